@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+"""Benchmark parsing of manifest files with FilePackageDataLoader.
+
+This generates channel manifests of various sizes in a temporary repository
+and measures how long it takes to load each one, comparing a plain
+read-and-parse against the loader's memory-mapped path with each installed
+JSON backend.
+
+Usage:
+
+    python contrib/benchmarks/bench_manifest_parse.py [--repeat N] [SIZE...]
+
+Sizes may be given in bytes, or with a ``KB`` or ``MB`` suffix. The default
+sizes are 1KB, 1MB, and 50MB.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                '..', '..')))
+
+from rbpkg.repository.loaders import FilePackageDataLoader
+from rbpkg.utils.json_backends import JSON_BACKENDS, set_json_backend
+
+
+DEFAULT_SIZES = ['1KB', '1MB', '50MB']
+
+
+def parse_size(value):
+    """Parse a size argument.
+
+    Args:
+        value (unicode):
+            The size, optionally suffixed with ``KB`` or ``MB``.
+
+    Returns:
+        int:
+        The size in bytes.
+    """
+    value = value.upper()
+
+    if value.endswith('MB'):
+        return int(value[:-2]) * 1024 * 1024
+    elif value.endswith('KB'):
+        return int(value[:-2]) * 1024
+    else:
+        return int(value)
+
+
+def build_manifest(size):
+    """Build a channel manifest of roughly the given size.
+
+    Args:
+        size (int):
+            The target size of the serialized manifest, in bytes.
+
+    Returns:
+        bytes:
+        The serialized manifest.
+    """
+    release = {
+        'version': '1.0.0',
+        'release_date': '2016-01-01T00:00:00',
+        'release_notes_url': 'https://example.com/releases/1.0.0/',
+        'package_names': ['ExamplePackage==1.0.0'],
+    }
+    release_size = len(json.dumps(release)) + 2
+    count = max(1, size // release_size)
+
+    return json.dumps({
+        'format_version': '1.0',
+        'name': '1.0.x',
+        'releases': [
+            dict(release, version='1.0.%d' % i)
+            for i in range(count)
+        ],
+    }).encode('utf-8')
+
+
+def get_backends():
+    """Return instances of all installed JSON backends.
+
+    Returns:
+        list of rbpkg.utils.json_backends.JSONBackend:
+        The installed backends.
+    """
+    backends = []
+
+    for backend_cls in JSON_BACKENDS:
+        try:
+            backends.append(backend_cls())
+        except ImportError:
+            pass
+
+    return backends
+
+
+def run_benchmarks(sizes, repeat):
+    """Run the benchmarks and print the results.
+
+    Args:
+        sizes (list of int):
+            The manifest sizes to benchmark.
+
+        repeat (int):
+            The number of times to load each manifest. The best time is
+            reported.
+    """
+    root = tempfile.mkdtemp(prefix='rbpkg-bench.')
+    os.environ['RBPKG_FILE_LOADER_ROOT'] = root
+    backends = get_backends()
+
+    try:
+        print('%-10s %-16s %12s' % ('Size', 'Method', 'Time (ms)'))
+
+        for size in sizes:
+            filename = os.path.join(root, 'manifest-%d.json' % size)
+            path = '/manifest-%d.json' % size
+
+            with open(filename, 'wb') as fp:
+                fp.write(build_manifest(size))
+
+            def _read_and_parse():
+                with open(filename, 'rb') as fp:
+                    json.loads(fp.read().decode('utf-8'))
+
+            results = [('read+json', _read_and_parse)]
+
+            for backend in backends:
+                loader = FilePackageDataLoader()
+
+                def _load(backend=backend, loader=loader):
+                    set_json_backend(backend)
+                    loader.load_by_path(path)
+
+                results.append(('loader+%s' % backend.name, _load))
+
+            for name, func in results:
+                best = min(timeit.repeat(func, number=1, repeat=repeat))
+                print('%-10s %-16s %12.3f' % (size, name, best * 1000))
+
+            os.unlink(filename)
+    finally:
+        set_json_backend(None)
+        shutil.rmtree(root)
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description='Benchmark manifest parsing.')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='The number of times to load each manifest.')
+    parser.add_argument('sizes', nargs='*', default=DEFAULT_SIZES,
+                        help='Manifest sizes to benchmark.')
+
+    options = parser.parse_args()
+
+    run_benchmarks([parse_size(size) for size in options.sizes],
+                   options.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,10 +6,15 @@ import os
 import platform
 import sys
 import textwrap
+from timeit import default_timer
 
 from colorlog import ColoredFormatter
 
 from rbpkg import get_version_string
+from rbpkg.repository.loaders import (InstrumentedPackageDataLoader,
+                                      get_data_loader, set_data_loader)
+from rbpkg.repository.package_repo import get_repository
+from rbpkg.repository.warm_start import create_warm_start_cache
 
 
 class LogLevelFilter(logging.Filter):
@@ -44,21 +49,56 @@ class BaseCommand(object):
 
         This will parse any options, initialize logging, and call the
         subclass's main().
+
+        If ``--offline`` was passed, package data will only be loaded from
+        the local cache.
+
+        If ``--stats`` was passed, all loads from the package repository
+        will be instrumented, and a summary will be printed once the command
+        finishes.
+
+        If :env:`RBPKG_WARM_START` is set to ``1``, package data saved by
+        the previous run is restored before the command runs, and saved
+        again once it finishes successfully.
         """
         parser = self.setup_options()
 
         self.options = parser.parse_args(argv)
         self._init_logging(debug=self.options.debug)
 
-        self.main()
+        if self.options.offline:
+            # This is set in the environment so that any data loaders
+            # created by the command will also be offline.
+            os.environ['RBPKG_OFFLINE'] = '1'
+            set_data_loader(None)
+
+        warm_start_cache = create_warm_start_cache()
+
+        if warm_start_cache is not None:
+            warm_start_cache.restore(get_repository())
+
+        if self.options.stats:
+            loader = InstrumentedPackageDataLoader(get_data_loader())
+            set_data_loader(loader)
+            start_time = default_timer()
+
+            try:
+                self.main()
+            finally:
+                self._print_stats(loader, default_timer() - start_time)
+        else:
+            self.main()
+
+        if warm_start_cache is not None:
+            warm_start_cache.save(get_repository())
 
     def setup_options(self):
         """Set up options for the command.
 
         This instantiates an :py:class:`~argparse.ArgumentParser` with the
-        standard --debug and --dry-run options. It then calls the subclass's
-        :py:meth:`add_options`, which can provide additional options for
-        the parser.
+        standard --debug, --dry-run, --offline, and --stats options. It then
+        calls the subclass's :py:meth:`add_options`, which can provide
+        additional options for the parser.
 
         Returns:
             argparse.ArgumentParser:
@@ -76,6 +116,17 @@ class BaseCommand(object):
                             action='store_true',
                             default=False,
                             help='Simulates all operations.')
+        parser.add_argument('--offline',
+                            action='store_true',
+                            default=False,
+                            help='Loads package data only from the local '
+                                 'cache, without contacting the package '
+                                 'repository.')
+        parser.add_argument('--stats',
+                            action='store_true',
+                            default=False,
+                            help='Displays timing and size information for '
+                                 'data loaded from the package repository.')
 
         self.add_options(parser)
 
@@ -93,6 +144,25 @@ class BaseCommand(object):
         """
         pass
 
+    def _print_stats(self, loader, total_time):
+        """Print statistics on loads from the package repository.
+
+        Args:
+            loader (rbpkg.repository.loaders.InstrumentedPackageDataLoader):
+                The loader that recorded the loads.
+
+            total_time (float):
+                The total time spent running the command, in seconds.
+        """
+        summary = loader.get_summary()
+        load_time = summary['fetch_time'] + summary['parse_time']
+
+        sys.stderr.write('\n%s\n\n' % loader.format_summary())
+        sys.stderr.write(
+            'Command time: %.2f ms (%.2f ms loading, %.2f ms other)\n'
+            % (total_time * 1000, load_time * 1000,
+               max(total_time - load_time, 0) * 1000))
+
     def _init_logging(self, debug=False):
         """Initialize logging.
 
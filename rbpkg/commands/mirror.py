@@ -0,0 +1,60 @@
+from __future__ import unicode_literals
+
+import logging
+import sys
+
+from rbpkg.commands.base import BaseCommand
+from rbpkg.repository.errors import LoadDataError
+from rbpkg.repository.loaders import create_data_loader
+from rbpkg.repository.sqlite_mirror import SqliteRepositoryMirror
+
+
+logger = logging.getLogger(__name__)
+
+
+class MirrorCommand(BaseCommand):
+    """Creates or updates a local SQLite mirror of the package repository.
+
+    Only package bundles that have changed since the last sync are fetched.
+    The mirror can be used in place of the repository by setting
+    $RBPKG_SQLITE_MIRROR to its path.
+    """
+
+    def add_options(self, parser):
+        """Add custom options to the parser.
+
+        Args:
+            parser (argparse.ArgumentParser):
+                The argument parser to populate.
+        """
+        parser.add_argument('--full',
+                            action='store_true',
+                            default=False,
+                            help='Re-imports all package bundles, even if '
+                                 'unchanged.')
+        parser.add_argument('filename',
+                            help='The SQLite database for the mirror.')
+
+    def main(self):
+        """Run the command."""
+        if self.options.dry_run:
+            logger.info('Would sync the repository to %s',
+                        self.options.filename)
+            return
+
+        mirror = SqliteRepositoryMirror(self.options.filename)
+
+        try:
+            bundle_names = mirror.sync(create_data_loader(use_mirror=False),
+                                       force=self.options.full)
+        except LoadDataError as e:
+            logger.error('Unable to sync the repository: %s', e)
+            sys.exit(1)
+        finally:
+            mirror.close()
+
+        if bundle_names:
+            logger.info('Updated %d package bundles: %s',
+                        len(bundle_names), ', '.join(bundle_names))
+        else:
+            logger.info('The mirror is up to date.')
@@ -0,0 +1,71 @@
+from __future__ import unicode_literals
+
+import logging
+import sys
+
+from rbpkg.commands.base import BaseCommand
+from rbpkg.repository.errors import LoadDataError
+from rbpkg.repository.package_repo import get_repository
+
+
+logger = logging.getLogger(__name__)
+
+
+class SearchCommand(BaseCommand):
+    """Searches for packages by name.
+
+    Package bundles in the package index are matched by their own names and
+    by the names of their native (Debian, RPM, Python, etc.) packages.
+    Names starting with the query are listed first, followed by names
+    similar to it.
+    """
+
+    #: The default maximum number of results to show.
+    DEFAULT_LIMIT = 20
+
+    def add_options(self, parser):
+        """Add custom options to the parser.
+
+        Args:
+            parser (argparse.ArgumentParser):
+                The argument parser to populate.
+        """
+        parser.add_argument('--limit',
+                            type=int,
+                            default=self.DEFAULT_LIMIT,
+                            help='The maximum number of results to show. '
+                                 'Defaults to %d.' % self.DEFAULT_LIMIT)
+        parser.add_argument('--prefix',
+                            action='store_true',
+                            default=False,
+                            help='Only shows names starting with the query.')
+        parser.add_argument('query',
+                            help='The name or partial name to search for.')
+
+    def main(self):
+        """Run the command."""
+        try:
+            search_index = get_repository().get_search_index()
+        except LoadDataError as e:
+            logger.error('Unable to load the package index: %s', e)
+            sys.exit(1)
+
+        if self.options.prefix:
+            results = search_index.search_prefix(self.options.query,
+                                                 limit=self.options.limit)
+        else:
+            results = search_index.search(self.options.query,
+                                          limit=self.options.limit)
+
+        if not results:
+            logger.info('No packages found matching "%s".',
+                        self.options.query)
+            sys.exit(1)
+
+        for result in results:
+            if result.package_type is None:
+                logger.info('%s', result.bundle_name)
+            else:
+                logger.info('%s (%s package "%s")',
+                            result.bundle_name, result.package_type,
+                            result.matched_name)
@@ -0,0 +1,59 @@
+from __future__ import unicode_literals
+
+import logging
+import os
+import sys
+
+from rbpkg.commands.base import BaseCommand
+from rbpkg.repository.archives import (ARCHIVE_FORMATS,
+                                       create_repository_archive,
+                                       iter_repository_files)
+
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotCommand(BaseCommand):
+    """Creates a single-file snapshot of a package repository.
+
+    The snapshot is a zip or tar archive of a repository tree (the
+    directory containing packages/). It can be used in place of the tree
+    by setting $RBPKG_REPOSITORY_ARCHIVE to its path.
+    """
+
+    def add_options(self, parser):
+        """Add custom options to the parser.
+
+        Args:
+            parser (argparse.ArgumentParser):
+                The argument parser to populate.
+        """
+        parser.add_argument('--format',
+                            dest='archive_format',
+                            choices=ARCHIVE_FORMATS,
+                            default=None,
+                            help='The archive format. By default, this is '
+                                 'based on the extension of the output '
+                                 'file, falling back to zip.')
+        parser.add_argument('root',
+                            help='The root of the repository tree.')
+        parser.add_argument('filename',
+                            help='The archive file to write.')
+
+    def main(self):
+        """Run the command."""
+        root = self.options.root
+
+        if not os.path.isdir(os.path.join(root, 'packages')):
+            logger.error('%s does not contain a packages/ directory.', root)
+            sys.exit(1)
+
+        if self.options.dry_run:
+            count = len(list(iter_repository_files(root)))
+        else:
+            count = create_repository_archive(
+                root,
+                self.options.filename,
+                archive_format=self.options.archive_format)
+
+        logger.info('Wrote %d files to %s', count, self.options.filename)
@@ -6,6 +6,7 @@ import six
 from rbpkg.package_manager.dep_graph import DependencyGraph
 from rbpkg.package_manager.errors import (DependencyConflictError,
                                           PackageInstallError)
+from rbpkg.repository.errors import PackageLookupError
 from rbpkg.repository.package_channel import PackageChannel
 from rbpkg.repository.package_repo import get_repository
 from rbpkg.utils.matches import matches_version_range
@@ -25,6 +26,12 @@ class PendingInstall(object):
     must be resolved using :py:meth:`resolve_dependencies`. The resulting
     install order of packages can then be retrieved using
     :py:meth:`get_install_order`.
+
+    Packages and dependencies are looked up in the repository provided when
+    creating the install. Passing a
+    :py:class:`~rbpkg.repository.snapshots.RepositorySnapshot` ensures that
+    dependencies are resolved against consistent data, even if the
+    repository is refreshed in the meantime.
     """
 
     #: Install all required dependencies. This is the default.
@@ -36,7 +43,8 @@ class PendingInstall(object):
     #: Install all required, recommended, and optional dependencies.
     INSTALL_DEPS_ALL = 2
 
-    def __init__(self, install_deps_mode=INSTALL_DEPS_REQUIRED):
+    def __init__(self, install_deps_mode=INSTALL_DEPS_REQUIRED,
+                 repository=None):
         """Initialize the PendingInstall.
 
         Args:
@@ -46,13 +54,17 @@ class PendingInstall(object):
                 :py:attr:`INSTALL_DEPS_REQUIRED` (default),
                 :py:attr:`INSTALL_DEPS_RECOMMENDED`, or
                 :py:attr:`INSTALL_DEPS_ALL`.
+
+            repository (object, optional):
+                The repository or repository snapshot to look up
+                dependencies in. This defaults to the shared repository.
         """
         self.install_deps_mode = install_deps_mode
 
         self._bundle_infos = []
         self._bundle_infos_map = {}
         self._dep_graph = DependencyGraph()
-        self._repository = get_repository()
+        self._repository = repository or get_repository()
 
     def add_package(self, release, package_type):
         """Add a package to be installed.
@@ -183,23 +195,12 @@ class PendingInstall(object):
         """
         new_bundle_infos = []
 
-        for bundle_info in bundle_infos:
-            rules = bundle_info['rules']
-
-            new_bundle_infos.extend(self._process_dependencies_list(
-                bundle_info,
-                rules.required_dependencies))
+        self._prefetch_dependency_bundles(bundle_infos)
 
-            if self.install_deps_mode in (self.INSTALL_DEPS_RECOMMENDED,
-                                          self.INSTALL_DEPS_ALL):
+        for bundle_info in bundle_infos:
+            for deps in self._get_dependency_lists(bundle_info['rules']):
                 new_bundle_infos.extend(self._process_dependencies_list(
-                    bundle_info,
-                    rules.recommended_dependencies))
-
-                if self.install_deps_mode == self.INSTALL_DEPS_ALL:
-                    new_bundle_infos.extend(self._process_dependencies_list(
-                        bundle_info,
-                        rules.optional_dependencies))
+                    bundle_info, deps))
 
         if new_bundle_infos:
             self._bundle_infos.extend(new_bundle_infos)
@@ -210,6 +211,54 @@ class PendingInstall(object):
 
             self._resolve_dependencies_for_bundles(new_bundle_infos)
 
+    def _get_dependency_lists(self, rules):
+        """Return the lists of dependencies to install for a set of rules.
+
+        Args:
+            rules (rbpkg.repository.package_rules.PackageRules):
+                The rules listing the dependencies.
+
+        Returns:
+            list of list of unicode:
+            The lists of dependencies to install, based on
+            :py:attr:`install_deps_mode`.
+        """
+        dep_lists = [rules.required_dependencies]
+
+        if self.install_deps_mode in (self.INSTALL_DEPS_RECOMMENDED,
+                                      self.INSTALL_DEPS_ALL):
+            dep_lists.append(rules.recommended_dependencies)
+
+            if self.install_deps_mode == self.INSTALL_DEPS_ALL:
+                dep_lists.append(rules.optional_dependencies)
+
+        return dep_lists
+
+    def _prefetch_dependency_bundles(self, bundle_infos):
+        """Look up the package bundles for dependencies in one batch.
+
+        This fetches the bundles for all dependencies of the given bundles
+        together, so that processing each dependency afterward won't need
+        to wait on the repository. Lookup errors are left for that
+        processing to report.
+
+        Args:
+            bundle_infos (list):
+                A list of bundle information dictionaries.
+        """
+        dep_names = [
+            self._split_dependency(dep)[0]
+            for bundle_info in bundle_infos
+            for deps in self._get_dependency_lists(bundle_info['rules'])
+            for dep in deps
+        ]
+
+        if dep_names:
+            try:
+                self._repository.lookup_package_bundles(dep_names)
+            except PackageLookupError:
+                pass
+
     def _process_dependencies_list(self, bundle_info, deps):
         """Process a single list of dependencies for a bundle.
 
@@ -7,7 +7,9 @@ from rbpkg.repository.loaders import InMemoryPackageDataLoader, set_data_loader
 from rbpkg.repository.package_bundle import PackageBundle
 from rbpkg.repository.package_channel import PackageChannel
 from rbpkg.repository.package_release import PackageRelease
+from rbpkg.repository.package_repo import PackageRepository
 from rbpkg.repository.package_rules import PackageRules
+from rbpkg.repository.snapshots import PackageBundleView
 from rbpkg.testing.testcases import TestCase
 
 
@@ -201,6 +203,97 @@ class PendingInstallTests(TestCase):
         self.assertTrue('MyPackage' in pending_install._bundle_infos_map)
         self.assertTrue('DepPackage1' in pending_install._bundle_infos_map)
 
+    def test_resolve_dependencies_with_snapshot(self):
+        """Testing PendingInstall.resolve_dependencies with a repository
+        snapshot
+        """
+        self.data_loader.path_to_content.update({
+            '/packages/index.json': {
+                'format_version': '1.0',
+                'last_updated_timestamp': '2015-10-15T08:17:29.958569',
+                'bundles': [],
+            },
+            '/packages/DepPackage1/index.json': {
+                'format_version': '1.0',
+                'name': 'DepPackage1',
+                'created_timestamp': '2015-10-11T08:17:29.958569',
+                'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+                'current_version': '1.5',
+                'channels': [
+                    {
+                        'name': '1.x',
+                        'created_timestamp': '2015-10-13T08:17:29.958569',
+                        'last_updated_timestamp': '2015-10-14T08:17:29.958569',
+                        'latest_version': '1.5',
+                        'current': True,
+                        'visible': True,
+                        'manifest_file': '1.x.json',
+                    },
+                ],
+            },
+            '/packages/DepPackage1/1.x.json': {
+                'format_version': '1.0',
+                'created_timestamp': '2015-10-11T08:17:29.958569',
+                'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+                'releases': [
+                    {
+                        'version': '1.5',
+                        'type': 'stable',
+                        'visible': True,
+                    }
+                ],
+                'package_rules': [
+                    {
+                        'version_range': '*',
+                        'package_type': 'python',
+                        'package_name': 'DepPackage1',
+                        'systems': ['*'],
+                    },
+                ],
+            },
+        })
+
+        repository = PackageRepository()
+        snapshot = repository.create_snapshot(bundle_names=['DepPackage1'],
+                                              load_channels=True)
+
+        # Changes to the repository after the snapshot is taken won't be seen.
+        repository.clear_caches()
+        self.data_loader.path_to_content.pop('/packages/DepPackage1/1.x.json')
+
+        pending_install = PendingInstall(repository=snapshot)
+
+        bundle = PackageBundle(name='MyPackage')
+        channel = PackageChannel(bundle, name='1.0.x')
+        channel._loaded = True
+        bundle._channels = [channel]
+
+        release = PackageRelease(channel=channel, version='1.0')
+        channel._releases = [release]
+
+        rules = PackageRules(
+            channel=channel,
+            version_range='*',
+            required_dependencies=[
+                'DepPackage1>=1.0',
+            ],
+            package_type='python',
+            package_name='TestPackage',
+            systems=['*'])
+        channel._package_rules = [rules]
+
+        pending_install.add_package(release, 'python')
+
+        pending_install.resolve_dependencies()
+
+        self.assertEqual(len(pending_install._bundle_infos), 2)
+
+        bundle_info = pending_install._bundle_infos[1]
+        self.assertIsInstance(bundle_info['bundle'], PackageBundleView)
+        self.assertEqual(bundle_info['bundle'].name, 'DepPackage1')
+        self.assertEqual(bundle_info['release'].version, '1.5')
+        self.assertEqual(bundle_info['rules'].package_name, 'DepPackage1')
+
     def test_resolve_dependencies_with_recommended_deps(self):
         """Testing PendingInstall.resolve_dependencies with recommended
         dependencies
@@ -0,0 +1,142 @@
+"""Utilities for working with single-file repository archives.
+
+A repository archive is a zip or tar file containing a copy of a package
+repository tree (such as :file:`packages/index.json` and the bundle and
+channel manifests beneath it). It can be copied around as one file and
+served by :py:class:`~rbpkg.repository.loaders.ArchivePackageDataLoader`.
+
+Zip archives are preferred, since their central directory allows any
+member to be read without scanning the rest of the archive.
+"""
+
+from __future__ import unicode_literals
+
+import os
+import tarfile
+import tempfile
+import zipfile
+
+from rbpkg.utils.disk_cache import replace_file
+
+
+#: The zip archive format.
+ARCHIVE_FORMAT_ZIP = 'zip'
+
+#: The uncompressed tar archive format.
+ARCHIVE_FORMAT_TAR = 'tar'
+
+#: All supported archive formats.
+ARCHIVE_FORMATS = (ARCHIVE_FORMAT_ZIP, ARCHIVE_FORMAT_TAR)
+
+
+def get_archive_format(filename):
+    """Return the archive format to use for a filename.
+
+    Args:
+        filename (unicode):
+            The filename of the archive.
+
+    Returns:
+        unicode:
+        The archive format, based on the file extension. This defaults to
+        :py:data:`ARCHIVE_FORMAT_ZIP`.
+    """
+    if filename.lower().endswith('.tar'):
+        return ARCHIVE_FORMAT_TAR
+    else:
+        return ARCHIVE_FORMAT_ZIP
+
+
+def iter_repository_files(root):
+    """Iterate through all files in a repository tree.
+
+    Files are returned in sorted order, so archives built from the same
+    tree will have the same layout.
+
+    Args:
+        root (unicode):
+            The root of the repository tree.
+
+    Yields:
+        tuple:
+        A 2-tuple containing the member name within the archive (using
+        ``/`` as a separator) and the filename on disk.
+    """
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+
+        for name in sorted(filenames):
+            if name.startswith('.tmp-'):
+                # This is a manifest in the middle of being written.
+                continue
+
+            filename = os.path.join(dirpath, name)
+            rel_path = os.path.relpath(filename, root)
+
+            yield rel_path.replace(os.sep, '/'), filename
+
+
+def create_repository_archive(root, filename, archive_format=None):
+    """Create an archive from a repository tree.
+
+    The archive is written to a temporary file and then moved into place,
+    so loaders reading an existing archive at that location won't see a
+    partial file.
+
+    Args:
+        root (unicode):
+            The root of the repository tree.
+
+        filename (unicode):
+            The filename of the archive to create.
+
+        archive_format (unicode, optional):
+            The archive format. If not provided, it will be determined from
+            the filename by :py:func:`get_archive_format`.
+
+    Returns:
+        int:
+        The number of files written to the archive.
+
+    Raises:
+        ValueError:
+            The archive format is not supported.
+    """
+    if archive_format is None:
+        archive_format = get_archive_format(filename)
+
+    if archive_format not in ARCHIVE_FORMATS:
+        raise ValueError('Unsupported archive format "%s"' % archive_format)
+
+    fd, temp_filename = tempfile.mkstemp(
+        prefix='.tmp-',
+        dir=os.path.dirname(os.path.abspath(filename)))
+    os.close(fd)
+
+    count = 0
+
+    try:
+        if archive_format == ARCHIVE_FORMAT_ZIP:
+            with zipfile.ZipFile(temp_filename, 'w',
+                                 zipfile.ZIP_DEFLATED) as archive:
+                for name, member_filename in iter_repository_files(root):
+                    archive.write(member_filename, name)
+                    count += 1
+        else:
+            with tarfile.open(temp_filename, 'w') as archive:
+                for name, member_filename in iter_repository_files(root):
+                    archive.add(member_filename, name)
+                    count += 1
+
+        # The temporary file is only readable by its owner. Give the
+        # archive the permissions of a normally created file instead.
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temp_filename, 0o666 & ~umask)
+
+        replace_file(temp_filename, filename)
+    except Exception:
+        os.unlink(temp_filename)
+        raise
+
+    return count
@@ -0,0 +1,874 @@
+"""asyncio-native data loaders and repository operations.
+
+These mirror the synchronous API in :py:mod:`rbpkg.repository.loaders`, but
+allow many manifests to be loaded concurrently on a single event loop. This
+module requires Python 3.7 or higher.
+
+Most callers will use the awaitable counterparts on the repository classes,
+such as :py:meth:`PackageRepository.lookup_package_bundle_async()
+<rbpkg.repository.package_repo.PackageRepository.
+lookup_package_bundle_async>`, which use the loader returned by
+:py:func:`get_async_data_loader`.
+"""
+
+from __future__ import unicode_literals
+
+import asyncio
+import logging
+import ssl
+from urllib.parse import urljoin, urlsplit
+
+from rbpkg import get_package_version
+from rbpkg.repository.errors import LoadDataError, PathNotFoundError
+from rbpkg.repository.loaders import (DEFAULT_REPOSITORY_URL,
+                                      FetchResult,
+                                      get_data_loader)
+from rbpkg.repository.manifests import parse_manifest_content
+
+
+logger = logging.getLogger(__name__)
+
+
+_async_data_loader = None
+
+
+class _AsyncInFlightCall(object):
+    """State for a call in progress within an AsyncSingleFlight."""
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class AsyncSingleFlight(object):
+    """Coalesces concurrent coroutine calls for the same key into one call.
+
+    This is the :py:mod:`asyncio` counterpart to
+    :py:class:`~rbpkg.utils.single_flight.SingleFlight`. When several tasks
+    request the same key at the same time, only the first one will start
+    the work, in a task of its own. All callers (including the first) wait
+    on that task for its result (or exception).
+
+    Cancelling a caller doesn't cancel the shared task while other callers
+    are still waiting on it. It's only cancelled once no callers remain.
+
+    Calls are tracked per event loop, so one instance can be shared by
+    several loops.
+
+    Attributes:
+        call_count (int):
+            The number of calls that performed work.
+
+        coalesced_count (int):
+            The number of calls that waited on another call's result
+            instead of performing the work themselves.
+    """
+
+    def __init__(self):
+        """Initialize the object."""
+        self.call_count = 0
+        self.coalesced_count = 0
+
+        self._in_flight = {}
+
+    async def do(self, key, func, *args, **kwargs):
+        """Call a coroutine function, sharing the result with concurrent
+        callers.
+
+        Args:
+            key (object):
+                The key identifying the work. This must be hashable.
+
+            func (callable):
+                The coroutine function to call, if no call for the key is in
+                flight.
+
+            *args (tuple):
+                Positional arguments to pass to the function.
+
+            **kwargs (dict):
+                Keyword arguments to pass to the function.
+
+        Returns:
+            object:
+            The result of the function.
+
+        Raises:
+            Exception:
+                Any exception raised by the function will be raised to all
+                callers waiting on it.
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (loop, key)
+        call = self._in_flight.get(flight_key)
+
+        if call is None:
+            call = _AsyncInFlightCall(loop.create_task(func(*args, **kwargs)))
+            call.task.add_done_callback(
+                lambda task: self._on_call_done(flight_key, call))
+            self._in_flight[flight_key] = call
+            self.call_count += 1
+        else:
+            self.coalesced_count += 1
+
+        call.waiters += 1
+
+        try:
+            # Shield the shared task, so that cancelling one caller doesn't
+            # cancel it for the others.
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+
+    def _on_call_done(self, flight_key, call):
+        """Forget a call once its task has finished.
+
+        Args:
+            flight_key (tuple):
+                The key the call is tracked under.
+
+            call (_AsyncInFlightCall):
+                The call that finished.
+        """
+        if self._in_flight.get(flight_key) is call:
+            del self._in_flight[flight_key]
+
+        if not call.task.cancelled():
+            # Mark the exception as retrieved, in case nothing was waiting.
+            call.task.exception()
+
+
+#: Coalesces concurrent async loads of the same index, bundle, or channel.
+_single_flight = AsyncSingleFlight()
+
+
+class AsyncPackageDataLoader(object):
+    """Base class for an asyncio-native data loader."""
+
+    async def load_by_path(self, *parts):
+        """Load data from the given path within the repository.
+
+        Args:
+            *parts (list of unicode):
+                The segments of a path within the repository.
+
+        Returns:
+            dict: The loaded data from that path, if found.
+
+        Raises:
+            rbpkg.repository.errors.ConfigurationError:
+                Indicates a problem with the configuration of rbpkg or its
+                environment.
+
+            rbpkg.repository.errors.LoadDataError:
+                Error loading or parsing data from the path.
+        """
+        raise NotImplementedError
+
+    async def load_by_paths(self, paths):
+        """Load data from several paths within the repository.
+
+        By default, all paths are loaded concurrently through
+        :py:meth:`load_by_path`.
+
+        Args:
+            paths (list of unicode):
+                The paths within the repository to load. Duplicates will
+                only be loaded once.
+
+        Returns:
+            dict:
+            A mapping of each path to its loaded data.
+
+        Raises:
+            rbpkg.repository.errors.ConfigurationError:
+                Indicates a problem with the configuration of rbpkg or its
+                environment.
+
+            rbpkg.repository.errors.LoadDataError:
+                Error loading or parsing data from one of the paths.
+        """
+        paths = list(dict.fromkeys(paths))
+        results = await asyncio.gather(*[
+            self.load_by_path(path)
+            for path in paths
+        ])
+
+        return dict(zip(paths, results))
+
+
+class ExecutorAsyncPackageDataLoader(AsyncPackageDataLoader):
+    """An async data loader that runs a synchronous loader in an executor.
+
+    This allows any :py:class:`~rbpkg.repository.loaders.PackageDataLoader`
+    (including caching and other wrapping loaders) to be used from asyncio
+    code without blocking the event loop.
+
+    Attributes:
+        loader (rbpkg.repository.loaders.PackageDataLoader):
+            The synchronous loader to use, or ``None`` to use the loader
+            returned by :py:func:`~rbpkg.repository.loaders.get_data_loader`
+            at the time of each load.
+
+        executor (concurrent.futures.Executor):
+            The executor to run loads in, or ``None`` for the event loop's
+            default executor.
+    """
+
+    def __init__(self, loader=None, executor=None):
+        """Initialize the data loader.
+
+        Args:
+            loader (rbpkg.repository.loaders.PackageDataLoader, optional):
+                The synchronous loader to use.
+
+            executor (concurrent.futures.Executor, optional):
+                The executor to run loads in.
+        """
+        self.loader = loader
+        self.executor = executor
+
+    async def load_by_path(self, *parts):
+        """Load data from the given path within the repository.
+
+        Args:
+            *parts (list of unicode):
+                The segments of a path within the repository.
+
+        Returns:
+            dict: The loaded data from that path, if found.
+
+        Raises:
+            rbpkg.repository.errors.ConfigurationError:
+                Indicates a problem with the configuration of rbpkg or its
+                environment.
+
+            rbpkg.repository.errors.LoadDataError:
+                Error loading or parsing data from the path.
+        """
+        loader = self.loader or get_data_loader()
+
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, loader.load_by_path, '/'.join(parts))
+
+
+class AsyncHttpPackageDataLoader(AsyncPackageDataLoader):
+    """An async data loader that fetches data over HTTP(S).
+
+    This is the asyncio counterpart to
+    :py:class:`~rbpkg.repository.loaders.HttpPackageDataLoader`. Connections
+    are kept alive and pooled per host, and the number of simultaneous
+    connections to each host is capped, so hundreds of concurrent loads
+    will share a small number of connections.
+
+    Attributes:
+        base_url (unicode):
+            The URL to the root of the repository.
+
+        timeout (float):
+            The timeout, in seconds, for each request.
+
+        max_connections (int):
+            The maximum number of simultaneous connections per host.
+
+        requests_sent (int):
+            The number of HTTP requests that have been sent.
+
+        connections_opened (int):
+            The number of new connections that have been opened.
+
+        connections_reused (int):
+            The number of requests that were sent over an existing
+            connection.
+    """
+
+    #: The default timeout, in seconds, for each request.
+    DEFAULT_TIMEOUT = 30
+
+    #: The default maximum number of simultaneous connections per host.
+    DEFAULT_MAX_CONNECTIONS = 8
+
+    def __init__(self, base_url=DEFAULT_REPOSITORY_URL,
+                 timeout=DEFAULT_TIMEOUT,
+                 max_connections=DEFAULT_MAX_CONNECTIONS):
+        """Initialize the data loader.
+
+        Args:
+            base_url (unicode, optional):
+                The URL to the root of the repository.
+
+            timeout (float, optional):
+                The timeout, in seconds, for each request.
+
+            max_connections (int, optional):
+                The maximum number of simultaneous connections per host.
+        """
+        if not base_url.endswith('/'):
+            base_url += '/'
+
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.requests_sent = 0
+        self.connections_opened = 0
+        self.connections_reused = 0
+
+        self._idle_connections = {}
+        self._semaphores = {}
+
+    async def load_by_path(self, *parts):
+        """Load data from the given path within the repository.
+
+        Args:
+            *parts (list of unicode):
+                The segments of a path within the repository.
+
+        Returns:
+            dict: The loaded data from that path, if found.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                Error loading or parsing data from the path.
+        """
+        path = '/'.join(parts)
+        result = await self.fetch_by_path(path)
+
+        return parse_manifest_content(path, result.content)
+
+    async def fetch_by_path(self, path, etag=None, last_modified=None):
+        """Fetch the raw content for the given path within the repository.
+
+        If validators are provided, a conditional request will be sent.
+
+        Args:
+            path (unicode):
+                The path within the repository.
+
+            etag (unicode, optional):
+                The ETag from a previous fetch of this path.
+
+            last_modified (unicode, optional):
+                The Last-Modified value from a previous fetch of this path.
+
+        Returns:
+            rbpkg.repository.loaders.FetchResult:
+            The result of the fetch.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                Error loading the data from the path.
+        """
+        if urlsplit(path).scheme:
+            url = path
+        else:
+            url = urljoin(self.base_url, path.lstrip('/'))
+
+        request_headers = {}
+
+        if etag:
+            request_headers['If-None-Match'] = etag
+
+        if last_modified:
+            request_headers['If-Modified-Since'] = last_modified
+
+        status, headers, content = await self._send_request(url,
+                                                            request_headers)
+
+        if status == 304:
+            return FetchResult(path=path,
+                               etag=headers.get('etag', etag),
+                               last_modified=headers.get('last-modified',
+                                                         last_modified),
+                               not_modified=True)
+        elif status in (404, 410):
+            raise PathNotFoundError(
+                'Unable to load "%s". The file could not be found.' % url)
+        elif status != 200:
+            raise LoadDataError(
+                'Unable to load "%s": HTTP %s' % (url, status))
+
+        return FetchResult(path=path,
+                           content=content,
+                           etag=headers.get('etag'),
+                           last_modified=headers.get('last-modified'))
+
+    def get_connection_stats(self):
+        """Return statistics on connection usage.
+
+        Returns:
+            dict:
+            A dictionary containing ``requests_sent``, ``connections_opened``
+            and ``connections_reused`` counts, along with the number of
+            ``idle_connections`` currently held in the pool.
+        """
+        return {
+            'requests_sent': self.requests_sent,
+            'connections_opened': self.connections_opened,
+            'connections_reused': self.connections_reused,
+            'idle_connections': sum(
+                len(conns)
+                for conns in self._idle_connections.values()
+            ),
+        }
+
+    async def close(self):
+        """Close all idle connections."""
+        idle_connections = self._idle_connections
+        self._idle_connections = {}
+
+        for conns in idle_connections.values():
+            for reader, writer in conns:
+                writer.close()
+
+    async def _send_request(self, url, headers):
+        """Send a GET request for a URL and read the response.
+
+        If a pooled connection turns out to have been closed by the server,
+        the request will be retried once on a new connection.
+
+        Args:
+            url (unicode):
+                The URL to fetch.
+
+            headers (dict):
+                Additional headers to send in the request.
+
+        Returns:
+            tuple:
+            A 3-tuple containing the HTTP status code, a dictionary of
+            response headers (with lowercase names), and the response body
+            as a byte string.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                The request could not be sent, or the response could not be
+                read.
+        """
+        parsed_url = urlsplit(url)
+        key = (parsed_url.scheme, parsed_url.netloc)
+        request_path = parsed_url.path or '/'
+
+        if parsed_url.query:
+            request_path += '?%s' % parsed_url.query
+
+        request = [
+            'GET %s HTTP/1.1' % request_path,
+            'Host: %s' % parsed_url.netloc,
+            'Accept-Encoding: gzip',
+            'Connection: keep-alive',
+            'User-Agent: rbpkg/%s' % get_package_version(),
+        ]
+        request += [
+            '%s: %s' % (name, value)
+            for name, value in headers.items()
+        ]
+        request = ('\r\n'.join(request) + '\r\n\r\n').encode('latin-1')
+
+        semaphore = self._semaphores.get(key)
+
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_connections)
+            self._semaphores[key] = semaphore
+
+        allow_reuse = True
+
+        async with semaphore:
+            while True:
+                reader, writer, reused = await self._acquire_connection(
+                    key,
+                    allow_reuse=allow_reuse)
+
+                try:
+                    writer.write(request)
+                    await writer.drain()
+
+                    status, response_headers, content, keep_alive = \
+                        await asyncio.wait_for(self._read_response(reader),
+                                               self.timeout)
+                except (OSError, EOFError, asyncio.IncompleteReadError,
+                        asyncio.TimeoutError, ValueError) as e:
+                    writer.close()
+
+                    if reused and not isinstance(e, asyncio.TimeoutError):
+                        # The server most likely closed the idle
+                        # connection. Try again, once, on a new one.
+                        logger.debug('Retrying %s on a new connection after '
+                                     'error: %r',
+                                     url, e)
+                        allow_reuse = False
+                        continue
+
+                    raise LoadDataError('Unable to load "%s": %r' % (url, e))
+
+                if keep_alive:
+                    self._idle_connections.setdefault(key, []).append(
+                        (reader, writer))
+                else:
+                    writer.close()
+
+                return status, response_headers, content
+
+    async def _acquire_connection(self, key, allow_reuse=True):
+        """Return a connection for a host.
+
+        An idle connection will be returned from the pool if one is
+        available and ``allow_reuse`` is set. Otherwise, a new connection
+        will be opened.
+
+        Args:
+            key (tuple):
+                A tuple of the URL scheme and network location.
+
+            allow_reuse (bool, optional):
+                Whether an idle connection from the pool may be returned.
+
+        Returns:
+            tuple:
+            A 3-tuple containing the stream reader, the stream writer, and
+            a boolean indicating whether the connection was reused.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                The connection could not be opened.
+        """
+        self.requests_sent += 1
+
+        if allow_reuse:
+            try:
+                reader, writer = self._idle_connections[key].pop()
+                self.connections_reused += 1
+
+                return reader, writer, True
+            except (IndexError, KeyError):
+                pass
+
+        scheme, netloc = key
+
+        if scheme == 'https':
+            ssl_context = ssl.create_default_context()
+            default_port = 443
+        elif scheme == 'http':
+            ssl_context = None
+            default_port = 80
+        else:
+            raise LoadDataError('Unsupported URL scheme "%s" for "%s"'
+                                % (scheme, netloc))
+
+        parsed_netloc = urlsplit('//%s' % netloc)
+
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(parsed_netloc.hostname,
+                                        parsed_netloc.port or default_port,
+                                        ssl=ssl_context),
+                self.timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            raise LoadDataError('Unable to connect to "%s": %r' % (netloc, e))
+
+        self.connections_opened += 1
+
+        return reader, writer, False
+
+    async def _read_response(self, reader):
+        """Read an HTTP response from a connection.
+
+        Args:
+            reader (asyncio.StreamReader):
+                The stream to read from.
+
+        Returns:
+            tuple:
+            A 4-tuple containing the HTTP status code, a dictionary of
+            response headers (with lowercase names), the response body, and
+            a boolean indicating whether the connection can be reused.
+
+        Raises:
+            EOFError:
+                The connection was closed before a response was read.
+
+            ValueError:
+                The response was malformed.
+        """
+        status_line = await reader.readline()
+
+        if not status_line:
+            raise EOFError('Connection closed by server')
+
+        version, status = status_line.decode('latin-1').split(None, 2)[:2]
+        status = int(status)
+        headers = {}
+
+        while True:
+            line = await reader.readline()
+
+            if line in (b'\r\n', b'\n', b''):
+                break
+
+            name, value = line.decode('latin-1').split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = (version == 'HTTP/1.1' and
+                      headers.get('connection', '').lower() != 'close')
+
+        if status in (204, 304) or 100 <= status < 200:
+            content = b''
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+
+            while True:
+                size = int((await reader.readline()).split(b';', 1)[0], 16)
+
+                if size == 0:
+                    # Skip any trailers.
+                    while (await reader.readline()) not in (b'\r\n', b'\n',
+                                                            b''):
+                        pass
+
+                    break
+
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+
+            content = b''.join(chunks)
+        elif 'content-length' in headers:
+            content = await reader.readexactly(int(headers['content-length']))
+        else:
+            content = await reader.read()
+            keep_alive = False
+
+        return status, headers, content, keep_alive
+
+
+async def load_package_channel(channel):
+    """Load a package channel's manifest file.
+
+    This is used by
+    :py:meth:`PackageChannel.load_async()
+    <rbpkg.repository.package_channel.PackageChannel.load_async>`.
+
+    Concurrent loads of the same channel are coalesced into one.
+
+    Args:
+        channel (rbpkg.repository.package_channel.PackageChannel):
+            The channel to load.
+    """
+    await _single_flight.do(('channel', channel), _load_package_channel,
+                            channel)
+
+
+async def load_package_bundle(bundle, load_channels=False):
+    """Load a package bundle's manifest file.
+
+    This is used by
+    :py:meth:`PackageBundle.load_async()
+    <rbpkg.repository.package_bundle.PackageBundle.load_async>`.
+
+    Concurrent loads of the same bundle (and of its channels) are coalesced
+    into one.
+
+    Args:
+        bundle (rbpkg.repository.package_bundle.PackageBundle):
+            The bundle to load.
+
+        load_channels (bool, optional):
+            Whether to also load the manifests for all channels. These will
+            be loaded concurrently.
+    """
+    await _single_flight.do(('bundle', bundle), _load_package_bundle, bundle)
+
+    if load_channels:
+        await asyncio.gather(*[
+            load_package_channel(channel)
+            for channel in bundle._channels
+        ])
+
+
+async def get_package_index(repository):
+    """Return the root package index from a repository.
+
+    This is used by
+    :py:meth:`PackageRepository.get_index_async()
+    <rbpkg.repository.package_repo.PackageRepository.get_index_async>`.
+
+    Concurrent loads of the index are coalesced into one.
+
+    Args:
+        repository (rbpkg.repository.package_repo.PackageRepository):
+            The repository to load the index from.
+
+    Returns:
+        rbpkg.repository.package_index.PackageIndex:
+        The root package index.
+    """
+    index = repository._index
+
+    if not index:
+        index = await _single_flight.do((repository, 'index'),
+                                        _load_package_index, repository)
+
+    return index
+
+
+async def lookup_package_bundle(repository, name):
+    """Look up a package bundle by name in a repository.
+
+    This is used by
+    :py:meth:`PackageRepository.lookup_package_bundle_async()
+    <rbpkg.repository.package_repo.PackageRepository.
+    lookup_package_bundle_async>`.
+
+    Concurrent lookups of the same bundle are coalesced into one.
+
+    Args:
+        repository (rbpkg.repository.package_repo.PackageRepository):
+            The repository to look up the bundle in.
+
+        name (unicode):
+            The name of the package bundle.
+
+    Returns:
+        rbpkg.repository.package_bundle.PackageBundle:
+        The package bundle.
+
+    Raises:
+        rbpkg.repository.errors.PackageLookupError:
+            The package bundle could not be found or loaded.
+    """
+    package_bundle = repository._package_bundle_cache.get(name)
+
+    if package_bundle is None:
+        repository._check_missing_package_bundle(name)
+
+        package_bundle = await _single_flight.do(
+            (repository, 'bundle', name),
+            _load_repository_package_bundle, repository, name)
+
+    return package_bundle
+
+
+async def _load_package_channel(channel):
+    """Load a package channel's manifest file.
+
+    This is called for one task at a time, per channel, by
+    :py:func:`load_package_channel`.
+
+    Args:
+        channel (rbpkg.repository.package_channel.PackageChannel):
+            The channel to load.
+    """
+    # Let the exceptions bubble up.
+    channel._load_data(await get_async_data_loader().load_by_path(
+        channel.absolute_manifest_url))
+
+
+async def _load_package_bundle(bundle):
+    """Load a package bundle's manifest file.
+
+    This is called for one task at a time, per bundle, by
+    :py:func:`load_package_bundle`.
+
+    Args:
+        bundle (rbpkg.repository.package_bundle.PackageBundle):
+            The bundle to load.
+    """
+    # Let the exceptions bubble up.
+    bundle._load_data(await get_async_data_loader().load_by_path(
+        bundle.absolute_manifest_url))
+
+
+async def _load_package_index(repository):
+    """Load the root package index for a repository.
+
+    This is called for one task at a time, per repository, by
+    :py:func:`get_package_index`.
+
+    Args:
+        repository (rbpkg.repository.package_repo.PackageRepository):
+            The repository to load the index for.
+
+    Returns:
+        rbpkg.repository.package_index.PackageIndex:
+        The root package index.
+    """
+    if not repository._index:
+        manifest_url = repository._build_package_index_path()
+        index_data = await get_async_data_loader().load_by_path(manifest_url)
+
+        # Another thread may have loaded the index in the meantime.
+        if not repository._index:
+            repository._set_index_data(manifest_url, index_data)
+
+    return repository._index
+
+
+async def _load_repository_package_bundle(repository, name):
+    """Load a package bundle and add it to a repository's cache.
+
+    This is called for one task at a time, per repository and bundle name,
+    by :py:func:`lookup_package_bundle`.
+
+    Args:
+        repository (rbpkg.repository.package_repo.PackageRepository):
+            The repository to look up the bundle in.
+
+        name (unicode):
+            The name of the package bundle.
+
+    Returns:
+        rbpkg.repository.package_bundle.PackageBundle:
+        The package bundle.
+
+    Raises:
+        rbpkg.repository.errors.PackageLookupError:
+            The package bundle could not be loaded.
+    """
+    path = repository._build_package_bundle_path(name)
+
+    try:
+        package_bundle_data = \
+            await get_async_data_loader().load_by_path(path)
+    except LoadDataError as e:
+        raise repository._make_lookup_error(name, e)
+
+    # Another thread may have finished loading this while it was being
+    # fetched.
+    package_bundle = repository._package_bundle_cache.peek(name)
+
+    if package_bundle is None:
+        package_bundle = repository._add_package_bundle_data(
+            name, path, package_bundle_data)
+
+    return package_bundle
+
+
+def get_async_data_loader():
+    """Return the async data loader for the session.
+
+    If one hasn't been set through :py:func:`set_async_data_loader`, an
+    :py:class:`ExecutorAsyncPackageDataLoader` will be used, wrapping the
+    loader returned by :py:func:`~rbpkg.repository.loaders.get_data_loader`.
+
+    Returns:
+        AsyncPackageDataLoader: The async data loader instance.
+    """
+    global _async_data_loader
+
+    if not _async_data_loader:
+        _async_data_loader = ExecutorAsyncPackageDataLoader()
+
+    return _async_data_loader
+
+
+def set_async_data_loader(loader):
+    """Set the async data loader instance to use for the session.
+
+    Args:
+        loader (AsyncPackageDataLoader):
+            The async data loader, or ``None`` to unset the loader.
+    """
+    global _async_data_loader
+
+    _async_data_loader = loader
@@ -0,0 +1,480 @@
+"""A content-addressed layout for package repositories.
+
+In this layout, channel manifests and the package rules within them are
+stored as immutable objects, named by the SHA-256 hash of their content,
+under :file:`packages/objects/`. Identical content is only stored once, no
+matter how many bundles or channels share it.
+
+Bundle manifests reference their channel manifests by object path, and
+channel manifests reference their package rules with a reference of the
+form::
+
+    {"$sha256": "<hex digest>"}
+
+The package index and bundle manifests stay at their usual paths, so they
+can be updated in place.
+
+:py:class:`ContentAddressedPackageDataLoader` resolves these references,
+verifies each object against its hash, and caches parsed objects by hash.
+An object that's unchanged is never fetched or parsed again, even when the
+manifests referencing it change.
+
+:py:class:`ContentStore` writes a repository in this layout.
+"""
+
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import logging
+import os
+import posixpath
+import re
+
+import six
+from six.moves.urllib.parse import urljoin
+
+from rbpkg.repository.errors import LoadDataError
+from rbpkg.repository.loaders import (PackageDataLoader,
+                                      WrappingPackageDataLoader)
+from rbpkg.repository.manifests import load_all_pages, write_manifest
+from rbpkg.utils.caches import LRUObjectCache
+from rbpkg.utils.single_flight import SingleFlight
+
+
+logger = logging.getLogger(__name__)
+
+
+#: The path within the repository where objects are stored.
+OBJECTS_PATH = '/packages/objects/'
+
+#: The key used for references to objects.
+REF_KEY = '$sha256'
+
+
+_OBJECT_PATH_RE = re.compile(r'/objects/[0-9a-f]{2}/([0-9a-f]{64})\.json$')
+
+
+def get_object_digest(data):
+    """Return the hash used to address data in the store.
+
+    The hash is computed over a canonical JSON encoding of the data, so it
+    doesn't depend on formatting or compression of the stored file.
+
+    Args:
+        data (object):
+            The JSON-serializable data.
+
+    Returns:
+        unicode:
+        The SHA-256 hex digest.
+    """
+    content = json.dumps(data, sort_keys=True, separators=(',', ':'))
+
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def get_object_path(digest):
+    """Return the path within the repository for an object.
+
+    Args:
+        digest (unicode):
+            The hex digest of the object.
+
+    Returns:
+        unicode:
+        The path to the object.
+    """
+    return '%s%s/%s.json' % (OBJECTS_PATH, digest[:2], digest)
+
+
+def parse_object_path(path):
+    """Return the digest of the object at a path.
+
+    Args:
+        path (unicode):
+            A path within the repository.
+
+    Returns:
+        unicode:
+        The hex digest, or ``None`` if the path isn't an object path.
+    """
+    m = _OBJECT_PATH_RE.search(path)
+
+    if m:
+        return m.group(1)
+
+    return None
+
+
+class ContentAddressedPackageDataLoader(WrappingPackageDataLoader):
+    """A data loader for repositories using the content-addressed layout.
+
+    Objects are verified against their hash when fetched, and parsed
+    objects are kept in a memory-budgeted cache keyed by hash. Since objects
+    are immutable, cached objects are used without asking the wrapped
+    loader again, and objects shared by several manifests are only fetched
+    and parsed once.
+
+    References within loaded manifests are replaced with the referenced
+    data. Paths that aren't objects are loaded from the wrapped loader as
+    usual.
+
+    Callers must treat the loaded data as read-only, since it may be shared.
+
+    Attributes:
+        cache (rbpkg.utils.caches.ObjectCache):
+            The cache of parsed objects, keyed by hash.
+    """
+
+    #: The default memory budget for cached objects, in bytes.
+    DEFAULT_MAX_CACHE_SIZE = 32 * 1024 * 1024
+
+    def __init__(self, loader, max_cache_size=DEFAULT_MAX_CACHE_SIZE):
+        """Initialize the data loader.
+
+        Args:
+            loader (rbpkg.repository.loaders.PackageDataLoader):
+                The data loader to wrap.
+
+            max_cache_size (int, optional):
+                The memory budget for cached objects, in bytes.
+        """
+        super(ContentAddressedPackageDataLoader, self).__init__(loader)
+
+        self.cache = LRUObjectCache(max_size=max_cache_size)
+
+        self._single_flight = SingleFlight()
+
+    def load_by_path(self, *parts):
+        """Load data from the given path within the repository.
+
+        Args:
+            *parts (list of unicode):
+                The segments of a path within the repository.
+
+        Returns:
+            dict: The loaded data from that path, with references resolved.
+
+        Raises:
+            rbpkg.repository.errors.ConfigurationError:
+                Indicates a problem with the configuration of rbpkg or its
+                environment.
+
+            rbpkg.repository.errors.LoadDataError:
+                Error loading or parsing data from the path, or an object
+                didn't match its hash.
+        """
+        path = '/'.join(parts)
+        digest = parse_object_path(path)
+
+        if digest is None:
+            return self._resolve_refs(path, self.loader.load_by_path(path))
+        else:
+            return self._load_object(path, digest)
+
+    def fetch_by_path(self, path, etag=None, last_modified=None):
+        """Fetch the raw content for the given path within the repository.
+
+        Objects are loaded and verified through :py:meth:`load_by_path`, and
+        re-encoded with their references resolved. Other paths are fetched
+        from the wrapped loader.
+
+        Args:
+            path (unicode):
+                The path within the repository.
+
+            etag (unicode, optional):
+                The ETag from a previous fetch of this path.
+
+            last_modified (unicode, optional):
+                The Last-Modified value from a previous fetch of this path.
+
+        Returns:
+            rbpkg.repository.loaders.FetchResult:
+            The result of the fetch.
+
+        Raises:
+            rbpkg.repository.errors.ConfigurationError:
+                Indicates a problem with the configuration of rbpkg or its
+                environment.
+
+            rbpkg.repository.errors.LoadDataError:
+                Error loading the data from the path, or an object didn't
+                match its hash.
+        """
+        if parse_object_path(path) is None:
+            return self.loader.fetch_by_path(path, etag=etag,
+                                             last_modified=last_modified)
+        else:
+            return PackageDataLoader.fetch_by_path(self, path)
+
+    def _load_object(self, path, digest):
+        """Load an object, using the cache if possible.
+
+        Args:
+            path (unicode):
+                The path to the object.
+
+            digest (unicode):
+                The hex digest of the object.
+
+        Returns:
+            object:
+            The object's data, with references resolved.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                The object could not be loaded, or didn't match its hash.
+        """
+        data = self.cache.get(digest)
+
+        if data is None:
+            data = self._single_flight.do(digest, self._fetch_object,
+                                          path, digest)
+
+        return data
+
+    def _fetch_object(self, path, digest):
+        """Fetch, verify, and cache an object.
+
+        This is called for one thread at a time, per object.
+
+        Args:
+            path (unicode):
+                The path to the object.
+
+            digest (unicode):
+                The hex digest of the object.
+
+        Returns:
+            object:
+            The object's data, with references resolved.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                The object could not be loaded, or didn't match its hash.
+        """
+        data = self.cache.peek(digest)
+
+        if data is None:
+            data = self.loader.load_by_path(path)
+
+            if get_object_digest(data) != digest:
+                raise LoadDataError(
+                    'The content at "%s" does not match its hash.' % path)
+
+            data = self._resolve_refs(path, data)
+            self.cache.set(digest, data)
+
+        return data
+
+    def _resolve_refs(self, path, data):
+        """Replace references in data with the referenced objects.
+
+        Containers without references are returned as-is, rather than
+        copied.
+
+        Args:
+            path (unicode):
+                The path the data was loaded from.
+
+            data (object):
+                The data to resolve references in.
+
+        Returns:
+            object:
+            The data, with references resolved.
+        """
+        if isinstance(data, dict):
+            if len(data) == 1 and REF_KEY in data:
+                digest = data[REF_KEY]
+
+                return self._load_object(get_object_path(digest), digest)
+
+            resolved = dict(
+                (key, self._resolve_refs(path, value))
+                for key, value in six.iteritems(data)
+            )
+
+            if any(resolved[key] is not value
+                   for key, value in six.iteritems(data)):
+                return resolved
+        elif isinstance(data, list):
+            resolved = [
+                self._resolve_refs(path, value)
+                for value in data
+            ]
+
+            if any(new_value is not value
+                   for new_value, value in zip(resolved, data)):
+                return resolved
+
+        return data
+
+
+class ContentStore(object):
+    """Writes a package repository in the content-addressed layout.
+
+    Attributes:
+        root (unicode):
+            The root of the repository tree being written.
+
+        objects_reused (int):
+            The number of objects that were already in the store.
+
+        objects_written (int):
+            The number of objects that were written.
+    """
+
+    def __init__(self, root):
+        """Initialize the store.
+
+        Args:
+            root (unicode):
+                The root of the repository tree (the directory containing
+                :file:`packages/`).
+        """
+        self.root = root
+        self.objects_written = 0
+        self.objects_reused = 0
+
+    def add_object(self, data):
+        """Add an object to the store.
+
+        The object is only written if it isn't already in the store.
+
+        Args:
+            data (object):
+                The JSON-serializable data to store.
+
+        Returns:
+            unicode:
+            The hex digest of the object.
+        """
+        digest = get_object_digest(data)
+        filename = self._get_filename(get_object_path(digest))
+
+        if os.path.exists(filename):
+            self.objects_reused += 1
+        else:
+            dirname = os.path.dirname(filename)
+
+            if not os.path.isdir(dirname):
+                os.makedirs(dirname)
+
+            write_manifest(filename, data)
+            self.objects_written += 1
+
+        return digest
+
+    def add_channel_manifest(self, data):
+        """Add a channel manifest to the store.
+
+        The package rules are stored as a separate object, so that channels
+        with the same rules share them.
+
+        Args:
+            data (dict):
+                The channel manifest data. This must not be paged.
+
+        Returns:
+            unicode:
+            The hex digest of the channel manifest object.
+        """
+        data = dict(data)
+        data['package_rules'] = {
+            REF_KEY: self.add_object(data.get('package_rules', [])),
+        }
+
+        return self.add_object(data)
+
+    def write_repository(self, loader, index_path='/packages/index.json'):
+        """Write a copy of a repository in the content-addressed layout.
+
+        The package index and each bundle listed in it are written at their
+        usual paths, with channel manifests (merged from all their pages)
+        stored as objects.
+
+        Args:
+            loader (rbpkg.repository.loaders.PackageDataLoader):
+                The loader used to read the source repository.
+
+            index_path (unicode, optional):
+                The path to the package index within the repository.
+
+        Returns:
+            list of unicode:
+            The paths of the manifests written outside the object store.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                A manifest could not be loaded from the source repository.
+        """
+        index_data = loader.load_by_path(index_path)
+        bundle_paths = [
+            urljoin(index_path, entry['manifest_file'])
+            for entry in index_data.get('bundles', [])
+        ]
+        written = []
+
+        for bundle_path, bundle_data in sorted(
+                six.iteritems(loader.load_by_paths(bundle_paths))):
+            bundle_data = dict(bundle_data)
+            channel_entries = []
+
+            for channel_entry in bundle_data.get('channels', []):
+                channel_path = urljoin(bundle_path,
+                                       channel_entry['manifest_file'])
+                channel_data = load_all_pages(
+                    loader, channel_path, loader.load_by_path(channel_path))
+                digest = self.add_channel_manifest(channel_data)
+
+                channel_entry = dict(channel_entry)
+                channel_entry['manifest_file'] = posixpath.relpath(
+                    get_object_path(digest),
+                    posixpath.dirname('/%s' % bundle_path.lstrip('/')))
+                channel_entries.append(channel_entry)
+
+            bundle_data['channels'] = channel_entries
+            self._write_manifest(bundle_path, bundle_data)
+            written.append(bundle_path)
+
+        self._write_manifest(index_path, index_data)
+        written.append(index_path)
+
+        logger.debug('Wrote %d objects (%d reused) to %s',
+                     self.objects_written, self.objects_reused, self.root)
+
+        return written
+
+    def _write_manifest(self, path, data):
+        """Write a manifest at a path within the repository.
+
+        Args:
+            path (unicode):
+                The path within the repository.
+
+            data (dict):
+                The manifest data.
+        """
+        filename = self._get_filename(path)
+        dirname = os.path.dirname(filename)
+
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+
+        write_manifest(filename, data)
+
+    def _get_filename(self, path):
+        """Return the filename for a path within the repository.
+
+        Args:
+            path (unicode):
+                The path within the repository.
+
+        Returns:
+            unicode:
+            The filename in the repository tree.
+        """
+        return os.path.join(self.root, *path.strip('/').split('/'))
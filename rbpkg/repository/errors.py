@@ -9,5 +9,22 @@ class LoadDataError(IOError):
     """Error loading or parsing data from the repository."""
 
 
+class PathNotFoundError(LoadDataError):
+    """A path could not be found in the repository."""
+
+
 class PackageLookupError(Exception):
-    """Error looking up a package."""
+    """Error looking up a package.
+
+    Attributes:
+        package_bundles (dict):
+            When raised while looking up several package bundles at once, a
+            mapping of names to the package bundles that were found. This is
+            ``None`` otherwise.
+    """
+
+    package_bundles = None
+
+
+class SnapshotChangedError(Exception):
+    """Data needed by a repository snapshot has changed in the repository."""
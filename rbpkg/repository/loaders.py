@@ -7,17 +7,1914 @@ data loaders.
 
 from __future__ import unicode_literals
 
+import calendar
 import json
+import logging
+import mmap
 import os
+import posixpath
+import socket
+import tarfile
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from email.utils import formatdate
+from multiprocessing.pool import ThreadPool
+from timeit import default_timer
 
-from rbpkg.repository.errors import ConfigurationError, LoadDataError
+import dateutil.parser
+import six
+from six.moves import http_client
+from six.moves.urllib.parse import urljoin, urlsplit
+
+from rbpkg import get_package_version
+from rbpkg.repository.archives import ARCHIVE_FORMAT_TAR, ARCHIVE_FORMAT_ZIP
+from rbpkg.repository.errors import (ConfigurationError, LoadDataError,
+                                    PathNotFoundError)
+from rbpkg.repository.manifests import parse_manifest_content
+from rbpkg.utils.caches import NegativeCache
+from rbpkg.utils.compression import (COMPRESSION_EXTENSIONS,
+                                     get_supported_compressions,
+                                     open_decompressed)
+from rbpkg.utils.disk_cache import DiskCache
+from rbpkg.utils.json_backends import get_json_backend
+from rbpkg.utils.single_flight import SingleFlight
+
+
+logger = logging.getLogger(__name__)
+
+
+#: The URL of the main package repository.
+DEFAULT_REPOSITORY_URL = 'https://packages.reviewboard.org/'
+
+#: The default age, in seconds, past which cached manifests are stale in
+#: offline mode.
+DEFAULT_MAX_STALENESS = 24 * 60 * 60
 
 
 _data_loader = None
 
 
-class PackageDataLoader(object):
-    """Base class for a data loader."""
+class FetchResult(object):
+    """The raw result of fetching a path from a repository.
+
+    Attributes:
+        path (unicode):
+            The path that was fetched.
+
+        content (bytes):
+            The raw content of the file. This may be compressed (see
+            :py:mod:`rbpkg.utils.compression`), and will be ``None`` if
+            :py:attr:`not_modified` is set.
+
+        etag (unicode):
+            An opaque validator for this version of the content, if the
+            loader supports one.
+
+        last_modified (unicode):
+            The HTTP-formatted date when the content was last modified, if
+            the loader supports it.
+
+        not_modified (bool):
+            Whether the content is unchanged from the version identified by
+            the validators passed when fetching.
+
+        from_cache (bool):
+            Whether the content was served from a cache.
+    """
+
+    def __init__(self, path, content=None, etag=None, last_modified=None,
+                 not_modified=False, from_cache=False):
+        """Initialize the result.
+
+        Args:
+            path (unicode):
+                The path that was fetched.
+
+            content (bytes, optional):
+                The raw content of the file.
+
+            etag (unicode, optional):
+                An opaque validator for this version of the content.
+
+            last_modified (unicode, optional):
+                The HTTP-formatted date when the content was last modified.
+
+            not_modified (bool, optional):
+                Whether the content is unchanged from the version identified
+                by the validators passed when fetching.
+
+            from_cache (bool, optional):
+                Whether the content was served from a cache.
+        """
+        self.path = path
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+        self.not_modified = not_modified
+        self.from_cache = from_cache
+
+    def __repr__(self):
+        return (
+            '<FetchResult(%s; etag=%s; not_modified=%s; from_cache=%s)>'
+            % (self.path, self.etag, self.not_modified, self.from_cache)
+        )
+
+
+class PackageDataLoader(object):
+    """Base class for a data loader.
+
+    Attributes:
+        max_workers (int):
+            The maximum number of paths loaded concurrently by
+            :py:meth:`try_load_by_paths`. If this is 1, paths are loaded
+            in turn, without a thread pool.
+
+        supports_release_queries (bool):
+            Whether the loader can look up releases itself, through
+            :py:meth:`query_latest_release`, instead of requiring every
+            channel manifest to be loaded and searched.
+    """
+
+    #: The default maximum number of concurrent loads in
+    #: try_load_by_paths().
+    DEFAULT_MAX_WORKERS = 8
+
+    max_workers = DEFAULT_MAX_WORKERS
+    supports_release_queries = False
+
+    def load_by_path(self, *parts):
+        """Load data from the given path within the repository.
+
+        Args:
+            *parts (list of unicode):
+                The segments of a path within the repository.
+
+        Returns:
+            dict: The loaded data from that path, if found.
+
+        Raises:
+            rbpkg.repository.errors.ConfigurationError:
+                Indicates a problem with the configuration of rbpkg or its
+                environment.
+
+            rbpkg.repository.errors.LoadDataError:
+                Error loading or parsing data from the path.
+        """
+        raise NotImplementedError
+
+    def load_by_paths(self, paths):
+        """Load data from several paths within the repository.
+
+        The paths are loaded through :py:meth:`try_load_by_paths`. If any
+        of them fail to load, the error for the first of those paths will
+        be raised.
+
+        Args:
+            paths (list of unicode):
+                The paths within the repository to load. Duplicates will
+                only be loaded once.
+
+        Returns:
+            dict:
+            A mapping of each path to its loaded data.
+
+        Raises:
+            rbpkg.repository.errors.ConfigurationError:
+                Indicates a problem with the configuration of rbpkg or its
+                environment.
+
+            rbpkg.repository.errors.LoadDataError:
+                Error loading or parsing data from one of the paths.
+        """
+        results, errors = self.try_load_by_paths(paths)
+
+        for path in paths:
+            if path in errors:
+                raise errors[path]
+
+        return results
+
+    def try_load_by_paths(self, paths):
+        """Load data from several paths, collecting errors for each path.
+
+        Unlike :py:meth:`load_by_paths`, a path that fails to load won't
+        prevent the data for the other paths from being returned.
+
+        By default, the paths are loaded concurrently through
+        :py:meth:`load_by_path`, using a pool of at most
+        :py:attr:`max_workers` threads. Loading a batch of paths then takes
+        roughly as long as the slowest path, rather than the sum of all of
+        them. Subclasses with a native way of loading many paths at once
+        can override this.
+
+        Args:
+            paths (list of unicode):
+                The paths within the repository to load. Duplicates will
+                only be loaded once.
+
+        Returns:
+            tuple:
+            A 2-tuple of a mapping of paths to their loaded data, and a
+            mapping of paths to the
+            :py:class:`~rbpkg.repository.errors.LoadDataError` raised when
+            loading them.
+
+        Raises:
+            rbpkg.repository.errors.ConfigurationError:
+                Indicates a problem with the configuration of rbpkg or its
+                environment.
+        """
+        paths = list(OrderedDict.fromkeys(paths))
+
+        if len(paths) <= 1 or self.max_workers <= 1:
+            outcomes = [
+                self._try_load_by_path(path)
+                for path in paths
+            ]
+        else:
+            pool = ThreadPool(min(self.max_workers, len(paths)))
+
+            try:
+                outcomes = pool.map(self._try_load_by_path, paths)
+            finally:
+                pool.close()
+                pool.join()
+
+        results = {}
+        errors = {}
+
+        for path, (data, error) in zip(paths, outcomes):
+            if error is None:
+                results[path] = data
+            else:
+                errors[path] = error
+
+        return results, errors
+
+    def fetch_by_path(self, path, etag=None, last_modified=None):
+        """Fetch the raw content for the given path within the repository.
+
+        If validators from a previous fetch are provided, and the content
+        has not changed, the loader may return a result with
+        :py:attr:`FetchResult.not_modified` set instead of the content.
+
+        By default, this re-encodes the result of :py:meth:`load_by_path`
+        and never reports unmodified content. Subclasses that have access to
+        the raw content should override this.
+
+        Args:
+            path (unicode):
+                The path within the repository.
+
+            etag (unicode, optional):
+                The ETag from a previous fetch of this path.
+
+            last_modified (unicode, optional):
+                The Last-Modified value from a previous fetch of this path.
+
+        Returns:
+            FetchResult:
+            The result of the fetch.
+
+        Raises:
+            rbpkg.repository.errors.ConfigurationError:
+                Indicates a problem with the configuration of rbpkg or its
+                environment.
+
+            rbpkg.repository.errors.LoadDataError:
+                Error loading the data from the path.
+        """
+        data = self.load_by_path(path)
+
+        return FetchResult(path=path,
+                           content=json.dumps(data).encode('utf-8'))
+
+    def parse_content(self, path, content):
+        """Parse raw content fetched from the repository.
+
+        Args:
+            path (unicode):
+                The path the content was fetched from. This is used for
+                error reporting.
+
+            content (bytes):
+                The raw content to parse.
+
+        Returns:
+            dict:
+            The parsed data.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                The content could not be parsed.
+        """
+        return parse_manifest_content(path, content)
+
+    def query_latest_release(self, bundle_path, version_range,
+                             channel_types=None, release_types=None):
+        """Return the latest release of a bundle within a version range.
+
+        This is only available if :py:attr:`supports_release_queries` is
+        set.
+
+        Args:
+            bundle_path (unicode):
+                The path to the bundle's manifest.
+
+            version_range (unicode):
+                The version range, including the bundle name (such as
+                ``ReviewBoard>=2.0``).
+
+            channel_types (list of unicode, optional):
+                The channel types to limit channels to.
+
+            release_types (list of unicode, optional):
+                The release types to limit releases to.
+
+        Returns:
+            tuple:
+            A 2-tuple of the name of the channel containing the release and
+            the release data (in channel manifest format), or ``None`` if no
+            release matches.
+
+        Raises:
+            rbpkg.repository.errors.PathNotFoundError:
+                The loader has no data for the bundle. Callers should fall
+                back on searching the bundle's channels.
+        """
+        raise NotImplementedError
+
+    def _try_load_by_path(self, path):
+        """Load data from a path, returning any error instead of raising it.
+
+        Args:
+            path (unicode):
+                The path within the repository.
+
+        Returns:
+            tuple:
+            A 2-tuple of the loaded data (or ``None``) and the
+            :py:class:`~rbpkg.repository.errors.LoadDataError` raised when
+            loading it (or ``None``).
+        """
+        try:
+            return self.load_by_path(path), None
+        except LoadDataError as e:
+            return None, e
+
+
+class WrappingPackageDataLoader(PackageDataLoader):
+    """Base class for a data loader that wraps another loader.
+
+    Wrapping loaders add behavior (such as caching) on top of another loader.
+    By default, all operations are passed through to the wrapped loader.
+    Subclasses can override :py:meth:`fetch_by_path` to alter how content
+    is retrieved, and :py:meth:`load_by_path` will parse its results.
+
+    Attributes:
+        loader (PackageDataLoader):
+            The wrapped data loader.
+    """
+
+    def __init__(self, loader):
+        """Initialize the data loader.
+
+        Args:
+            loader (PackageDataLoader):
+                The data loader to wrap.
+        """
+        self.loader = loader
+
+    @property
+    def supports_release_queries(self):
+        """Whether the wrapped loader can look up releases itself."""
+        return self.loader.supports_release_queries
+
+    def load_by_path(self, *parts):
+        """Load data from the given path within the repository.
+
+        Args:
+            *parts (list of unicode):
+                The segments of a path within the repository.
+
+        Returns:
+            dict: The loaded data from that path, if found.
+
+        Raises:
+            rbpkg.repository.errors.ConfigurationError:
+                Indicates a problem with the configuration of rbpkg or its
+                environment.
+
+            rbpkg.repository.errors.LoadDataError:
+                Error loading or parsing data from the path.
+        """
+        path = '/'.join(parts)
+
+        return self.parse_content(path, self.fetch_by_path(path).content)
+
+    def fetch_by_path(self, path, etag=None, last_modified=None):
+        """Fetch the raw content for the given path within the repository.
+
+        Args:
+            path (unicode):
+                The path within the repository.
+
+            etag (unicode, optional):
+                The ETag from a previous fetch of this path.
+
+            last_modified (unicode, optional):
+                The Last-Modified value from a previous fetch of this path.
+
+        Returns:
+            FetchResult:
+            The result of the fetch.
+
+        Raises:
+            rbpkg.repository.errors.ConfigurationError:
+                Indicates a problem with the configuration of rbpkg or its
+                environment.
+
+            rbpkg.repository.errors.LoadDataError:
+                Error loading the data from the path.
+        """
+        return self.loader.fetch_by_path(path, etag=etag,
+                                         last_modified=last_modified)
+
+    def parse_content(self, path, content):
+        """Parse raw content fetched from the repository.
+
+        Args:
+            path (unicode):
+                The path the content was fetched from.
+
+            content (bytes):
+                The raw content to parse.
+
+        Returns:
+            dict:
+            The parsed data.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                The content could not be parsed.
+        """
+        return self.loader.parse_content(path, content)
+
+    def query_latest_release(self, bundle_path, version_range,
+                             channel_types=None, release_types=None):
+        """Return the latest release of a bundle within a version range.
+
+        Args:
+            bundle_path (unicode):
+                The path to the bundle's manifest.
+
+            version_range (unicode):
+                The version range, including the bundle name.
+
+            channel_types (list of unicode, optional):
+                The channel types to limit channels to.
+
+            release_types (list of unicode, optional):
+                The release types to limit releases to.
+
+        Returns:
+            tuple:
+            A 2-tuple of the channel name and the release data, or ``None``
+            if no release matches.
+        """
+        return self.loader.query_latest_release(
+            bundle_path, version_range,
+            channel_types=channel_types,
+            release_types=release_types)
+
+
+class CachingPackageDataLoader(WrappingPackageDataLoader):
+    """A data loader that caches raw manifests on disk.
+
+    Manifests fetched from the wrapped loader are stored on disk along with
+    their validators (ETag and Last-Modified). On later fetches, including
+    those from other rbpkg processes, the cached validators are sent along
+    with the request, and the cached content is used if the wrapped loader
+    reports that it hasn't changed. An unchanged repository therefore costs
+    a conditional request per manifest instead of a full transfer.
+
+    The cache is size-capped, with least recently used entries evicted
+    first. See :py:class:`~rbpkg.utils.disk_cache.DiskCache` for details.
+
+    Paths that the wrapped loader reports as not found are remembered for
+    :py:attr:`negative_ttl` seconds, both in memory and on disk, so that
+    repeated lookups of a missing manifest fail without another request.
+
+    In offline mode, manifests are served purely from the cache, without
+    ever asking the wrapped loader. Cached manifests that were last
+    validated more than :py:attr:`max_staleness` seconds ago are still
+    served, but a warning is logged for each. Outside of offline mode,
+    if :py:attr:`max_staleness` is set and the wrapped loader fails to
+    fetch a manifest, a cached copy no older than that will be served in
+    its place.
+
+    Attributes:
+        cache (rbpkg.utils.disk_cache.DiskCache):
+            The cache storing manifests.
+
+        hits (int):
+            The number of fetches served from the cache after revalidation.
+
+        max_staleness (float):
+            The age, in seconds, past which cached manifests are considered
+            stale. This may be ``None``.
+
+        misses (int):
+            The number of fetches that required transferring the content.
+
+        negative_hits (int):
+            The number of fetches that failed due to a cached not-found
+            result.
+
+        negative_ttl (float):
+            The number of seconds a not-found result is cached.
+
+        offline (bool):
+            Whether manifests are served only from the cache.
+
+        stale_hits (int):
+            The number of fetches served from the cache without
+            revalidation, due to offline mode or a failed fetch.
+    """
+
+    #: The default number of seconds a not-found result is cached.
+    DEFAULT_NEGATIVE_TTL = 300
+
+    def __init__(self, loader, cache_dir, max_size=DiskCache.DEFAULT_MAX_SIZE,
+                 negative_ttl=DEFAULT_NEGATIVE_TTL, offline=False,
+                 max_staleness=None):
+        """Initialize the data loader.
+
+        Args:
+            loader (PackageDataLoader):
+                The data loader to wrap.
+
+            cache_dir (unicode):
+                The directory where manifests will be cached.
+
+            max_size (int, optional):
+                The maximum total size of the cache, in bytes.
+
+            negative_ttl (float, optional):
+                The number of seconds a not-found result is cached. A value
+                of 0 disables caching of not-found results.
+
+            offline (bool, optional):
+                Whether to serve manifests only from the cache.
+
+            max_staleness (float, optional):
+                The age, in seconds, past which cached manifests are
+                considered stale.
+        """
+        super(CachingPackageDataLoader, self).__init__(loader)
+
+        self.cache = DiskCache(cache_dir, max_size=max_size)
+        self.negative_ttl = negative_ttl
+        self.offline = offline
+        self.max_staleness = max_staleness
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.stale_hits = 0
+
+        self._missing_paths = NegativeCache(ttl=negative_ttl)
+        self._stale_paths = set()
+        self._lock = threading.Lock()
+
+    def fetch_by_path(self, path, etag=None, last_modified=None):
+        """Fetch the raw content for the given path within the repository.
+
+        If the path is cached, the wrapped loader will be asked to
+        revalidate it, and the cached content returned if unchanged. If the
+        path was recently found to be missing, this will fail without
+        asking the wrapped loader.
+
+        In offline mode, the wrapped loader is never asked, and this will
+        fail if the path isn't cached.
+
+        Args:
+            path (unicode):
+                The path within the repository.
+
+            etag (unicode, optional):
+                The ETag from a previous fetch of this path.
+
+            last_modified (unicode, optional):
+                The Last-Modified value from a previous fetch of this path.
+
+        Returns:
+            FetchResult:
+            The result of the fetch.
+
+        Raises:
+            rbpkg.repository.errors.ConfigurationError:
+                Indicates a problem with the configuration of rbpkg or its
+                environment.
+
+            rbpkg.repository.errors.LoadDataError:
+                Error loading the data from the path, or the path isn't
+                cached in offline mode.
+
+            rbpkg.repository.errors.PathNotFoundError:
+                The path doesn't exist in the repository.
+        """
+        if self.offline:
+            return self._fetch_offline(path)
+
+        message = self._missing_paths.get(path)
+
+        if message is not None:
+            with self._lock:
+                self.negative_hits += 1
+
+            raise PathNotFoundError(message)
+
+        entry = self.cache.get(path)
+
+        if entry is not None and entry.missing:
+            age = time.time() - (entry.stored_timestamp or 0)
+
+            if 0 <= age < self.negative_ttl:
+                message = entry.content.decode('utf-8')
+                self._missing_paths.add(path, message,
+                                        ttl=self.negative_ttl - age)
+                with self._lock:
+                    self.negative_hits += 1
+
+                raise PathNotFoundError(message)
+
+            entry = None
+
+        try:
+            if entry is None:
+                result = self.loader.fetch_by_path(
+                    path,
+                    etag=etag,
+                    last_modified=last_modified)
+            else:
+                result = self.loader.fetch_by_path(
+                    path,
+                    etag=entry.etag,
+                    last_modified=entry.last_modified)
+        except PathNotFoundError as e:
+            if self.negative_ttl > 0:
+                message = six.text_type(e)
+                self._missing_paths.add(path, message)
+                self.cache.set(path, message.encode('utf-8'), missing=True)
+
+            raise
+        except LoadDataError as e:
+            if (entry is None or
+                self.max_staleness is None or
+                self._get_age(entry) > self.max_staleness):
+                raise
+
+            logger.warning('Unable to fetch "%s" (%s). Using the cached '
+                           'copy instead.',
+                           path, e)
+
+            return self._make_stale_result(entry)
+
+        if entry is not None and result.not_modified:
+            with self._lock:
+                self.hits += 1
+
+            # Record when this was last validated, so that the staleness of
+            # the entry can be determined later, including in offline mode.
+            self.cache.mark_validated(path)
+
+            return FetchResult(
+                path=path,
+                content=entry.content,
+                etag=entry.etag,
+                last_modified=entry.last_modified,
+                not_modified=(etag is not None and etag == entry.etag),
+                from_cache=True)
+        elif result.not_modified:
+            # The caller's own copy is still valid, but there's no content
+            # to cache.
+            return result
+
+        with self._lock:
+            self.misses += 1
+        self.cache.set(path, result.content,
+                       etag=result.etag,
+                       last_modified=result.last_modified)
+
+        return result
+
+    def _fetch_offline(self, path):
+        """Fetch the content for a path purely from the cache.
+
+        Args:
+            path (unicode):
+                The path within the repository.
+
+        Returns:
+            FetchResult:
+            The result of the fetch.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                The path isn't cached.
+
+            rbpkg.repository.errors.PathNotFoundError:
+                The path was cached as not existing in the repository.
+        """
+        entry = self.cache.get(path)
+
+        if entry is None:
+            raise LoadDataError(
+                'Unable to load "%s": It is not available in the cache, and '
+                'rbpkg is running in offline mode.'
+                % path)
+        elif entry.missing:
+            with self._lock:
+                self.negative_hits += 1
+
+            raise PathNotFoundError(entry.content.decode('utf-8'))
+
+        if (self.max_staleness is not None and
+            self._get_age(entry) > self.max_staleness):
+            with self._lock:
+                warn = path not in self._stale_paths
+                self._stale_paths.add(path)
+
+            if warn:
+                logger.warning('The cached copy of "%s" is %d hours old, '
+                               'and may be out of date.',
+                               path, self._get_age(entry) // 3600)
+
+        return self._make_stale_result(entry)
+
+    def _make_stale_result(self, entry):
+        """Return a result for a cache entry served without revalidation.
+
+        Args:
+            entry (rbpkg.utils.disk_cache.DiskCacheEntry):
+                The cache entry.
+
+        Returns:
+            FetchResult:
+            The result of the fetch.
+        """
+        with self._lock:
+            self.stale_hits += 1
+
+        return FetchResult(path=entry.key,
+                           content=entry.content,
+                           etag=entry.etag,
+                           last_modified=entry.last_modified,
+                           from_cache=True)
+
+    def _get_age(self, entry):
+        """Return the age of a cache entry.
+
+        Args:
+            entry (rbpkg.utils.disk_cache.DiskCacheEntry):
+                The cache entry.
+
+        Returns:
+            float:
+            The number of seconds since the entry was stored or last
+            validated.
+        """
+        return max(time.time() - (entry.validated_timestamp or 0), 0)
+
+
+class CoalescingPackageDataLoader(WrappingPackageDataLoader):
+    """A data loader that coalesces concurrent loads of the same path.
+
+    When several threads load the same path at the same time (for instance,
+    while resolving installs that share dependencies), only one load will
+    be sent to the wrapped loader. The other threads will wait for it and
+    share the parsed result.
+
+    Callers must treat the loaded data as read-only, since it may be shared.
+    """
+
+    def __init__(self, loader):
+        """Initialize the data loader.
+
+        Args:
+            loader (PackageDataLoader):
+                The data loader to wrap.
+        """
+        super(CoalescingPackageDataLoader, self).__init__(loader)
+
+        self._single_flight = SingleFlight()
+
+    @property
+    def coalesced_count(self):
+        """The number of loads that were coalesced with another in flight."""
+        return self._single_flight.coalesced_count
+
+    def load_by_path(self, *parts):
+        """Load data from the given path within the repository.
+
+        Args:
+            *parts (list of unicode):
+                The segments of a path within the repository.
+
+        Returns:
+            dict: The loaded data from that path, if found.
+
+        Raises:
+            rbpkg.repository.errors.ConfigurationError:
+                Indicates a problem with the configuration of rbpkg or its
+                environment.
+
+            rbpkg.repository.errors.LoadDataError:
+                Error loading or parsing data from the path.
+        """
+        path = '/'.join(parts)
+
+        return self._single_flight.do(('load', path),
+                                      self.loader.load_by_path, path)
+
+    def fetch_by_path(self, path, etag=None, last_modified=None):
+        """Fetch the raw content for the given path within the repository.
+
+        Args:
+            path (unicode):
+                The path within the repository.
+
+            etag (unicode, optional):
+                The ETag from a previous fetch of this path.
+
+            last_modified (unicode, optional):
+                The Last-Modified value from a previous fetch of this path.
+
+        Returns:
+            FetchResult:
+            The result of the fetch.
+
+        Raises:
+            rbpkg.repository.errors.ConfigurationError:
+                Indicates a problem with the configuration of rbpkg or its
+                environment.
+
+            rbpkg.repository.errors.LoadDataError:
+                Error loading the data from the path.
+        """
+        return self._single_flight.do(
+            ('fetch', path, etag, last_modified),
+            self.loader.fetch_by_path, path,
+            etag=etag,
+            last_modified=last_modified)
+
+
+class LoadRecord(object):
+    """Information on a single load recorded by an instrumented loader.
+
+    Attributes:
+        path (unicode):
+            The path that was loaded.
+
+        fetch_time (float):
+            The time spent fetching the raw content, in seconds.
+
+        parse_time (float):
+            The time spent parsing the content, in seconds. This is ``None``
+            if the fetch failed, or if the content was only fetched (through
+            :py:meth:`InstrumentedPackageDataLoader.fetch_by_path`) and
+            parsed elsewhere.
+
+        size (int):
+            The size of the raw content, in bytes. This is the size as
+            transferred, which may be compressed.
+
+        from_cache (bool):
+            Whether the content was served from a cache.
+
+        error (unicode):
+            The error that caused the load to fail, if any.
+    """
+
+    def __init__(self, path, fetch_time=0, parse_time=None, size=0,
+                 from_cache=False, error=None):
+        """Initialize the record.
+
+        Args:
+            path (unicode):
+                The path that was loaded.
+
+            fetch_time (float, optional):
+                The time spent fetching the raw content, in seconds.
+
+            parse_time (float, optional):
+                The time spent parsing the content, in seconds.
+
+            size (int, optional):
+                The size of the raw content, in bytes.
+
+            from_cache (bool, optional):
+                Whether the content was served from a cache.
+
+            error (unicode, optional):
+                The error that caused the load to fail.
+        """
+        self.path = path
+        self.fetch_time = fetch_time
+        self.parse_time = parse_time
+        self.size = size
+        self.from_cache = from_cache
+        self.error = error
+
+    def __repr__(self):
+        return (
+            '<LoadRecord(%s; fetch_time=%.4f; parse_time=%s; size=%d; '
+            'from_cache=%s)>'
+            % (self.path, self.fetch_time, self.parse_time, self.size,
+               self.from_cache)
+        )
+
+
+class InstrumentedPackageDataLoader(WrappingPackageDataLoader):
+    """A data loader that records timing and size information for loads.
+
+    Each call to :py:meth:`load_by_path` is split into a fetch of the raw
+    content from the wrapped loader and a parse of that content, and a
+    :py:class:`LoadRecord` is stored with the time spent on each, the size
+    of the content, and whether it came from a cache. Calls to
+    :py:meth:`fetch_by_path` (such as when streaming releases from a channel
+    manifest) are recorded as well, without a parse time.
+
+    Records are available through :py:attr:`records` and
+    :py:meth:`get_summary`, and can be received as they're made by
+    registering a listener through :py:meth:`add_listener`.
+
+    Loaders without native support for fetching raw content (such as
+    :py:class:`InMemoryPackageDataLoader`) re-encode their data when
+    fetched, which will be reflected in the fetch times.
+    """
+
+    def __init__(self, loader):
+        """Initialize the data loader.
+
+        Args:
+            loader (PackageDataLoader):
+                The data loader to wrap.
+        """
+        super(InstrumentedPackageDataLoader, self).__init__(loader)
+
+        self._records = []
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    @property
+    def records(self):
+        """A list of all recorded loads, in the order they finished."""
+        with self._lock:
+            return list(self._records)
+
+    def add_listener(self, listener):
+        """Add a function to call for each recorded load.
+
+        Listeners are called from the thread that performed the load.
+
+        Args:
+            listener (callable):
+                The function to call. It will be passed the
+                :py:class:`LoadRecord`.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Remove a function previously added by :py:meth:`add_listener`.
+
+        Args:
+            listener (callable):
+                The function to remove.
+        """
+        self._listeners.remove(listener)
+
+    def reset(self):
+        """Discard all recorded loads."""
+        with self._lock:
+            self._records = []
+
+    def load_by_path(self, *parts):
+        """Load data from the given path within the repository.
+
+        Args:
+            *parts (list of unicode):
+                The segments of a path within the repository.
+
+        Returns:
+            dict: The loaded data from that path, if found.
+
+        Raises:
+            rbpkg.repository.errors.ConfigurationError:
+                Indicates a problem with the configuration of rbpkg or its
+                environment.
+
+            rbpkg.repository.errors.LoadDataError:
+                Error loading or parsing data from the path.
+        """
+        path = '/'.join(parts)
+        record = LoadRecord(path)
+        start_time = default_timer()
+
+        try:
+            result = self._fetch(record, path)
+            fetched_time = default_timer()
+
+            data = self.parse_content(path, result.content)
+            record.parse_time = default_timer() - fetched_time
+        except Exception as e:
+            if record.fetch_time == 0:
+                record.fetch_time = default_timer() - start_time
+
+            record.error = six.text_type(e)
+            raise
+        finally:
+            self._add_record(record)
+
+        return data
+
+    def fetch_by_path(self, path, etag=None, last_modified=None):
+        """Fetch the raw content for the given path within the repository.
+
+        Args:
+            path (unicode):
+                The path within the repository.
+
+            etag (unicode, optional):
+                The ETag from a previous fetch of this path.
+
+            last_modified (unicode, optional):
+                The Last-Modified value from a previous fetch of this path.
+
+        Returns:
+            FetchResult:
+            The result of the fetch.
+
+        Raises:
+            rbpkg.repository.errors.ConfigurationError:
+                Indicates a problem with the configuration of rbpkg or its
+                environment.
+
+            rbpkg.repository.errors.LoadDataError:
+                Error loading the data from the path.
+        """
+        record = LoadRecord(path)
+        start_time = default_timer()
+
+        try:
+            return self._fetch(record, path, etag=etag,
+                               last_modified=last_modified)
+        except Exception as e:
+            record.fetch_time = default_timer() - start_time
+            record.error = six.text_type(e)
+            raise
+        finally:
+            self._add_record(record)
+
+    def get_summary(self):
+        """Return a summary of all recorded loads.
+
+        Returns:
+            dict:
+            A dictionary containing:
+
+            ``loads`` (:py:class:`int`):
+                The number of loads.
+
+            ``errors`` (:py:class:`int`):
+                The number of loads that failed.
+
+            ``cache_hits`` (:py:class:`int`):
+                The number of loads served from a cache.
+
+            ``total_bytes`` (:py:class:`int`):
+                The total size of all content fetched.
+
+            ``fetch_time`` (:py:class:`float`):
+                The total time spent fetching, in seconds.
+
+            ``parse_time`` (:py:class:`float`):
+                The total time spent parsing, in seconds.
+        """
+        records = self.records
+
+        return {
+            'loads': len(records),
+            'errors': sum(1 for record in records if record.error),
+            'cache_hits': sum(1 for record in records if record.from_cache),
+            'total_bytes': sum(record.size for record in records),
+            'fetch_time': sum(record.fetch_time for record in records),
+            'parse_time': sum(record.parse_time or 0 for record in records),
+        }
+
+    def format_summary(self):
+        """Return a table summarizing all recorded loads.
+
+        Returns:
+            unicode:
+            The summary table, with a row per load and a row of totals.
+        """
+        row_fmt = '%-50s %10s %10s %10s %6s'
+        lines = [
+            row_fmt % ('Path', 'Fetch (ms)', 'Parse (ms)', 'Bytes', 'Cache'),
+        ]
+
+        for record in self.records:
+            if record.error:
+                parse_time = 'error'
+            elif record.parse_time is None:
+                parse_time = '-'
+            else:
+                parse_time = '%.2f' % (record.parse_time * 1000)
+
+            lines.append(row_fmt % (
+                record.path,
+                '%.2f' % (record.fetch_time * 1000),
+                parse_time,
+                record.size,
+                record.from_cache and 'hit' or 'miss'))
+
+        summary = self.get_summary()
+        lines.append(row_fmt % (
+            'Total (%d loads, %d errors)' % (summary['loads'],
+                                             summary['errors']),
+            '%.2f' % (summary['fetch_time'] * 1000),
+            '%.2f' % (summary['parse_time'] * 1000),
+            summary['total_bytes'],
+            summary['cache_hits']))
+
+        return '\n'.join(lines)
+
+    def _fetch(self, record, path, etag=None, last_modified=None):
+        """Fetch content from the wrapped loader, filling in a record.
+
+        Args:
+            record (LoadRecord):
+                The record to fill in with the fetch time, size, and cache
+                status.
+
+            path (unicode):
+                The path within the repository.
+
+            etag (unicode, optional):
+                The ETag from a previous fetch of this path.
+
+            last_modified (unicode, optional):
+                The Last-Modified value from a previous fetch of this path.
+
+        Returns:
+            FetchResult:
+            The result of the fetch.
+        """
+        start_time = default_timer()
+        result = self.loader.fetch_by_path(path, etag=etag,
+                                           last_modified=last_modified)
+        record.fetch_time = default_timer() - start_time
+        record.size = len(result.content or b'')
+        record.from_cache = result.from_cache
+
+        return result
+
+    def _add_record(self, record):
+        """Store a record and notify listeners.
+
+        Args:
+            record (LoadRecord):
+                The record to store.
+        """
+        with self._lock:
+            self._records.append(record)
+
+        for listener in list(self._listeners):
+            try:
+                listener(record)
+            except Exception as e:
+                logger.exception('Error in load listener %r: %s',
+                                 listener, e)
+
+
+class _Mirror(object):
+    """State for a mirror used by :py:class:`MirroredPackageDataLoader`."""
+
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self.latency = None
+        self.index_timestamp = None
+        self.healthy = True
+        self.failed_until = 0
+        self.requests = 0
+        self.failures = 0
+
+
+class MirroredPackageDataLoader(PackageDataLoader):
+    """A data loader that routes requests across several mirrors.
+
+    Mirrors are probed by fetching the package index from each of them.
+    This measures their latency and reads the index's
+    ``last_updated_timestamp``. Only mirrors serving the newest index are
+    used, so data from different versions of the repository is never mixed.
+    Of those, requests go to the mirror with the lowest latency.
+
+    If a request to a mirror fails, it's retried on the next mirror in
+    order. A mirror that fails while another succeeds is skipped for
+    :py:attr:`failure_cooldown` seconds. Latencies are updated from every
+    successful request, and mirrors are re-probed every
+    :py:attr:`probe_interval` seconds.
+
+    Attributes:
+        index_path (unicode):
+            The path to the package index, used when probing.
+
+        probe_interval (float):
+            The number of seconds between probes of the mirrors.
+
+        failure_cooldown (float):
+            The number of seconds a failed mirror is skipped.
+    """
+
+    #: The default number of seconds between probes.
+    DEFAULT_PROBE_INTERVAL = 300
+
+    #: The default number of seconds a failed mirror is skipped.
+    DEFAULT_FAILURE_COOLDOWN = 30
+
+    #: The weight given to new latency measurements.
+    LATENCY_WEIGHT = 0.3
+
+    def __init__(self, loaders, index_path='/packages/index.json',
+                 probe_interval=DEFAULT_PROBE_INTERVAL,
+                 failure_cooldown=DEFAULT_FAILURE_COOLDOWN):
+        """Initialize the data loader.
+
+        Args:
+            loaders (list of PackageDataLoader):
+                The loaders for each mirror, in order of preference when
+                latencies are unknown.
+
+            index_path (unicode, optional):
+                The path to the package index, used when probing.
+
+            probe_interval (float, optional):
+                The number of seconds between probes of the mirrors.
+
+            failure_cooldown (float, optional):
+                The number of seconds a failed mirror is skipped.
+
+        Raises:
+            ValueError:
+                No loaders were provided.
+        """
+        if not loaders:
+            raise ValueError('At least one mirror must be provided.')
+
+        self.index_path = index_path
+        self.probe_interval = probe_interval
+        self.failure_cooldown = failure_cooldown
+
+        self._mirrors = [
+            _Mirror(getattr(loader, 'base_url', None) or repr(loader),
+                    loader)
+            for loader in loaders
+        ]
+        self._last_probe_time = None
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()
+
+    def load_by_path(self, *parts):
+        """Load data from the given path within the repository.
+
+        Args:
+            *parts (list of unicode):
+                The segments of a path within the repository.
+
+        Returns:
+            dict: The loaded data from that path, if found.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                Error loading or parsing data from the path on every mirror.
+        """
+        path = '/'.join(parts)
+
+        return self.parse_content(path, self.fetch_by_path(path).content)
+
+    def fetch_by_path(self, path, etag=None, last_modified=None):
+        """Fetch the raw content for the given path within the repository.
+
+        Args:
+            path (unicode):
+                The path within the repository.
+
+            etag (unicode, optional):
+                The ETag from a previous fetch of this path.
+
+            last_modified (unicode, optional):
+                The Last-Modified value from a previous fetch of this path.
+
+        Returns:
+            FetchResult:
+            The result of the fetch.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                Error loading the data from the path on every mirror.
+        """
+        self._probe_if_needed()
+
+        failed_mirrors = []
+        error = None
+
+        for mirror in self.get_ranked_mirrors():
+            start_time = default_timer()
+
+            try:
+                result = mirror.loader.fetch_by_path(
+                    path,
+                    etag=etag,
+                    last_modified=last_modified)
+            except LoadDataError as e:
+                logger.debug('Unable to fetch %s from mirror %s: %s',
+                             path, mirror.name, e)
+                failed_mirrors.append(mirror)
+                error = e
+                continue
+
+            now = default_timer()
+
+            with self._lock:
+                mirror.requests += 1
+                self._record_latency(mirror, now - start_time)
+
+                # Only penalize mirrors that failed where this one
+                # succeeded. If every mirror fails, the path is most likely
+                # missing from the repository.
+                for failed_mirror in failed_mirrors:
+                    self._mark_failed(failed_mirror, now)
+
+            return result
+
+        raise error
+
+    def probe(self):
+        """Probe all mirrors for their latency and index timestamp.
+
+        Mirrors are probed concurrently. Mirrors that can't be reached are
+        marked as failed.
+        """
+        def _probe_mirror(mirror):
+            start_time = default_timer()
+
+            try:
+                data = self.parse_content(
+                    self.index_path,
+                    mirror.loader.fetch_by_path(self.index_path).content)
+                timestamp = dateutil.parser.parse(
+                    data['last_updated_timestamp'])
+            except (LoadDataError, KeyError, ValueError) as e:
+                logger.debug('Unable to probe mirror %s: %s',
+                             mirror.name, e)
+                return mirror, None, None
+
+            return mirror, default_timer() - start_time, timestamp
+
+        pool = ThreadPool(len(self._mirrors))
+
+        try:
+            results = pool.map(_probe_mirror, self._mirrors)
+        finally:
+            pool.close()
+            pool.join()
+
+        now = default_timer()
+
+        with self._lock:
+            for mirror, latency, timestamp in results:
+                if latency is None:
+                    self._mark_failed(mirror, now)
+                else:
+                    mirror.latency = latency
+                    mirror.index_timestamp = timestamp
+                    mirror.healthy = True
+                    mirror.failed_until = 0
+
+            self._last_probe_time = now
+
+    def get_ranked_mirrors(self):
+        """Return the mirrors to use for a request, in order.
+
+        Healthy mirrors serving the newest index come first, ordered by
+        latency, followed by any other mirrors serving the newest index.
+        If no mirror is known to serve the newest index, all mirrors are
+        returned, so that requests are still attempted.
+
+        Returns:
+            list:
+            The mirrors, in the order they should be tried.
+        """
+        now = default_timer()
+
+        with self._lock:
+            timestamps = [
+                mirror.index_timestamp
+                for mirror in self._mirrors
+                if mirror.index_timestamp is not None
+            ]
+
+            if timestamps:
+                newest = max(timestamps)
+                mirrors = [
+                    mirror
+                    for mirror in self._mirrors
+                    if mirror.index_timestamp == newest
+                ]
+            else:
+                mirrors = list(self._mirrors)
+
+            for mirror in mirrors:
+                if not mirror.healthy and mirror.failed_until <= now:
+                    mirror.healthy = True
+
+            # Python's sort is stable, so mirrors with unknown latencies
+            # keep their configured order.
+            return sorted(
+                mirrors,
+                key=lambda mirror: (not mirror.healthy,
+                                    mirror.latency is None,
+                                    mirror.latency or 0))
+
+    def get_mirror_stats(self):
+        """Return statistics on each mirror.
+
+        Returns:
+            list of dict:
+            A dictionary for each mirror, in configured order, containing
+            its ``name``, measured ``latency`` (in seconds), ``healthy``
+            state, ``index_timestamp``, and counts of ``requests`` and
+            ``failures``.
+        """
+        with self._lock:
+            return [
+                {
+                    'name': mirror.name,
+                    'latency': mirror.latency,
+                    'healthy': mirror.healthy,
+                    'index_timestamp': mirror.index_timestamp,
+                    'requests': mirror.requests,
+                    'failures': mirror.failures,
+                }
+                for mirror in self._mirrors
+            ]
+
+    def close(self):
+        """Close the loaders for all mirrors."""
+        for mirror in self._mirrors:
+            if hasattr(mirror.loader, 'close'):
+                mirror.loader.close()
+
+    def _probe_if_needed(self):
+        """Probe the mirrors if they haven't been probed recently."""
+        last_probe_time = self._last_probe_time
+
+        if (last_probe_time is not None and
+            default_timer() - last_probe_time < self.probe_interval):
+            return
+
+        with self._probe_lock:
+            # Another thread may have probed while we waited.
+            if (self._last_probe_time is None or
+                self._last_probe_time == last_probe_time):
+                self.probe()
+
+    def _record_latency(self, mirror, latency):
+        """Record a latency measurement for a mirror.
+
+        The caller must hold the lock.
+
+        Args:
+            mirror (_Mirror):
+                The mirror.
+
+            latency (float):
+                The measured latency, in seconds.
+        """
+        if mirror.latency is None:
+            mirror.latency = latency
+        else:
+            mirror.latency += self.LATENCY_WEIGHT * (latency - mirror.latency)
+
+    def _mark_failed(self, mirror, now):
+        """Mark a mirror as failed.
+
+        The caller must hold the lock.
+
+        Args:
+            mirror (_Mirror):
+                The mirror.
+
+            now (float):
+                The current time.
+        """
+        logger.debug('Skipping mirror %s for %s seconds',
+                     mirror.name, self.failure_cooldown)
+
+        mirror.healthy = False
+        mirror.failed_until = now + self.failure_cooldown
+        mirror.failures += 1
+
+
+class FilePackageDataLoader(PackageDataLoader):
+    """A data loader that operates on local files.
+
+    This is primarily intended for local development, where it's desirable
+    to work off locally-generated files and not the central package
+    repository.
+
+    If a compressed variant of a manifest file exists (such as
+    :file:`index.json.gz` or :file:`index.json.xz`), it will be used in
+    place of the uncompressed file, unless the uncompressed file is newer.
+
+    Large uncompressed files are memory-mapped and handed to the JSON
+    backend as a buffer, avoiding a copy into a string before parsing. This
+    is only done on Python 3, and only if the backend can parse buffers
+    directly (see
+    :py:attr:`JSONBackend.accepts_buffers
+    <rbpkg.utils.json_backends.JSONBackend.accepts_buffers>`). Otherwise,
+    the file is read normally.
+
+    Functions registered through :py:meth:`add_load_listener` are called
+    with the path each time this loader is about to load or fetch a file.
+    This lets callers (such as
+    :py:class:`~rbpkg.repository.watchers.RepositoryWatcher`) examine the
+    file before its contents are read.
+    """
+
+    #: The minimum size of a file, in bytes, before it's memory-mapped.
+    #:
+    #: Below this, reading the file is cheaper than setting up the mapping.
+    MMAP_MIN_SIZE = 64 * 1024
+
+    def __init__(self):
+        """Initialize the data loader."""
+        self._load_listeners = []
+
+    def add_load_listener(self, listener):
+        """Add a function to call before each file is loaded or fetched.
+
+        Listeners are called from the thread that performs the load.
+
+        Args:
+            listener (callable):
+                The function to call. It will be passed the path within the
+                repository.
+        """
+        self._load_listeners.append(listener)
+
+    def remove_load_listener(self, listener):
+        """Remove a function previously added by :py:meth:`add_load_listener`.
+
+        Args:
+            listener (callable):
+                The function to remove.
+        """
+        self._load_listeners.remove(listener)
+
+    def load_by_path(self, *parts):
+        """Load data from the given path within the repository.
+
+        This required that the :env:`RBPKG_FILE_LOADER_ROOT` environment
+        variable is set to the location where rbpkg can find the manifest
+        files.
+
+        Compressed files are decompressed as they're read.
+
+        Args:
+            *parts (list of unicode):
+                The segments of a path within the repository.
+
+        Returns:
+            dict: The loaded data from that path, if found.
+
+        Raises:
+            rbpkg.api.errors.ConfigurationError:
+                Indicates a problem with the configuration of rbpkg or its
+                environment.
+
+            rbpkg.api.errors.LoadDataError:
+                Error loading or parsing data from the path.
+        """
+        path = '/'.join(parts)
+        self._notify_load_listeners(path)
+        filename, compression, st = self._find_file(path)
+
+        if not compression:
+            if (st.st_size >= self.MMAP_MIN_SIZE and
+                six.PY3 and
+                get_json_backend().accepts_buffers):
+                return self._parse_mapped_file(path, filename)
+            else:
+                return self.parse_content(path, self._read_file(filename))
+
+        try:
+            with open(filename, 'rb') as fp:
+                with open_decompressed(fp, compression) as decompressed_fp:
+                    content = decompressed_fp.read()
+        except (IOError, EOFError) as e:
+            raise LoadDataError('Unable to load "%s": %s' % (filename, e))
+
+        return self.parse_content(path, content)
+
+    def fetch_by_path(self, path, etag=None, last_modified=None):
+        """Fetch the raw content for the given path within the repository.
+
+        The file's modification time and size are used as validators, so
+        unchanged files can be detected without reading them.
+
+        If a compressed variant of the file is used, the content will be
+        returned compressed. :py:meth:`parse_content` will decompress it.
+
+        Args:
+            path (unicode):
+                The path within the repository.
+
+            etag (unicode, optional):
+                The ETag from a previous fetch of this path.
+
+            last_modified (unicode, optional):
+                The Last-Modified value from a previous fetch of this path.
+
+        Returns:
+            FetchResult:
+            The result of the fetch.
+
+        Raises:
+            rbpkg.api.errors.ConfigurationError:
+                Indicates a problem with the configuration of rbpkg or its
+                environment.
+
+            rbpkg.api.errors.LoadDataError:
+                Error loading the data from the path.
+        """
+        self._notify_load_listeners(path)
+        filename, compression, st = self._find_file(path)
+
+        new_etag = '"%x-%x"' % (int(st.st_mtime * 1000000), st.st_size)
+        new_last_modified = formatdate(st.st_mtime, usegmt=True)
+
+        if etag is not None and etag == new_etag:
+            return FetchResult(path=path,
+                               etag=new_etag,
+                               last_modified=new_last_modified,
+                               not_modified=True)
+
+        return FetchResult(path=path,
+                           content=self._read_file(filename),
+                           etag=new_etag,
+                           last_modified=new_last_modified)
+
+    def get_file_path(self, path):
+        """Return the local filename for a path within the repository.
+
+        This requires that the :env:`RBPKG_FILE_LOADER_ROOT` environment
+        variable is set to the location where rbpkg can find the manifest
+        files.
+
+        Args:
+            path (unicode):
+                The path within the repository.
+
+        Returns:
+            unicode:
+            The absolute path to the file on the filesystem.
+
+        Raises:
+            rbpkg.api.errors.ConfigurationError:
+                :env:`RBPKG_FILE_LOADER_ROOT` was not set to a valid path.
+        """
+        root = os.environ.get('RBPKG_FILE_LOADER_ROOT', '')
+
+        if not root or not os.path.isdir(root):
+            raise ConfigurationError(
+                '$RBPKG_FILE_LOADER_ROOT must be set to a valid path when '
+                'using FilePackageDataLoader.')
+
+        return os.path.join(root, self._normalize_path(path))
+
+    def _notify_load_listeners(self, path):
+        """Notify listeners that a file is about to be loaded.
+
+        Args:
+            path (unicode):
+                The path within the repository.
+        """
+        for listener in list(self._load_listeners):
+            try:
+                listener(path)
+            except Exception as e:
+                logger.exception('Error in file load listener %r: %s',
+                                 listener, e)
+
+    def _find_file(self, path):
+        """Return the file to use for a path within the repository.
+
+        If several variants of the file exist, the most recently modified
+        one is used, so that a stale compressed file can't hide an updated
+        uncompressed one. If they were modified at the same time,
+        compressed variants are preferred, since they require less disk
+        I/O to read.
+
+        Args:
+            path (unicode):
+                The path within the repository.
+
+        Returns:
+            tuple:
+            A 3-tuple containing the filename, the compression format
+            (or ``None``), and the result of :py:func:`os.stat` on the file.
+
+        Raises:
+            rbpkg.api.errors.ConfigurationError:
+                :env:`RBPKG_FILE_LOADER_ROOT` was not set to a valid path.
+
+            rbpkg.api.errors.LoadDataError:
+                No file could be found for the path.
+        """
+        filename = self.get_file_path(path)
+        candidates = [
+            (filename + COMPRESSION_EXTENSIONS[compression], compression)
+            for compression in get_supported_compressions()
+        ]
+        candidates.append((filename, None))
+        found = None
+
+        for candidate_filename, compression in candidates:
+            try:
+                st = os.stat(candidate_filename)
+            except OSError:
+                continue
+
+            if found is None or st.st_mtime > found[2].st_mtime:
+                found = (candidate_filename, compression, st)
+
+        if found is None:
+            raise PathNotFoundError(
+                'Unable to load "%s". The file could not be found.'
+                % filename)
+
+        return found
+
+    def _parse_mapped_file(self, path, filename):
+        """Parse a file by memory-mapping it.
+
+        This requires Python 3, since memory-mapped files don't support
+        :py:class:`memoryview` on Python 2.
+
+        Args:
+            path (unicode):
+                The path within the repository.
+
+            filename (unicode):
+                The file to parse.
+
+        Returns:
+            dict:
+            The parsed data.
+
+        Raises:
+            rbpkg.api.errors.LoadDataError:
+                The file could not be read or parsed.
+        """
+        try:
+            with open(filename, 'rb') as fp:
+                mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except (IOError, OSError, ValueError) as e:
+            raise LoadDataError('Unable to load "%s": %s' % (filename, e))
+
+        try:
+            view = memoryview(mapped)
+
+            try:
+                return self.parse_content(path, view)
+            finally:
+                view.release()
+        finally:
+            mapped.close()
+
+    def _read_file(self, filename):
+        """Return the contents of a file.
+
+        Args:
+            filename (unicode):
+                The file to read.
+
+        Returns:
+            bytes:
+            The contents of the file.
+
+        Raises:
+            rbpkg.api.errors.LoadDataError:
+                The file could not be read.
+        """
+        try:
+            with open(filename, 'rb') as fp:
+                return fp.read()
+        except IOError as e:
+            raise LoadDataError('Unable to load "%s": %s' % (filename, e))
+
+    def _normalize_path(self, path):
+        """Return a normalized version of the given path.
+
+        The path will be converted from a package repository path format
+        (using ``/`` as separators) to a native path, and normalized
+        to remove all relative path information (like ``..``).
+
+        Args:
+            path (unicode):
+                The path to normalize.
+
+        Returns:
+            unicode: The normalized path.
+        """
+        return os.path.normpath(os.path.join(*path.split('/')))
+
+
+class ArchivePackageDataLoader(PackageDataLoader):
+    """A data loader that reads from a single-file repository archive.
+
+    The archive is a zip or tar file containing a repository tree, as
+    created by :py:func:`rbpkg.repository.archives.create_repository_archive`
+    (or :command:`rbpkg snapshot`). Its directory of members is read once
+    when the loader is created, and the archive is kept open, so each load
+    is a lookup and a read within the one open file.
+
+    As with :py:class:`FilePackageDataLoader`, compressed variants of
+    manifest files within the archive are preferred.
+
+    Attributes:
+        filename (unicode):
+            The filename of the archive.
+
+        archive_format (unicode):
+            The format of the archive (one of
+            :py:data:`~rbpkg.repository.archives.ARCHIVE_FORMATS`).
+    """
+
+    # Reads from the archive are serialized, so paths are loaded in turn.
+    max_workers = 1
+
+    def __init__(self, filename):
+        """Initialize the data loader.
+
+        Args:
+            filename (unicode):
+                The filename of the archive.
+
+        Raises:
+            rbpkg.api.errors.LoadDataError:
+                The archive could not be opened.
+        """
+        self.filename = filename
+
+        # Neither zipfile nor tarfile support concurrent reads from the same
+        # archive, so reads are serialized.
+        self._lock = threading.Lock()
+
+        try:
+            if zipfile.is_zipfile(filename):
+                self.archive_format = ARCHIVE_FORMAT_ZIP
+                self._archive = zipfile.ZipFile(filename, 'r')
+                members = self._archive.infolist()
+            elif tarfile.is_tarfile(filename):
+                self.archive_format = ARCHIVE_FORMAT_TAR
+                self._archive = tarfile.open(filename, 'r')
+                members = [
+                    info
+                    for info in self._archive.getmembers()
+                    if info.isfile()
+                ]
+            else:
+                raise LoadDataError(
+                    'Unable to load repository archive "%s". It is not a '
+                    'zip or tar file.'
+                    % filename)
+        except (IOError, OSError, zipfile.BadZipfile, tarfile.TarError) as e:
+            raise LoadDataError('Unable to load repository archive "%s": %s'
+                                % (filename, e))
+
+        self._members = {}
+
+        for info in members:
+            name = self._get_member_name(info)
+
+            if not name.endswith('/'):
+                self._members[posixpath.normpath(name)] = info
 
     def load_by_path(self, *parts):
         """Load data from the given path within the repository.
@@ -30,82 +1927,158 @@ class PackageDataLoader(object):
             dict: The loaded data from that path, if found.
 
         Raises:
-            rbpkg.repository.errors.ConfigurationError:
-                Indicates a problem with the configuration of rbpkg or its
-                environment.
-
-            rbpkg.repository.errors.LoadDataError:
+            rbpkg.api.errors.LoadDataError:
                 Error loading or parsing data from the path.
         """
-        raise NotImplementedError
+        path = '/'.join(parts)
 
+        return self.parse_content(path,
+                                  self._read_member(self._find_member(path)))
 
-class FilePackageDataLoader(PackageDataLoader):
-    """A data loader that operates on local files.
+    def fetch_by_path(self, path, etag=None, last_modified=None):
+        """Fetch the raw content for the given path within the repository.
 
-    This is primarily intended for local development, where it's desirable
-    to work off locally-generated files and not the central package
-    repository.
-    """
+        The member's checksum (for zip files) or modification time (for tar
+        files) and size are used as validators.
 
-    def load_by_path(self, *parts):
-        """Load data from the given path within the repository.
+        Args:
+            path (unicode):
+                The path within the repository.
 
-        This required that the :env:`RBPKG_FILE_LOADER_ROOT` environment
-        variable is set to the location where rbpkg can find the manifest
-        files.
+            etag (unicode, optional):
+                The ETag from a previous fetch of this path.
 
-        Args:
-            *parts (list of unicode):
-                The segments of a path within the repository.
+            last_modified (unicode, optional):
+                The Last-Modified value from a previous fetch of this path.
 
         Returns:
-            dict: The loaded data from that path, if found.
+            FetchResult:
+            The result of the fetch.
 
         Raises:
-            rbpkg.api.errors.ConfigurationError:
-                Indicates a problem with the configuration of rbpkg or its
-                environment.
-
             rbpkg.api.errors.LoadDataError:
-                Error loading or parsing data from the path.
+                Error loading the data from the path.
         """
-        root = os.environ.get('RBPKG_FILE_LOADER_ROOT', '')
+        info = self._find_member(path)
 
-        if not root or not os.path.isdir(root):
-            raise ConfigurationError(
-                '$RBPKG_FILE_LOADER_ROOT must be set to a valid path when '
-                'using FilePackageDataLoader.')
+        if self.archive_format == ARCHIVE_FORMAT_ZIP:
+            new_etag = '"%08x-%x"' % (info.CRC, info.file_size)
+            mtime = calendar.timegm(info.date_time + (0, 0, 0))
+        else:
+            new_etag = '"%x-%x"' % (int(info.mtime), info.size)
+            mtime = info.mtime
 
-        path = os.path.join(root, self._normalize_path(os.path.join(*parts)))
+        new_last_modified = formatdate(mtime, usegmt=True)
 
-        if not os.path.exists(path):
-            raise LoadDataError(
-                'Unable to load "%s". The file could not be found.' % path)
+        if etag is not None and etag == new_etag:
+            return FetchResult(path=path,
+                               etag=new_etag,
+                               last_modified=new_last_modified,
+                               not_modified=True)
 
-        try:
-            with open(path, 'r') as fp:
-                return json.loads(fp.read())
-        except IOError as e:
-            raise LoadDataError('Unable to load "%s": %s' % (path, e))
-        except ValueError as e:
-            raise LoadDataError('Unable to parse data at "%s": %s' % (path, e))
+        return FetchResult(path=path,
+                           content=self._read_member(info),
+                           etag=new_etag,
+                           last_modified=new_last_modified)
 
-    def _normalize_path(self, path):
-        """Return a normalized version of the given path.
+    def get_paths(self):
+        """Return all paths available in the archive.
 
-        The path will be converted from a package repository path format
-        (using ``/`` as separators) to a native path, and normalized
-        to remove all relative path information (like ``..``).
+        Returns:
+            list of unicode:
+            The sorted list of paths, as they'd be passed to
+            :py:meth:`load_by_path`.
+        """
+        return sorted(
+            '/%s' % name
+            for name in six.iterkeys(self._members)
+        )
+
+    def close(self):
+        """Close the archive.
+
+        The loader can't be used after this is called.
+        """
+        with self._lock:
+            self._archive.close()
+
+    def _find_member(self, path):
+        """Return the archive member to use for a path within the repository.
 
         Args:
             path (unicode):
-                The path to normalize.
+                The path within the repository.
 
         Returns:
-            unicode: The normalized path.
+            object:
+            The :py:class:`zipfile.ZipInfo` or :py:class:`tarfile.TarInfo`
+            for the member.
+
+        Raises:
+            rbpkg.api.errors.LoadDataError:
+                No member could be found for the path.
         """
-        return os.path.normpath(os.path.join(*path.split('/')))
+        name = posixpath.normpath(path.lstrip('/'))
+        candidates = [
+            name + COMPRESSION_EXTENSIONS[compression]
+            for compression in get_supported_compressions()
+        ]
+        candidates.append(name)
+
+        for candidate in candidates:
+            try:
+                return self._members[candidate]
+            except KeyError:
+                continue
+
+        raise PathNotFoundError(
+            'Unable to load "%s". It could not be found in "%s".'
+            % (path, self.filename))
+
+    def _read_member(self, info):
+        """Return the contents of a member of the archive.
+
+        Args:
+            info (object):
+                The :py:class:`zipfile.ZipInfo` or
+                :py:class:`tarfile.TarInfo` for the member.
+
+        Returns:
+            bytes:
+            The contents of the member.
+
+        Raises:
+            rbpkg.api.errors.LoadDataError:
+                The member could not be read.
+        """
+        try:
+            with self._lock:
+                if self.archive_format == ARCHIVE_FORMAT_ZIP:
+                    return self._archive.read(info)
+                else:
+                    return self._archive.extractfile(info).read()
+        except (IOError, OSError, ValueError, zipfile.BadZipfile,
+                tarfile.TarError) as e:
+            raise LoadDataError('Unable to load "%s" from "%s": %s'
+                                % (self._get_member_name(info),
+                                   self.filename, e))
+
+    def _get_member_name(self, info):
+        """Return the name of a member of the archive.
+
+        Args:
+            info (object):
+                The :py:class:`zipfile.ZipInfo` or
+                :py:class:`tarfile.TarInfo` for the member.
+
+        Returns:
+            unicode:
+            The name of the member.
+        """
+        if self.archive_format == ARCHIVE_FORMAT_ZIP:
+            return info.filename
+        else:
+            return info.name
 
 
 class InMemoryPackageDataLoader(PackageDataLoader):
@@ -115,6 +2088,9 @@ class InMemoryPackageDataLoader(PackageDataLoader):
     deserialized values from different paths.
     """
 
+    # The content is already in memory, so paths are loaded in turn.
+    max_workers = 1
+
     def __init__(self, path_to_content={}):
         """Initialize the data loader.
 
@@ -145,14 +2121,511 @@ class InMemoryPackageDataLoader(PackageDataLoader):
         try:
             return self.path_to_content[path]
         except KeyError as e:
-            raise LoadDataError('Unable to load "%s": %s' % (path, e))
+            raise PathNotFoundError('Unable to load "%s": %s' % (path, e))
+
+
+class HttpPackageDataLoader(PackageDataLoader):
+    """A data loader that fetches data from a repository over HTTP(S).
+
+    This is the loader used for the main package repository. Connections
+    are kept alive and pooled per host, so that resolving a large install
+    reuses a handful of connections instead of performing a new TCP/TLS
+    handshake for every manifest.
+
+    Responses may be gzip-compressed in transit. Compressed content is kept
+    compressed (including in any caches) until it's parsed.
+
+    The loader is safe to use from multiple threads. Each request checks out
+    an idle connection for the host (or opens a new one), and returns it to
+    the pool once the response has been fully read.
+
+    Attributes:
+        base_url (unicode):
+            The URL to the root of the repository. Paths passed to
+            :py:meth:`load_by_path` are resolved relative to this.
+
+        timeout (float):
+            The timeout, in seconds, for connecting and reading responses.
+
+        max_idle_connections (int):
+            The maximum number of idle connections kept open per host.
+
+        requests_sent (int):
+            The number of HTTP requests that have been sent.
+
+        connections_opened (int):
+            The number of new connections that have been opened.
+
+        connections_reused (int):
+            The number of requests that were sent over an existing
+            connection.
+    """
+
+    #: The default timeout, in seconds, for connections and responses.
+    DEFAULT_TIMEOUT = 30
+
+    #: The default maximum number of idle connections kept per host.
+    DEFAULT_MAX_IDLE_CONNECTIONS = 4
+
+    def __init__(self, base_url=DEFAULT_REPOSITORY_URL,
+                 timeout=DEFAULT_TIMEOUT,
+                 max_idle_connections=DEFAULT_MAX_IDLE_CONNECTIONS):
+        """Initialize the data loader.
+
+        Args:
+            base_url (unicode, optional):
+                The URL to the root of the repository.
+
+            timeout (float, optional):
+                The timeout, in seconds, for connecting and reading
+                responses.
+
+            max_idle_connections (int, optional):
+                The maximum number of idle connections kept open per host.
+        """
+        if not base_url.endswith('/'):
+            base_url += '/'
+
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_idle_connections = max_idle_connections
+        self.requests_sent = 0
+        self.connections_opened = 0
+        self.connections_reused = 0
+
+        self._idle_connections = {}
+        self._lock = threading.Lock()
+
+    def load_by_path(self, *parts):
+        """Load data from the given path within the repository.
+
+        Args:
+            *parts (list of unicode):
+                The segments of a path within the repository.
+
+        Returns:
+            dict: The loaded data from that path, if found.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                Error loading or parsing data from the path.
+        """
+        path = '/'.join(parts)
+
+        return self.parse_content(path, self.fetch_by_path(path).content)
+
+    def fetch_by_path(self, path, etag=None, last_modified=None):
+        """Fetch the raw content for the given path within the repository.
+
+        If validators are provided, a conditional request will be sent. The
+        server can then respond with a :http:`304` instead of the content.
+
+        Args:
+            path (unicode):
+                The path within the repository.
+
+            etag (unicode, optional):
+                The ETag from a previous fetch of this path.
+
+            last_modified (unicode, optional):
+                The Last-Modified value from a previous fetch of this path.
+
+        Returns:
+            FetchResult:
+            The result of the fetch.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                Error loading the data from the path.
+        """
+        url = self._build_url(path)
+        request_headers = {}
+
+        if etag:
+            request_headers['If-None-Match'] = etag
+
+        if last_modified:
+            request_headers['If-Modified-Since'] = last_modified
+
+        status, headers, content = self._send_request(url, request_headers)
+
+        if status == 304:
+            return FetchResult(path=path,
+                               etag=headers.get('etag', etag),
+                               last_modified=headers.get('last-modified',
+                                                         last_modified),
+                               not_modified=True)
+        elif status in (404, 410):
+            raise PathNotFoundError(
+                'Unable to load "%s". The file could not be found.' % url)
+        elif status != 200:
+            raise LoadDataError(
+                'Unable to load "%s": HTTP %s' % (url, status))
+
+        return FetchResult(path=path,
+                           content=content,
+                           etag=headers.get('etag'),
+                           last_modified=headers.get('last-modified'))
+
+    def get_connection_stats(self):
+        """Return statistics on connection usage.
+
+        Returns:
+            dict:
+            A dictionary containing ``requests_sent``, ``connections_opened``
+            and ``connections_reused`` counts, along with the number of
+            ``idle_connections`` currently held in the pool.
+        """
+        with self._lock:
+            return {
+                'requests_sent': self.requests_sent,
+                'connections_opened': self.connections_opened,
+                'connections_reused': self.connections_reused,
+                'idle_connections': sum(
+                    len(conns)
+                    for conns in self._idle_connections.values()
+                ),
+            }
+
+    def close(self):
+        """Close all idle connections.
+
+        The loader can still be used afterward. New connections will be
+        opened as needed.
+        """
+        with self._lock:
+            idle_connections = self._idle_connections
+            self._idle_connections = {}
+
+        for conns in idle_connections.values():
+            for conn in conns:
+                conn.close()
+
+    def _build_url(self, path):
+        """Return the full URL for a path in the repository.
+
+        Absolute URLs are returned as-is. Any other paths are treated as
+        relative to :py:attr:`base_url`, even if they start with ``/``.
+
+        Args:
+            path (unicode):
+                The path within the repository.
+
+        Returns:
+            unicode:
+            The full URL.
+        """
+        if urlsplit(path).scheme:
+            return path
+
+        return urljoin(self.base_url, path.lstrip('/'))
+
+    def _send_request(self, url, headers={}):
+        """Send a GET request for a URL and read the response.
+
+        If a pooled connection turns out to have been closed by the server,
+        the request will be retried once on a newly-opened connection.
+        Other idle connections to the host are not tried.
+
+        Args:
+            url (unicode):
+                The URL to fetch.
+
+            headers (dict, optional):
+                Additional headers to send in the request.
+
+        Returns:
+            tuple:
+            A 3-tuple containing the HTTP status code, a dictionary of
+            response headers (with lowercase names), and the response body
+            as a byte string.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                The request could not be sent, or the response could not be
+                read.
+        """
+        parsed_url = urlsplit(url)
+        key = (parsed_url.scheme, parsed_url.netloc)
+        request_path = parsed_url.path or '/'
+
+        if parsed_url.query:
+            request_path += '?%s' % parsed_url.query
+
+        request_headers = {
+            'Accept-Encoding': 'gzip',
+            'Connection': 'keep-alive',
+            'User-Agent': 'rbpkg/%s' % get_package_version(),
+        }
+        request_headers.update(headers)
+
+        allow_reuse = True
+
+        while True:
+            conn, reused = self._acquire_connection(key,
+                                                    allow_reuse=allow_reuse)
+
+            try:
+                conn.request('GET', request_path, headers=request_headers)
+                response = conn.getresponse()
+                content = response.read()
+            except (socket.error, http_client.HTTPException) as e:
+                conn.close()
+
+                if reused:
+                    # The server most likely closed the idle connection.
+                    # Try again, once, on a new one.
+                    logger.debug('Retrying %s on a new connection after '
+                                 'error: %s',
+                                 url, e)
+                    allow_reuse = False
+                    continue
+
+                raise LoadDataError('Unable to load "%s": %s' % (url, e))
+
+            response_headers = dict(
+                (name.lower(), value)
+                for name, value in response.getheaders()
+            )
+
+            if (response.will_close or
+                response_headers.get('connection', '').lower() == 'close'):
+                conn.close()
+            else:
+                self._release_connection(key, conn)
+
+            return response.status, response_headers, content
+
+    def _acquire_connection(self, key, allow_reuse=True):
+        """Return a connection for a host.
+
+        An idle connection will be returned from the pool if one is
+        available and ``allow_reuse`` is set. Otherwise, a new connection
+        will be created.
+
+        Args:
+            key (tuple):
+                A tuple of the URL scheme and network location.
+
+            allow_reuse (bool, optional):
+                Whether an idle connection from the pool may be returned.
+
+        Returns:
+            tuple:
+            A 2-tuple containing the connection and a boolean indicating
+            whether it was reused from the pool.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                The URL scheme is not supported.
+        """
+        with self._lock:
+            self.requests_sent += 1
+
+            if allow_reuse:
+                try:
+                    conn = self._idle_connections[key].pop()
+                    self.connections_reused += 1
+
+                    return conn, True
+                except (IndexError, KeyError):
+                    pass
+
+            self.connections_opened += 1
+
+        scheme, netloc = key
+
+        if scheme == 'https':
+            conn = http_client.HTTPSConnection(netloc, timeout=self.timeout)
+        elif scheme == 'http':
+            conn = http_client.HTTPConnection(netloc, timeout=self.timeout)
+        else:
+            raise LoadDataError('Unsupported URL scheme "%s" for "%s"'
+                                % (scheme, netloc))
+
+        return conn, False
+
+    def _release_connection(self, key, conn):
+        """Return a connection to the pool of idle connections.
+
+        If the pool for the host is full, the connection will be closed
+        instead.
+
+        Args:
+            key (tuple):
+                A tuple of the URL scheme and network location.
+
+            conn (httplib.HTTPConnection):
+                The connection to release.
+        """
+        with self._lock:
+            conns = self._idle_connections.setdefault(key, [])
+
+            if len(conns) < self.max_idle_connections:
+                conns.append(conn)
+                conn = None
+
+        if conn is not None:
+            conn.close()
+
+
+def get_default_cache_dir():
+    """Return the default directory for caching repository data.
+
+    This will be the :file:`rbpkg` directory within
+    :env:`XDG_CACHE_HOME`, or :file:`~/.cache` if that's unset.
+
+    Returns:
+        unicode:
+        The default cache directory.
+    """
+    return os.path.join(
+        os.environ.get('XDG_CACHE_HOME') or
+        os.path.join(os.path.expanduser('~'), '.cache'),
+        'rbpkg')
+
+
+def create_data_loader(use_mirror=True, offline=None):
+    """Create a new data loader based on the environment.
+
+    If :env:`RBPKG_USE_FILE_LOADER` is set to ``1``, then
+    :py:class:`FilePackageDataLoader`` will be used. If
+    :env:`RBPKG_REPOSITORY_ARCHIVE` is set to the filename of a repository
+    archive, :py:class:`ArchivePackageDataLoader` will be used. Otherwise,
+    :py:class:`HttpPackageDataLoader` will be used to load from the URL in
+    :env:`RBPKG_REPOSITORY_URL`, or the main package repository if unset.
+    If :env:`RBPKG_REPOSITORY_MIRRORS` is set to a whitespace-separated list
+    of URLs, requests will instead be routed across those mirrors by
+    :py:class:`MirroredPackageDataLoader`.
+
+    Data fetched over HTTP is cached on disk by
+    :py:class:`CachingPackageDataLoader`, in :env:`RBPKG_CACHE_DIR` or
+    the directory returned by :py:func:`get_default_cache_dir`. Setting
+    :env:`RBPKG_CACHE_DIR` to an empty value disables the cache.
+    Concurrent loads of the same path are coalesced by
+    :py:class:`CoalescingPackageDataLoader`.
+
+    If :env:`RBPKG_OFFLINE` is set to ``1``, manifests are only loaded from
+    the on-disk cache, and the repository is never contacted. Cached
+    manifests older than :env:`RBPKG_MAX_STALENESS` seconds (or
+    :py:data:`DEFAULT_MAX_STALENESS`, in offline mode) will log a warning
+    when used. Outside of offline mode, setting :env:`RBPKG_MAX_STALENESS`
+    allows cached manifests up to that age to be used when the repository
+    can't be reached.
+
+    If :env:`RBPKG_CONTENT_ADDRESSED` is set to ``1``, the repository is
+    expected to use the content-addressed layout, and will be loaded through
+    :py:class:`~rbpkg.repository.content_store.
+    ContentAddressedPackageDataLoader`.
+
+    If :env:`RBPKG_WARM_START` is set to ``1``, digests of fetched manifests
+    are recorded by :py:class:`~rbpkg.repository.warm_start.
+    ManifestDigestPackageDataLoader`, allowing the deserialized data to be
+    reused on the next run. See :py:mod:`rbpkg.repository.warm_start`.
+
+    If :env:`RBPKG_SQLITE_MIRROR` is set to the filename of a SQLite
+    repository mirror, manifests will be loaded from the mirror by
+    :py:class:`~rbpkg.repository.sqlite_mirror.SqlitePackageDataLoader`.
+    Anything that isn't in the mirror will be loaded through the loader
+    described above.
+
+    Args:
+        use_mirror (bool, optional):
+            Whether a SQLite mirror may be used. This is disabled when
+            creating a loader to sync the mirror from.
+
+        offline (bool, optional):
+            Whether to load only from the cache. If ``None``, this is
+            determined by :env:`RBPKG_OFFLINE`.
+
+    Returns:
+        PackageDataLoader: The new data loader.
+
+    Raises:
+        rbpkg.repository.errors.ConfigurationError:
+            Offline mode was requested without a cache directory, or
+            :env:`RBPKG_MAX_STALENESS` is invalid.
+    """
+    if offline is None:
+        offline = (os.environ.get('RBPKG_OFFLINE') == '1')
+
+    if os.environ.get('RBPKG_USE_FILE_LOADER') == '1':
+        loader = FilePackageDataLoader()
+    elif os.environ.get('RBPKG_REPOSITORY_ARCHIVE'):
+        loader = ArchivePackageDataLoader(
+            os.environ['RBPKG_REPOSITORY_ARCHIVE'])
+    else:
+        mirror_urls = os.environ.get('RBPKG_REPOSITORY_MIRRORS', '').split()
+
+        if mirror_urls:
+            loader = MirroredPackageDataLoader([
+                HttpPackageDataLoader(url)
+                for url in mirror_urls
+            ])
+        else:
+            loader = HttpPackageDataLoader(
+                os.environ.get('RBPKG_REPOSITORY_URL',
+                               DEFAULT_REPOSITORY_URL))
+
+        cache_dir = os.environ.get('RBPKG_CACHE_DIR',
+                                   get_default_cache_dir())
+
+        max_staleness = os.environ.get('RBPKG_MAX_STALENESS')
+
+        if max_staleness:
+            try:
+                max_staleness = float(max_staleness)
+            except ValueError:
+                raise ConfigurationError(
+                    'RBPKG_MAX_STALENESS must be a number of seconds, not '
+                    '"%s".'
+                    % max_staleness)
+        elif offline:
+            max_staleness = DEFAULT_MAX_STALENESS
+        else:
+            max_staleness = None
+
+        if cache_dir:
+            loader = CachingPackageDataLoader(loader, cache_dir,
+                                              offline=offline,
+                                              max_staleness=max_staleness)
+        elif offline:
+            raise ConfigurationError(
+                'Offline mode requires a cache directory. RBPKG_CACHE_DIR '
+                'must not be empty.')
+
+        loader = CoalescingPackageDataLoader(loader)
+
+    if os.environ.get('RBPKG_WARM_START') == '1':
+        # This is imported here to avoid a circular import.
+        from rbpkg.repository.warm_start import \
+            ManifestDigestPackageDataLoader
+
+        loader = ManifestDigestPackageDataLoader(loader)
+
+    if os.environ.get('RBPKG_CONTENT_ADDRESSED') == '1':
+        # This is imported here to avoid a circular import.
+        from rbpkg.repository.content_store import \
+            ContentAddressedPackageDataLoader
+
+        loader = ContentAddressedPackageDataLoader(loader)
+
+    if use_mirror and os.environ.get('RBPKG_SQLITE_MIRROR'):
+        # This is imported here to avoid a circular import.
+        from rbpkg.repository.sqlite_mirror import (SqlitePackageDataLoader,
+                                                    SqliteRepositoryMirror)
+
+        loader = SqlitePackageDataLoader(
+            SqliteRepositoryMirror(os.environ['RBPKG_SQLITE_MIRROR']),
+            fallback_loader=loader)
+
+    return loader
 
 
 def get_data_loader():
     """Return the data loader for the session.
 
-    If :env:`RBPKG_USE_FILE_LOADER` is set to ``1``, then
-    :py:class:`FilePackageDataLoader`` will be used.
+    The loader is created by :py:func:`create_data_loader` on first use.
 
     Returns:
         PackageDataLoader: The data loader instance.
@@ -160,10 +2633,7 @@ def get_data_loader():
     global _data_loader
 
     if not _data_loader:
-        if os.environ.get('RBPKG_USE_FILE_LOADER') == '1':
-            _data_loader = FilePackageDataLoader()
-        else:
-            raise NotImplementedError
+        _data_loader = create_data_loader()
 
     return _data_loader
 
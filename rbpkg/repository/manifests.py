@@ -0,0 +1,290 @@
+"""Utilities for reading and writing manifest files.
+
+Manifest files may be stored uncompressed (``.json``), or compressed with
+gzip (``.json.gz``) or XZ (``.json.xz``). Compressed content is detected
+automatically when parsing.
+
+Channel manifests may also be paged. The head page (the channel's manifest
+file) contains the newest releases and all package rules, along with a
+``next_page`` key pointing to a continuation page, relative to the head
+page. Each continuation page contains the next set of older releases, and
+its own ``next_page`` key if there are more.
+"""
+
+from __future__ import unicode_literals
+
+import json
+import os
+import tempfile
+
+from six.moves.urllib.parse import urljoin
+
+from rbpkg.repository.errors import LoadDataError
+from rbpkg.utils.compression import (COMPRESSION_EXTENSIONS, compress,
+                                     decompress)
+from rbpkg.utils.disk_cache import replace_file
+from rbpkg.utils.json_backends import get_json_backend
+
+
+_JSON_WHITESPACE = ' \t\n\r'
+
+
+def parse_manifest_content(path, content):
+    """Parse the raw content of a manifest file.
+
+    Content compressed with any supported format will be decompressed
+    first. The content is parsed by the process's
+    :py:func:`JSON backend <rbpkg.utils.json_backends.get_json_backend>`.
+
+    Args:
+        path (unicode):
+            The path the content was fetched from. This is used for error
+            reporting.
+
+        content (bytes or memoryview):
+            The raw content to parse. Buffers (such as a view over a
+            memory-mapped file) will be parsed without copying, if the JSON
+            backend supports it.
+
+    Returns:
+        dict:
+        The parsed data.
+
+    Raises:
+        rbpkg.repository.errors.LoadDataError:
+            The content could not be parsed.
+    """
+    try:
+        return get_json_backend().loads(decompress(content))
+    except (IOError, ValueError) as e:
+        raise LoadDataError('Unable to parse data at "%s": %s' % (path, e))
+
+
+def iter_manifest_items(path, content, key, other_values=None):
+    """Iterate through the items of a list in the raw content of a manifest.
+
+    Only the top-level object of the manifest and the items in the list
+    stored under ``key`` are parsed, one at a time, as the caller iterates.
+    Other top-level values are skipped over as they're encountered. A
+    caller that stops iterating early won't pay to parse the rest of the
+    manifest.
+
+    Content compressed with any supported format will be decompressed
+    first. This always uses the standard :py:mod:`json` module, as other
+    JSON backends can't parse incrementally.
+
+    Args:
+        path (unicode):
+            The path the content was fetched from. This is used for error
+            reporting.
+
+        content (bytes or memoryview):
+            The raw content to parse.
+
+        key (unicode):
+            The top-level key containing the list.
+
+        other_values (dict, optional):
+            A dictionary to store the other top-level values in. If
+            provided, the rest of the top-level object will be parsed once
+            the list is exhausted, so that values after the list are
+            included.
+
+    Yields:
+        object:
+        Each parsed item in the list. Nothing will be yielded if the key is
+        not present.
+
+    Raises:
+        rbpkg.repository.errors.LoadDataError:
+            The content could not be parsed.
+    """
+    try:
+        text = bytes(decompress(content)).decode('utf-8')
+    except (IOError, ValueError) as e:
+        raise LoadDataError('Unable to parse data at "%s": %s' % (path, e))
+
+    decoder = json.JSONDecoder()
+    pos = 0
+
+    def _skip(pos, expected=None):
+        while pos < len(text) and text[pos] in _JSON_WHITESPACE:
+            pos += 1
+
+        if expected is not None:
+            if not text.startswith(expected, pos):
+                raise ValueError('Expected "%s" at position %d'
+                                 % (expected, pos))
+
+            pos += len(expected)
+
+        return pos
+
+    try:
+        pos = _skip(_skip(pos, '{'))
+
+        if text.startswith('}', pos):
+            return
+
+        while True:
+            item_key, pos = decoder.raw_decode(text, _skip(pos))
+            pos = _skip(pos, ':')
+
+            if item_key == key:
+                pos = _skip(_skip(pos, '['))
+
+                if text.startswith(']', pos):
+                    pos += 1
+                else:
+                    while True:
+                        item, pos = decoder.raw_decode(text, pos)
+
+                        yield item
+
+                        pos = _skip(pos)
+
+                        if text.startswith(']', pos):
+                            pos += 1
+                            break
+
+                        pos = _skip(_skip(pos, ','))
+
+                if other_values is None:
+                    return
+            else:
+                value, pos = decoder.raw_decode(text, _skip(pos))
+
+                if other_values is not None:
+                    other_values[item_key] = value
+
+            pos = _skip(pos)
+
+            if text.startswith('}', pos):
+                return
+
+            pos = _skip(pos, ',')
+    except ValueError as e:
+        raise LoadDataError('Unable to parse data at "%s": %s' % (path, e))
+
+
+def load_all_pages(loader, path, data):
+    """Return a paged channel manifest with all pages merged in.
+
+    If the manifest isn't paged, it's returned as-is.
+
+    Args:
+        loader (rbpkg.repository.loaders.PackageDataLoader):
+            The loader used to fetch continuation pages.
+
+        path (unicode):
+            The path to the head page.
+
+        data (dict):
+            The parsed data from the head page.
+
+    Returns:
+        dict:
+        The manifest data, with the releases from all pages and without a
+        ``next_page`` key.
+
+    Raises:
+        rbpkg.repository.errors.LoadDataError:
+            A continuation page could not be loaded.
+    """
+    if not data.get('next_page'):
+        return data
+
+    data = dict(data)
+    releases = list(data.get('releases', []))
+    next_page = data.pop('next_page')
+
+    while next_page:
+        path = urljoin(path, next_page)
+        page_data = loader.load_by_path(path)
+        releases += page_data.get('releases', [])
+        next_page = page_data.get('next_page')
+
+    data['releases'] = releases
+
+    return data
+
+
+def serialize_manifest(data, compression=None):
+    """Serialize manifest data for storage in the repository.
+
+    Args:
+        data (dict):
+            The data to serialize, as returned by one of the ``serialize()``
+            methods (such as
+            :py:meth:`PackageChannel.serialize()
+            <rbpkg.repository.package_channel.PackageChannel.serialize>`).
+
+        compression (unicode, optional):
+            The compression format to use (one of
+            :py:data:`~rbpkg.utils.compression.COMPRESSION_GZIP` or
+            :py:data:`~rbpkg.utils.compression.COMPRESSION_XZ`), or ``None``
+            to leave the result uncompressed.
+
+    Returns:
+        bytes:
+        The serialized manifest.
+
+    Raises:
+        ValueError:
+            The compression format is not supported.
+    """
+    content = json.dumps(data, indent=2, sort_keys=True).encode('utf-8')
+
+    if compression:
+        content = compress(content, compression)
+
+    return content
+
+
+def write_manifest(filename, data, compression=None):
+    """Write manifest data to a file in the repository.
+
+    If compressing, the extension for the compression format (such as
+    ``.gz``) will be appended to the filename. The file is written
+    atomically.
+
+    Args:
+        filename (unicode):
+            The filename of the uncompressed manifest (such as
+            :file:`1.0.x.json`).
+
+        data (dict):
+            The data to write, as returned by one of the ``serialize()``
+            methods.
+
+        compression (unicode, optional):
+            The compression format to use, or ``None`` to leave the file
+            uncompressed.
+
+    Returns:
+        unicode:
+        The filename that was written.
+
+    Raises:
+        ValueError:
+            The compression format is not supported.
+    """
+    content = serialize_manifest(data, compression=compression)
+
+    if compression:
+        filename += COMPRESSION_EXTENSIONS[compression]
+
+    fd, temp_filename = tempfile.mkstemp(
+        prefix='.tmp-',
+        dir=os.path.dirname(os.path.abspath(filename)))
+
+    try:
+        with os.fdopen(fd, 'wb') as fp:
+            fp.write(content)
+
+        replace_file(temp_filename, filename)
+    except Exception:
+        os.unlink(temp_filename)
+        raise
+
+    return filename
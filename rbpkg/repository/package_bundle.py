@@ -1,10 +1,15 @@
 from __future__ import unicode_literals
 
+import threading
+
 import dateutil.parser
 from six.moves.urllib.parse import urljoin
 
+from rbpkg.repository.errors import PathNotFoundError
 from rbpkg.repository.loaders import get_data_loader
-from rbpkg.repository.package_channel import PackageChannel
+from rbpkg.repository.package_channel import (PackageChannel,
+                                              load_package_channels)
+from rbpkg.repository.package_release import PackageRelease
 from rbpkg.utils.matches import matches_version_range
 
 
@@ -18,6 +23,12 @@ class PackageBundle(object):
     the various channel can be looked up, and queries on the package
     can be made.
 
+    Package bundles are safe to share between threads. If several threads
+    access an unloaded bundle at once, only one will load its manifest.
+    Loaded data is swapped in once fully built, and lists returned by the
+    bundle are never modified afterward, so they're safe to iterate while
+    another thread reloads the bundle.
+
     Attributes:
         manifest_url (unicode):
             The URL to the manifest file. This may be absolute or relative.
@@ -150,6 +161,8 @@ class PackageBundle(object):
         self._channel_aliases = channel_aliases or {}
         self._channels = []
         self._loaded = False
+        self._load_lock = threading.Lock()
+        self._data_loaded_callback = None
 
     @property
     def description(self):
@@ -159,8 +172,7 @@ class PackageBundle(object):
         blank line, and then a longer description of the package. All but the
         summary are optional.
         """
-        if not self._loaded:
-            self.load()
+        self._ensure_loaded()
 
         return self._description
 
@@ -171,16 +183,14 @@ class PackageBundle(object):
         This is useful for setting up channels or providing compatibility when
         changing the version of a set of packages.
         """
-        if not self._loaded:
-            self.load()
+        self._ensure_loaded()
 
         return self._channel_aliases
 
     @property
     def channels(self):
         """The list of channels for this package bundle."""
-        if not self._loaded:
-            self.load()
+        self._ensure_loaded()
 
         return self._channels
 
@@ -202,6 +212,17 @@ class PackageBundle(object):
         The first one that contains a release matching the given range will
         be returned.
 
+        Channels that haven't been loaded will have their releases parsed
+        incrementally (see
+        :py:meth:`PackageChannel.iter_releases()
+        <rbpkg.repository.package_channel.PackageChannel.iter_releases>`),
+        stopping at the first match.
+
+        If the data loader supports release queries (such as one backed by a
+        :py:mod:`SQLite mirror <rbpkg.repository.sqlite_mirror>`), the
+        release will be looked up through the loader, without loading the
+        channel manifests.
+
         Args:
             version_range (unicode):
                 The version or version range to limit releases to.
@@ -218,13 +239,38 @@ class PackageBundle(object):
             be returned if no release matches.
         """
         version_range = self.name + version_range
+        loader = get_data_loader()
+
+        if loader.supports_release_queries:
+            try:
+                result = loader.query_latest_release(
+                    self.absolute_manifest_url,
+                    version_range,
+                    channel_types=channel_types,
+                    release_types=release_types)
+            except PathNotFoundError:
+                # The loader doesn't know about this bundle (for instance,
+                # it's not in the mirror). Fall back on searching the
+                # channels.
+                result = False
+
+            if result is None:
+                return None
+            elif result:
+                release = self._find_queried_release(*result)
+
+                if release is not None:
+                    return release
+
+            # The loader's data doesn't match this bundle. Fall back on
+            # searching the channels.
 
         for channel in self.channels:
             if (not channel.visible or
                 (channel_types and channel.channel_type not in channel_types)):
                 continue
 
-            for release in channel.releases:
+            for release in channel.iter_releases():
                 if ((not release_types or
                      release.release_type in release_types) and
                     matches_version_range(release.version, version_range)):
@@ -232,6 +278,65 @@ class PackageBundle(object):
 
         return None
 
+    def _find_queried_release(self, channel_name, release_data):
+        """Return a release returned by the data loader's release query.
+
+        Args:
+            channel_name (unicode):
+                The name of the channel containing the release.
+
+            release_data (dict):
+                The release data, in channel manifest format.
+
+        Returns:
+            rbpkg.repository.package_release.PackageRelease:
+            The release, or ``None`` if this bundle has no channel with the
+            given name.
+        """
+        for channel in self.channels:
+            if channel.name == channel_name:
+                if channel._loaded:
+                    for release in channel._releases:
+                        if release.version == release_data['version']:
+                            return release
+
+                return PackageRelease.deserialize(channel, release_data)
+
+        return None
+
+    def load_channels(self, channels=None):
+        """Load the manifests for several channels at once.
+
+        The manifest files for all the channels that haven't yet been loaded
+        will be fetched together, through
+        :py:meth:`~rbpkg.repository.loaders.PackageDataLoader.load_by_paths`.
+        This is faster than letting each channel load its manifest on first
+        access.
+
+        Channels that another thread is already loading are not fetched
+        again. This will wait for that thread to finish loading them.
+
+        Args:
+            channels (list of rbpkg.repository.package_channel.
+                      PackageChannel, optional):
+                The channels to load. This defaults to all channels in the
+                bundle.
+        """
+        if channels is None:
+            channels = self.channels
+
+        load_package_channels(channels)
+
+    def unload_channels(self):
+        """Unload the manifest data for all loaded channels.
+
+        This frees the releases and package rules of the channels. They'll
+        be loaded again on demand.
+        """
+        for channel in self._channels:
+            if channel._loaded:
+                channel.unload()
+
     def serialize_index_entry(self):
         """Serialize the package bundle for the package index.
 
@@ -287,28 +392,136 @@ class PackageBundle(object):
 
         The data from the manifest will be loaded and stored in this
         instance, allowing the caller to access it.
+
+        Only one thread will load the bundle at a time.
         """
-        # Let the exceptions bubble up.
-        data = get_data_loader().load_by_path(self.absolute_manifest_url)
+        with self._load_lock:
+            # Let the exceptions bubble up.
+            self._load_data(
+                get_data_loader().load_by_path(self.absolute_manifest_url))
 
-        self._channels = []
-        self._channel_aliases = []
+    def load_async(self, load_channels=False):
+        """Asynchronously load data from the manifest file.
+
+        This is the :py:mod:`asyncio` counterpart to :py:meth:`load`. It
+        requires Python 3.7 or higher.
+
+        Args:
+            load_channels (bool, optional):
+                Whether to also load the manifests for all channels.
+
+        Returns:
+            coroutine:
+            A coroutine that completes once the data has been loaded.
+        """
+        # This is imported here, since asyncio support isn't available on
+        # all supported versions of Python.
+        from rbpkg.repository.async_loaders import load_package_bundle
+
+        return load_package_bundle(self, load_channels=load_channels)
+
+    def _ensure_loaded(self):
+        """Load data from the manifest file, if not already loaded.
+
+        If several threads need the data at once, only one will load it,
+        and the others will wait for it.
+        """
+        if not self._loaded:
+            with self._load_lock:
+                if not self._loaded:
+                    # Let the exceptions bubble up.
+                    self._load_data(get_data_loader().load_by_path(
+                        self.absolute_manifest_url))
+
+    def _load_data(self, data):
+        """Load data from a parsed manifest file.
+
+        If the bundle was already loaded, any loaded channels whose manifest
+        URL and ``last_updated_timestamp`` haven't changed will be kept,
+        along with their releases and package rules. Other channels will be
+        replaced with unloaded ones.
+
+        The new list of channels is built in full before being swapped in,
+        so other threads will see either the old or the new list, and never
+        a partially-loaded one.
+
+        Args:
+            data (dict):
+                The parsed data from the bundle's manifest file.
+        """
+        old_channels = dict(
+            (channel.name, channel)
+            for channel in self._channels
+            if channel._loaded
+        )
+        channels = []
+
+        for channel_data in data['channels']:
+            channel = PackageChannel.deserialize(self, channel_data)
+            old_channel = old_channels.get(channel.name)
+
+            if (old_channel is not None and
+                old_channel.absolute_manifest_url ==
+                channel.absolute_manifest_url and
+                old_channel.last_updated_timestamp ==
+                channel.last_updated_timestamp):
+                # The channel's manifest hasn't changed. Keep its loaded
+                # data, but update the details that live in the bundle.
+                old_channel.latest_version = channel.latest_version
+                old_channel.channel_type = channel.channel_type
+                old_channel.current = channel.current
+                old_channel.visible = channel.visible
+                channel = old_channel
+
+            channels.append(channel)
 
         self.created_timestamp = \
             dateutil.parser.parse(data['created_timestamp'])
         self.last_updated_timestamp = \
             dateutil.parser.parse(data['last_updated_timestamp'])
         self._description = '\n'.join(data.get('description', [])) or None
-        self.current_version = self.current_version
+        self.current_version = data.get('current_version')
         self.package_names = data['package_names']
         self._channel_aliases = data['channel_aliases']
+        self._channels = channels
+        self._loaded = True
+        self._notify_data_loaded()
 
-        self._channels = [
-            PackageChannel.deserialize(self, channel_data)
-            for channel_data in data['channels']
-        ]
+    def _notify_data_loaded(self):
+        """Notify a listener that data was loaded into the bundle.
 
-        self._loaded = True
+        This is called when the bundle or one of its channels loads its
+        manifest, so that a cache holding the bundle can account for the
+        change in size.
+        """
+        if self._data_loaded_callback is not None:
+            self._data_loaded_callback(self)
+
+    def __getstate__(self):
+        """Return the state of the bundle for pickling.
+
+        The load lock and the data-loaded callback can't be pickled, and
+        are left out.
+
+        Returns:
+            dict:
+            The state of the bundle.
+        """
+        state = self.__dict__.copy()
+        del state['_load_lock']
+        state['_data_loaded_callback'] = None
+
+        return state
+
+    def __setstate__(self, state):
+        """Restore the state of the bundle after unpickling.
+
+        Args:
+            state (dict):
+                The state of the bundle.
+        """
+        self.__dict__.update(state)
+        self._load_lock = threading.Lock()
 
     def __repr__(self):
         return '<PackageBundle(%s)>' % self.name
@@ -1,9 +1,17 @@
 from __future__ import unicode_literals
 
+import posixpath
+import threading
+from collections import OrderedDict
+from itertools import islice
+
 import dateutil.parser
+import six
+from six.moves.collections_abc import Sequence
 from six.moves.urllib.parse import urljoin
 
 from rbpkg.repository.loaders import get_data_loader
+from rbpkg.repository.manifests import iter_manifest_items
 from rbpkg.repository.package_release import PackageRelease
 from rbpkg.repository.package_rules import PackageRules
 
@@ -11,6 +19,144 @@ from rbpkg.repository.package_rules import PackageRules
 FORMAT_VERSION = '1.0'
 
 
+def get_page_manifest_url(manifest_url, page_num):
+    """Return the URL to a continuation page of a paged channel manifest.
+
+    Args:
+        manifest_url (unicode):
+            The URL to the channel's manifest file (the head page).
+
+        page_num (int):
+            The page number. Continuation pages start at 2.
+
+    Returns:
+        unicode:
+        The URL to the page, in the same directory as the head page.
+    """
+    base, ext = posixpath.splitext(manifest_url)
+
+    return '%s.page%d%s' % (base, page_num, ext)
+
+
+def load_package_channels(channels):
+    """Load the manifests for several channels at once.
+
+    The manifest files for all the channels that haven't yet been loaded
+    will be fetched together, through
+    :py:meth:`~rbpkg.repository.loaders.PackageDataLoader.load_by_paths`.
+    The channels may belong to different bundles.
+
+    Channels that another thread is already loading are not fetched again.
+    This will wait for that thread to finish loading them.
+
+    Args:
+        channels (list of PackageChannel):
+            The channels to load.
+
+    Raises:
+        rbpkg.repository.errors.LoadDataError:
+            A channel manifest could not be loaded.
+    """
+    locked = []
+    in_progress = []
+
+    for channel in channels:
+        if not channel._loaded:
+            if channel._load_lock.acquire(False):
+                locked.append(channel)
+            else:
+                in_progress.append(channel)
+
+    to_load = []
+
+    try:
+        # Another thread may have finished loading some of these before
+        # the locks were acquired.
+        to_load = [
+            channel
+            for channel in locked
+            if not channel._loaded
+        ]
+
+        if to_load:
+            # Let the exceptions bubble up.
+            channels_data = get_data_loader().load_by_paths([
+                channel.absolute_manifest_url
+                for channel in to_load
+            ])
+
+            for channel in to_load:
+                channel._load_data(
+                    channels_data[channel.absolute_manifest_url],
+                    notify=False)
+    finally:
+        for channel in locked:
+            channel._load_lock.release()
+
+        # Notify each bundle once for the whole batch, rather than once per
+        # channel.
+        for bundle in OrderedDict.fromkeys(
+                channel.bundle
+                for channel in to_load
+                if channel._loaded):
+            bundle._notify_data_loaded()
+
+    for channel in in_progress:
+        channel._ensure_loaded()
+
+
+class PagedReleaseList(Sequence):
+    """A read-only list of releases that loads older pages on demand.
+
+    This is returned by :py:attr:`PackageChannel.releases` for channels with
+    paged manifests. Iterating or indexing only loads as many continuation
+    pages as needed to reach the requested releases. Taking the length, or
+    using negative indexes, loads all pages.
+    """
+
+    def __init__(self, channel):
+        """Initialize the list.
+
+        Args:
+            channel (PackageChannel):
+                The channel owning the releases.
+        """
+        self.channel = channel
+
+    def __iter__(self):
+        return self.channel.iter_releases()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice) or index < 0:
+            return list(self)[index]
+
+        for release in islice(self, index, None):
+            return release
+
+        raise IndexError('release index out of range')
+
+    def __len__(self):
+        return sum(1 for release in self)
+
+    def __bool__(self):
+        for release in self:
+            return True
+
+        return False
+
+    __nonzero__ = __bool__
+
+    def __eq__(self, other):
+        return (isinstance(other, (list, Sequence)) and
+                list(self) == list(other))
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '<PagedReleaseList(%r)>' % self.channel
+
+
 class PackageChannel(object):
     """A channel of releases for a given package.
 
@@ -22,6 +168,12 @@ class PackageChannel(object):
     Each channel entry further contains all the specific releases that can
     be installed.
 
+    Channels are safe to share between threads. If several threads access
+    an unloaded channel at once, only one will load its manifest. Loaded
+    data is swapped in once fully built, and lists returned by the channel
+    are never modified afterward, so they're safe to iterate while another
+    thread reloads or unloads the channel.
+
     Attributes:
         bundle (rbpkg.repository.bundle.PackageBundle):
             The bundle that owns the channel.
@@ -62,6 +214,9 @@ class PackageChannel(object):
     #: Release channel.
     CHANNEL_TYPE_RELEASE = 'release'
 
+    #: The default number of releases per page in a paged manifest.
+    DEFAULT_PAGE_SIZE = 20
+
     @classmethod
     def deserialize(cls, bundle, data):
         """Deserialize a payload into a PackageChannel.
@@ -144,6 +299,10 @@ class PackageChannel(object):
         self._loaded = False
         self._releases = []
         self._package_rules = []
+        self._next_page_url = None
+        self._load_lock = threading.Lock()
+        self._release_stream_lock = threading.Lock()
+        self._reset_release_stream()
 
     @property
     def releases(self):
@@ -151,9 +310,15 @@ class PackageChannel(object):
 
         If the channel manifest file hasn't yet been loaded, it will be
         synchronously loaded first.
+
+        If the manifest is paged, and older pages haven't been loaded yet,
+        this will be a :py:class:`PagedReleaseList`, which loads them as
+        they're reached.
         """
-        if not self._loaded:
-            self.load()
+        self._ensure_loaded()
+
+        if self._next_page_url:
+            return PagedReleaseList(self)
 
         return self._releases
 
@@ -164,18 +329,201 @@ class PackageChannel(object):
         If the channel manifest file hasn't yet been loaded, it will be
         synchronously loaded first.
         """
-        if not self._loaded:
-            self.load()
+        self._ensure_loaded()
 
         return self._package_rules
 
     @property
     def latest_release(self):
-        """Information on the latest release."""
-        try:
-            return self.releases[0]
-        except IndexError:
-            return None
+        """Information on the latest release.
+
+        If the channel manifest file hasn't yet been loaded, only the first
+        release will be parsed. See :py:meth:`iter_releases`.
+        """
+        for release in self.iter_releases():
+            return release
+
+        return None
+
+    def iter_releases(self):
+        """Iterate through the releases in the channel.
+
+        If the channel manifest file has been loaded, this iterates through
+        :py:attr:`releases`. For paged manifests, continuation pages will be
+        loaded only once iteration reaches them.
+
+        Otherwise, the manifest is fetched and its releases are parsed one
+        at a time, as the caller iterates. A caller that stops early (for
+        instance, after finding the newest release matching a version
+        range) won't pay to parse and build the remaining releases or the
+        package rules. Releases parsed this way are kept, and shared with
+        later iterations, so the manifest is only fetched and parsed once.
+
+        The manifest is still fetched in full. Only the parsing is
+        incremental.
+
+        Yields:
+            rbpkg.repository.package_release.PackageRelease:
+            Each release in the channel, newest first.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                The manifest could not be loaded or parsed.
+        """
+        i = 0
+
+        while True:
+            fetch_url = None
+
+            with self._release_stream_lock:
+                streaming = not self._loaded
+
+                if not streaming:
+                    releases = self._releases
+
+                    if i >= len(releases):
+                        fetch_url = self._next_page_url
+                else:
+                    releases = self._streamed_releases
+
+                    if i >= len(releases):
+                        fetch_url = self._stream_next_release()
+
+                if fetch_url is None:
+                    if i >= len(releases):
+                        return
+
+                    release = releases[i]
+
+            if fetch_url is not None:
+                # Pages are fetched without holding the lock, so other
+                # threads can keep iterating over the releases already
+                # available.
+                if streaming:
+                    self._fetch_release_stream_page(fetch_url)
+                else:
+                    self._load_next_page(fetch_url)
+
+                continue
+
+            yield release
+
+            i += 1
+
+    def _stream_next_release(self):
+        """Parse the next release from the channel's manifest.
+
+        The caller must hold the release stream lock.
+
+        Returns:
+            unicode:
+            The URL of the page that must be fetched (through
+            :py:meth:`_fetch_release_stream_page`) before the next release
+            can be parsed, or ``None`` if a release was parsed or there are
+            no more releases.
+        """
+        while self._release_stream is not None:
+            try:
+                release_data = next(self._release_stream)
+            except StopIteration:
+                next_page = self._release_stream_values.get('next_page')
+                self._release_stream = None
+
+                if next_page:
+                    self._release_stream_url = \
+                        urljoin(self._release_stream_url, next_page)
+                else:
+                    self._release_stream_url = None
+            else:
+                self._streamed_releases.append(
+                    PackageRelease.deserialize(self, release_data))
+
+                return None
+
+        return self._release_stream_url
+
+    def _fetch_release_stream_page(self, url):
+        """Fetch a page of the manifest for streaming releases.
+
+        The head page is parsed incrementally, as releases are streamed.
+        Continuation pages of a paged manifest are loaded in full.
+
+        This is called without holding the release stream lock. The page is
+        discarded if another thread fetched it first, or if the channel was
+        loaded or reset in the meantime.
+
+        Args:
+            url (unicode):
+                The URL of the page.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                The page could not be loaded.
+        """
+        loader = get_data_loader()
+
+        if url == self.absolute_manifest_url:
+            values = {}
+            release_stream = iter_manifest_items(
+                url, loader.fetch_by_path(url).content, 'releases',
+                other_values=values)
+        else:
+            values = loader.load_by_path(url)
+            release_stream = iter(values.get('releases', []))
+
+        with self._release_stream_lock:
+            if (not self._loaded and
+                self._release_stream is None and
+                self._release_stream_url == url):
+                self._release_stream = release_stream
+                self._release_stream_values = values
+
+    def _load_next_page(self, url):
+        """Load the next continuation page of a paged manifest.
+
+        The releases on the page are added to the loaded releases.
+
+        This is called without holding the release stream lock. The page is
+        discarded if another thread loaded it first, or if the channel was
+        unloaded or reloaded in the meantime.
+
+        Args:
+            url (unicode):
+                The URL of the page.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                The page could not be loaded.
+        """
+        page_data = get_data_loader().load_by_path(url)
+        releases = [
+            PackageRelease.deserialize(self, release_data)
+            for release_data in page_data.get('releases', [])
+        ]
+        next_page = page_data.get('next_page')
+
+        with self._release_stream_lock:
+            if self._loaded and self._next_page_url == url:
+                # A new list is swapped in, rather than extending the old
+                # one, so that other threads iterating over it aren't
+                # affected.
+                self._releases = self._releases + releases
+
+                if next_page:
+                    self._next_page_url = urljoin(url, next_page)
+                else:
+                    self._next_page_url = None
+
+    def _reset_release_stream(self):
+        """Reset the state for streaming releases from the manifest.
+
+        The caller must hold the release stream lock, unless the channel
+        is still being constructed.
+        """
+        self._release_stream = None
+        self._release_stream_url = self.absolute_manifest_url
+        self._release_stream_values = {}
+        self._streamed_releases = []
 
     def get_all_rules_for_version(self, version, require_current_system=True):
         """Return lists of rules for the given version.
@@ -239,7 +587,7 @@ class PackageChannel(object):
             'last_updated_timestamp': self.last_updated_timestamp.isoformat(),
             'releases': [
                 release.serialize()
-                for release in self.releases
+                for release in self.iter_releases()
             ],
             'package_rules': [
                 package_rules.serialize()
@@ -247,34 +595,181 @@ class PackageChannel(object):
             ],
         }
 
+    def serialize_pages(self, page_size):
+        """Serialize the channel into JSON-serializable pages.
+
+        This serializes the channel in the paged layout. The head page,
+        stored as the channel's manifest file, will contain the newest
+        ``page_size`` releases and all the package rules. Older releases
+        will go in continuation pages, named by
+        :py:func:`get_page_manifest_url`.
+
+        Args:
+            page_size (int):
+                The number of releases per page.
+
+        Returns:
+            list of tuple:
+            A list of ``(manifest_url, data)`` tuples, one per page,
+            starting with the head page.
+
+        Raises:
+            ValueError:
+                ``page_size`` is less than 1.
+        """
+        if page_size < 1:
+            raise ValueError('page_size must be at least 1')
+
+        data = self.serialize()
+        releases = data['releases']
+        data['releases'] = releases[:page_size]
+        pages = [(self.manifest_url, data)]
+
+        for i in six.moves.range(page_size, len(releases), page_size):
+            page_url = get_page_manifest_url(self.manifest_url,
+                                             len(pages) + 1)
+            pages[-1][1]['next_page'] = posixpath.basename(page_url)
+            pages.append((page_url, {
+                'format_version': FORMAT_VERSION,
+                'releases': releases[i:i + page_size],
+            }))
+
+        return pages
+
     def load(self):
         """Load data from the manifest file.
 
         The data from the manifest will be loaded and stored in this
         instance, allowing the caller to access it.
+
+        Only one thread will load the channel at a time.
         """
-        # Let the exceptions bubble up.
-        data = get_data_loader().load_by_path(self.absolute_manifest_url)
+        with self._load_lock:
+            # Let the exceptions bubble up.
+            self._load_data(
+                get_data_loader().load_by_path(self.absolute_manifest_url))
 
-        self._releases = []
-        self._package_rules = []
+    def load_async(self):
+        """Asynchronously load data from the manifest file.
+
+        This is the :py:mod:`asyncio` counterpart to :py:meth:`load`. It
+        requires Python 3.7 or higher.
+
+        Returns:
+            coroutine:
+            A coroutine that completes once the data has been loaded.
+        """
+        # This is imported here, since asyncio support isn't available on
+        # all supported versions of Python.
+        from rbpkg.repository.async_loaders import load_package_channel
+
+        return load_package_channel(self)
+
+    def unload(self):
+        """Unload the data from the manifest file.
+
+        This frees the releases and package rules. They'll be loaded again
+        on demand.
+        """
+        with self._load_lock:
+            with self._release_stream_lock:
+                self._loaded = False
+                self._releases = []
+                self._package_rules = []
+                self._next_page_url = None
+                self._reset_release_stream()
+
+    def _ensure_loaded(self):
+        """Load data from the manifest file, if not already loaded.
+
+        If several threads need the data at once, only one will load it,
+        and the others will wait for it.
+        """
+        if not self._loaded:
+            with self._load_lock:
+                if not self._loaded:
+                    # Let the exceptions bubble up.
+                    self._load_data(get_data_loader().load_by_path(
+                        self.absolute_manifest_url))
+
+    def _load_data(self, data, notify=True):
+        """Load data from a parsed manifest file.
 
-        self.created_timestamp = \
-            dateutil.parser.parse(data['created_timestamp'])
-        self.last_updated_timestamp = \
-            dateutil.parser.parse(data['last_updated_timestamp'])
+        The new releases and package rules are built in full before being
+        swapped in, so other threads will see either the old or the new
+        data, and never a partially-loaded list.
+
+        Args:
+            data (dict):
+                The parsed data from the channel's manifest file.
 
-        self._releases = [
+            notify (bool, optional):
+                Whether to notify the bundle that data was loaded. Callers
+                loading several channels at once may notify the bundle
+                themselves.
+        """
+        releases = [
             PackageRelease.deserialize(self, releases_data)
             for releases_data in data['releases']
         ]
 
-        self._package_rules = [
+        package_rules = [
             PackageRules.deserialize(self, rules_data)
             for rules_data in data['package_rules']
         ]
 
-        self._loaded = True
+        if data.get('next_page'):
+            next_page_url = urljoin(self.absolute_manifest_url,
+                                    data['next_page'])
+        else:
+            next_page_url = None
+
+        with self._release_stream_lock:
+            self.created_timestamp = \
+                dateutil.parser.parse(data['created_timestamp'])
+            self.last_updated_timestamp = \
+                dateutil.parser.parse(data['last_updated_timestamp'])
+            self._releases = releases
+            self._package_rules = package_rules
+            self._next_page_url = next_page_url
+            self._loaded = True
+            self._reset_release_stream()
+
+        if notify:
+            self.bundle._notify_data_loaded()
+
+    def __getstate__(self):
+        """Return the state of the channel for pickling.
+
+        The locks and any in-progress release stream can't be pickled, and
+        are left out. Releases streamed from an unloaded channel will be
+        parsed again when needed.
+
+        Returns:
+            dict:
+            The state of the channel.
+        """
+        with self._release_stream_lock:
+            state = self.__dict__.copy()
+
+        for key in ('_load_lock', '_release_stream_lock', '_release_stream',
+                    '_release_stream_url', '_release_stream_values',
+                    '_streamed_releases'):
+            del state[key]
+
+        return state
+
+    def __setstate__(self, state):
+        """Restore the state of the channel after unpickling.
+
+        Args:
+            state (dict):
+                The state of the channel.
+        """
+        self.__dict__.update(state)
+        self._load_lock = threading.Lock()
+        self._release_stream_lock = threading.Lock()
+        self._reset_release_stream()
 
     def __repr__(self):
         return (
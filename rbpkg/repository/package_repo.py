@@ -1,50 +1,414 @@
 from __future__ import unicode_literals
 
+import logging
+import os
+import threading
+from multiprocessing.pool import ThreadPool
+
 import six
 
-from rbpkg.repository.errors import LoadDataError, PackageLookupError
+from rbpkg.repository.errors import (ConfigurationError, LoadDataError,
+                                    PackageLookupError, PathNotFoundError)
 from rbpkg.repository.loaders import get_data_loader
 from rbpkg.repository.package_bundle import PackageBundle
+from rbpkg.repository.package_channel import load_package_channels
 from rbpkg.repository.package_index import PackageIndex
+from rbpkg.repository.search import PackageSearchIndex
+from rbpkg.repository.snapshots import RepositorySnapshot
+from rbpkg.utils.caches import (OBJECT_CACHE_POLICIES, LRUObjectCache,
+                                NegativeCache)
+from rbpkg.utils.single_flight import SingleFlight
+
+
+logger = logging.getLogger(__name__)
 
 
 _repository = None
 
 
+#: The default memory budget for cached package bundles, in bytes.
+DEFAULT_BUNDLE_CACHE_SIZE = 64 * 1024 * 1024
+
+
 class PackageRepository(object):
     """Interface with packages on the package repository.
 
     This provides an API to look up and manage packages living on the
     package repository.
+
+    The repository is safe to share between threads, such as across a pool
+    of workers. Concurrent lookups of the same package bundle (or the index)
+    from multiple threads are coalesced, so that only one thread fetches and
+    parses the manifest, and the others share its result. The bundles and
+    channels it returns load their own manifests safely as well.
+
+    Package bundles that don't exist in the repository are remembered for
+    a short time (:py:attr:`MISSING_BUNDLE_TTL` seconds), so that repeated
+    lookups of a missing bundle fail without fetching from the repository.
+
+    Package bundles that are found are kept in a memory-budgeted
+    :py:class:`~rbpkg.utils.caches.ObjectCache`. The size of each bundle
+    includes its loaded channels, and is updated as channels are loaded.
+    When a bundle is evicted, its loaded channels are unloaded as well, so
+    that their memory is freed even if the caller still holds the bundle.
     """
 
     BASE_PATH = '/packages/'
 
-    def __init__(self):
-        self._package_bundle_cache = {}
+    #: The number of seconds a missing package bundle is remembered.
+    MISSING_BUNDLE_TTL = 60
+
+    #: The maximum number of bundles prefetched at once.
+    PREFETCH_WORKERS = 4
+
+    def __init__(self, bundle_cache=None):
+        """Initialize the repository.
+
+        Args:
+            bundle_cache (rbpkg.utils.caches.ObjectCache, optional):
+                The cache used for package bundles. This defaults to an
+                :py:class:`~rbpkg.utils.caches.LRUObjectCache` with a budget
+                of :py:data:`DEFAULT_BUNDLE_CACHE_SIZE`. The cache's
+                :py:attr:`~rbpkg.utils.caches.ObjectCache.on_evict` callback
+                will be replaced.
+        """
+        if bundle_cache is None:
+            bundle_cache = LRUObjectCache(max_size=DEFAULT_BUNDLE_CACHE_SIZE)
+
+        bundle_cache.on_evict = self._on_package_bundle_evicted
+
+        self._package_bundle_cache = bundle_cache
+        self._missing_bundles = NegativeCache(ttl=self.MISSING_BUNDLE_TTL)
         self._index = None
+        self._lock = threading.Lock()
+        self._single_flight = SingleFlight()
+        self._prefetch_index = None
+        self._prefetch_result = None
+        self._search_index = None
+
+    @property
+    def coalesced_loads(self):
+        """The number of loads that were coalesced with another in flight.
+
+        Each of these was a lookup that waited on a concurrent fetch of the
+        same manifest, instead of fetching it again.
+        """
+        return self._single_flight.coalesced_count
+
+    def get_cache_stats(self):
+        """Return statistics on the package bundle cache.
+
+        Returns:
+            dict:
+            The statistics. See
+            :py:meth:`ObjectCache.get_stats()
+            <rbpkg.utils.caches.ObjectCache.get_stats>` for details.
+        """
+        return self._package_bundle_cache.get_stats()
 
     def clear_caches(self):
         """Clear all caches.
 
         Any subsequent lookups of packages will re-fetch from the repository.
         """
-        self._package_bundle_cache = {}
-        self._index = None
+        with self._lock:
+            self._package_bundle_cache.clear()
+            self._index = None
+
+        self._missing_bundles.clear()
+
+    def invalidate_index(self):
+        """Invalidate the cached root package index.
+
+        The next call to :py:meth:`get_index` will re-fetch it. Cached
+        package bundles are left alone.
+        """
+        with self._lock:
+            self._index = None
+
+    def invalidate_package_bundle(self, name):
+        """Invalidate a cached package bundle.
+
+        The next lookup of the bundle will re-fetch it. This also forgets
+        whether the bundle was recently found to be missing.
+
+        Args:
+            name (unicode):
+                The name of the package bundle.
+        """
+        self._package_bundle_cache.discard(name)
+        self._missing_bundles.discard(name)
+
+    def get_cached_manifest_paths(self):
+        """Return the paths of manifests whose data is cached.
+
+        This includes the root package index (if loaded), each cached
+        package bundle, and each loaded channel of those bundles.
 
-    def get_index(self):
+        Returns:
+            list of unicode:
+            The paths within the repository.
+        """
+        with self._lock:
+            index = self._index
+
+        paths = []
+
+        if index is not None:
+            paths.append(self._build_package_index_path())
+
+        for name in self._package_bundle_cache.keys():
+            package_bundle = self._package_bundle_cache.peek(name)
+
+            if package_bundle is not None:
+                paths.append(package_bundle.absolute_manifest_url)
+                paths += [
+                    channel.absolute_manifest_url
+                    for channel in package_bundle._channels
+                    if channel._loaded
+                ]
+
+        return paths
+
+    def invalidate_manifests(self, paths):
+        """Invalidate cached data loaded from the given manifests.
+
+        Only the data loaded from those manifests is invalidated. A changed
+        bundle manifest invalidates that bundle, and a changed channel
+        manifest unloads that channel, leaving the rest of its bundle
+        cached.
+
+        Args:
+            paths (list of unicode):
+                The paths within the repository of the changed manifests.
+
+        Returns:
+            list of unicode:
+            The paths that had cached data invalidated.
+        """
+        paths = set(paths)
+        invalidated = []
+        index_path = self._build_package_index_path()
+
+        if index_path in paths and self._index is not None:
+            self.invalidate_index()
+            invalidated.append(index_path)
+
+        for name in self._package_bundle_cache.keys():
+            package_bundle = self._package_bundle_cache.peek(name)
+
+            if package_bundle is None:
+                continue
+
+            if package_bundle.absolute_manifest_url in paths:
+                self.invalidate_package_bundle(name)
+                invalidated.append(package_bundle.absolute_manifest_url)
+                continue
+
+            unloaded = False
+
+            for channel in package_bundle._channels:
+                if (channel._loaded and
+                    channel.absolute_manifest_url in paths):
+                    channel.unload()
+                    invalidated.append(channel.absolute_manifest_url)
+                    unloaded = True
+
+            if unloaded:
+                self._package_bundle_cache.update_size(name)
+
+        return invalidated
+
+    def refresh(self, reload_bundles=True):
+        """Incrementally refresh the cached data from the repository.
+
+        This fetches the root package index and compares it against the
+        cached copy. If the index's ``last_updated_timestamp`` hasn't
+        changed, nothing else is done.
+
+        Otherwise, each bundle entry's ``last_updated_timestamp`` is compared
+        against the cached bundle (and the previous index), and only bundles
+        that changed are touched:
+
+        * Changed bundles that are cached are re-fetched and updated in
+          place (if ``reload_bundles`` is set) or invalidated. Updating in
+          place keeps any loaded channels whose manifests haven't changed.
+        * Bundles removed from the index are invalidated.
+        * Bundles added to the index are no longer considered missing.
+
+        Bundles not listed in the index are left alone, as the index only
+        covers core packages.
+
+        All manifests are fetched before any cached data is changed, so a
+        failed refresh leaves the caches untouched.
+
+        Args:
+            reload_bundles (bool, optional):
+                Whether to re-fetch changed bundles that are cached, rather
+                than invalidating them.
+
+        Returns:
+            list of unicode:
+            The sorted names of bundles that were added, changed, or removed.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                The index or a bundle manifest could not be loaded.
+        """
+        old_index = self._index
+        manifest_url = self._build_package_index_path()
+        new_index = PackageIndex.deserialize(
+            manifest_url,
+            get_data_loader().load_by_path(manifest_url))
+
+        if (old_index is not None and
+            old_index.last_updated_timestamp ==
+            new_index.last_updated_timestamp):
+            return []
+
+        if old_index is None:
+            old_timestamps = {}
+        else:
+            old_timestamps = dict(
+                (bundle.name, bundle.last_updated_timestamp)
+                for bundle in old_index.bundles
+            )
+
+        new_timestamps = dict(
+            (bundle.name, bundle.last_updated_timestamp)
+            for bundle in new_index.bundles
+        )
+
+        changed = set(old_timestamps) - set(new_timestamps)
+        to_reload = {}
+
+        for name, timestamp in six.iteritems(new_timestamps):
+            package_bundle = self._package_bundle_cache.peek(name)
+
+            if package_bundle is not None:
+                if package_bundle.last_updated_timestamp == timestamp:
+                    continue
+
+                to_reload[name] = package_bundle
+            elif old_timestamps.get(name) == timestamp:
+                continue
+
+            changed.add(name)
+
+        if reload_bundles and to_reload:
+            bundles_data = get_data_loader().load_by_paths([
+                package_bundle.absolute_manifest_url
+                for package_bundle in six.itervalues(to_reload)
+            ])
+        else:
+            bundles_data = {}
+
+        with self._lock:
+            self._index = new_index
+
+        for name in changed:
+            package_bundle = to_reload.get(name)
+
+            if package_bundle is not None and bundles_data:
+                package_bundle._load_data(
+                    bundles_data[package_bundle.absolute_manifest_url])
+                self._missing_bundles.discard(name)
+            else:
+                self.invalidate_package_bundle(name)
+
+        return sorted(changed)
+
+    def get_index(self, prefetch=False):
         """Return the root package index from the repository.
 
+        If ``prefetch`` is set, the manifests for all bundles in the index,
+        and for their visible channels, will be loaded in the background by
+        a pool of :py:attr:`PREFETCH_WORKERS` threads. The loaded bundles
+        are added to the bundle cache, so later lookups of them (and
+        accesses to their visible channels) won't need to wait on the
+        repository. The index itself is left unchanged. This only happens
+        once per index.
+
+        Args:
+            prefetch (bool, optional):
+                Whether to prefetch the bundles in the index.
+
         Returns:
             rbpkg.repository.package_index.PackageIndex:
             The root package index.
         """
-        if not self._index:
-            manifest_url = self._build_package_index_path()
-            index_data = get_data_loader().load_by_path(manifest_url)
-            self._index = PackageIndex.deserialize(manifest_url, index_data)
+        index = self._index
 
-        return self._index
+        if not index:
+            index = self._single_flight.do('index', self._load_index)
+
+        if prefetch:
+            self._start_prefetch(index)
+
+        return index
+
+    def get_search_index(self):
+        """Return a search index over the bundles in the root package index.
+
+        The search index covers the names of the bundles in the index, and
+        the native names of their packages. It's built on first use, and
+        rebuilt whenever the root package index changes.
+
+        Returns:
+            rbpkg.repository.search.PackageSearchIndex:
+            The search index.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                The root package index could not be loaded.
+        """
+        index = self.get_index()
+        search_index = self._search_index
+
+        if search_index is None or search_index[0] is not index:
+            search_index = (index, PackageSearchIndex(list(index.bundles)))
+
+            with self._lock:
+                self._search_index = search_index
+
+        return search_index[1]
+
+    def wait_for_prefetch(self, timeout=None):
+        """Wait for a prefetch started by :py:meth:`get_index` to finish.
+
+        Args:
+            timeout (float, optional):
+                The maximum number of seconds to wait.
+
+        Returns:
+            bool:
+            ``True`` if there's no prefetch in progress, or ``False`` if it
+            didn't finish within the timeout.
+        """
+        result = self._prefetch_result
+
+        if result is None:
+            return True
+
+        result.wait(timeout)
+
+        return result.ready()
+
+    def get_index_async(self):
+        """Asynchronously return the root package index from the repository.
+
+        This is the :py:mod:`asyncio` counterpart to :py:meth:`get_index`.
+        It requires Python 3.7 or higher.
+
+        Returns:
+            coroutine:
+            A coroutine resulting in the root package index.
+        """
+        # This is imported here, since asyncio support isn't available on
+        # all supported versions of Python.
+        from rbpkg.repository.async_loaders import get_package_index
+
+        return get_package_index(self)
 
     def lookup_package_bundle(self, name):
         """Look up a package bundle by name.
@@ -55,28 +419,420 @@ class PackageRepository(object):
 
         Returns:
             PackageBundle:
-            The package bundle, if found, or ``None`` if a bundle with
-            that name doesn't exist.
+            The package bundle.
+
+        Raises:
+            rbpkg.repository.errors.PackageLookupError:
+                The package bundle could not be found or loaded.
         """
         package_bundle = self._package_bundle_cache.get(name)
 
+        if package_bundle is None:
+            self._check_missing_package_bundle(name)
+
+            package_bundle = self._single_flight.do(
+                ('bundle', name), self._load_package_bundle, name)
+
+        return package_bundle
+
+    def lookup_package_bundles(self, names, load_channels=False):
+        """Look up several package bundles by name.
+
+        Bundles that aren't cached are fetched together, through
+        :py:meth:`~rbpkg.repository.loaders.PackageDataLoader.
+        try_load_by_paths`, rather than one at a time.
+
+        If any bundle can't be found or loaded, the rest will still be
+        looked up and cached before the error is raised. The bundles that
+        were found are available through the error's
+        :py:attr:`~rbpkg.repository.errors.PackageLookupError.package_bundles`
+        attribute.
+
+        Args:
+            names (list of unicode):
+                The names of the package bundles.
+
+            load_channels (bool, optional):
+                Whether to also load the manifests for all channels of the
+                bundles. These are fetched together as well.
+
+        Returns:
+            dict:
+            A mapping of bundle names to
+            :py:class:`~rbpkg.repository.package_bundle.PackageBundle`
+            instances.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                A channel manifest could not be loaded.
+
+            rbpkg.repository.errors.PackageLookupError:
+                A package bundle could not be found or loaded.
+        """
+        package_bundles = {}
+        to_fetch = []
+        error = None
+
+        for name in names:
+            if name in package_bundles:
+                continue
+
+            package_bundle = self._package_bundle_cache.get(name)
+
+            if package_bundle is not None:
+                package_bundles[name] = package_bundle
+            elif name not in to_fetch:
+                try:
+                    self._check_missing_package_bundle(name)
+                except PackageLookupError as e:
+                    error = error or e
+                else:
+                    to_fetch.append(name)
+
+        if to_fetch:
+            paths = [
+                self._build_package_bundle_path(name)
+                for name in to_fetch
+            ]
+
+            bundles_data, load_errors = \
+                get_data_loader().try_load_by_paths(paths)
+
+            for name, path in zip(to_fetch, paths):
+                if path in load_errors:
+                    error = error or self._make_lookup_error(
+                        name, load_errors[path])
+                    continue
+
+                package_bundle = self._package_bundle_cache.peek(name)
+
+                if package_bundle is None:
+                    package_bundle = self._add_package_bundle_data(
+                        name, path, bundles_data[path])
+
+                package_bundles[name] = package_bundle
+
+        if load_channels:
+            load_package_channels([
+                channel
+                for package_bundle in six.itervalues(package_bundles)
+                for channel in package_bundle.channels
+            ])
+
+        if error is not None:
+            error.package_bundles = package_bundles
+
+            raise error
+
+        return package_bundles
+
+    def lookup_package_bundle_async(self, name):
+        """Asynchronously look up a package bundle by name.
+
+        This is the :py:mod:`asyncio` counterpart to
+        :py:meth:`lookup_package_bundle`. It requires Python 3.7 or higher.
+
+        Args:
+            name (unicode):
+                The name of the package bundle.
+
+        Returns:
+            coroutine:
+            A coroutine resulting in the package bundle.
+        """
+        # This is imported here, since asyncio support isn't available on
+        # all supported versions of Python.
+        from rbpkg.repository.async_loaders import lookup_package_bundle
+
+        return lookup_package_bundle(self, name)
+
+    def create_snapshot(self, previous=None, bundle_names=None,
+                        load_channels=False):
+        """Create a consistent, read-only snapshot of the repository.
+
+        The snapshot pins the current package index. Package bundles are
+        pinned the first time they're looked up through the snapshot, or
+        up front if listed in ``bundle_names``. Later calls to
+        :py:meth:`refresh`, :py:meth:`clear_caches`, or the invalidation
+        methods won't affect the pinned data.
+
+        See :py:mod:`rbpkg.repository.snapshots` for details.
+
+        Args:
+            previous (rbpkg.repository.snapshots.RepositorySnapshot,
+                      optional):
+                A previous snapshot of this repository. Views of bundles
+                and channels that haven't changed since will be shared
+                with it.
+
+            bundle_names (list of unicode, optional):
+                The names of package bundles to pin right away.
+
+            load_channels (bool, optional):
+                Whether to also pin the data for all channels of the bundles
+                in ``bundle_names``.
+
+        Returns:
+            rbpkg.repository.snapshots.RepositorySnapshot:
+            The new snapshot.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                A channel manifest could not be loaded.
+
+            rbpkg.repository.errors.PackageLookupError:
+                A package bundle in ``bundle_names`` could not be found or
+                loaded.
+        """
+        snapshot = RepositorySnapshot(self, self.get_index(),
+                                      previous=previous)
+
+        if bundle_names:
+            snapshot.lookup_package_bundles(bundle_names,
+                                            load_channels=load_channels)
+
+        return snapshot
+
+    def _load_index(self):
+        """Load the root package index.
+
+        This is called for one thread at a time by :py:meth:`get_index`.
+
+        Returns:
+            rbpkg.repository.package_index.PackageIndex:
+            The root package index.
+        """
+        if not self._index:
+            manifest_url = self._build_package_index_path()
+            self._set_index_data(
+                manifest_url,
+                get_data_loader().load_by_path(manifest_url))
+
+        return self._index
+
+    def _load_package_bundle(self, name):
+        """Load a package bundle and add it to the cache.
+
+        This is called for one thread at a time, per bundle name, by
+        :py:meth:`lookup_package_bundle`.
+
+        Args:
+            name (unicode):
+                The name of the package bundle.
+
+        Returns:
+            PackageBundle:
+            The package bundle.
+
+        Raises:
+            rbpkg.repository.errors.PackageLookupError:
+                The package bundle could not be loaded.
+        """
+        # Another thread may have finished loading this after our caller
+        # checked the cache.
+        package_bundle = self._package_bundle_cache.peek(name)
+
         if package_bundle is None:
             path = self._build_package_bundle_path(name)
 
             try:
                 package_bundle_data = get_data_loader().load_by_path(path)
             except LoadDataError as e:
-                raise PackageLookupError(six.text_type(e))
+                raise self._make_lookup_error(name, e)
+
+            package_bundle = self._add_package_bundle_data(
+                name, path, package_bundle_data)
 
-            package_bundle = PackageBundle.deserialize(
-                base_url=self.BASE_PATH,
-                manifest_url=path,
-                data=package_bundle_data)
+        return package_bundle
+
+    def _make_lookup_error(self, name, error):
+        """Return a lookup error for a package bundle that failed to load.
+
+        If the bundle wasn't found, this will be remembered, so that later
+        lookups can fail without asking the repository again.
+
+        Args:
+            name (unicode):
+                The name of the package bundle.
+
+            error (rbpkg.repository.errors.LoadDataError):
+                The error raised when loading the bundle.
 
-            self._package_bundle_cache[name] = package_bundle
+        Returns:
+            rbpkg.repository.errors.PackageLookupError:
+            The error to raise.
+        """
+        message = six.text_type(error)
+
+        if isinstance(error, PathNotFoundError):
+            self._missing_bundles.add(name, message)
+
+        return PackageLookupError(message)
+
+    def _check_missing_package_bundle(self, name):
+        """Check whether a package bundle was recently found to be missing.
+
+        Args:
+            name (unicode):
+                The name of the package bundle.
+
+        Raises:
+            rbpkg.repository.errors.PackageLookupError:
+                The package bundle was recently found to be missing.
+        """
+        message = self._missing_bundles.get(name)
+
+        if message is not None:
+            raise PackageLookupError(message)
+
+    def _start_prefetch(self, index):
+        """Start prefetching the bundles in an index.
+
+        Args:
+            index (rbpkg.repository.package_index.PackageIndex):
+                The index to prefetch bundles for.
+        """
+        with self._lock:
+            if self._prefetch_index is index or not index.bundles:
+                return
+
+            self._prefetch_index = index
+
+        names = [
+            package_bundle.name
+            for package_bundle in index.bundles
+        ]
+        pool = ThreadPool(min(self.PREFETCH_WORKERS, len(names)))
+
+        try:
+            self._prefetch_result = pool.map_async(
+                self._prefetch_package_bundle, names)
+        finally:
+            # The workers will exit once the prefetch has finished.
+            pool.close()
+
+    def _prefetch_package_bundle(self, name):
+        """Prefetch a bundle, along with its visible channels.
+
+        This is run in a prefetch worker thread. The bundle is only stored
+        in the bundle cache. Its channels are loaded one at a time by this
+        worker, so that the number of concurrent loads stays bounded by
+        :py:attr:`PREFETCH_WORKERS`. Errors are logged and otherwise
+        ignored, so that the bundle or channel can be loaded (and the error
+        raised) on demand.
+
+        Args:
+            name (unicode):
+                The name of the package bundle.
+        """
+        try:
+            package_bundle = self.lookup_package_bundle(name)
+        except Exception as e:
+            logger.debug('Unable to prefetch package bundle %s: %s',
+                         name, e)
+            return
+
+        for channel in package_bundle.channels:
+            if not channel.visible:
+                continue
+
+            try:
+                load_package_channels([channel])
+            except Exception as e:
+                logger.debug('Unable to prefetch channel %s for package '
+                             'bundle %s: %s',
+                             channel.name, name, e)
+
+    def _set_index_data(self, manifest_url, index_data):
+        """Set the root package index from loaded data.
+
+        Args:
+            manifest_url (unicode):
+                The path to the index's manifest file.
+
+            index_data (dict):
+                The parsed data from the manifest file.
+        """
+        self._set_index(PackageIndex.deserialize(manifest_url, index_data))
+
+    def _set_index(self, index):
+        """Set the root package index.
+
+        Args:
+            index (rbpkg.repository.package_index.PackageIndex):
+                The root package index.
+        """
+        with self._lock:
+            self._index = index
+
+    def _add_package_bundle_data(self, name, path, package_bundle_data):
+        """Deserialize a package bundle and add it to the cache.
+
+        Args:
+            name (unicode):
+                The name of the package bundle.
+
+            path (unicode):
+                The path to the bundle's manifest file.
+
+            package_bundle_data (dict):
+                The parsed data from the manifest file.
+
+        Returns:
+            PackageBundle:
+            The resulting package bundle.
+        """
+        package_bundle = PackageBundle.deserialize(
+            base_url=self.BASE_PATH,
+            manifest_url=path,
+            data=package_bundle_data)
+        self._add_package_bundle(name, package_bundle)
 
         return package_bundle
 
+    def _add_package_bundle(self, name, package_bundle):
+        """Add a package bundle to the cache.
+
+        Args:
+            name (unicode):
+                The name of the package bundle.
+
+            package_bundle (rbpkg.repository.package_bundle.PackageBundle):
+                The package bundle.
+        """
+        package_bundle._data_loaded_callback = \
+            self._on_package_bundle_data_loaded
+        self._package_bundle_cache.set(name, package_bundle)
+        self._missing_bundles.discard(name)
+
+    def _on_package_bundle_data_loaded(self, package_bundle):
+        """Handle data being loaded into a cached package bundle.
+
+        This updates the cached size of the bundle. Channels loaded together
+        (through :py:func:`~rbpkg.repository.package_channel.
+        load_package_channels`) notify their bundle once for the batch.
+
+        Args:
+            package_bundle (rbpkg.repository.package_bundle.PackageBundle):
+                The package bundle that loaded data.
+        """
+        self._package_bundle_cache.update_size(package_bundle.name)
+
+    def _on_package_bundle_evicted(self, name, package_bundle):
+        """Handle a package bundle being evicted from the cache.
+
+        This unloads the bundle's channels, so that their data can be freed.
+
+        Args:
+            name (unicode):
+                The name of the package bundle.
+
+            package_bundle (rbpkg.repository.package_bundle.PackageBundle):
+                The evicted package bundle.
+        """
+        package_bundle._data_loaded_callback = None
+        package_bundle.unload_channels()
+
     def _build_package_bundle_path(self, name):
         """Build the path to the named package bundle.
 
@@ -110,6 +866,48 @@ def get_repository():
     global _repository
 
     if not _repository:
-        _repository = PackageRepository()
+        _repository = PackageRepository(bundle_cache=create_bundle_cache())
 
     return _repository
+
+
+def create_bundle_cache():
+    """Create a cache for package bundles, based on the environment.
+
+    The cache's memory budget (in bytes) can be set through
+    ``$RBPKG_BUNDLE_CACHE_SIZE``, with ``0`` meaning unbounded. The eviction
+    policy (``lru`` or ``lfu``) can be set through
+    ``$RBPKG_BUNDLE_CACHE_POLICY``.
+
+    Returns:
+        rbpkg.utils.caches.ObjectCache:
+        The new cache.
+
+    Raises:
+        rbpkg.repository.errors.ConfigurationError:
+            The environment specifies an invalid size or policy.
+    """
+    size = os.environ.get('RBPKG_BUNDLE_CACHE_SIZE')
+    policy = os.environ.get('RBPKG_BUNDLE_CACHE_POLICY', 'lru')
+
+    if size is None:
+        max_size = DEFAULT_BUNDLE_CACHE_SIZE
+    else:
+        try:
+            max_size = int(size) or None
+        except ValueError:
+            max_size = -1
+
+        if max_size is not None and max_size < 0:
+            raise ConfigurationError(
+                '$RBPKG_BUNDLE_CACHE_SIZE must be a number of bytes, not "%s"'
+                % size)
+
+    try:
+        cache_cls = OBJECT_CACHE_POLICIES[policy]
+    except KeyError:
+        raise ConfigurationError(
+            '$RBPKG_BUNDLE_CACHE_POLICY must be one of %s, not "%s"'
+            % (', '.join(sorted(OBJECT_CACHE_POLICIES)), policy))
+
+    return cache_cls(max_size=max_size)
@@ -0,0 +1,433 @@
+"""In-memory search over package bundle names and native package names.
+
+A :py:class:`PackageSearchIndex` is built from a list of package bundles
+(normally the entries of the root
+:py:class:`~rbpkg.repository.package_index.PackageIndex`). It indexes each
+bundle's name along with the native names of its packages (the ``name`` of
+each entry in
+:py:attr:`~rbpkg.repository.package_bundle.PackageBundle.package_names`,
+such as a Debian, RPM, or Python package name), and supports:
+
+* Exact lookups, through :py:meth:`PackageSearchIndex.lookup`.
+* Prefix searches, through :py:meth:`PackageSearchIndex.search_prefix`. The
+  names are kept in a sorted array, so this is a binary search followed by
+  a scan of the matches.
+* Fuzzy searches, through :py:meth:`PackageSearchIndex.search_fuzzy`. Names
+  are broken into trigrams, with posting lists of the names containing each
+  trigram. Candidates are scored by the similarity of their trigrams to
+  the query's.
+
+All matching is case-insensitive.
+"""
+
+from __future__ import unicode_literals
+
+import bisect
+import math
+import threading
+from collections import Counter, defaultdict
+
+import six
+
+
+#: The default minimum similarity for fuzzy search results.
+DEFAULT_MIN_SIMILARITY = 0.3
+
+
+def get_trigrams(term):
+    """Return the set of trigrams for a term.
+
+    The term is padded, so that the start and end of the term (and terms
+    shorter than 3 characters) produce trigrams as well.
+
+    Args:
+        term (unicode):
+            The lowercase term.
+
+    Returns:
+        set of unicode:
+        The trigrams.
+    """
+    padded = '  %s ' % term
+
+    return set(
+        padded[i:i + 3]
+        for i in range(len(padded) - 2)
+    )
+
+
+class PackageSearchResult(object):
+    """A package bundle matching a search.
+
+    Attributes:
+        bundle_name (unicode):
+            The name of the matching package bundle.
+
+        matched_name (unicode):
+            The name that matched the search. This is either the bundle name
+            or one of its native package names.
+
+        package_type (unicode):
+            The type of the native package that matched, or ``None`` if the
+            bundle name matched.
+
+        score (float):
+            How well the name matched, from 0 to 1. An exact match is 1.
+    """
+
+    def __init__(self, bundle_name, matched_name, package_type, score):
+        """Initialize the result.
+
+        Args:
+            bundle_name (unicode):
+                The name of the matching package bundle.
+
+            matched_name (unicode):
+                The name that matched the search.
+
+            package_type (unicode):
+                The type of the native package that matched, if any.
+
+            score (float):
+                How well the name matched, from 0 to 1.
+        """
+        self.bundle_name = bundle_name
+        self.matched_name = matched_name
+        self.package_type = package_type
+        self.score = score
+
+    def __repr__(self):
+        return (
+            '<PackageSearchResult(%s; matched_name=%s; package_type=%s; '
+            'score=%.2f)>'
+            % (self.bundle_name, self.matched_name, self.package_type,
+               self.score)
+        )
+
+
+class PackageSearchIndex(object):
+    """A search index over package bundle names and native package names.
+
+    See the module documentation for details. The index is immutable once
+    built, and is safe to share between threads. The trigram posting lists
+    used for fuzzy searches are only built on the first fuzzy search.
+    """
+
+    def __init__(self, bundles):
+        """Build the search index.
+
+        Args:
+            bundles (list of rbpkg.repository.package_bundle.PackageBundle):
+                The package bundles to index. Only their names and
+                ``package_names`` are used, so unloaded bundles (such as
+                entries in the package index) are fine.
+        """
+        term_ids = {}
+
+        # For each term, the list of (bundle name, name, package type)
+        # entries it came from.
+        self._term_entries = []
+
+        for bundle in bundles:
+            names = [(bundle.name, None)]
+            names += [
+                # Manifests store the package type as "type", though it's
+                # documented as "package_type".
+                (info['name'], info.get('package_type') or info.get('type'))
+                for info in bundle.package_names or []
+                if isinstance(info, dict) and info.get('name')
+            ]
+
+            for name, package_type in names:
+                term = name.lower()
+                term_id = term_ids.get(term)
+
+                if term_id is None:
+                    term_id = len(self._term_entries)
+                    term_ids[term] = term_id
+                    self._term_entries.append([])
+
+                entry = (bundle.name, name, package_type)
+
+                if entry not in self._term_entries[term_id]:
+                    self._term_entries[term_id].append(entry)
+
+        self._term_ids = term_ids
+
+        # The sorted array of terms, for prefix searches.
+        self._sorted_terms = sorted(term_ids)
+
+        # Trigram posting lists, for fuzzy searches. These are built on
+        # first use.
+        self._postings = None
+        self._trigram_counts = None
+        self._posting_sets = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Return the number of indexed names.
+
+        Returns:
+            int:
+            The number of distinct indexed names.
+        """
+        return len(self._term_entries)
+
+    def lookup(self, name):
+        """Return the package bundles with a bundle or native package name.
+
+        Args:
+            name (unicode):
+                The name to look up.
+
+        Returns:
+            list of PackageSearchResult:
+            The matching package bundles.
+        """
+        term_id = self._term_ids.get(name.strip().lower())
+
+        if term_id is None:
+            return []
+
+        return self._build_results([(term_id, 1.0)])
+
+    def search_prefix(self, prefix, limit=None):
+        """Return the package bundles with a name starting with a prefix.
+
+        Results are ordered by how much of the name the prefix covers, so
+        an exact match comes first.
+
+        Args:
+            prefix (unicode):
+                The prefix to search for.
+
+            limit (int, optional):
+                The maximum number of results to return.
+
+        Returns:
+            list of PackageSearchResult:
+            The matching package bundles.
+        """
+        prefix = prefix.strip().lower()
+
+        if not prefix:
+            return []
+
+        sorted_terms = self._sorted_terms
+        i = bisect.bisect_left(sorted_terms, prefix)
+        matches = []
+
+        while i < len(sorted_terms) and sorted_terms[i].startswith(prefix):
+            term = sorted_terms[i]
+            matches.append((self._term_ids[term],
+                            float(len(prefix)) / len(term)))
+            i += 1
+
+        return self._build_results(matches, limit)
+
+    def search_fuzzy(self, query, limit=None,
+                     min_similarity=DEFAULT_MIN_SIMILARITY):
+        """Return the package bundles with a name similar to the query.
+
+        Similarity is the Jaccard similarity of the trigrams of the query
+        and of the name. This tolerates typos, and matches on substrings of
+        longer names.
+
+        Args:
+            query (unicode):
+                The name to search for.
+
+            limit (int, optional):
+                The maximum number of results to return.
+
+            min_similarity (float, optional):
+                The minimum similarity, from 0 to 1, for a name to match.
+
+        Returns:
+            list of PackageSearchResult:
+            The matching package bundles, most similar first.
+        """
+        query = query.strip().lower()
+
+        if not query:
+            return []
+
+        postings, trigram_counts = self._get_postings()
+        trigrams = sorted(
+            get_trigrams(query),
+            key=lambda trigram: len(postings.get(trigram, ())))
+        num_trigrams = len(trigrams)
+
+        # The similarity can't be higher than the fraction of the query's
+        # trigrams that a name shares, so a matching name must share at
+        # least min_shared of them. It must then contain at least one of
+        # the rarest (num_trigrams - min_shared + 1) trigrams. Only names
+        # in those posting lists are counted, and the longer posting lists
+        # are only checked for those names.
+        min_shared = max(
+            int(math.ceil(min_similarity * num_trigrams - 1e-9)),
+            1)
+        num_rare = num_trigrams - min_shared + 1
+        counts = Counter()
+
+        for trigram in trigrams[:num_rare]:
+            counts.update(postings.get(trigram, ()))
+
+        for trigram in trigrams[num_rare:]:
+            for term_id in self._get_posting_set(trigram).intersection(
+                    counts):
+                counts[term_id] += 1
+
+        matches = []
+
+        for term_id, shared in six.iteritems(counts):
+            similarity = (
+                float(shared) /
+                (num_trigrams + trigram_counts[term_id] - shared))
+
+            if similarity >= min_similarity:
+                matches.append((term_id, similarity))
+
+        return self._build_results(matches, limit)
+
+    def search(self, query, limit=None,
+               min_similarity=DEFAULT_MIN_SIMILARITY):
+        """Search for package bundles by name.
+
+        Prefix matches (including exact matches) come first, followed by
+        fuzzy matches for any other bundles.
+
+        Args:
+            query (unicode):
+                The name or partial name to search for.
+
+            limit (int, optional):
+                The maximum number of results to return.
+
+            min_similarity (float, optional):
+                The minimum similarity, from 0 to 1, for a fuzzy match.
+
+        Returns:
+            list of PackageSearchResult:
+            The matching package bundles.
+        """
+        results = self.search_prefix(query, limit)
+
+        if limit is None or len(results) < limit:
+            found = set(
+                result.bundle_name
+                for result in results
+            )
+
+            if limit is None:
+                fuzzy_limit = None
+            else:
+                # Some of the fuzzy matches may already be listed.
+                fuzzy_limit = limit + len(results)
+
+            results += [
+                result
+                for result in self.search_fuzzy(query,
+                                                limit=fuzzy_limit,
+                                                min_similarity=min_similarity)
+                if result.bundle_name not in found
+            ]
+
+        if limit is not None:
+            results = results[:limit]
+
+        return results
+
+    def _get_postings(self):
+        """Return the trigram posting lists, building them if needed.
+
+        Returns:
+            tuple:
+            A 2-tuple of a mapping of trigrams to lists of term IDs, and a
+            list of the number of trigrams in each term.
+        """
+        if self._postings is None:
+            with self._lock:
+                if self._postings is None:
+                    postings = defaultdict(list)
+                    trigram_counts = [0] * len(self._term_entries)
+
+                    for term, term_id in six.iteritems(self._term_ids):
+                        trigrams = get_trigrams(term)
+                        trigram_counts[term_id] = len(trigrams)
+
+                        for trigram in trigrams:
+                            postings[trigram].append(term_id)
+
+                    self._trigram_counts = trigram_counts
+                    self._postings = dict(postings)
+
+        return self._postings, self._trigram_counts
+
+    def _get_posting_set(self, trigram):
+        """Return the posting list for a trigram as a set.
+
+        Sets are only built for the posting lists that need them, and are
+        kept for later searches.
+
+        Args:
+            trigram (unicode):
+                The trigram.
+
+        Returns:
+            frozenset of int:
+            The IDs of the terms containing the trigram.
+        """
+        term_ids = self._posting_sets.get(trigram)
+
+        if term_ids is None:
+            term_ids = frozenset(self._postings.get(trigram, ()))
+            self._posting_sets[trigram] = term_ids
+
+        return term_ids
+
+    def _build_results(self, matches, limit=None):
+        """Build results for matching terms.
+
+        Each bundle is only included once, for its best-scoring name.
+
+        Args:
+            matches (list of tuple):
+                A list of (term ID, score) tuples.
+
+            limit (int, optional):
+                The maximum number of results to return.
+
+        Returns:
+            list of PackageSearchResult:
+            The results, ordered by score and then by bundle name.
+        """
+        results = []
+        seen = set()
+
+        # Going from the highest score down, the first name seen for a
+        # bundle is its best. Once there are enough results, the rest only
+        # need to be considered if they tie with the lowest score so far.
+        for term_id, score in sorted(matches, key=lambda match: -match[1]):
+            if (limit is not None and
+                len(results) >= limit and
+                score < results[-1].score):
+                break
+
+            for bundle_name, name, package_type in \
+                    self._term_entries[term_id]:
+                if bundle_name not in seen:
+                    seen.add(bundle_name)
+                    results.append(PackageSearchResult(
+                        bundle_name=bundle_name,
+                        matched_name=name,
+                        package_type=package_type,
+                        score=score))
+
+        results.sort(
+            key=lambda result: (-result.score, result.bundle_name.lower()))
+
+        if limit is not None:
+            results = results[:limit]
+
+        return results
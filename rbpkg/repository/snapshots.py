@@ -0,0 +1,651 @@
+"""Consistent, read-only snapshots of a package repository.
+
+A :py:class:`RepositorySnapshot` pins the package index, and each package
+bundle and channel the first time it's accessed through the snapshot. From
+then on, the snapshot will always return the same data for them, even if
+the repository's caches are cleared or refreshed. This lets a long-running
+operation (such as resolving the dependencies of a
+:py:class:`~rbpkg.package_manager.pending_install.PendingInstall`) work on
+consistent data while the repository moves on.
+
+When the snapshot is created, it records the version (the
+``last_updated_timestamp``) of each package bundle listed in the index or
+cached by the repository, and pinned bundles record the versions of their
+channels. If data loaded later for the snapshot doesn't match the recorded
+version, because the repository changed in the meantime,
+:py:class:`~rbpkg.repository.errors.SnapshotChangedError` is raised rather
+than mixing old and new data. A new snapshot should then be created.
+
+Bundles, channels, releases, and package rules are returned as read-only
+views. Views hold on to the lists loaded for the underlying objects, which
+are never modified once loaded, so reading from a snapshot doesn't require
+any locking.
+
+Snapshots are cheap to create. A snapshot created with a previous snapshot
+will share that snapshot's views for any bundles and channels that haven't
+been reloaded since.
+"""
+
+from __future__ import unicode_literals
+
+import threading
+
+import six
+
+from rbpkg.repository.errors import PackageLookupError, SnapshotChangedError
+from rbpkg.utils.matches import matches_version_range
+
+
+class _ReadOnlyView(object):
+    """Base class for a read-only view of a repository object.
+
+    Attributes not provided by the view are read from the underlying
+    object. No attributes can be set.
+    """
+
+    def __init__(self, source):
+        """Initialize the view.
+
+        Args:
+            source (object):
+                The underlying object.
+        """
+        object.__setattr__(self, '_source', source)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        return getattr(self._source, name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('%s is read-only' % type(self).__name__)
+
+    def __delattr__(self, name):
+        raise AttributeError('%s is read-only' % type(self).__name__)
+
+    def __repr__(self):
+        return '<%s(%r)>' % (type(self).__name__, self._source)
+
+
+class PackageReleaseView(_ReadOnlyView):
+    """A read-only view of a package release in a snapshot.
+
+    Attributes:
+        channel (PackageChannelView):
+            The view of the channel containing the release.
+    """
+
+    def __init__(self, release, channel):
+        """Initialize the view.
+
+        Args:
+            release (rbpkg.repository.package_release.PackageRelease):
+                The release.
+
+            channel (PackageChannelView):
+                The view of the channel containing the release.
+        """
+        super(PackageReleaseView, self).__init__(release)
+
+        object.__setattr__(self, 'channel', channel)
+
+
+class PackageRulesView(_ReadOnlyView):
+    """A read-only view of package rules in a snapshot.
+
+    Attributes:
+        channel (PackageChannelView):
+            The view of the channel containing the rules.
+    """
+
+    def __init__(self, rules, channel):
+        """Initialize the view.
+
+        Args:
+            rules (rbpkg.repository.package_rules.PackageRules):
+                The package rules.
+
+            channel (PackageChannelView):
+                The view of the channel containing the rules.
+        """
+        super(PackageRulesView, self).__init__(rules)
+
+        object.__setattr__(self, 'channel', channel)
+
+
+class PackageChannelView(_ReadOnlyView):
+    """A read-only view of a package channel in a snapshot.
+
+    The channel's details are copied when the view is created. Its
+    releases and package rules are pinned the first time either is
+    accessed, loading the channel's manifest if needed. If the loaded
+    manifest has a different ``last_updated_timestamp`` than the one copied
+    from the bundle, the channel has changed since, and
+    :py:class:`~rbpkg.repository.errors.SnapshotChangedError` is raised.
+
+    Views of unchanged channels are shared between snapshots, so
+    :py:attr:`bundle` may be the view of the same bundle from an earlier
+    snapshot.
+
+    Attributes:
+        bundle (PackageBundleView):
+            The view of the bundle containing the channel.
+    """
+
+    #: Details copied from the channel when the view is created.
+    PINNED_ATTRS = ('name', 'manifest_url', 'absolute_manifest_url',
+                    'created_timestamp', 'last_updated_timestamp',
+                    'latest_version', 'channel_type', 'current', 'visible')
+
+    def __init__(self, channel, bundle):
+        """Initialize the view.
+
+        Args:
+            channel (rbpkg.repository.package_channel.PackageChannel):
+                The channel.
+
+            bundle (PackageBundleView):
+                The view of the bundle containing the channel.
+        """
+        super(PackageChannelView, self).__init__(channel)
+
+        object.__setattr__(self, 'bundle', bundle)
+
+        for attr in self.PINNED_ATTRS:
+            object.__setattr__(self, attr, getattr(channel, attr))
+
+        object.__setattr__(self, '_lock', threading.Lock())
+        object.__setattr__(self, '_source_releases', None)
+        object.__setattr__(self, '_releases', None)
+        object.__setattr__(self, '_package_rules', None)
+
+        if channel._loaded:
+            self._pin_data()
+
+    @property
+    def releases(self):
+        """The releases in the channel, as a tuple of views."""
+        if self._releases is None:
+            self._pin_data()
+
+        return self._releases
+
+    @property
+    def package_rules(self):
+        """The package rules in the channel, as a tuple of views."""
+        if self._package_rules is None:
+            self._pin_data()
+
+        return self._package_rules
+
+    @property
+    def latest_release(self):
+        """The latest release in the channel, or ``None``."""
+        releases = self.releases
+
+        if releases:
+            return releases[0]
+
+        return None
+
+    def iter_releases(self):
+        """Iterate through the releases in the channel.
+
+        Yields:
+            PackageReleaseView:
+            Each release in the channel, newest first.
+        """
+        return iter(self.releases)
+
+    def get_all_rules_for_version(self, version, require_current_system=True):
+        """Return lists of rules for the given version.
+
+        Args:
+            version (unicode):
+                The version to restrict rules to.
+
+            require_current_system (bool):
+                If set, only rules valid for the current system will be
+                returned.
+
+        Returns:
+            list of PackageRulesView:
+            The rules for the given version.
+        """
+        return [
+            rules
+            for rules in self.package_rules
+            if rules.matches_version(version, require_current_system)
+        ]
+
+    def _pin_data(self):
+        """Pin the releases and package rules of the channel.
+
+        This loads the channel's manifest (including any continuation
+        pages) if needed. Only one thread will pin the data.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                The manifest could not be loaded.
+
+            rbpkg.repository.errors.SnapshotChangedError:
+                The loaded manifest is from a different version of the
+                channel.
+        """
+        with self._lock:
+            if self._releases is not None:
+                return
+
+            channel = self._source
+            channel._ensure_loaded()
+
+            with channel._release_stream_lock:
+                releases = channel._releases
+                package_rules = channel._package_rules
+                has_more_pages = bool(channel._next_page_url)
+                last_updated_timestamp = channel.last_updated_timestamp
+
+            if last_updated_timestamp != self.last_updated_timestamp:
+                raise SnapshotChangedError(
+                    'The channel "%s" has changed since the snapshot was '
+                    'created.'
+                    % self.absolute_manifest_url)
+
+            source_releases = releases
+
+            if has_more_pages:
+                releases = list(channel.iter_releases())
+
+            object.__setattr__(self, '_source_releases', source_releases)
+            object.__setattr__(self, '_package_rules', tuple(
+                PackageRulesView(rules, self)
+                for rules in package_rules
+            ))
+            object.__setattr__(self, '_releases', tuple(
+                PackageReleaseView(release, self)
+                for release in releases
+            ))
+
+    def _is_current_for(self, channel):
+        """Return whether this view is up to date with a channel.
+
+        Args:
+            channel (rbpkg.repository.package_channel.PackageChannel):
+                The channel to compare against.
+
+        Returns:
+            bool:
+            ``True`` if the view can be shared for the channel.
+        """
+        return (
+            channel is self._source and
+            all(getattr(channel, attr) == getattr(self, attr)
+                for attr in self.PINNED_ATTRS) and
+            (self._source_releases is None or
+             (channel._loaded and
+              channel._releases is self._source_releases))
+        )
+
+
+class PackageBundleView(_ReadOnlyView):
+    """A read-only view of a package bundle in a snapshot.
+
+    Attributes:
+        channels (tuple of PackageChannelView):
+            Views of the channels in the bundle.
+    """
+
+    #: Details copied from the bundle when the view is created.
+    PINNED_ATTRS = ('name', 'manifest_url', 'absolute_manifest_url',
+                    'created_timestamp', 'last_updated_timestamp',
+                    'current_version', 'package_names', 'description',
+                    'channel_aliases')
+
+    def __init__(self, bundle, previous=None):
+        """Initialize the view.
+
+        Args:
+            bundle (rbpkg.repository.package_bundle.PackageBundle):
+                The bundle. Its manifest will be loaded if needed.
+
+            previous (PackageBundleView, optional):
+                A view of the bundle from a previous snapshot. Views of
+                channels that haven't changed will be shared with it.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                The manifest could not be loaded.
+        """
+        super(PackageBundleView, self).__init__(bundle)
+
+        bundle._ensure_loaded()
+
+        for attr in self.PINNED_ATTRS:
+            object.__setattr__(self, attr, getattr(bundle, attr))
+
+        if previous is None:
+            old_channels = {}
+        else:
+            old_channels = dict(
+                (channel_view._source, channel_view)
+                for channel_view in previous.channels
+            )
+
+        channels = []
+
+        for channel in bundle._channels:
+            channel_view = old_channels.get(channel)
+
+            if channel_view is None or not channel_view._is_current_for(
+                    channel):
+                channel_view = PackageChannelView(channel, self)
+
+            channels.append(channel_view)
+
+        object.__setattr__(self, 'channels', tuple(channels))
+        object.__setattr__(self, '_source_channels', bundle._channels)
+
+    @property
+    def current_channel(self):
+        """The view of the current channel in the bundle, or ``None``."""
+        for channel in self.channels:
+            if channel.current:
+                return channel
+
+        return None
+
+    def get_latest_release_for_version_range(self, version_range,
+                                             channel_types=None,
+                                             release_types=None):
+        """Return the latest release that satisfies the given version range.
+
+        All visible channels will be searched in order from newest to oldest.
+
+        Args:
+            version_range (unicode):
+                The version or version range to limit releases to.
+
+            channel_types (list, optional):
+                The optional list of channel types to limit channels to.
+
+            release_types (list, optional):
+                The optional list of release types to limit releases to.
+
+        Returns:
+            PackageReleaseView:
+            The release matching the given criteria, if found. ``None`` will
+            be returned if no release matches.
+        """
+        version_range = self.name + version_range
+
+        for channel in self.channels:
+            if (not channel.visible or
+                (channel_types and channel.channel_type not in channel_types)):
+                continue
+
+            for release in channel.releases:
+                if ((not release_types or
+                     release.release_type in release_types) and
+                    matches_version_range(release.version, version_range)):
+                    return release
+
+        return None
+
+    def load_channels(self, channels=None):
+        """Pin the data for several channels at once.
+
+        Any channels that haven't been loaded are loaded together first.
+
+        Args:
+            channels (list of PackageChannelView, optional):
+                The channels to load. This defaults to all channels in the
+                bundle.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                A channel manifest could not be loaded.
+        """
+        if channels is None:
+            channels = self.channels
+
+        self._source.load_channels([
+            channel._source
+            for channel in channels
+        ])
+
+        for channel in channels:
+            channel.releases
+
+    def _is_current_for(self, bundle):
+        """Return whether this view is up to date with a bundle.
+
+        Args:
+            bundle (rbpkg.repository.package_bundle.PackageBundle):
+                The bundle to compare against.
+
+        Returns:
+            bool:
+            ``True`` if the view can be shared for the bundle.
+        """
+        return (bundle is self._source and
+                bundle._loaded and
+                bundle._channels is self._source_channels and
+                all(channel_view._is_current_for(channel)
+                    for channel_view, channel in zip(self.channels,
+                                                     bundle._channels)))
+
+
+class RepositorySnapshot(object):
+    """A consistent, read-only snapshot of a package repository.
+
+    This provides the same lookup methods as
+    :py:class:`~rbpkg.repository.package_repo.PackageRepository`, returning
+    read-only views. See the module documentation for details.
+
+    Snapshots are safe to share between threads.
+
+    Attributes:
+        index (rbpkg.repository.package_index.PackageIndex):
+            The pinned root package index.
+
+        repository (rbpkg.repository.package_repo.PackageRepository):
+            The repository the snapshot was taken from.
+    """
+
+    def __init__(self, repository, index, previous=None):
+        """Initialize the snapshot.
+
+        Callers should use :py:meth:`PackageRepository.create_snapshot()
+        <rbpkg.repository.package_repo.PackageRepository.create_snapshot>`
+        instead.
+
+        Args:
+            repository (rbpkg.repository.package_repo.PackageRepository):
+                The repository the snapshot is taken from.
+
+            index (rbpkg.repository.package_index.PackageIndex):
+                The root package index to pin.
+
+            previous (RepositorySnapshot, optional):
+                A previous snapshot to share unchanged views with.
+        """
+        self.repository = repository
+        self.index = index
+
+        # Record the versions of the bundles known right now, so that
+        # bundles pinned later can be checked against them.
+        bundle_versions = {}
+
+        for name in repository._package_bundle_cache.keys():
+            package_bundle = repository._package_bundle_cache.peek(name)
+
+            if package_bundle is not None and package_bundle._loaded:
+                bundle_versions[name] = package_bundle.last_updated_timestamp
+
+        for package_bundle in index.bundles:
+            bundle_versions[package_bundle.name] = \
+                package_bundle.last_updated_timestamp
+
+        self._bundle_versions = bundle_versions
+        self._previous = previous
+        self._bundles = {}
+        self._lock = threading.Lock()
+
+    def get_index(self):
+        """Return the pinned root package index.
+
+        Returns:
+            rbpkg.repository.package_index.PackageIndex:
+            The root package index.
+        """
+        return self.index
+
+    def lookup_package_bundle(self, name):
+        """Look up a package bundle by name.
+
+        The bundle is pinned the first time it's looked up. It must match
+        the version recorded when the snapshot was created, if any.
+
+        Args:
+            name (unicode):
+                The name of the package bundle.
+
+        Returns:
+            PackageBundleView:
+            The view of the package bundle.
+
+        Raises:
+            rbpkg.repository.errors.PackageLookupError:
+                The package bundle could not be found or loaded.
+
+            rbpkg.repository.errors.SnapshotChangedError:
+                The package bundle has changed since the snapshot was
+                created.
+        """
+        bundle_view = self._bundles.get(name)
+
+        if bundle_view is None:
+            bundle_view = self._pin_bundle(
+                name, self.repository.lookup_package_bundle(name))
+
+        return bundle_view
+
+    def lookup_package_bundles(self, names, load_channels=False):
+        """Look up several package bundles by name.
+
+        Bundles that haven't yet been pinned are looked up together. See
+        :py:meth:`PackageRepository.lookup_package_bundles()
+        <rbpkg.repository.package_repo.PackageRepository.
+        lookup_package_bundles>`.
+
+        Args:
+            names (list of unicode):
+                The names of the package bundles.
+
+            load_channels (bool, optional):
+                Whether to also pin the data for all channels of the
+                bundles.
+
+        Returns:
+            dict:
+            A mapping of bundle names to :py:class:`PackageBundleView`
+            instances.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                A channel manifest could not be loaded.
+
+            rbpkg.repository.errors.PackageLookupError:
+                A package bundle could not be found or loaded.
+
+            rbpkg.repository.errors.SnapshotChangedError:
+                A package bundle or channel has changed since the snapshot
+                was created.
+        """
+        bundle_views = {}
+        to_lookup = []
+
+        for name in names:
+            bundle_view = self._bundles.get(name)
+
+            if bundle_view is None:
+                to_lookup.append(name)
+            else:
+                bundle_views[name] = bundle_view
+
+        error = None
+
+        if to_lookup:
+            try:
+                bundles = self.repository.lookup_package_bundles(
+                    to_lookup, load_channels=load_channels)
+            except PackageLookupError as e:
+                # The bundles that were found can still be pinned.
+                error = e
+                bundles = e.package_bundles or {}
+
+            for name, bundle in six.iteritems(bundles):
+                bundle_views[name] = self._pin_bundle(name, bundle)
+
+        if load_channels:
+            for bundle_view in six.itervalues(bundle_views):
+                for channel in bundle_view.channels:
+                    channel.releases
+
+        if error is not None:
+            raise error
+
+        return bundle_views
+
+    def _pin_bundle(self, name, bundle):
+        """Pin a package bundle in the snapshot.
+
+        If another thread pinned the bundle first, its view is used.
+
+        Args:
+            name (unicode):
+                The name of the package bundle.
+
+            bundle (rbpkg.repository.package_bundle.PackageBundle):
+                The package bundle.
+
+        Returns:
+            PackageBundleView:
+            The view of the package bundle.
+
+        Raises:
+            rbpkg.repository.errors.PackageLookupError:
+                The bundle's manifest could not be loaded.
+
+            rbpkg.repository.errors.SnapshotChangedError:
+                The bundle has changed since the snapshot was created.
+        """
+        previous_view = None
+
+        if self._previous is not None:
+            previous_view = self._previous._bundles.get(name)
+
+            if (previous_view is not None and
+                previous_view._is_current_for(bundle)):
+                bundle_view = previous_view
+                previous_view = None
+            else:
+                bundle_view = None
+        else:
+            bundle_view = None
+
+        if bundle_view is None:
+            bundle_view = PackageBundleView(bundle, previous=previous_view)
+
+        version = self._bundle_versions.get(name)
+
+        if (version is not None and
+            bundle_view.last_updated_timestamp != version):
+            raise SnapshotChangedError(
+                'The package bundle "%s" has changed since the snapshot was '
+                'created.'
+                % name)
+
+        with self._lock:
+            return self._bundles.setdefault(name, bundle_view)
@@ -0,0 +1,858 @@
+"""A local SQLite mirror of a package repository.
+
+The mirror stores the package index, bundles, channels, releases, and
+package rules in normalized tables, with indexes on bundle names, versions,
+and systems. Lookups can then be answered with indexed queries, rather than
+by loading and parsing whole manifest files.
+
+The mirror is populated from any
+:py:class:`~rbpkg.repository.loaders.PackageDataLoader` (such as one reading
+the JSON manifests in a repository tree) by
+:py:meth:`SqliteRepositoryMirror.sync`, and served back through
+:py:class:`SqlitePackageDataLoader`.
+
+Only the bundles listed in the package index are mirrored. Anything else
+(such as a dependency on a bundle that isn't in the index) is loaded through
+the :py:class:`SqlitePackageDataLoader`'s fallback loader, if it has one.
+"""
+
+from __future__ import unicode_literals
+
+import json
+import logging
+import sqlite3
+import threading
+
+import pkg_resources
+from six.moves.urllib.parse import urljoin
+
+from rbpkg.repository.errors import LoadDataError, PathNotFoundError
+from rbpkg.repository.loaders import PackageDataLoader
+from rbpkg.repository.manifests import load_all_pages
+
+
+logger = logging.getLogger(__name__)
+
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS repository_index (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    manifest_path TEXT NOT NULL,
+    format_version TEXT,
+    last_updated_timestamp TEXT
+);
+
+CREATE TABLE IF NOT EXISTS bundles (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    manifest_path TEXT NOT NULL UNIQUE,
+    index_position INTEGER,
+    index_manifest_file TEXT,
+    format_version TEXT,
+    created_timestamp TEXT,
+    last_updated_timestamp TEXT,
+    description TEXT,
+    current_version TEXT,
+    channel_aliases TEXT,
+    package_names TEXT
+);
+
+CREATE TABLE IF NOT EXISTS channels (
+    id INTEGER PRIMARY KEY,
+    bundle_id INTEGER NOT NULL REFERENCES bundles (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    manifest_file TEXT NOT NULL,
+    manifest_path TEXT NOT NULL UNIQUE,
+    format_version TEXT,
+    created_timestamp TEXT,
+    last_updated_timestamp TEXT,
+    latest_version TEXT,
+    channel_type TEXT,
+    is_current INTEGER NOT NULL,
+    visible INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS channels_bundle_id
+    ON channels (bundle_id, position);
+
+CREATE TABLE IF NOT EXISTS releases (
+    id INTEGER PRIMARY KEY,
+    channel_id INTEGER NOT NULL REFERENCES channels (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    version TEXT NOT NULL,
+    release_type TEXT,
+    visible INTEGER NOT NULL,
+    release_notes_url TEXT
+);
+
+CREATE INDEX IF NOT EXISTS releases_channel_id
+    ON releases (channel_id, position);
+
+CREATE INDEX IF NOT EXISTS releases_version
+    ON releases (version);
+
+CREATE TABLE IF NOT EXISTS package_rules (
+    id INTEGER PRIMARY KEY,
+    channel_id INTEGER NOT NULL REFERENCES channels (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    version_range TEXT,
+    package_type TEXT,
+    package_name TEXT,
+    data TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS package_rules_channel_id
+    ON package_rules (channel_id, position);
+
+CREATE TABLE IF NOT EXISTS package_rules_systems (
+    rules_id INTEGER NOT NULL REFERENCES package_rules (id)
+        ON DELETE CASCADE,
+    system TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS package_rules_systems_system
+    ON package_rules_systems (system, rules_id);
+
+CREATE INDEX IF NOT EXISTS package_rules_systems_rules_id
+    ON package_rules_systems (rules_id);
+'''
+
+
+class SqliteRepositoryMirror(object):
+    """A local SQLite mirror of a package repository.
+
+    A single connection is shared by all threads, with access serialized
+    by a lock.
+
+    Attributes:
+        filename (unicode):
+            The filename of the SQLite database.
+    """
+
+    #: The version of the database schema.
+    SCHEMA_VERSION = 1
+
+    #: The default path to the package index within the repository.
+    DEFAULT_INDEX_PATH = '/packages/index.json'
+
+    def __init__(self, filename):
+        """Initialize the mirror.
+
+        The database will be created if it doesn't exist.
+
+        Args:
+            filename (unicode):
+                The filename of the SQLite database, or ``:memory:`` for an
+                in-memory database.
+        """
+        self.filename = filename
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(filename, check_same_thread=False)
+        self._conn.execute('PRAGMA foreign_keys = ON')
+
+        with self._conn:
+            schema_version = \
+                self._conn.execute('PRAGMA user_version').fetchone()[0]
+
+            if schema_version not in (0, self.SCHEMA_VERSION):
+                raise LoadDataError(
+                    'The repository mirror "%s" uses an unsupported schema '
+                    'version (%s).'
+                    % (filename, schema_version))
+
+            self._conn.executescript(_SCHEMA)
+            self._conn.execute('PRAGMA user_version = %d'
+                               % self.SCHEMA_VERSION)
+
+    def close(self):
+        """Close the database.
+
+        The mirror can't be used after this is called.
+        """
+        with self._lock:
+            self._conn.close()
+
+    def sync(self, loader, index_path=DEFAULT_INDEX_PATH, force=False):
+        """Sync the mirror with a repository.
+
+        Only bundles whose ``last_updated_timestamp`` in the package index
+        differs from the mirrored copy will be fetched and replaced. Bundles
+        that are no longer in the index are removed from the mirror. If the
+        index itself hasn't changed, nothing else will be fetched.
+
+        All manifests are fetched before the mirror is modified, and changes
+        are made in a single transaction, so a failed sync leaves the mirror
+        unchanged.
+
+        Args:
+            loader (rbpkg.repository.loaders.PackageDataLoader):
+                The loader used to fetch manifests from the repository.
+
+            index_path (unicode, optional):
+                The path to the package index within the repository.
+
+            force (bool, optional):
+                Whether to re-import all bundles, even if unchanged.
+
+        Returns:
+            list of unicode:
+            The names of the bundles that were imported or updated.
+
+        Raises:
+            rbpkg.repository.errors.LoadDataError:
+                A manifest could not be loaded from the repository.
+        """
+        index_data = loader.load_by_path(index_path)
+        index_timestamp = index_data.get('last_updated_timestamp')
+
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT manifest_path, last_updated_timestamp'
+                '  FROM repository_index').fetchone()
+
+            if (not force and row is not None and
+                row == (index_path, index_timestamp)):
+                logger.debug('Repository mirror %s is up to date',
+                             self.filename)
+                return []
+
+            stored_timestamps = dict(self._conn.execute(
+                'SELECT name, last_updated_timestamp FROM bundles'))
+
+        base_url = urljoin(index_path, '.')
+        bundle_entries = index_data.get('bundles', [])
+        bundle_paths = {}
+
+        for entry in bundle_entries:
+            name = entry['name']
+
+            if (force or
+                stored_timestamps.get(name) !=
+                entry['last_updated_timestamp']):
+                bundle_paths[name] = urljoin(base_url,
+                                             entry['manifest_file'])
+
+        bundles_data = loader.load_by_paths(list(bundle_paths.values()))
+        channel_paths = []
+
+        for path in bundle_paths.values():
+            for channel_entry in bundles_data[path].get('channels', []):
+                channel_paths.append(urljoin(path,
+                                             channel_entry['manifest_file']))
+
+        channels_data = loader.load_by_paths(channel_paths)
+
+        for path, channel_data in list(channels_data.items()):
+            channels_data[path] = load_all_pages(loader, path, channel_data)
+
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM repository_index')
+            self._conn.execute(
+                'INSERT INTO repository_index'
+                '  (id, manifest_path, format_version,'
+                '   last_updated_timestamp)'
+                '  VALUES (1, ?, ?, ?)',
+                (index_path, index_data.get('format_version'),
+                 index_timestamp))
+
+            for name, path in bundle_paths.items():
+                self._write_bundle(name, path, bundles_data[path],
+                                   channels_data)
+
+            self._conn.execute(
+                'UPDATE bundles'
+                '   SET index_position = NULL, index_manifest_file = NULL')
+
+            for i, entry in enumerate(bundle_entries):
+                self._conn.execute(
+                    'UPDATE bundles'
+                    '   SET index_position = ?, index_manifest_file = ?'
+                    ' WHERE name = ?',
+                    (i, entry['manifest_file'], entry['name']))
+
+            # Anything left without a position was dropped from the index.
+            # Its channels, releases, and rules are deleted along with it.
+            removed_count = self._conn.execute(
+                'DELETE FROM bundles WHERE index_position IS NULL').rowcount
+
+        logger.debug('Synced %d bundles to repository mirror %s '
+                     '(%d removed)',
+                     len(bundle_paths), self.filename, removed_count)
+
+        return sorted(bundle_paths.keys())
+
+    def get_manifest_data(self, path):
+        """Return the manifest data for a path within the repository.
+
+        The data is rebuilt from the mirrored tables, in the same format as
+        the original manifest.
+
+        Args:
+            path (unicode):
+                The path to the package index, or to a bundle or channel
+                manifest.
+
+        Returns:
+            dict:
+            The manifest data, or ``None`` if the path isn't in the mirror.
+        """
+        with self._lock:
+            return (self._get_index_data(path) or
+                    self._get_bundle_data(path) or
+                    self._get_channel_data(path))
+
+    def get_latest_release(self, bundle_path, version_range,
+                           channel_types=None, release_types=None):
+        """Return the latest release of a bundle within a version range.
+
+        This follows the same rules as
+        :py:meth:`PackageBundle.get_latest_release_for_version_range()
+        <rbpkg.repository.package_bundle.PackageBundle.
+        get_latest_release_for_version_range>`, but is answered by a single
+        query. The version range is checked by a SQL function, and only the
+        first matching release (in channel and release order) is returned
+        by the database.
+
+        Args:
+            bundle_path (unicode):
+                The path to the bundle's manifest.
+
+            version_range (unicode):
+                The version range, including the bundle name (such as
+                ``ReviewBoard>=2.0``).
+
+            channel_types (list of unicode, optional):
+                The channel types to limit channels to.
+
+            release_types (list of unicode, optional):
+                The release types to limit releases to.
+
+        Returns:
+            tuple:
+            A 2-tuple of the channel name and the release data (in channel
+            manifest format), or ``None`` if no release matches.
+
+        Raises:
+            rbpkg.repository.errors.PathNotFoundError:
+                The bundle isn't in the mirror.
+        """
+        specifier = pkg_resources.Requirement.parse(version_range).specifier
+
+        def _matches_version(version):
+            return any(True for unused in specifier.filter([version]))
+
+        query = [
+            'SELECT channels.name, releases.version,'
+            '       releases.release_type, releases.visible,'
+            '       releases.release_notes_url'
+            '  FROM releases'
+            '  JOIN channels ON channels.id = releases.channel_id'
+            ' WHERE channels.bundle_id = ?'
+            '   AND channels.visible = 1'
+            '   AND rbpkg_matches_version(releases.version)'
+        ]
+        params = []
+
+        if channel_types:
+            query.append('AND channels.channel_type IN (%s)'
+                         % ', '.join('?' * len(channel_types)))
+            params += channel_types
+
+        if release_types:
+            query.append('AND releases.release_type IN (%s)'
+                         % ', '.join('?' * len(release_types)))
+            params += release_types
+
+        query.append('ORDER BY channels.position, releases.position'
+                     ' LIMIT 1')
+
+        with self._lock:
+            bundle_row = self._conn.execute(
+                'SELECT id FROM bundles WHERE manifest_path = ?',
+                (bundle_path,)).fetchone()
+
+            if bundle_row is None:
+                raise PathNotFoundError(
+                    'Unable to find "%s" in the repository mirror "%s".'
+                    % (bundle_path, self.filename))
+
+            self._conn.create_function('rbpkg_matches_version', 1,
+                                       _matches_version)
+            row = self._conn.execute(' '.join(query),
+                                     [bundle_row[0]] + params).fetchone()
+
+        if row is None:
+            return None
+
+        return row[0], self._build_release_data(row[1:])
+
+    def get_package_rules(self, channel_path, system=None):
+        """Return the package rules for a channel.
+
+        Args:
+            channel_path (unicode):
+                The path to the channel's manifest.
+
+            system (unicode, optional):
+                A system to limit rules to. Rules that apply to all systems
+                (``*``) are always included.
+
+        Returns:
+            list of dict:
+            The package rules data, in channel manifest format.
+        """
+        query = [
+            'SELECT package_rules.data'
+            '  FROM package_rules'
+            '  JOIN channels ON channels.id = package_rules.channel_id'
+            ' WHERE channels.manifest_path = ?'
+        ]
+        params = [channel_path]
+
+        if system is not None:
+            query.append(
+                'AND package_rules.id IN ('
+                '    SELECT rules_id FROM package_rules_systems'
+                '     WHERE system IN (?, ?))')
+            params += [system, '*']
+
+        query.append('ORDER BY package_rules.position')
+
+        with self._lock:
+            return [
+                json.loads(row[0])
+                for row in self._conn.execute(' '.join(query), params)
+            ]
+
+    def _write_bundle(self, name, path, bundle_data, channels_data):
+        """Write a bundle and its channels to the mirror.
+
+        Any existing copy of the bundle is replaced. The caller must hold
+        the lock and be within a transaction.
+
+        Args:
+            name (unicode):
+                The name of the bundle.
+
+            path (unicode):
+                The path to the bundle's manifest.
+
+            bundle_data (dict):
+                The parsed bundle manifest.
+
+            channels_data (dict):
+                A mapping of channel manifest paths to their parsed data.
+        """
+        self._conn.execute('DELETE FROM bundles WHERE name = ?', (name,))
+
+        description = bundle_data.get('description')
+
+        if description is not None:
+            description = json.dumps(description)
+
+        bundle_id = self._conn.execute(
+            'INSERT INTO bundles'
+            '  (name, manifest_path, format_version, created_timestamp,'
+            '   last_updated_timestamp, description, current_version,'
+            '   channel_aliases, package_names)'
+            '  VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (name,
+             path,
+             bundle_data.get('format_version'),
+             bundle_data['created_timestamp'],
+             bundle_data['last_updated_timestamp'],
+             description,
+             bundle_data.get('current_version'),
+             json.dumps(bundle_data.get('channel_aliases', {})),
+             json.dumps(bundle_data.get('package_names', [])))).lastrowid
+
+        for i, channel_entry in enumerate(bundle_data.get('channels', [])):
+            channel_path = urljoin(path, channel_entry['manifest_file'])
+            channel_data = channels_data[channel_path]
+
+            channel_id = self._conn.execute(
+                'INSERT INTO channels'
+                '  (bundle_id, position, name, manifest_file, manifest_path,'
+                '   format_version, created_timestamp,'
+                '   last_updated_timestamp, latest_version, channel_type,'
+                '   is_current, visible)'
+                '  VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (bundle_id,
+                 i,
+                 channel_entry['name'],
+                 channel_entry['manifest_file'],
+                 channel_path,
+                 channel_data.get('format_version'),
+                 channel_entry['created_timestamp'],
+                 channel_entry['last_updated_timestamp'],
+                 channel_entry['latest_version'],
+                 channel_entry.get('type', 'release'),
+                 channel_entry.get('current', False),
+                 channel_entry.get('visible', True))).lastrowid
+
+            self._conn.executemany(
+                'INSERT INTO releases'
+                '  (channel_id, position, version, release_type, visible,'
+                '   release_notes_url)'
+                '  VALUES (?, ?, ?, ?, ?, ?)',
+                [
+                    (channel_id,
+                     j,
+                     release_data['version'],
+                     release_data.get('type', 'stable'),
+                     release_data.get('visible', True),
+                     release_data.get('release_notes_url'))
+                    for j, release_data in enumerate(
+                        channel_data.get('releases', []))
+                ])
+
+            for j, rules_data in enumerate(
+                    channel_data.get('package_rules', [])):
+                rules_id = self._conn.execute(
+                    'INSERT INTO package_rules'
+                    '  (channel_id, position, version_range, package_type,'
+                    '   package_name, data)'
+                    '  VALUES (?, ?, ?, ?, ?, ?)',
+                    (channel_id,
+                     j,
+                     rules_data.get('version_range'),
+                     rules_data.get('package_type'),
+                     rules_data.get('package_name'),
+                     json.dumps(rules_data))).lastrowid
+
+                self._conn.executemany(
+                    'INSERT INTO package_rules_systems (rules_id, system)'
+                    '  VALUES (?, ?)',
+                    [
+                        (rules_id, system)
+                        for system in rules_data.get('systems', [])
+                    ])
+
+    def _get_index_data(self, path):
+        """Return the package index data for a path.
+
+        The caller must hold the lock.
+
+        Args:
+            path (unicode):
+                The path within the repository.
+
+        Returns:
+            dict:
+            The package index data, or ``None`` if the path isn't the
+            mirrored index.
+        """
+        row = self._conn.execute(
+            'SELECT format_version, last_updated_timestamp'
+            '  FROM repository_index'
+            ' WHERE manifest_path = ?',
+            (path,)).fetchone()
+
+        if row is None:
+            return None
+
+        return {
+            'format_version': row[0],
+            'last_updated_timestamp': row[1],
+            'bundles': [
+                {
+                    'name': bundle_row[0],
+                    'manifest_file': bundle_row[1],
+                    'created_timestamp': bundle_row[2],
+                    'last_updated_timestamp': bundle_row[3],
+                    'current_version': bundle_row[4],
+                    'package_names': json.loads(bundle_row[5]),
+                }
+                for bundle_row in self._conn.execute(
+                    'SELECT name, index_manifest_file, created_timestamp,'
+                    '       last_updated_timestamp, current_version,'
+                    '       package_names'
+                    '  FROM bundles'
+                    ' WHERE index_position IS NOT NULL'
+                    ' ORDER BY index_position')
+            ],
+        }
+
+    def _get_bundle_data(self, path):
+        """Return the bundle manifest data for a path.
+
+        The caller must hold the lock.
+
+        Args:
+            path (unicode):
+                The path within the repository.
+
+        Returns:
+            dict:
+            The bundle manifest data, or ``None`` if there's no bundle at
+            the path.
+        """
+        row = self._conn.execute(
+            'SELECT id, name, format_version, created_timestamp,'
+            '       last_updated_timestamp, description, current_version,'
+            '       channel_aliases, package_names'
+            '  FROM bundles'
+            ' WHERE manifest_path = ?',
+            (path,)).fetchone()
+
+        if row is None:
+            return None
+
+        data = {
+            'format_version': row[2],
+            'name': row[1],
+            'created_timestamp': row[3],
+            'last_updated_timestamp': row[4],
+            'current_version': row[6],
+            'channel_aliases': json.loads(row[7]),
+            'package_names': json.loads(row[8]),
+            'channels': [
+                {
+                    'name': channel_row[0],
+                    'manifest_file': channel_row[1],
+                    'created_timestamp': channel_row[2],
+                    'last_updated_timestamp': channel_row[3],
+                    'latest_version': channel_row[4],
+                    'type': channel_row[5],
+                    'current': bool(channel_row[6]),
+                    'visible': bool(channel_row[7]),
+                }
+                for channel_row in self._conn.execute(
+                    'SELECT name, manifest_file, created_timestamp,'
+                    '       last_updated_timestamp, latest_version,'
+                    '       channel_type, is_current, visible'
+                    '  FROM channels'
+                    ' WHERE bundle_id = ?'
+                    ' ORDER BY position',
+                    (row[0],))
+            ],
+        }
+
+        if row[5] is not None:
+            data['description'] = json.loads(row[5])
+
+        return data
+
+    def _get_channel_data(self, path):
+        """Return the channel manifest data for a path.
+
+        The caller must hold the lock.
+
+        Args:
+            path (unicode):
+                The path within the repository.
+
+        Returns:
+            dict:
+            The channel manifest data, or ``None`` if there's no channel at
+            the path.
+        """
+        row = self._conn.execute(
+            'SELECT id, format_version, created_timestamp,'
+            '       last_updated_timestamp'
+            '  FROM channels'
+            ' WHERE manifest_path = ?',
+            (path,)).fetchone()
+
+        if row is None:
+            return None
+
+        return {
+            'format_version': row[1],
+            'created_timestamp': row[2],
+            'last_updated_timestamp': row[3],
+            'releases': [
+                self._build_release_data(release_row)
+                for release_row in self._conn.execute(
+                    'SELECT version, release_type, visible,'
+                    '       release_notes_url'
+                    '  FROM releases'
+                    ' WHERE channel_id = ?'
+                    ' ORDER BY position',
+                    (row[0],))
+            ],
+            'package_rules': [
+                json.loads(rules_row[0])
+                for rules_row in self._conn.execute(
+                    'SELECT data'
+                    '  FROM package_rules'
+                    ' WHERE channel_id = ?'
+                    ' ORDER BY position',
+                    (row[0],))
+            ],
+        }
+
+    def _build_release_data(self, row):
+        """Return release data from a database row.
+
+        Args:
+            row (tuple):
+                The version, release type, visibility, and release notes URL
+                for the release.
+
+        Returns:
+            dict:
+            The release data, in channel manifest format.
+        """
+        data = {
+            'version': row[0],
+            'type': row[1],
+            'visible': bool(row[2]),
+        }
+
+        if row[3]:
+            data['release_notes_url'] = row[3]
+
+        return data
+
+
+class SqlitePackageDataLoader(PackageDataLoader):
+    """A data loader that serves manifests from a SQLite mirror.
+
+    Manifests are rebuilt from the mirror's tables on each load. Release
+    lookups on package bundles are answered through indexed queries (see
+    :py:meth:`query_latest_release`), without loading channel manifests.
+
+    Paths that aren't in the mirror (such as bundles that aren't listed in
+    the package index) are loaded through the fallback loader, if one was
+    provided.
+
+    Attributes:
+        mirror (SqliteRepositoryMirror):
+            The mirror to load from.
+
+        fallback_loader (rbpkg.repository.loaders.PackageDataLoader):
+            The loader used for paths that aren't in the mirror, if any.
+    """
+
+    supports_release_queries = True
+
+    def __init__(self, mirror, fallback_loader=None):
+        """Initialize the data loader.
+
+        Args:
+            mirror (SqliteRepositoryMirror):
+                The mirror to load from.
+
+            fallback_loader (rbpkg.repository.loaders.PackageDataLoader,
+                             optional):
+                The loader used for paths that aren't in the mirror.
+        """
+        self.mirror = mirror
+        self.fallback_loader = fallback_loader
+
+    def load_by_path(self, *parts):
+        """Load data from the given path within the repository.
+
+        Args:
+            *parts (list of unicode):
+                The segments of a path within the repository.
+
+        Returns:
+            dict: The loaded data from that path, if found.
+
+        Raises:
+            rbpkg.api.errors.LoadDataError:
+                The path isn't in the mirror, and couldn't be loaded by the
+                fallback loader.
+        """
+        path = '/'.join(parts)
+        data = self.mirror.get_manifest_data(path)
+
+        if data is None:
+            if self.fallback_loader is not None:
+                return self.fallback_loader.load_by_path(path)
+
+            raise self._make_not_found_error(path)
+
+        return data
+
+    def try_load_by_paths(self, paths):
+        """Load data from several paths, collecting errors for each path.
+
+        Access to the mirror is serialized, so this loads each path in turn.
+        Any paths that aren't in the mirror are then loaded together through
+        the fallback loader.
+
+        Args:
+            paths (list of unicode):
+                The paths within the repository to load.
+
+        Returns:
+            tuple:
+            A 2-tuple of a mapping of paths to their loaded data, and a
+            mapping of paths to the
+            :py:class:`~rbpkg.repository.errors.LoadDataError` raised when
+            loading them.
+        """
+        results = {}
+        errors = {}
+        missing_paths = []
+
+        for path in paths:
+            data = self.mirror.get_manifest_data(path)
+
+            if data is None:
+                missing_paths.append(path)
+            else:
+                results[path] = data
+
+        if missing_paths:
+            if self.fallback_loader is not None:
+                fallback_results, errors = \
+                    self.fallback_loader.try_load_by_paths(missing_paths)
+                results.update(fallback_results)
+            else:
+                for path in missing_paths:
+                    errors[path] = self._make_not_found_error(path)
+
+        return results, errors
+
+    def query_latest_release(self, bundle_path, version_range,
+                             channel_types=None, release_types=None):
+        """Return the latest release of a bundle within a version range.
+
+        Args:
+            bundle_path (unicode):
+                The path to the bundle's manifest.
+
+            version_range (unicode):
+                The version range, including the bundle name.
+
+            channel_types (list of unicode, optional):
+                The channel types to limit channels to.
+
+            release_types (list of unicode, optional):
+                The release types to limit releases to.
+
+        Returns:
+            tuple:
+            A 2-tuple of the channel name and the release data, or ``None``
+            if no release matches.
+
+        Raises:
+            rbpkg.repository.errors.PathNotFoundError:
+                The bundle isn't in the mirror. The caller should search the
+                bundle's channels instead.
+        """
+        return self.mirror.get_latest_release(bundle_path, version_range,
+                                              channel_types=channel_types,
+                                              release_types=release_types)
+
+    def _make_not_found_error(self, path):
+        """Return an error for a path that isn't in the mirror.
+
+        Args:
+            path (unicode):
+                The path within the repository.
+
+        Returns:
+            rbpkg.repository.errors.PathNotFoundError:
+            The error to raise.
+        """
+        return PathNotFoundError(
+            'Unable to load "%s". It could not be found in the repository '
+            'mirror "%s".'
+            % (path, self.mirror.filename))
@@ -0,0 +1,113 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import stat
+import tarfile
+import tempfile
+import zipfile
+
+from rbpkg.repository.archives import (ARCHIVE_FORMAT_TAR,
+                                       ARCHIVE_FORMAT_ZIP,
+                                       create_repository_archive,
+                                       get_archive_format,
+                                       iter_repository_files)
+from rbpkg.testing.testcases import TestCase
+
+
+class ArchivesTests(TestCase):
+    """Unit tests for rbpkg.repository.archives."""
+
+    def setUp(self):
+        super(ArchivesTests, self).setUp()
+
+        self.tempdir = tempfile.mkdtemp(prefix='rbpkg-tests.')
+        self.root = os.path.join(self.tempdir, 'repo')
+        os.makedirs(os.path.join(self.root, 'packages', 'TestPackage'))
+
+        for name in ('packages/index.json',
+                     'packages/TestPackage/index.json',
+                     'packages/TestPackage/1.0.x.json',
+                     'packages/.tmp-abc123'):
+            with open(os.path.join(self.root, name), 'wb') as fp:
+                fp.write(b'{}')
+
+    def tearDown(self):
+        super(ArchivesTests, self).tearDown()
+
+        shutil.rmtree(self.tempdir)
+
+    def test_get_archive_format(self):
+        """Testing get_archive_format"""
+        self.assertEqual(get_archive_format('snapshot.zip'),
+                         ARCHIVE_FORMAT_ZIP)
+        self.assertEqual(get_archive_format('snapshot.TAR'),
+                         ARCHIVE_FORMAT_TAR)
+        self.assertEqual(get_archive_format('snapshot'), ARCHIVE_FORMAT_ZIP)
+
+    def test_iter_repository_files(self):
+        """Testing iter_repository_files"""
+        self.assertEqual(
+            [name for name, filename in iter_repository_files(self.root)],
+            [
+                'packages/index.json',
+                'packages/TestPackage/1.0.x.json',
+                'packages/TestPackage/index.json',
+            ])
+
+    def test_create_repository_archive_with_zip(self):
+        """Testing create_repository_archive with zip format"""
+        filename = os.path.join(self.tempdir, 'snapshot.zip')
+
+        self.assertEqual(create_repository_archive(self.root, filename), 3)
+
+        with zipfile.ZipFile(filename, 'r') as archive:
+            self.assertEqual(
+                archive.namelist(),
+                [
+                    'packages/index.json',
+                    'packages/TestPackage/1.0.x.json',
+                    'packages/TestPackage/index.json',
+                ])
+
+    def test_create_repository_archive_permissions(self):
+        """Testing create_repository_archive applies the umask to the
+        archive's permissions
+        """
+        filename = os.path.join(self.tempdir, 'snapshot.zip')
+        old_umask = os.umask(0o022)
+
+        try:
+            create_repository_archive(self.root, filename)
+        finally:
+            os.umask(old_umask)
+
+        self.assertEqual(stat.S_IMODE(os.stat(filename).st_mode), 0o644)
+
+    def test_create_repository_archive_with_tar(self):
+        """Testing create_repository_archive with tar format"""
+        filename = os.path.join(self.tempdir, 'snapshot')
+
+        self.assertEqual(
+            create_repository_archive(self.root, filename,
+                                      archive_format=ARCHIVE_FORMAT_TAR),
+            3)
+
+        with tarfile.open(filename, 'r') as archive:
+            self.assertEqual(
+                archive.getnames(),
+                [
+                    'packages/index.json',
+                    'packages/TestPackage/1.0.x.json',
+                    'packages/TestPackage/index.json',
+                ])
+
+    def test_create_repository_archive_with_invalid_format(self):
+        """Testing create_repository_archive with an unsupported format"""
+        filename = os.path.join(self.tempdir, 'snapshot.zip')
+
+        self.assertRaises(
+            ValueError,
+            lambda: create_repository_archive(self.root, filename,
+                                              archive_format='rar'))
+        self.assertFalse(os.path.exists(filename))
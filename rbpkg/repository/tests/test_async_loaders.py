@@ -0,0 +1,444 @@
+from __future__ import unicode_literals
+
+from unittest import SkipTest
+
+from kgb import SpyAgency
+from six.moves.urllib.parse import urlsplit
+
+from rbpkg.repository.errors import LoadDataError, PackageLookupError
+from rbpkg.repository.package_bundle import PackageBundle
+from rbpkg.repository.package_channel import PackageChannel
+from rbpkg.repository.package_repo import (PackageRepository,
+                                            get_repository)
+from rbpkg.repository.tests.testcases import PackagesTestCase
+from rbpkg.testing.http_server import TestHTTPServer
+
+try:
+    import asyncio
+
+    from rbpkg.repository.async_loaders import (
+        AsyncHttpPackageDataLoader,
+        AsyncSingleFlight,
+        ExecutorAsyncPackageDataLoader,
+        set_async_data_loader)
+except (ImportError, SyntaxError):
+    # asyncio support isn't available on this version of Python.
+    asyncio = None
+
+
+class AsyncLoadersTestCase(PackagesTestCase):
+    """Base class for tests using asyncio."""
+
+    def setUp(self):
+        if asyncio is None:
+            raise SkipTest('asyncio support is not available')
+
+        super(AsyncLoadersTestCase, self).setUp()
+
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        super(AsyncLoadersTestCase, self).tearDown()
+
+        set_async_data_loader(None)
+        self.loop.close()
+
+    def run_async(self, coro):
+        """Run a coroutine to completion and return its result.
+
+        Args:
+            coro (coroutine):
+                The coroutine to run.
+
+        Returns:
+            object:
+            The result of the coroutine.
+        """
+        return self.loop.run_until_complete(coro)
+
+    def gather(self, coros):
+        """Return a future for the results of several coroutines.
+
+        Args:
+            coros (list of coroutine):
+                The coroutines to run concurrently.
+
+        Returns:
+            asyncio.Future:
+            A future resulting in the list of results.
+        """
+        return asyncio.gather(*[
+            self.loop.create_task(coro)
+            for coro in coros
+        ])
+
+
+class AsyncSingleFlightTests(AsyncLoadersTestCase):
+    """Unit tests for rbpkg.repository.async_loaders.AsyncSingleFlight."""
+
+    def test_do_coalesces(self):
+        """Testing AsyncSingleFlight.do coalesces concurrent calls"""
+        single_flight = AsyncSingleFlight()
+        calls = []
+
+        async def func():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+
+            return 42
+
+        results = self.run_async(self.gather([
+            single_flight.do('key', func)
+            for i in range(3)
+        ]))
+
+        self.assertEqual(results, [42, 42, 42])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(single_flight.call_count, 1)
+        self.assertEqual(single_flight.coalesced_count, 2)
+
+    def test_do_with_owner_cancelled(self):
+        """Testing AsyncSingleFlight.do with the first caller cancelled
+        still returns the result to other callers
+        """
+        single_flight = AsyncSingleFlight()
+        started = asyncio.Event()
+        finish = asyncio.Event()
+
+        async def func():
+            started.set()
+            await finish.wait()
+
+            return 42
+
+        async def run():
+            owner = asyncio.ensure_future(single_flight.do('key', func))
+            await started.wait()
+
+            waiter = asyncio.ensure_future(single_flight.do('key', func))
+            await asyncio.sleep(0)
+
+            owner.cancel()
+            await asyncio.sleep(0)
+            finish.set()
+
+            result = await waiter
+
+            self.assertTrue(owner.cancelled())
+
+            return result
+
+        self.assertEqual(self.run_async(run()), 42)
+
+    def test_do_with_all_callers_cancelled(self):
+        """Testing AsyncSingleFlight.do with all callers cancelled cancels
+        the call
+        """
+        single_flight = AsyncSingleFlight()
+        cancelled = []
+
+        async def func():
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+
+        async def run():
+            callers = [
+                asyncio.ensure_future(single_flight.do('key', func))
+                for i in range(2)
+            ]
+            await asyncio.sleep(0)
+
+            for caller in callers:
+                caller.cancel()
+
+            await asyncio.sleep(0.01)
+
+        self.run_async(run())
+
+        self.assertEqual(cancelled, [1])
+        self.assertEqual(single_flight._in_flight, {})
+
+
+class ExecutorAsyncPackageDataLoaderTests(AsyncLoadersTestCase):
+    """Unit tests for
+    rbpkg.repository.async_loaders.ExecutorAsyncPackageDataLoader.
+    """
+
+    def test_load_by_path(self):
+        """Testing ExecutorAsyncPackageDataLoader.load_by_path"""
+        self.data_loader.path_to_content['/packages/index.json'] = {
+            'format_version': '1.0',
+        }
+
+        loader = ExecutorAsyncPackageDataLoader()
+
+        self.assertEqual(
+            self.run_async(loader.load_by_path('/packages/index.json')),
+            {'format_version': '1.0'})
+
+    def test_load_by_paths(self):
+        """Testing ExecutorAsyncPackageDataLoader.load_by_paths"""
+        self.data_loader.path_to_content.update({
+            '/packages/A/index.json': {'name': 'A'},
+            '/packages/B/index.json': {'name': 'B'},
+        })
+
+        loader = ExecutorAsyncPackageDataLoader()
+
+        self.assertEqual(
+            self.run_async(loader.load_by_paths([
+                '/packages/A/index.json',
+                '/packages/B/index.json',
+            ])),
+            {
+                '/packages/A/index.json': {'name': 'A'},
+                '/packages/B/index.json': {'name': 'B'},
+            })
+
+    def test_load_by_path_with_error(self):
+        """Testing ExecutorAsyncPackageDataLoader.load_by_path with error"""
+        loader = ExecutorAsyncPackageDataLoader()
+
+        self.assertRaises(
+            LoadDataError,
+            lambda: self.run_async(loader.load_by_path('/packages/bad.json')))
+
+
+class AsyncHttpPackageDataLoaderTests(AsyncLoadersTestCase):
+    """Unit tests for
+    rbpkg.repository.async_loaders.AsyncHttpPackageDataLoader.
+    """
+
+    def setUp(self):
+        super(AsyncHttpPackageDataLoaderTests, self).setUp()
+
+        self.server = TestHTTPServer(dict(
+            ('/packages/Package%s/index.json' % i, {'name': 'Package%s' % i})
+            for i in range(20)
+        ))
+        self.server.start()
+
+        self.loader = AsyncHttpPackageDataLoader(self.server.url,
+                                                 max_connections=4)
+
+    def tearDown(self):
+        self.run_async(self.loader.close())
+        self.server.stop()
+
+        super(AsyncHttpPackageDataLoaderTests, self).tearDown()
+
+    def test_load_by_path(self):
+        """Testing AsyncHttpPackageDataLoader.load_by_path"""
+        self.assertEqual(
+            self.run_async(self.loader.load_by_path(
+                '/packages/Package1/index.json')),
+            {'name': 'Package1'})
+
+    def test_load_by_path_with_not_found(self):
+        """Testing AsyncHttpPackageDataLoader.load_by_path with path not
+        found
+        """
+        self.assertRaises(
+            LoadDataError,
+            lambda: self.run_async(self.loader.load_by_path(
+                '/packages/missing.json')))
+
+    def test_load_by_paths(self):
+        """Testing AsyncHttpPackageDataLoader.load_by_paths shares
+        connections
+        """
+        paths = [
+            '/packages/Package%s/index.json' % i
+            for i in range(20)
+        ]
+
+        result = self.run_async(self.loader.load_by_paths(paths))
+
+        self.assertEqual(len(result), 20)
+        self.assertEqual(result['/packages/Package5/index.json'],
+                         {'name': 'Package5'})
+        self.assertTrue(self.server.connections_accepted <= 4)
+
+        stats = self.loader.get_connection_stats()
+        self.assertEqual(stats['requests_sent'], 20)
+        self.assertEqual(stats['connections_opened'],
+                         self.server.connections_accepted)
+        self.assertEqual(stats['connections_reused'],
+                         20 - stats['connections_opened'])
+
+    def test_load_by_path_retries_once(self):
+        """Testing AsyncHttpPackageDataLoader.load_by_path only retries
+        once on a new connection when pooled connections were closed
+        """
+        parsed_url = urlsplit(self.server.url)
+        key = (parsed_url.scheme, parsed_url.netloc)
+
+        async def run():
+            conns = []
+
+            for i in range(3):
+                reader, writer, reused = \
+                    await self.loader._acquire_connection(key)
+
+                # Simulate the server dropping the idle connection.
+                writer.close()
+                conns.append((reader, writer))
+
+            await asyncio.sleep(0.01)
+            self.loader._idle_connections[key] = conns
+
+            return await self.loader.load_by_path(
+                '/packages/Package1/index.json')
+
+        self.assertEqual(self.run_async(run()), {'name': 'Package1'})
+
+        stats = self.loader.get_connection_stats()
+        self.assertEqual(stats['connections_opened'], 4)
+        self.assertEqual(stats['connections_reused'], 1)
+
+    def test_fetch_by_path_with_etag(self):
+        """Testing AsyncHttpPackageDataLoader.fetch_by_path with unchanged
+        ETag
+        """
+        path = '/packages/Package1/index.json'
+        result = self.run_async(self.loader.fetch_by_path(path))
+        result = self.run_async(self.loader.fetch_by_path(path,
+                                                          etag=result.etag))
+
+        self.assertTrue(result.not_modified)
+        self.assertEqual(self.server.not_modified_count, 1)
+
+
+class AsyncRepositoryTests(SpyAgency, AsyncLoadersTestCase):
+    """Unit tests for the asyncio counterparts on repository classes."""
+
+    def setUp(self):
+        super(AsyncRepositoryTests, self).setUp()
+
+        self.data_loader.path_to_content.update({
+            '/packages/index.json': {
+                'format_version': '1.0',
+                'last_updated_timestamp': '2015-10-15T08:17:29.958569',
+                'bundles': [],
+            },
+            '/packages/TestPackage/index.json': {
+                'format_version': '1.0',
+                'name': 'TestPackage',
+                'created_timestamp': '2015-10-11T08:17:29.958569',
+                'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+                'package_names': [],
+                'channel_aliases': {},
+                'channels': [
+                    {
+                        'name': '1.0.x',
+                        'created_timestamp': '2015-10-13T08:17:29.958569',
+                        'last_updated_timestamp':
+                            '2015-10-14T08:17:29.958569',
+                        'latest_version': '1.0',
+                        'current': True,
+                        'visible': True,
+                        'manifest_file': '1.0.x.json',
+                    },
+                ],
+            },
+            '/packages/TestPackage/1.0.x.json': {
+                'format_version': '1.0',
+                'created_timestamp': '2015-10-11T08:17:29.958569',
+                'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+                'releases': [
+                    {
+                        'version': '1.0',
+                        'type': 'stable',
+                        'visible': True,
+                    },
+                ],
+                'package_rules': [],
+            },
+        })
+
+    def test_get_index_async(self):
+        """Testing PackageRepository.get_index_async"""
+        index = self.run_async(get_repository().get_index_async())
+
+        self.assertEqual(index.bundles, [])
+        self.assertIs(get_repository().get_index(), index)
+
+    def test_lookup_package_bundle_async(self):
+        """Testing PackageRepository.lookup_package_bundle_async"""
+        repository = get_repository()
+        bundle = self.run_async(
+            repository.lookup_package_bundle_async('TestPackage'))
+
+        self.assertEqual(bundle.name, 'TestPackage')
+        self.assertIs(repository.lookup_package_bundle('TestPackage'), bundle)
+
+    def test_lookup_package_bundle_async_coalesces(self):
+        """Testing PackageRepository.lookup_package_bundle_async coalesces
+        concurrent lookups of the same bundle
+        """
+        self.spy_on(self.data_loader.load_by_path)
+
+        repository = PackageRepository()
+        bundles = self.run_async(self.gather([
+            repository.lookup_package_bundle_async('TestPackage')
+            for i in range(5)
+        ]))
+
+        self.assertEqual(len(self.data_loader.load_by_path.calls), 1)
+
+        for bundle in bundles:
+            self.assertIs(bundle, bundles[0])
+
+    def test_lookup_package_bundle_async_with_not_found(self):
+        """Testing PackageRepository.lookup_package_bundle_async with bundle
+        not found
+        """
+        self.assertRaises(
+            PackageLookupError,
+            lambda: self.run_async(
+                get_repository().lookup_package_bundle_async('Missing')))
+
+    def test_bundle_load_async(self):
+        """Testing PackageBundle.load_async with load_channels=True"""
+        bundle = PackageBundle(
+            manifest_url='/packages/TestPackage/index.json',
+            name='TestPackage')
+
+        self.run_async(bundle.load_async(load_channels=True))
+
+        self.assertTrue(bundle._loaded)
+        self.assertEqual(len(bundle.channels), 1)
+        self.assertTrue(bundle.channels[0]._loaded)
+        self.assertEqual(bundle.channels[0].releases[0].version, '1.0')
+
+    def test_bundle_load_async_coalesces(self):
+        """Testing PackageBundle.load_async coalesces concurrent loads"""
+        self.spy_on(self.data_loader.load_by_path)
+
+        bundle = PackageBundle(
+            manifest_url='/packages/TestPackage/index.json',
+            name='TestPackage')
+
+        self.run_async(self.gather([
+            bundle.load_async(load_channels=True),
+            bundle.load_async(load_channels=True),
+        ]))
+
+        # One load for the bundle, and one for its channel.
+        self.assertEqual(len(self.data_loader.load_by_path.calls), 2)
+        self.assertTrue(bundle.channels[0]._loaded)
+
+    def test_channel_load_async(self):
+        """Testing PackageChannel.load_async"""
+        bundle = PackageBundle(
+            manifest_url='/packages/TestPackage/index.json',
+            name='TestPackage')
+        channel = PackageChannel(bundle, manifest_url='1.0.x.json')
+
+        self.run_async(channel.load_async())
+
+        self.assertTrue(channel._loaded)
+        self.assertEqual(channel.releases[0].version, '1.0')
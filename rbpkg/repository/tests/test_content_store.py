@@ -0,0 +1,207 @@
+from __future__ import unicode_literals
+
+import copy
+import json
+import os
+import shutil
+import tempfile
+
+from kgb import SpyAgency
+
+from rbpkg.repository.content_store import (ContentAddressedPackageDataLoader,
+                                            ContentStore,
+                                            get_object_digest,
+                                            get_object_path,
+                                            parse_object_path)
+from rbpkg.repository.errors import LoadDataError
+from rbpkg.repository.loaders import (FilePackageDataLoader,
+                                      InMemoryPackageDataLoader,
+                                      set_data_loader)
+from rbpkg.repository.package_repo import PackageRepository
+from rbpkg.testing.testcases import TestCase
+
+
+PACKAGE_RULES = [
+    {
+        'version_range': '*',
+        'package_type': 'python',
+        'package_name': 'TestPackage',
+        'systems': ['*'],
+    },
+]
+
+
+def _make_bundle(name):
+    return {
+        'format_version': '1.0',
+        'name': name,
+        'created_timestamp': '2015-10-10T08:17:29.958569',
+        'last_updated_timestamp': '2015-10-15T08:17:29.958569',
+        'current_version': '1.0',
+        'package_names': [],
+        'channels': [
+            {
+                'name': '1.0.x',
+                'created_timestamp': '2015-10-11T08:17:29.958569',
+                'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+                'latest_version': '1.0',
+                'type': 'release',
+                'current': True,
+                'visible': True,
+                'manifest_file': '1.0.x.json',
+            },
+        ],
+    }
+
+
+def _make_channel(version):
+    return {
+        'format_version': '1.0',
+        'created_timestamp': '2015-10-11T08:17:29.958569',
+        'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+        'releases': [
+            {
+                'version': version,
+                'type': 'stable',
+                'visible': True,
+            },
+        ],
+        'package_rules': copy.deepcopy(PACKAGE_RULES),
+    }
+
+
+REPOSITORY_DATA = {
+    '/packages/index.json': {
+        'format_version': '1.0',
+        'last_updated_timestamp': '2015-10-15T08:17:29.958569',
+        'bundles': [
+            {
+                'name': name,
+                'manifest_file': '%s/index.json' % name,
+                'created_timestamp': '2015-10-10T08:17:29.958569',
+                'last_updated_timestamp': '2015-10-15T08:17:29.958569',
+                'current_version': '1.0',
+                'package_names': [],
+            }
+            for name in ('TestPackage', 'OtherPackage')
+        ],
+    },
+    '/packages/TestPackage/index.json': _make_bundle('TestPackage'),
+    '/packages/TestPackage/1.0.x.json': _make_channel('1.0'),
+    '/packages/OtherPackage/index.json': _make_bundle('OtherPackage'),
+    '/packages/OtherPackage/1.0.x.json': _make_channel('1.0.1'),
+}
+
+
+class ContentStoreTests(SpyAgency, TestCase):
+    """Unit tests for rbpkg.repository.content_store."""
+
+    def setUp(self):
+        super(ContentStoreTests, self).setUp()
+
+        self.root = tempfile.mkdtemp(prefix='rbpkg-tests.')
+        self.store = ContentStore(self.root)
+        self.store.write_repository(
+            InMemoryPackageDataLoader(copy.deepcopy(REPOSITORY_DATA)))
+
+        self._old_root = os.environ.get('RBPKG_FILE_LOADER_ROOT')
+        os.environ['RBPKG_FILE_LOADER_ROOT'] = self.root
+
+        self.file_loader = FilePackageDataLoader()
+        self.loader = ContentAddressedPackageDataLoader(self.file_loader)
+
+    def tearDown(self):
+        super(ContentStoreTests, self).tearDown()
+
+        set_data_loader(None)
+
+        if self._old_root is None:
+            del os.environ['RBPKG_FILE_LOADER_ROOT']
+        else:
+            os.environ['RBPKG_FILE_LOADER_ROOT'] = self._old_root
+
+        shutil.rmtree(self.root)
+
+    def test_parse_object_path(self):
+        """Testing parse_object_path"""
+        digest = get_object_digest({'a': 1})
+
+        self.assertEqual(parse_object_path(get_object_path(digest)), digest)
+        self.assertIsNone(parse_object_path('/packages/index.json'))
+
+    def test_write_repository_dedupes_objects(self):
+        """Testing ContentStore.write_repository stores identical content
+        once
+        """
+        filenames = []
+
+        for dirpath, dirnames, files in os.walk(
+                os.path.join(self.root, 'packages', 'objects')):
+            filenames += files
+
+        # Two channel manifests, plus the package rules they share.
+        self.assertEqual(len(filenames), 3)
+        self.assertEqual(self.store.objects_written, 3)
+        self.assertEqual(self.store.objects_reused, 1)
+
+    def test_write_repository_rewrites_channel_paths(self):
+        """Testing ContentStore.write_repository points channels at objects"""
+        bundle_data = self.file_loader.load_by_path(
+            '/packages/TestPackage/index.json')
+        manifest_file = bundle_data['channels'][0]['manifest_file']
+
+        self.assertTrue(manifest_file.startswith('../objects/'))
+        self.assertIsNotNone(parse_object_path(manifest_file))
+
+    def test_load_by_path_resolves_refs(self):
+        """Testing ContentAddressedPackageDataLoader.load_by_path with
+        references
+        """
+        set_data_loader(self.loader)
+
+        bundle = PackageRepository().lookup_package_bundle('TestPackage')
+        channel = bundle.current_channel
+
+        self.assertEqual(channel.releases[0].version, '1.0')
+        self.assertEqual(len(channel.package_rules), 1)
+        self.assertEqual(channel.package_rules[0].package_name,
+                         'TestPackage')
+
+    def test_load_by_path_shares_objects(self):
+        """Testing ContentAddressedPackageDataLoader.load_by_path only
+        fetches shared objects once
+        """
+        self.spy_on(self.file_loader.load_by_path)
+
+        paths = []
+
+        for name in ('TestPackage', 'OtherPackage'):
+            bundle_path = '/packages/%s/index.json' % name
+            bundle_data = self.loader.load_by_path(bundle_path)
+            paths.append(os.path.normpath(os.path.join(
+                os.path.dirname(bundle_path),
+                bundle_data['channels'][0]['manifest_file'])))
+
+        first = self.loader.load_by_path(paths[0])
+        second = self.loader.load_by_path(paths[1])
+
+        self.assertEqual(first['package_rules'], PACKAGE_RULES)
+        self.assertIs(first['package_rules'], second['package_rules'])
+        self.assertIs(self.loader.load_by_path(paths[0]), first)
+
+        # Two bundles, two channels, and one set of package rules.
+        self.assertEqual(len(self.file_loader.load_by_path.calls), 5)
+
+    def test_load_by_path_with_hash_mismatch(self):
+        """Testing ContentAddressedPackageDataLoader.load_by_path with
+        content that doesn't match its hash
+        """
+        digest = get_object_digest(PACKAGE_RULES)
+        path = get_object_path(digest)
+
+        with open(os.path.join(self.root, *path.strip('/').split('/')),
+                  'w') as fp:
+            fp.write(json.dumps([]))
+
+        with self.assertRaises(LoadDataError):
+            self.loader.load_by_path(path)
@@ -0,0 +1,1232 @@
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import SkipTest
+
+import six
+from kgb import SpyAgency
+from six.moves.urllib.parse import urlsplit
+
+from rbpkg.repository.archives import (ARCHIVE_FORMAT_TAR,
+                                       ARCHIVE_FORMAT_ZIP,
+                                       create_repository_archive)
+from rbpkg.repository import loaders
+from rbpkg.repository.errors import LoadDataError, PathNotFoundError
+from rbpkg.repository.loaders import (ArchivePackageDataLoader,
+                                      CachingPackageDataLoader,
+                                      CoalescingPackageDataLoader,
+                                      FilePackageDataLoader,
+                                      HttpPackageDataLoader,
+                                      InMemoryPackageDataLoader,
+                                      InstrumentedPackageDataLoader,
+                                      MirroredPackageDataLoader)
+from rbpkg.testing.http_server import TestHTTPServer
+from rbpkg.testing.testcases import TestCase
+from rbpkg.utils.compression import (COMPRESSION_GZIP, COMPRESSION_XZ,
+                                     compress, get_supported_compressions)
+from rbpkg.utils.json_backends import StdlibJSONBackend, set_json_backend
+
+
+class FilePackageDataLoaderTests(SpyAgency, TestCase):
+    """Unit tests for rbpkg.repository.loaders.FilePackageDataLoader."""
+
+    def setUp(self):
+        super(FilePackageDataLoaderTests, self).setUp()
+
+        self.root = tempfile.mkdtemp(prefix='rbpkg-tests.')
+        os.mkdir(os.path.join(self.root, 'packages'))
+
+        with open(os.path.join(self.root, 'packages', 'index.json'),
+                  'w') as fp:
+            fp.write(json.dumps({'format_version': '1.0'}))
+
+        self._old_root = os.environ.get('RBPKG_FILE_LOADER_ROOT')
+        os.environ['RBPKG_FILE_LOADER_ROOT'] = self.root
+
+        self.loader = FilePackageDataLoader()
+
+    def tearDown(self):
+        super(FilePackageDataLoaderTests, self).tearDown()
+
+        if self._old_root is None:
+            del os.environ['RBPKG_FILE_LOADER_ROOT']
+        else:
+            os.environ['RBPKG_FILE_LOADER_ROOT'] = self._old_root
+
+        shutil.rmtree(self.root)
+
+    def test_load_by_path(self):
+        """Testing FilePackageDataLoader.load_by_path"""
+        self.assertEqual(self.loader.load_by_path('/packages/index.json'),
+                         {'format_version': '1.0'})
+
+    def test_load_by_path_with_load_listener(self):
+        """Testing FilePackageDataLoader.load_by_path notifies load
+        listeners
+        """
+        paths = []
+        self.loader.add_load_listener(paths.append)
+
+        try:
+            self.loader.load_by_path('/packages/index.json')
+            self.loader.fetch_by_path('/packages/index.json')
+
+            # Listeners only see loads from the loader they were added to.
+            FilePackageDataLoader().load_by_path('/packages/index.json')
+        finally:
+            self.loader.remove_load_listener(paths.append)
+
+        self.loader.load_by_path('/packages/index.json')
+
+        self.assertEqual(paths,
+                         ['/packages/index.json', '/packages/index.json'])
+
+    def test_load_by_path_with_large_file(self):
+        """Testing FilePackageDataLoader.load_by_path with a file large
+        enough to be memory-mapped
+        """
+        if six.PY2:
+            raise SkipTest('Memory-mapped files are not parsed on Python 2')
+
+        data = self._write_large_file()
+
+        backend = StdlibJSONBackend()
+        backend.accepts_buffers = True
+        set_json_backend(backend)
+        self.spy_on(self.loader._parse_mapped_file)
+
+        try:
+            self.assertEqual(
+                self.loader.load_by_path('/packages/large.json'),
+                data)
+        finally:
+            set_json_backend(None)
+
+        self.assertTrue(self.loader._parse_mapped_file.called)
+
+    def test_load_by_path_with_large_file_and_no_buffer_support(self):
+        """Testing FilePackageDataLoader.load_by_path with a large file and
+        a JSON backend that can't parse buffers doesn't memory-map it
+        """
+        data = self._write_large_file()
+
+        set_json_backend(StdlibJSONBackend())
+        self.spy_on(self.loader._parse_mapped_file)
+
+        try:
+            self.assertEqual(
+                self.loader.load_by_path('/packages/large.json'),
+                data)
+        finally:
+            set_json_backend(None)
+
+        self.assertFalse(self.loader._parse_mapped_file.called)
+
+    def test_load_by_path_with_small_file_not_mapped(self):
+        """Testing FilePackageDataLoader.load_by_path with a small file
+        doesn't memory-map it
+        """
+        self.spy_on(self.loader._parse_mapped_file)
+
+        self.loader.load_by_path('/packages/index.json')
+        self.assertFalse(self.loader._parse_mapped_file.called)
+
+    def test_load_by_path_with_not_found(self):
+        """Testing FilePackageDataLoader.load_by_path with path not found"""
+        self.assertRaises(
+            LoadDataError,
+            lambda: self.loader.load_by_path('/packages/missing.json'))
+
+    def test_load_by_path_with_gzip(self):
+        """Testing FilePackageDataLoader.load_by_path with .json.gz file"""
+        self._write_compressed('TestPackage.json', {'name': 'TestPackage'},
+                               COMPRESSION_GZIP)
+
+        self.assertEqual(
+            self.loader.load_by_path('/packages/TestPackage.json'),
+            {'name': 'TestPackage'})
+
+    def test_load_by_path_with_xz(self):
+        """Testing FilePackageDataLoader.load_by_path with .json.xz file"""
+        if COMPRESSION_XZ not in get_supported_compressions():
+            raise SkipTest('XZ compression is not supported')
+
+        self._write_compressed('TestPackage.json', {'name': 'TestPackage'},
+                               COMPRESSION_XZ)
+
+        self.assertEqual(
+            self.loader.load_by_path('/packages/TestPackage.json'),
+            {'name': 'TestPackage'})
+
+    def test_load_by_path_prefers_compressed(self):
+        """Testing FilePackageDataLoader.load_by_path prefers compressed
+        files
+        """
+        self._write_compressed('index.json', {'format_version': '2.0'},
+                               COMPRESSION_GZIP)
+        self._set_mtime('index.json', 1000)
+        self._set_mtime('index.json.gz', 1000)
+
+        self.assertEqual(self.loader.load_by_path('/packages/index.json'),
+                         {'format_version': '2.0'})
+
+    def test_load_by_path_prefers_newer_uncompressed(self):
+        """Testing FilePackageDataLoader.load_by_path prefers an
+        uncompressed file that's newer than the compressed file
+        """
+        self._write_compressed('index.json', {'format_version': '2.0'},
+                               COMPRESSION_GZIP)
+        self._set_mtime('index.json', 2000)
+        self._set_mtime('index.json.gz', 1000)
+
+        self.assertEqual(self.loader.load_by_path('/packages/index.json'),
+                         {'format_version': '1.0'})
+
+    def test_fetch_by_path_with_gzip(self):
+        """Testing FilePackageDataLoader.fetch_by_path with .json.gz file"""
+        self._write_compressed('TestPackage.json', {'name': 'TestPackage'},
+                               COMPRESSION_GZIP)
+
+        result = self.loader.fetch_by_path('/packages/TestPackage.json')
+
+        self.assertTrue(result.content.startswith(b'\x1f\x8b'))
+        self.assertEqual(
+            self.loader.parse_content(result.path, result.content),
+            {'name': 'TestPackage'})
+
+    def test_fetch_by_path(self):
+        """Testing FilePackageDataLoader.fetch_by_path"""
+        result = self.loader.fetch_by_path('/packages/index.json')
+
+        self.assertEqual(result.content, b'{"format_version": "1.0"}')
+        self.assertIsNotNone(result.etag)
+        self.assertIsNotNone(result.last_modified)
+        self.assertFalse(result.not_modified)
+
+    def test_fetch_by_path_with_unchanged_etag(self):
+        """Testing FilePackageDataLoader.fetch_by_path with unchanged ETag"""
+        etag = self.loader.fetch_by_path('/packages/index.json').etag
+        result = self.loader.fetch_by_path('/packages/index.json', etag=etag)
+
+        self.assertTrue(result.not_modified)
+        self.assertIsNone(result.content)
+
+    def _write_large_file(self):
+        """Write a manifest large enough to be memory-mapped.
+
+        The manifest is written to :file:`packages/large.json`.
+
+        Returns:
+            dict:
+            The data written to the manifest.
+        """
+        data = {
+            'name': 'TestPackage',
+            'releases': [
+                {'version': '1.0.%d' % i}
+                for i in range(FilePackageDataLoader.MMAP_MIN_SIZE // 10)
+            ],
+        }
+
+        with open(os.path.join(self.root, 'packages', 'large.json'),
+                  'w') as fp:
+            fp.write(json.dumps(data))
+
+        return data
+
+    def _set_mtime(self, name, mtime):
+        """Set the modification time of a file in the repository.
+
+        Args:
+            name (unicode):
+                The name of the file in :file:`packages/`.
+
+            mtime (int):
+                The new modification time.
+        """
+        os.utime(os.path.join(self.root, 'packages', name), (mtime, mtime))
+
+    def _write_compressed(self, name, data, compression):
+        """Write a compressed manifest file to the repository.
+
+        Args:
+            name (unicode):
+                The name of the uncompressed file in :file:`packages/`.
+
+            data (dict):
+                The data to write.
+
+            compression (unicode):
+                The compression format.
+        """
+        filename = os.path.join(self.root, 'packages', name)
+
+        if compression == COMPRESSION_GZIP:
+            filename += '.gz'
+        else:
+            filename += '.xz'
+
+        with open(filename, 'wb') as fp:
+            fp.write(compress(json.dumps(data).encode('utf-8'), compression))
+
+
+class HttpPackageDataLoaderTests(TestCase):
+    """Unit tests for rbpkg.repository.loaders.HttpPackageDataLoader."""
+
+    def setUp(self):
+        super(HttpPackageDataLoaderTests, self).setUp()
+
+        self.server = TestHTTPServer({
+            '/packages/index.json': {
+                'format_version': '1.0',
+            },
+            '/packages/TestPackage/index.json': {
+                'name': 'TestPackage',
+            },
+            '/packages/bad.json': b'{bad',
+        })
+        self.server.start()
+
+        self.loader = HttpPackageDataLoader(self.server.url)
+
+    def tearDown(self):
+        super(HttpPackageDataLoaderTests, self).tearDown()
+
+        self.loader.close()
+        self.server.stop()
+
+    def test_load_by_path(self):
+        """Testing HttpPackageDataLoader.load_by_path"""
+        self.assertEqual(self.loader.load_by_path('/packages/index.json'),
+                         {'format_version': '1.0'})
+        self.assertEqual(self.server.request_log, ['/packages/index.json'])
+
+    def test_load_by_path_with_parts(self):
+        """Testing HttpPackageDataLoader.load_by_path with multiple parts"""
+        self.assertEqual(
+            self.loader.load_by_path('packages', 'TestPackage', 'index.json'),
+            {'name': 'TestPackage'})
+
+    def test_load_by_path_with_base_url_prefix(self):
+        """Testing HttpPackageDataLoader.load_by_path with a path prefix in
+        the base URL
+        """
+        self.server.path_to_content['/mirror/packages/index.json'] = {
+            'mirror': True,
+        }
+
+        loader = HttpPackageDataLoader('%smirror' % self.server.url)
+
+        try:
+            self.assertEqual(loader.load_by_path('/packages/index.json'),
+                             {'mirror': True})
+        finally:
+            loader.close()
+
+    def test_load_by_path_with_absolute_url(self):
+        """Testing HttpPackageDataLoader.load_by_path with an absolute URL"""
+        self.assertEqual(
+            self.loader.load_by_path('%spackages/index.json'
+                                     % self.server.url),
+            {'format_version': '1.0'})
+
+    def test_load_by_path_with_not_found(self):
+        """Testing HttpPackageDataLoader.load_by_path with path not found"""
+        self.assertRaises(
+            LoadDataError,
+            lambda: self.loader.load_by_path('/packages/missing.json'))
+
+    def test_load_by_path_with_invalid_json(self):
+        """Testing HttpPackageDataLoader.load_by_path with invalid JSON"""
+        self.assertRaises(
+            LoadDataError,
+            lambda: self.loader.load_by_path('/packages/bad.json'))
+
+    def test_load_by_path_with_gzip_encoding(self):
+        """Testing HttpPackageDataLoader.load_by_path with gzip
+        Content-Encoding
+        """
+        self.server.compress_responses = True
+
+        result = self.loader.fetch_by_path('/packages/index.json')
+        self.assertTrue(result.content.startswith(b'\x1f\x8b'))
+
+        self.assertEqual(self.loader.load_by_path('/packages/index.json'),
+                         {'format_version': '1.0'})
+
+    def test_connection_reuse(self):
+        """Testing HttpPackageDataLoader reuses connections"""
+        for i in range(5):
+            self.loader.load_by_path('/packages/index.json')
+            self.loader.load_by_path('/packages/TestPackage/index.json')
+
+        self.assertEqual(self.server.connections_accepted, 1)
+        self.assertEqual(self.server.requests_handled, 10)
+        self.assertEqual(
+            self.loader.get_connection_stats(),
+            {
+                'requests_sent': 10,
+                'connections_opened': 1,
+                'connections_reused': 9,
+                'idle_connections': 1,
+            })
+
+    def test_connection_reuse_after_server_close(self):
+        """Testing HttpPackageDataLoader retries when a pooled connection
+        was closed
+        """
+        self.loader.load_by_path('/packages/index.json')
+
+        # Simulate the server dropping the idle connection.
+        for conns in self.loader._idle_connections.values():
+            for conn in conns:
+                conn.sock.close()
+
+        self.assertEqual(self.loader.load_by_path('/packages/index.json'),
+                         {'format_version': '1.0'})
+        self.assertEqual(self.loader.connections_opened, 2)
+
+    def test_connection_reuse_retries_once(self):
+        """Testing HttpPackageDataLoader only retries once on a new
+        connection when pooled connections were closed
+        """
+        parsed_url = urlsplit(self.server.url)
+        key = (parsed_url.scheme, parsed_url.netloc)
+        self.loader.max_idle_connections = 3
+
+        conns = [
+            self.loader._acquire_connection(key)[0]
+            for i in range(3)
+        ]
+
+        # Simulate the server dropping all the idle connections.
+        for conn in conns:
+            conn.connect()
+            conn.sock.close()
+            self.loader._release_connection(key, conn)
+
+        self.assertEqual(self.loader.load_by_path('/packages/index.json'),
+                         {'format_version': '1.0'})
+        self.assertEqual(self.loader.connections_opened, 4)
+        self.assertEqual(self.loader.connections_reused, 1)
+
+    def test_load_by_paths(self):
+        """Testing HttpPackageDataLoader.load_by_paths loads concurrently"""
+        paths = []
+
+        for i in range(6):
+            path = '/packages/Package%s/index.json' % i
+            self.server.path_to_content[path] = {'name': 'Package%s' % i}
+            paths.append(path)
+
+        self.server.delay = 0.3
+
+        start = time.time()
+        result = self.loader.load_by_paths(paths + paths[:2])
+        duration = time.time() - start
+
+        self.assertEqual(
+            result,
+            dict(
+                ('/packages/Package%s/index.json' % i,
+                 {'name': 'Package%s' % i})
+                for i in range(6)
+            ))
+        self.assertEqual(self.server.requests_handled, 6)
+        self.assertTrue(duration < 6 * 0.3)
+
+    def test_load_by_paths_with_error(self):
+        """Testing HttpPackageDataLoader.load_by_paths with path not found"""
+        self.assertRaises(
+            LoadDataError,
+            lambda: self.loader.load_by_paths([
+                '/packages/index.json',
+                '/packages/missing.json',
+            ]))
+
+    def test_try_load_by_paths_with_error(self):
+        """Testing HttpPackageDataLoader.try_load_by_paths with path not
+        found returns the other paths' data
+        """
+        results, errors = self.loader.try_load_by_paths([
+            '/packages/index.json',
+            '/packages/missing.json',
+        ])
+
+        self.assertEqual(results, {
+            '/packages/index.json': {'format_version': '1.0'},
+        })
+        self.assertEqual(list(errors), ['/packages/missing.json'])
+        self.assertIsInstance(errors['/packages/missing.json'],
+                              PathNotFoundError)
+        self.assertEqual(self.server.requests_handled, 2)
+
+    def test_close(self):
+        """Testing HttpPackageDataLoader.close"""
+        self.loader.load_by_path('/packages/index.json')
+        self.loader.close()
+
+        self.assertEqual(
+            self.loader.get_connection_stats()['idle_connections'],
+            0)
+        self.assertEqual(self.loader.load_by_path('/packages/index.json'),
+                         {'format_version': '1.0'})
+
+
+class ArchivePackageDataLoaderTests(TestCase):
+    """Unit tests for rbpkg.repository.loaders.ArchivePackageDataLoader."""
+
+    def setUp(self):
+        super(ArchivePackageDataLoaderTests, self).setUp()
+
+        self.tempdir = tempfile.mkdtemp(prefix='rbpkg-tests.')
+        self.root = os.path.join(self.tempdir, 'repo')
+        os.makedirs(os.path.join(self.root, 'packages', 'TestPackage'))
+
+        self._write_file('index.json', b'{"format_version": "1.0"}')
+        self._write_file('TestPackage/index.json',
+                         compress(b'{"name": "TestPackage"}',
+                                  COMPRESSION_GZIP),
+                         extension='.gz')
+
+        self.loaders = []
+
+    def tearDown(self):
+        super(ArchivePackageDataLoaderTests, self).tearDown()
+
+        for loader in self.loaders:
+            loader.close()
+
+        shutil.rmtree(self.tempdir)
+
+    def test_load_by_path_with_zip(self):
+        """Testing ArchivePackageDataLoader.load_by_path with zip archive"""
+        loader = self._create_loader(ARCHIVE_FORMAT_ZIP)
+
+        self.assertEqual(loader.archive_format, ARCHIVE_FORMAT_ZIP)
+        self.assertEqual(loader.load_by_path('/packages/index.json'),
+                         {'format_version': '1.0'})
+
+    def test_load_by_path_with_tar(self):
+        """Testing ArchivePackageDataLoader.load_by_path with tar archive"""
+        loader = self._create_loader(ARCHIVE_FORMAT_TAR)
+
+        self.assertEqual(loader.archive_format, ARCHIVE_FORMAT_TAR)
+        self.assertEqual(loader.load_by_path('/packages/index.json'),
+                         {'format_version': '1.0'})
+
+    def test_load_by_path_with_compressed_member(self):
+        """Testing ArchivePackageDataLoader.load_by_path with compressed
+        member
+        """
+        loader = self._create_loader(ARCHIVE_FORMAT_ZIP)
+
+        self.assertEqual(
+            loader.load_by_path('/packages/TestPackage/index.json'),
+            {'name': 'TestPackage'})
+
+    def test_load_by_path_with_not_found(self):
+        """Testing ArchivePackageDataLoader.load_by_path with path not
+        found
+        """
+        loader = self._create_loader(ARCHIVE_FORMAT_ZIP)
+
+        self.assertRaises(
+            LoadDataError,
+            lambda: loader.load_by_path('/packages/missing.json'))
+
+    def test_load_by_paths(self):
+        """Testing ArchivePackageDataLoader.load_by_paths"""
+        loader = self._create_loader(ARCHIVE_FORMAT_TAR)
+
+        self.assertEqual(
+            loader.load_by_paths(['/packages/index.json',
+                                  '/packages/TestPackage/index.json']),
+            {
+                '/packages/index.json': {'format_version': '1.0'},
+                '/packages/TestPackage/index.json': {'name': 'TestPackage'},
+            })
+
+    def test_fetch_by_path_with_unchanged_etag(self):
+        """Testing ArchivePackageDataLoader.fetch_by_path with unchanged
+        ETag
+        """
+        for archive_format in (ARCHIVE_FORMAT_ZIP, ARCHIVE_FORMAT_TAR):
+            loader = self._create_loader(archive_format)
+            result = loader.fetch_by_path('/packages/index.json')
+
+            self.assertEqual(result.content, b'{"format_version": "1.0"}')
+            self.assertIsNotNone(result.etag)
+            self.assertIsNotNone(result.last_modified)
+
+            result = loader.fetch_by_path('/packages/index.json',
+                                          etag=result.etag)
+            self.assertTrue(result.not_modified)
+            self.assertIsNone(result.content)
+
+    def test_get_paths(self):
+        """Testing ArchivePackageDataLoader.get_paths"""
+        loader = self._create_loader(ARCHIVE_FORMAT_ZIP)
+
+        self.assertEqual(loader.get_paths(),
+                         ['/packages/TestPackage/index.json.gz',
+                          '/packages/index.json'])
+
+    def test_init_with_invalid_archive(self):
+        """Testing ArchivePackageDataLoader with a file that isn't an
+        archive
+        """
+        filename = os.path.join(self.tempdir, 'bad.zip')
+
+        with open(filename, 'wb') as fp:
+            fp.write(b'not an archive')
+
+        self.assertRaises(LoadDataError,
+                          lambda: ArchivePackageDataLoader(filename))
+
+    def _create_loader(self, archive_format):
+        """Create an archive of the repository and a loader for it.
+
+        Args:
+            archive_format (unicode):
+                The archive format.
+
+        Returns:
+            rbpkg.repository.loaders.ArchivePackageDataLoader:
+            The new loader.
+        """
+        filename = os.path.join(self.tempdir,
+                                'snapshot.%s' % archive_format)
+        create_repository_archive(self.root, filename)
+
+        loader = ArchivePackageDataLoader(filename)
+        self.loaders.append(loader)
+
+        return loader
+
+    def _write_file(self, name, content, extension=''):
+        """Write a file to the repository's packages/ directory.
+
+        Args:
+            name (unicode):
+                The name of the file, relative to :file:`packages/`.
+
+            content (bytes):
+                The content to write.
+
+            extension (unicode, optional):
+                An extension to append to the filename.
+        """
+        with open(os.path.join(self.root, 'packages', name) + extension,
+                  'wb') as fp:
+            fp.write(content)
+
+
+class InMemoryPackageDataLoaderTests(TestCase):
+    """Unit tests for rbpkg.repository.loaders.InMemoryPackageDataLoader."""
+
+    def test_load_by_paths(self):
+        """Testing InMemoryPackageDataLoader.load_by_paths"""
+        loader = InMemoryPackageDataLoader({
+            '/packages/index.json': {'format_version': '1.0'},
+            '/packages/TestPackage/index.json': {'name': 'TestPackage'},
+        })
+
+        self.assertEqual(
+            loader.load_by_paths(['/packages/index.json',
+                                  '/packages/TestPackage/index.json']),
+            {
+                '/packages/index.json': {'format_version': '1.0'},
+                '/packages/TestPackage/index.json': {'name': 'TestPackage'},
+            })
+
+    def test_fetch_by_path(self):
+        """Testing InMemoryPackageDataLoader.fetch_by_path"""
+        loader = InMemoryPackageDataLoader({
+            '/packages/index.json': {'format_version': '1.0'},
+        })
+
+        result = loader.fetch_by_path('/packages/index.json')
+        self.assertEqual(result.content, b'{"format_version": "1.0"}')
+        self.assertIsNone(result.etag)
+
+
+class CachingPackageDataLoaderTests(SpyAgency, TestCase):
+    """Unit tests for rbpkg.repository.loaders.CachingPackageDataLoader."""
+
+    def setUp(self):
+        super(CachingPackageDataLoaderTests, self).setUp()
+
+        self.cache_dir = tempfile.mkdtemp(prefix='rbpkg-tests.')
+        self.server = TestHTTPServer({
+            '/packages/index.json': {
+                'format_version': '1.0',
+            },
+        })
+        self.server.start()
+
+        self.http_loader = HttpPackageDataLoader(self.server.url)
+
+    def tearDown(self):
+        super(CachingPackageDataLoaderTests, self).tearDown()
+
+        self.http_loader.close()
+        self.server.stop()
+        shutil.rmtree(self.cache_dir)
+
+    def test_load_by_path_with_unchanged_content(self):
+        """Testing CachingPackageDataLoader.load_by_path revalidates unchanged
+        content
+        """
+        loader = CachingPackageDataLoader(self.http_loader, self.cache_dir)
+
+        self.assertEqual(loader.load_by_path('/packages/index.json'),
+                         {'format_version': '1.0'})
+        self.assertEqual(loader.load_by_path('/packages/index.json'),
+                         {'format_version': '1.0'})
+
+        self.assertEqual(self.server.requests_handled, 2)
+        self.assertEqual(self.server.not_modified_count, 1)
+        self.assertEqual(loader.hits, 1)
+        self.assertEqual(loader.misses, 1)
+
+    def test_load_by_path_with_unchanged_content_marks_validated(self):
+        """Testing CachingPackageDataLoader.load_by_path with unchanged
+        content marks the cache entry as validated without rewriting it
+        """
+        loader = CachingPackageDataLoader(self.http_loader, self.cache_dir)
+        loader.load_by_path('/packages/index.json')
+
+        self.spy_on(loader.cache.set)
+        self.spy_on(loader.cache.mark_validated)
+
+        loader.load_by_path('/packages/index.json')
+
+        self.assertFalse(loader.cache.set.called)
+        self.assertTrue(loader.cache.mark_validated.called_with(
+            '/packages/index.json'))
+
+    def test_load_by_path_with_changed_content(self):
+        """Testing CachingPackageDataLoader.load_by_path with changed
+        content
+        """
+        loader = CachingPackageDataLoader(self.http_loader, self.cache_dir)
+        loader.load_by_path('/packages/index.json')
+
+        self.server.path_to_content['/packages/index.json'] = {
+            'format_version': '2.0',
+        }
+
+        self.assertEqual(loader.load_by_path('/packages/index.json'),
+                         {'format_version': '2.0'})
+        self.assertEqual(self.server.not_modified_count, 0)
+        self.assertEqual(loader.misses, 2)
+
+    def test_load_by_path_shares_cache_between_loaders(self):
+        """Testing CachingPackageDataLoader.load_by_path with cache populated
+        by another loader
+        """
+        CachingPackageDataLoader(self.http_loader, self.cache_dir) \
+            .load_by_path('/packages/index.json')
+
+        loader = CachingPackageDataLoader(self.http_loader, self.cache_dir)
+        result = loader.fetch_by_path('/packages/index.json')
+
+        self.assertTrue(result.from_cache)
+        self.assertEqual(result.content, b'{"format_version": "1.0"}')
+        self.assertEqual(self.server.not_modified_count, 1)
+
+    def test_fetch_by_path_with_etag_and_not_cached(self):
+        """Testing CachingPackageDataLoader.fetch_by_path with an ETag for a
+        path that isn't cached
+        """
+        etag = self.http_loader.fetch_by_path('/packages/index.json').etag
+
+        loader = CachingPackageDataLoader(self.http_loader, self.cache_dir)
+        result = loader.fetch_by_path('/packages/index.json', etag=etag)
+
+        self.assertTrue(result.not_modified)
+        self.assertIsNone(result.content)
+        self.assertEqual(self.server.not_modified_count, 1)
+        self.assertEqual(loader.cache.get_total_size(), 0)
+
+    def test_load_by_path_with_not_found(self):
+        """Testing CachingPackageDataLoader.load_by_path with path not
+        found
+        """
+        loader = CachingPackageDataLoader(self.http_loader, self.cache_dir,
+                                          negative_ttl=0)
+
+        self.assertRaises(
+            LoadDataError,
+            lambda: loader.load_by_path('/packages/missing.json'))
+        self.assertEqual(loader.cache.get_total_size(), 0)
+
+    def test_load_by_path_with_cached_not_found(self):
+        """Testing CachingPackageDataLoader.load_by_path with a cached
+        not-found result
+        """
+        loader = CachingPackageDataLoader(self.http_loader, self.cache_dir)
+
+        for i in range(3):
+            self.assertRaises(
+                PathNotFoundError,
+                lambda: loader.load_by_path('/packages/missing.json'))
+
+        self.assertEqual(self.server.requests_handled, 1)
+        self.assertEqual(loader.negative_hits, 2)
+
+        # A new loader sharing the cache directory should use the on-disk
+        # result.
+        loader = CachingPackageDataLoader(self.http_loader, self.cache_dir)
+
+        self.assertRaises(
+            PathNotFoundError,
+            lambda: loader.load_by_path('/packages/missing.json'))
+        self.assertEqual(self.server.requests_handled, 1)
+        self.assertEqual(loader.negative_hits, 1)
+
+    def test_load_by_path_with_expired_not_found(self):
+        """Testing CachingPackageDataLoader.load_by_path with an expired
+        not-found result
+        """
+        self.assertRaises(
+            PathNotFoundError,
+            lambda: CachingPackageDataLoader(self.http_loader, self.cache_dir)
+            .load_by_path('/packages/new.json'))
+
+        self.server.path_to_content['/packages/new.json'] = {
+            'format_version': '1.0',
+        }
+
+        loader = CachingPackageDataLoader(self.http_loader, self.cache_dir,
+                                          negative_ttl=0.01)
+        time.sleep(0.02)
+
+        self.assertEqual(loader.load_by_path('/packages/new.json'),
+                         {'format_version': '1.0'})
+        self.assertEqual(loader.negative_hits, 0)
+
+    def test_load_by_path_with_offline(self):
+        """Testing CachingPackageDataLoader.load_by_path in offline mode"""
+        CachingPackageDataLoader(self.http_loader, self.cache_dir) \
+            .load_by_path('/packages/index.json')
+
+        loader = CachingPackageDataLoader(self.http_loader, self.cache_dir,
+                                          offline=True)
+
+        self.assertEqual(loader.load_by_path('/packages/index.json'),
+                         {'format_version': '1.0'})
+        self.assertEqual(self.server.requests_handled, 1)
+        self.assertEqual(loader.stale_hits, 1)
+
+    def test_load_by_path_with_offline_and_not_cached(self):
+        """Testing CachingPackageDataLoader.load_by_path in offline mode with
+        a path that isn't cached
+        """
+        loader = CachingPackageDataLoader(self.http_loader, self.cache_dir,
+                                          offline=True)
+
+        self.assertRaises(
+            LoadDataError,
+            lambda: loader.load_by_path('/packages/index.json'))
+        self.assertEqual(self.server.requests_handled, 0)
+
+    def test_load_by_path_with_offline_and_stale(self):
+        """Testing CachingPackageDataLoader.load_by_path in offline mode with
+        stale content
+        """
+        CachingPackageDataLoader(self.http_loader, self.cache_dir) \
+            .load_by_path('/packages/index.json')
+
+        loader = CachingPackageDataLoader(self.http_loader, self.cache_dir,
+                                          offline=True, max_staleness=0)
+        self.spy_on(loaders.logger.warning)
+
+        for i in range(2):
+            self.assertEqual(loader.load_by_path('/packages/index.json'),
+                             {'format_version': '1.0'})
+
+        self.assertEqual(len(loaders.logger.warning.calls), 1)
+        self.assertEqual(self.server.requests_handled, 1)
+
+    def test_load_by_path_with_fetch_error_and_max_staleness(self):
+        """Testing CachingPackageDataLoader.load_by_path with a failed fetch
+        and a cached copy within max_staleness
+        """
+        loader = CachingPackageDataLoader(self.http_loader, self.cache_dir,
+                                          max_staleness=60)
+        loader.load_by_path('/packages/index.json')
+
+        def _fetch_by_path(*args, **kwargs):
+            raise LoadDataError('Connection refused')
+
+        self.spy_on(self.http_loader.fetch_by_path, call_fake=_fetch_by_path)
+
+        self.assertEqual(loader.load_by_path('/packages/index.json'),
+                         {'format_version': '1.0'})
+        self.assertEqual(loader.stale_hits, 1)
+
+    def test_load_by_path_with_fetch_error_and_too_stale(self):
+        """Testing CachingPackageDataLoader.load_by_path with a failed fetch
+        and a cached copy older than max_staleness
+        """
+        loader = CachingPackageDataLoader(self.http_loader, self.cache_dir,
+                                          max_staleness=0)
+        loader.load_by_path('/packages/index.json')
+        time.sleep(0.01)
+
+        def _fetch_by_path(*args, **kwargs):
+            raise LoadDataError('Connection refused')
+
+        self.spy_on(self.http_loader.fetch_by_path, call_fake=_fetch_by_path)
+
+        self.assertRaises(
+            LoadDataError,
+            lambda: loader.load_by_path('/packages/index.json'))
+
+
+class CoalescingPackageDataLoaderTests(TestCase):
+    """Unit tests for rbpkg.repository.loaders.CoalescingPackageDataLoader."""
+
+    def test_load_by_path_with_concurrent_loads(self):
+        """Testing CoalescingPackageDataLoader.load_by_path with concurrent
+        loads of the same path
+        """
+        num_threads = 4
+        release = threading.Event()
+        calls = []
+
+        class _BlockingLoader(InMemoryPackageDataLoader):
+            def load_by_path(self, *parts):
+                calls.append(parts)
+                release.wait()
+
+                return super(_BlockingLoader, self).load_by_path(*parts)
+
+        loader = CoalescingPackageDataLoader(_BlockingLoader({
+            '/packages/index.json': {'format_version': '1.0'},
+        }))
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    loader.load_by_path('/packages/index.json')))
+            for i in range(num_threads)
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        while loader.coalesced_count < num_threads - 1:
+            time.sleep(0.01)
+
+        release.set()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'format_version': '1.0'}] * num_threads)
+        self.assertEqual(loader.coalesced_count, num_threads - 1)
+
+
+class InstrumentedPackageDataLoaderTests(TestCase):
+    """Unit tests for rbpkg.repository.loaders.InstrumentedPackageDataLoader.
+    """
+
+    def setUp(self):
+        super(InstrumentedPackageDataLoaderTests, self).setUp()
+
+        self.loader = InstrumentedPackageDataLoader(InMemoryPackageDataLoader({
+            '/packages/index.json': {
+                'format_version': '1.0',
+            },
+        }))
+
+    def test_load_by_path(self):
+        """Testing InstrumentedPackageDataLoader.load_by_path records loads"""
+        self.assertEqual(self.loader.load_by_path('/packages/index.json'),
+                         {'format_version': '1.0'})
+
+        records = self.loader.records
+        self.assertEqual(len(records), 1)
+
+        record = records[0]
+        self.assertEqual(record.path, '/packages/index.json')
+        self.assertEqual(record.size, len(b'{"format_version": "1.0"}'))
+        self.assertTrue(record.fetch_time >= 0)
+        self.assertTrue(record.parse_time >= 0)
+        self.assertFalse(record.from_cache)
+        self.assertIsNone(record.error)
+
+    def test_fetch_by_path(self):
+        """Testing InstrumentedPackageDataLoader.fetch_by_path records
+        fetches
+        """
+        result = self.loader.fetch_by_path('/packages/index.json')
+
+        self.assertEqual(result.content, b'{"format_version": "1.0"}')
+
+        records = self.loader.records
+        self.assertEqual(len(records), 1)
+
+        record = records[0]
+        self.assertEqual(record.path, '/packages/index.json')
+        self.assertEqual(record.size, len(result.content))
+        self.assertTrue(record.fetch_time >= 0)
+        self.assertIsNone(record.parse_time)
+        self.assertIsNone(record.error)
+        self.assertIn('-', self.loader.format_summary())
+
+    def test_load_by_path_with_error(self):
+        """Testing InstrumentedPackageDataLoader.load_by_path records failed
+        loads
+        """
+        self.assertRaises(
+            LoadDataError,
+            lambda: self.loader.load_by_path('/packages/missing.json'))
+
+        records = self.loader.records
+        self.assertEqual(len(records), 1)
+        self.assertIsNotNone(records[0].error)
+        self.assertIsNone(records[0].parse_time)
+
+    def test_load_by_path_with_cache_hit(self):
+        """Testing InstrumentedPackageDataLoader.load_by_path with content
+        from a cache
+        """
+        cache_dir = tempfile.mkdtemp(prefix='rbpkg-tests.')
+        server = TestHTTPServer({
+            '/packages/index.json': {
+                'format_version': '1.0',
+            },
+        })
+        server.start()
+        http_loader = HttpPackageDataLoader(server.url)
+
+        try:
+            loader = InstrumentedPackageDataLoader(
+                CachingPackageDataLoader(http_loader, cache_dir))
+            loader.load_by_path('/packages/index.json')
+            loader.load_by_path('/packages/index.json')
+        finally:
+            http_loader.close()
+            server.stop()
+            shutil.rmtree(cache_dir)
+
+        self.assertEqual(
+            [record.from_cache for record in loader.records],
+            [False, True])
+        self.assertEqual(loader.get_summary()['cache_hits'], 1)
+
+    def test_add_listener(self):
+        """Testing InstrumentedPackageDataLoader.add_listener"""
+        seen = []
+        self.loader.add_listener(seen.append)
+
+        self.loader.load_by_path('/packages/index.json')
+        self.assertEqual(seen, self.loader.records)
+
+        self.loader.remove_listener(seen.append)
+        self.loader.load_by_path('/packages/index.json')
+        self.assertEqual(len(seen), 1)
+
+    def test_get_summary(self):
+        """Testing InstrumentedPackageDataLoader.get_summary"""
+        self.loader.load_by_paths(['/packages/index.json'])
+
+        try:
+            self.loader.load_by_path('/packages/missing.json')
+        except LoadDataError:
+            pass
+
+        summary = self.loader.get_summary()
+        self.assertEqual(summary['loads'], 2)
+        self.assertEqual(summary['errors'], 1)
+        self.assertEqual(summary['cache_hits'], 0)
+        self.assertEqual(summary['total_bytes'],
+                         len(b'{"format_version": "1.0"}'))
+
+        table = self.loader.format_summary()
+        self.assertIn('/packages/index.json', table)
+        self.assertIn('Total (2 loads, 1 errors)', table)
+
+        self.loader.reset()
+        self.assertEqual(self.loader.records, [])
+
+
+class MirroredPackageDataLoaderTests(TestCase):
+    """Unit tests for rbpkg.repository.loaders.MirroredPackageDataLoader."""
+
+    def setUp(self):
+        super(MirroredPackageDataLoaderTests, self).setUp()
+
+        self.servers = []
+        self.loaders = []
+
+    def tearDown(self):
+        super(MirroredPackageDataLoaderTests, self).tearDown()
+
+        for loader in self.loaders:
+            loader.close()
+
+        for server in self.servers:
+            if server._server is not None:
+                server.stop()
+
+    def test_load_by_path_uses_fastest_mirror(self):
+        """Testing MirroredPackageDataLoader.load_by_path uses the fastest
+        mirror
+        """
+        slow = self._create_server(delay=0.1)
+        fast = self._create_server()
+        medium = self._create_server(delay=0.05)
+        loader = self._create_loader([slow, fast, medium])
+
+        self.assertEqual(
+            loader.load_by_path('/packages/TestPackage/index.json'),
+            {'name': 'TestPackage'})
+
+        self.assertEqual(
+            [mirror.name for mirror in loader.get_ranked_mirrors()],
+            [fast.url, medium.url, slow.url])
+        self.assertIn('/packages/TestPackage/index.json', fast.request_log)
+        self.assertNotIn('/packages/TestPackage/index.json',
+                         slow.request_log)
+        self.assertNotIn('/packages/TestPackage/index.json',
+                         medium.request_log)
+
+    def test_load_by_path_with_failover(self):
+        """Testing MirroredPackageDataLoader.load_by_path fails over to the
+        next mirror on errors
+        """
+        fast = self._create_server()
+        slow = self._create_server(delay=0.05)
+        loader = self._create_loader([fast, slow])
+        loader.probe()
+
+        # Make the fastest mirror fail for this path.
+        del fast.path_to_content['/packages/TestPackage/index.json']
+
+        self.assertEqual(
+            loader.load_by_path('/packages/TestPackage/index.json'),
+            {'name': 'TestPackage'})
+        self.assertIn('/packages/TestPackage/index.json', slow.request_log)
+
+        stats = loader.get_mirror_stats()
+        self.assertFalse(stats[0]['healthy'])
+        self.assertEqual(stats[0]['failures'], 1)
+        self.assertTrue(stats[1]['healthy'])
+        self.assertEqual(
+            [mirror.name for mirror in loader.get_ranked_mirrors()],
+            [slow.url, fast.url])
+
+    def test_load_by_path_with_unreachable_mirror(self):
+        """Testing MirroredPackageDataLoader.load_by_path with an
+        unreachable mirror
+        """
+        down = self._create_server()
+        up = self._create_server()
+        loader = self._create_loader([down, up])
+        down.stop()
+
+        self.assertEqual(
+            loader.load_by_path('/packages/TestPackage/index.json'),
+            {'name': 'TestPackage'})
+        self.assertEqual(
+            [mirror.name for mirror in loader.get_ranked_mirrors()],
+            [up.url])
+
+    def test_load_by_path_with_stale_mirror(self):
+        """Testing MirroredPackageDataLoader.load_by_path skips mirrors with
+        an older index
+        """
+        stale = self._create_server(
+            index_timestamp='2015-10-14T08:17:29.958569')
+        stale.path_to_content['/packages/TestPackage/index.json'] = {
+            'name': 'StalePackage',
+        }
+        current = self._create_server(delay=0.05)
+        loader = self._create_loader([stale, current])
+
+        self.assertEqual(
+            loader.load_by_path('/packages/TestPackage/index.json'),
+            {'name': 'TestPackage'})
+        self.assertNotIn('/packages/TestPackage/index.json',
+                         stale.request_log)
+
+    def test_load_by_path_with_not_found(self):
+        """Testing MirroredPackageDataLoader.load_by_path with path not found
+        on any mirror
+        """
+        servers = [self._create_server(), self._create_server()]
+        loader = self._create_loader(servers)
+
+        self.assertRaises(
+            LoadDataError,
+            lambda: loader.load_by_path('/packages/Missing/index.json'))
+
+        for server in servers:
+            self.assertIn('/packages/Missing/index.json', server.request_log)
+
+        # A path missing everywhere shouldn't count against any mirror.
+        self.assertTrue(all(
+            stats['healthy']
+            for stats in loader.get_mirror_stats()
+        ))
+
+    def _create_server(self, delay=0,
+                       index_timestamp='2015-10-15T08:17:29.958569'):
+        """Create and start a server acting as a mirror.
+
+        Args:
+            delay (float, optional):
+                The delay for each response.
+
+            index_timestamp (unicode, optional):
+                The timestamp for the mirror's package index.
+
+        Returns:
+            rbpkg.testing.http_server.TestHTTPServer:
+            The running server.
+        """
+        server = TestHTTPServer({
+            '/packages/index.json': {
+                'format_version': '1.0',
+                'last_updated_timestamp': index_timestamp,
+                'bundles': [],
+            },
+            '/packages/TestPackage/index.json': {
+                'name': 'TestPackage',
+            },
+        }, delay=delay)
+        server.start()
+        self.servers.append(server)
+
+        return server
+
+    def _create_loader(self, servers):
+        """Create a mirrored loader for servers.
+
+        Args:
+            servers (list of rbpkg.testing.http_server.TestHTTPServer):
+                The servers acting as mirrors.
+
+        Returns:
+            rbpkg.repository.loaders.MirroredPackageDataLoader:
+            The new loader.
+        """
+        loader = MirroredPackageDataLoader([
+            HttpPackageDataLoader(server.url)
+            for server in servers
+        ])
+        self.loaders.append(loader)
+
+        return loader
@@ -0,0 +1,149 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+
+from rbpkg.repository.errors import LoadDataError
+from rbpkg.repository.loaders import InMemoryPackageDataLoader
+from rbpkg.repository.manifests import (iter_manifest_items,
+                                        load_all_pages,
+                                        parse_manifest_content,
+                                        serialize_manifest,
+                                        write_manifest)
+from rbpkg.testing.testcases import TestCase
+from rbpkg.utils.compression import COMPRESSION_GZIP, detect_compression
+
+
+class ManifestsTests(TestCase):
+    """Unit tests for rbpkg.repository.manifests."""
+
+    def test_parse_manifest_content(self):
+        """Testing parse_manifest_content"""
+        self.assertEqual(
+            parse_manifest_content('/packages/index.json',
+                                   b'{"format_version": "1.0"}'),
+            {'format_version': '1.0'})
+
+    def test_parse_manifest_content_with_compressed(self):
+        """Testing parse_manifest_content with compressed content"""
+        content = serialize_manifest({'format_version': '1.0'},
+                                     compression=COMPRESSION_GZIP)
+
+        self.assertEqual(
+            parse_manifest_content('/packages/index.json', content),
+            {'format_version': '1.0'})
+
+    def test_parse_manifest_content_with_invalid(self):
+        """Testing parse_manifest_content with invalid content"""
+        self.assertRaises(
+            LoadDataError,
+            lambda: parse_manifest_content('/packages/index.json', b'{bad'))
+
+    def test_iter_manifest_items(self):
+        """Testing iter_manifest_items"""
+        content = serialize_manifest({
+            'format_version': '1.0',
+            'package_rules': [{'package_type': 'python'}],
+            'releases': [{'version': '1.0.1'}, {'version': '1.0'}],
+        })
+
+        self.assertEqual(
+            list(iter_manifest_items('/packages/1.0.x.json', content,
+                                     'releases')),
+            [{'version': '1.0.1'}, {'version': '1.0'}])
+
+    def test_iter_manifest_items_with_compressed(self):
+        """Testing iter_manifest_items with compressed content"""
+        content = serialize_manifest({'releases': [{'version': '1.0'}]},
+                                     compression=COMPRESSION_GZIP)
+
+        self.assertEqual(
+            list(iter_manifest_items('/packages/1.0.x.json', content,
+                                     'releases')),
+            [{'version': '1.0'}])
+
+    def test_iter_manifest_items_with_missing_or_empty(self):
+        """Testing iter_manifest_items with a missing or empty list"""
+        for content in (b'{}', b'{"format_version": "1.0"}',
+                        b'{"releases": [ ]}'):
+            self.assertEqual(
+                list(iter_manifest_items('/packages/1.0.x.json', content,
+                                         'releases')),
+                [])
+
+    def test_iter_manifest_items_stops_early(self):
+        """Testing iter_manifest_items only parses items as requested"""
+        items = iter_manifest_items('/packages/1.0.x.json',
+                                    b'{"releases": [{"version": "1.0"}, {bad',
+                                    'releases')
+
+        self.assertEqual(next(items), {'version': '1.0'})
+        self.assertRaises(LoadDataError, lambda: next(items))
+
+    def test_iter_manifest_items_with_other_values(self):
+        """Testing iter_manifest_items with other_values"""
+        other_values = {}
+        items = iter_manifest_items(
+            '/packages/1.0.x.json',
+            b'{"format_version": "1.0", "releases": [1, 2],'
+            b' "next_page": "1.0.x.page2.json"}',
+            'releases',
+            other_values=other_values)
+
+        self.assertEqual(list(items), [1, 2])
+        self.assertEqual(other_values, {
+            'format_version': '1.0',
+            'next_page': '1.0.x.page2.json',
+        })
+
+    def test_load_all_pages(self):
+        """Testing load_all_pages"""
+        loader = InMemoryPackageDataLoader({
+            '/packages/TestPackage/1.0.x.page2.json': {
+                'releases': [{'version': '1.0.1'}],
+                'next_page': '1.0.x.page3.json',
+            },
+            '/packages/TestPackage/1.0.x.page3.json': {
+                'releases': [{'version': '1.0'}],
+            },
+        })
+
+        self.assertEqual(
+            load_all_pages(loader, '/packages/TestPackage/1.0.x.json', {
+                'format_version': '1.0',
+                'releases': [{'version': '1.0.2'}],
+                'package_rules': [],
+                'next_page': '1.0.x.page2.json',
+            }),
+            {
+                'format_version': '1.0',
+                'releases': [
+                    {'version': '1.0.2'},
+                    {'version': '1.0.1'},
+                    {'version': '1.0'},
+                ],
+                'package_rules': [],
+            })
+
+    def test_write_manifest_with_compression(self):
+        """Testing write_manifest with compression"""
+        tempdir = tempfile.mkdtemp(prefix='rbpkg-tests.')
+
+        try:
+            filename = write_manifest(os.path.join(tempdir, 'index.json'),
+                                      {'format_version': '1.0'},
+                                      compression=COMPRESSION_GZIP)
+
+            self.assertEqual(filename,
+                             os.path.join(tempdir, 'index.json.gz'))
+
+            with open(filename, 'rb') as fp:
+                content = fp.read()
+
+            self.assertEqual(detect_compression(content), COMPRESSION_GZIP)
+            self.assertEqual(parse_manifest_content(filename, content),
+                             {'format_version': '1.0'})
+            self.assertEqual(os.listdir(tempdir), ['index.json.gz'])
+        finally:
+            shutil.rmtree(tempdir)
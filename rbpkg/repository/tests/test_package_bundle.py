@@ -1,14 +1,18 @@
 from __future__ import unicode_literals
 
+import threading
+import time
 from datetime import datetime
 
+from kgb import SpyAgency
+
 from rbpkg.repository.package_bundle import PackageBundle
 from rbpkg.repository.package_channel import PackageChannel
 from rbpkg.repository.package_release import PackageRelease
 from rbpkg.repository.tests.testcases import PackagesTestCase
 
 
-class PackageBundleTests(PackagesTestCase):
+class PackageBundleTests(SpyAgency, PackagesTestCase):
     """Unit tests for rbpkg.repository.package.PackageBundle."""
 
     def test_deserialize_with_all_info(self):
@@ -358,3 +362,153 @@ class PackageBundleTests(PackagesTestCase):
                 '>=1.0',
                 release_types=[PackageRelease.TYPE_ALPHA]),
             None)
+
+    def test_load_channels(self):
+        """Testing PackageBundle.load_channels"""
+        for name in ('1.0.x', '2.0.x'):
+            self.data_loader.path_to_content[
+                'packages/TestPackage/%s.json' % name] = {
+                'format_version': '1.0',
+                'created_timestamp': '2015-10-11T08:17:29.958569',
+                'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+                'releases': [
+                    {
+                        'version': name.replace('x', '0'),
+                        'type': 'stable',
+                        'visible': True,
+                    },
+                ],
+                'package_rules': [],
+            }
+
+        self.spy_on(self.data_loader.load_by_paths)
+        self.spy_on(self.data_loader.load_by_path)
+
+        bundle = PackageBundle(manifest_url='packages/TestPackage/index.json')
+        bundle._loaded = True
+
+        channel1 = PackageChannel(bundle=bundle, name='2.0.x',
+                                  manifest_url='2.0.x.json')
+        channel2 = PackageChannel(bundle=bundle, name='1.0.x',
+                                  manifest_url='1.0.x.json')
+        channel3 = PackageChannel(bundle=bundle, name='0.5.x',
+                                  manifest_url='0.5.x.json')
+        channel3._loaded = True
+        bundle._channels = [channel1, channel2, channel3]
+
+        bundle.load_channels()
+
+        self.assertEqual(len(self.data_loader.load_by_paths.calls), 1)
+        self.assertEqual(
+            self.data_loader.load_by_paths.calls[0].args[0],
+            [
+                'packages/TestPackage/2.0.x.json',
+                'packages/TestPackage/1.0.x.json',
+            ])
+        self.assertTrue(channel1._loaded)
+        self.assertTrue(channel2._loaded)
+        self.assertEqual(channel1.releases[0].version, '2.0.0')
+        self.assertEqual(channel2.releases[0].version, '1.0.0')
+        self.assertEqual(len(self.data_loader.load_by_path.calls), 2)
+
+    def test_channels_with_concurrent_access(self):
+        """Testing PackageBundle.channels with concurrent access from
+        several threads
+        """
+        self.data_loader.path_to_content['packages/TestPackage/index.json'] = {
+            'format_version': '1.0',
+            'name': 'TestPackage',
+            'created_timestamp': '2015-10-11T08:17:29.958569',
+            'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+            'package_names': [],
+            'channel_aliases': {},
+            'channels': [
+                {
+                    'name': '1.0.x',
+                    'created_timestamp': '2015-10-11T08:17:29.958569',
+                    'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+                    'latest_version': '1.0',
+                    'current': True,
+                    'visible': True,
+                    'manifest_file': '1.0.x.json',
+                },
+            ],
+        }
+        path_to_content = self.data_loader.path_to_content
+
+        def _load_by_path(loader, *parts):
+            time.sleep(0.05)
+
+            return path_to_content['/'.join(parts)]
+
+        self.spy_on(self.data_loader.load_by_path, call_fake=_load_by_path)
+
+        bundle = PackageBundle(manifest_url='packages/TestPackage/index.json')
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(bundle.channels))
+            for i in range(4)
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.data_loader.load_by_path.calls), 1)
+        self.assertEqual(len(results), 4)
+
+        for channels in results:
+            self.assertIs(channels, results[0])
+            self.assertEqual(len(channels), 1)
+
+    def test_load_channels_with_channel_loading_in_other_thread(self):
+        """Testing PackageBundle.load_channels with a channel being loaded by
+        another thread
+        """
+        for name in ('1.0.x', '2.0.x'):
+            self.data_loader.path_to_content[
+                'packages/TestPackage/%s.json' % name] = {
+                'format_version': '1.0',
+                'created_timestamp': '2015-10-11T08:17:29.958569',
+                'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+                'releases': [],
+                'package_rules': [],
+            }
+
+        bundle = PackageBundle(manifest_url='packages/TestPackage/index.json')
+        bundle._loaded = True
+
+        channel1 = PackageChannel(bundle=bundle, name='2.0.x',
+                                  manifest_url='2.0.x.json')
+        channel2 = PackageChannel(bundle=bundle, name='1.0.x',
+                                  manifest_url='1.0.x.json')
+        bundle._channels = [channel1, channel2]
+
+        self.spy_on(self.data_loader.load_by_paths)
+        self.spy_on(self.data_loader.load_by_path)
+
+        # Simulate another thread in the middle of loading the first
+        # channel.
+        channel1._load_lock.acquire()
+
+        thread = threading.Thread(target=bundle.load_channels)
+        thread.start()
+
+        while not channel2._loaded:
+            time.sleep(0.01)
+
+        self.assertTrue(thread.is_alive())
+
+        channel1._load_data(self.data_loader.path_to_content[
+            'packages/TestPackage/2.0.x.json'])
+        channel1._load_lock.release()
+        thread.join()
+
+        self.assertEqual(
+            [call.args[0] for call in self.data_loader.load_by_paths.calls],
+            [['packages/TestPackage/1.0.x.json']])
+        self.assertEqual(
+            [call.args for call in self.data_loader.load_by_path.calls],
+            [('packages/TestPackage/1.0.x.json',)])
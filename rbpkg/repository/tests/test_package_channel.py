@@ -1,12 +1,15 @@
 from __future__ import unicode_literals
 
 import platform
+import threading
+import time
 from datetime import datetime
 
 from kgb import SpyAgency
 
 from rbpkg.repository.package_bundle import PackageBundle
-from rbpkg.repository.package_channel import PackageChannel
+from rbpkg.repository.package_channel import (PackageChannel,
+                                              PagedReleaseList)
 from rbpkg.repository.package_release import PackageRelease
 from rbpkg.repository.package_rules import PackageRules
 from rbpkg.repository.tests.testcases import PackagesTestCase
@@ -119,6 +122,136 @@ class PackageChannelTests(SpyAgency, PackagesTestCase):
                 ],
             })
 
+    def test_serialize_pages(self):
+        """Testing PackageChannel.serialize_pages"""
+        bundle = PackageBundle(manifest_url='packages/TestPackage/index.json')
+
+        channel = PackageChannel(
+            bundle=bundle,
+            name='1.0.x',
+            manifest_url='1.0.x.json',
+            created_timestamp=datetime(2015, 10, 11, 8, 17, 29, 958569),
+            last_updated_timestamp=datetime(2015, 10, 12, 8, 17, 29, 958569))
+        channel._loaded = True
+        channel._releases = [
+            PackageRelease(channel=channel, version='1.0.%d' % i,
+                           release_type=PackageRelease.TYPE_STABLE)
+            for i in (4, 3, 2, 1, 0)
+        ]
+
+        pages = channel.serialize_pages(2)
+
+        self.assertEqual(
+            [(url, data.get('next_page')) for url, data in pages],
+            [
+                ('1.0.x.json', '1.0.x.page2.json'),
+                ('1.0.x.page2.json', '1.0.x.page3.json'),
+                ('1.0.x.page3.json', None),
+            ])
+        self.assertEqual(
+            [
+                [release['version'] for release in data['releases']]
+                for url, data in pages
+            ],
+            [['1.0.4', '1.0.3'], ['1.0.2', '1.0.1'], ['1.0.0']])
+        self.assertEqual(pages[0][1]['package_rules'], [])
+        self.assertNotIn('package_rules', pages[1][1])
+
+    def test_serialize_pages_with_invalid_page_size(self):
+        """Testing PackageChannel.serialize_pages with page_size less
+        than 1
+        """
+        bundle = PackageBundle(manifest_url='packages/TestPackage/index.json')
+        channel = PackageChannel(bundle=bundle, manifest_url='1.0.x.json')
+
+        self.assertRaises(ValueError, lambda: channel.serialize_pages(0))
+
+    def test_releases_with_paged_manifest(self):
+        """Testing PackageChannel.releases with a paged manifest loads older
+        pages only when reached
+        """
+        self._add_paged_manifest()
+
+        bundle = PackageBundle(manifest_url='packages/TestPackage/index.json')
+        channel = PackageChannel(bundle, manifest_url='1.0.x.json')
+
+        self.spy_on(self.data_loader.load_by_path)
+
+        channel.load()
+        releases = channel.releases
+
+        self.assertIsInstance(releases, PagedReleaseList)
+        self.assertEqual(releases[0].version, '1.0.4')
+        self.assertEqual(releases[1].version, '1.0.3')
+        self.assertEqual(len(channel.package_rules), 1)
+        self.assertEqual(len(self.data_loader.load_by_path.calls), 1)
+
+        self.assertEqual(releases[2].version, '1.0.2')
+        self.assertEqual(len(self.data_loader.load_by_path.calls), 2)
+
+        self.assertEqual([release.version for release in releases],
+                         ['1.0.4', '1.0.3', '1.0.2', '1.0.1', '1.0.0'])
+        self.assertEqual(len(self.data_loader.load_by_path.calls), 3)
+
+        # Once all pages are loaded, this is a plain list again.
+        self.assertIsInstance(channel.releases, list)
+        self.assertEqual(len(channel.releases), 5)
+
+    def test_iter_releases_with_paged_manifest(self):
+        """Testing PackageChannel.iter_releases with an unloaded paged
+        manifest
+        """
+        self._add_paged_manifest()
+
+        bundle = PackageBundle(manifest_url='packages/TestPackage/index.json')
+        channel = PackageChannel(bundle, manifest_url='1.0.x.json')
+
+        self.spy_on(self.data_loader.load_by_path)
+
+        self.assertEqual(channel.latest_release.version, '1.0.4')
+        self.assertEqual(
+            [call.args for call in self.data_loader.load_by_path.calls],
+            [('packages/TestPackage/1.0.x.json',)])
+
+        self.assertEqual(
+            [release.version for release in channel.iter_releases()],
+            ['1.0.4', '1.0.3', '1.0.2', '1.0.1', '1.0.0'])
+        self.assertEqual(
+            [call.args for call in self.data_loader.load_by_path.calls],
+            [
+                ('packages/TestPackage/1.0.x.json',),
+                ('packages/TestPackage/1.0.x.page2.json',),
+                ('packages/TestPackage/1.0.x.page3.json',),
+            ])
+        self.assertFalse(channel._loaded)
+
+    def test_iter_releases_fetches_without_lock(self):
+        """Testing PackageChannel.iter_releases doesn't hold the release
+        stream lock while fetching pages
+        """
+        self._add_paged_manifest()
+
+        bundle = PackageBundle(manifest_url='packages/TestPackage/index.json')
+        channel = PackageChannel(bundle, manifest_url='1.0.x.json')
+        path_to_content = self.data_loader.path_to_content
+        locked = []
+
+        def _load_by_path(loader, *parts):
+            locked.append(channel._release_stream_lock.locked())
+
+            return path_to_content['/'.join(parts)]
+
+        self.spy_on(self.data_loader.load_by_path, call_fake=_load_by_path)
+
+        # Stream the releases from the unloaded channel.
+        self.assertEqual(len(list(channel.iter_releases())), 5)
+        self.assertEqual(locked, [False, False, False])
+
+        # Load the paged manifest, and then its continuation pages.
+        channel.load()
+        self.assertEqual(len(list(channel.iter_releases())), 5)
+        self.assertEqual(locked, [False] * 6)
+
     def test_load(self):
         """Testing PackageChannel.load"""
         self.data_loader.path_to_content['packages/TestPackage/1.0.x.json'] = {
@@ -159,6 +292,53 @@ class PackageChannelTests(SpyAgency, PackagesTestCase):
         self.assertEqual(channel.package_rules[0].package_type,
                          'python')
 
+    def test_releases_with_concurrent_access(self):
+        """Testing PackageChannel.releases with concurrent access from
+        several threads
+        """
+        self.data_loader.path_to_content['packages/TestPackage/1.0.x.json'] = {
+            'format_version': '1.0',
+            'created_timestamp': '2015-10-11T08:17:29.958569',
+            'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+            'releases': [
+                {
+                    'version': '1.0',
+                    'type': 'stable',
+                    'visible': True,
+                }
+            ],
+            'package_rules': [],
+        }
+        path_to_content = self.data_loader.path_to_content
+
+        def _load_by_path(loader, *parts):
+            time.sleep(0.05)
+
+            return path_to_content['/'.join(parts)]
+
+        self.spy_on(self.data_loader.load_by_path, call_fake=_load_by_path)
+
+        bundle = PackageBundle(manifest_url='packages/TestPackage/index.json')
+        channel = PackageChannel(bundle, manifest_url='1.0.x.json')
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(channel.releases))
+            for i in range(4)
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.data_loader.load_by_path.calls), 1)
+        self.assertEqual(len(results), 4)
+
+        for releases in results:
+            self.assertIs(releases, results[0])
+            self.assertEqual(releases[0].version, '1.0')
+
     def test_latest_release(self):
         """Testing PackageChannel.latest_release"""
         bundle = PackageBundle(manifest_url='packages/TestPackage/index.json')
@@ -195,6 +375,57 @@ class PackageChannelTests(SpyAgency, PackagesTestCase):
 
         self.assertEqual(channel.latest_release, None)
 
+    def test_latest_release_with_unloaded(self):
+        """Testing PackageChannel.latest_release with channel not loaded
+        only parses the first release
+        """
+        self.data_loader.path_to_content['packages/TestPackage/1.0.x.json'] = {
+            'format_version': '1.0',
+            'created_timestamp': '2015-10-11T08:17:29.958569',
+            'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+            'releases': [
+                {
+                    'version': version,
+                    'type': 'stable',
+                    'visible': True,
+                }
+                for version in ('1.0.2', '1.0.1', '1.0')
+            ],
+            'package_rules': [],
+        }
+
+        bundle = PackageBundle(manifest_url='packages/TestPackage/index.json')
+        channel = PackageChannel(bundle, manifest_url='1.0.x.json')
+
+        self.spy_on(PackageRelease.deserialize)
+        self.spy_on(self.data_loader.fetch_by_path)
+
+        self.assertEqual(channel.latest_release.version, '1.0.2')
+        self.assertFalse(channel._loaded)
+        self.assertEqual(len(PackageRelease.deserialize.calls), 1)
+
+        # Later iterations share the releases already parsed.
+        self.assertIs(channel.latest_release, channel.latest_release)
+        self.assertEqual(
+            [release.version for release in channel.iter_releases()],
+            ['1.0.2', '1.0.1', '1.0'])
+        self.assertEqual(len(PackageRelease.deserialize.calls), 3)
+        self.assertEqual(len(self.data_loader.fetch_by_path.calls), 1)
+
+    def test_iter_releases_with_loaded(self):
+        """Testing PackageChannel.iter_releases with channel loaded"""
+        bundle = PackageBundle(manifest_url='packages/TestPackage/index.json')
+        channel = PackageChannel(bundle, manifest_url='1.0.x.json')
+        channel._loaded = True
+
+        release = PackageRelease(channel=channel, version='1.0')
+        channel._releases = [release]
+
+        self.spy_on(self.data_loader.fetch_by_path)
+
+        self.assertEqual(list(channel.iter_releases()), [release])
+        self.assertFalse(self.data_loader.fetch_by_path.called)
+
     def test_get_all_rules_for_version(self):
         """Testing PackageChannel.get_all_rules_for_version"""
         bundle = PackageBundle(manifest_url='packages/TestPackage/index.json')
@@ -292,3 +523,28 @@ class PackageChannelTests(SpyAgency, PackagesTestCase):
             channel.get_all_rules_for_version('1.0',
                                               require_current_system=True),
             [rules3, rules4, rules5])
+
+    def _add_paged_manifest(self):
+        """Add a paged channel manifest to the test data loader."""
+        bundle = PackageBundle(manifest_url='packages/TestPackage/index.json')
+        channel = PackageChannel(
+            bundle=bundle,
+            name='1.0.x',
+            manifest_url='1.0.x.json',
+            created_timestamp=datetime(2015, 10, 11, 8, 17, 29, 958569),
+            last_updated_timestamp=datetime(2015, 10, 12, 8, 17, 29, 958569))
+        channel._loaded = True
+        channel._releases = [
+            PackageRelease(channel=channel, version='1.0.%d' % i,
+                           release_type=PackageRelease.TYPE_STABLE)
+            for i in (4, 3, 2, 1, 0)
+        ]
+        channel._package_rules = [
+            PackageRules(channel=channel, version_range='*',
+                         package_type='python', package_name='TestPackage',
+                         systems=['*']),
+        ]
+
+        for url, data in channel.serialize_pages(2):
+            self.data_loader.path_to_content[
+                'packages/TestPackage/%s' % url] = data
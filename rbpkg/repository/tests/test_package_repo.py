@@ -0,0 +1,572 @@
+from __future__ import unicode_literals
+
+import os
+import threading
+
+import six
+from kgb import SpyAgency
+
+from rbpkg.repository.errors import ConfigurationError, PackageLookupError
+from rbpkg.repository.package_repo import (PackageRepository,
+                                           create_bundle_cache)
+from rbpkg.repository.tests.testcases import PackagesTestCase
+from rbpkg.utils.caches import LFUObjectCache, LRUObjectCache
+
+
+class PackageRepositoryTests(SpyAgency, PackagesTestCase):
+    """Unit tests for rbpkg.repository.package_repo.PackageRepository."""
+
+    def setUp(self):
+        super(PackageRepositoryTests, self).setUp()
+
+        self.data_loader.path_to_content.update({
+            '/packages/index.json': {
+                'format_version': '1.0',
+                'last_updated_timestamp': '2015-10-15T08:17:29.958569',
+                'bundles': [],
+            },
+            '/packages/TestPackage/index.json': {
+                'format_version': '1.0',
+                'name': 'TestPackage',
+                'created_timestamp': '2015-10-11T08:17:29.958569',
+                'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+                'package_names': [],
+                'channel_aliases': {},
+                'channels': [],
+            },
+        })
+
+    def test_get_index(self):
+        """Testing PackageRepository.get_index"""
+        repository = PackageRepository()
+        index = repository.get_index()
+
+        self.assertEqual(index.manifest_url, '/packages/index.json')
+        self.assertIs(repository.get_index(), index)
+
+    def test_lookup_package_bundle(self):
+        """Testing PackageRepository.lookup_package_bundle"""
+        self.spy_on(self.data_loader.load_by_path)
+
+        repository = PackageRepository()
+        bundle = repository.lookup_package_bundle('TestPackage')
+
+        self.assertEqual(bundle.name, 'TestPackage')
+        self.assertIs(repository.lookup_package_bundle('TestPackage'), bundle)
+        self.assertEqual(len(self.data_loader.load_by_path.calls), 1)
+
+    def test_lookup_package_bundle_with_not_found(self):
+        """Testing PackageRepository.lookup_package_bundle with bundle not
+        found
+        """
+        repository = PackageRepository()
+
+        self.assertRaises(
+            PackageLookupError,
+            lambda: repository.lookup_package_bundle('Missing'))
+
+    def test_lookup_package_bundle_with_repeated_not_found(self):
+        """Testing PackageRepository.lookup_package_bundle with repeated
+        lookups of a bundle not found
+        """
+        self.spy_on(self.data_loader.load_by_path)
+
+        repository = PackageRepository()
+
+        for i in range(3):
+            self.assertRaises(
+                PackageLookupError,
+                lambda: repository.lookup_package_bundle('Missing'))
+
+        self.assertEqual(len(self.data_loader.load_by_path.calls), 1)
+
+        # Clearing the caches should allow the bundle to be found once it's
+        # been published.
+        self.data_loader.path_to_content['/packages/Missing/index.json'] = \
+            self.data_loader.path_to_content[
+                '/packages/TestPackage/index.json']
+        repository.clear_caches()
+
+        self.assertIsNotNone(repository.lookup_package_bundle('Missing'))
+
+    def test_lookup_package_bundles(self):
+        """Testing PackageRepository.lookup_package_bundles"""
+        self._add_bundle_with_channel('OtherPackage')
+        self._add_bundle_with_channel('ThirdPackage')
+
+        repository = PackageRepository()
+        bundle = repository.lookup_package_bundle('TestPackage')
+
+        self.spy_on(self.data_loader.try_load_by_paths)
+        self.spy_on(self.data_loader.load_by_path)
+
+        bundles = repository.lookup_package_bundles(
+            ['TestPackage', 'OtherPackage', 'ThirdPackage', 'OtherPackage'])
+
+        self.assertEqual(sorted(six.iterkeys(bundles)),
+                         ['OtherPackage', 'TestPackage', 'ThirdPackage'])
+        self.assertIs(bundles['TestPackage'], bundle)
+        self.assertIs(repository.lookup_package_bundle('OtherPackage'),
+                      bundles['OtherPackage'])
+        self.assertFalse(bundles['OtherPackage'].channels[0]._loaded)
+
+        # Only the uncached bundles are fetched, in one batch.
+        self.assertEqual(
+            [
+                call.args[0]
+                for call in self.data_loader.try_load_by_paths.calls
+            ],
+            [[
+                '/packages/OtherPackage/index.json',
+                '/packages/ThirdPackage/index.json',
+            ]])
+
+    def test_lookup_package_bundles_with_load_channels(self):
+        """Testing PackageRepository.lookup_package_bundles with
+        load_channels=True
+        """
+        self._add_bundle_with_channel('OtherPackage')
+        self._add_bundle_with_channel('ThirdPackage')
+
+        self.spy_on(self.data_loader.try_load_by_paths)
+
+        repository = PackageRepository()
+        bundles = repository.lookup_package_bundles(
+            ['OtherPackage', 'ThirdPackage'],
+            load_channels=True)
+
+        self.assertTrue(bundles['OtherPackage'].channels[0]._loaded)
+        self.assertTrue(bundles['ThirdPackage'].channels[0]._loaded)
+        self.assertEqual(
+            [
+                call.args[0]
+                for call in self.data_loader.try_load_by_paths.calls
+            ],
+            [
+                [
+                    '/packages/OtherPackage/index.json',
+                    '/packages/ThirdPackage/index.json',
+                ],
+                [
+                    '/packages/OtherPackage/1.0.x.json',
+                    '/packages/ThirdPackage/1.0.x.json',
+                ],
+            ])
+
+    def test_lookup_package_bundles_with_not_found(self):
+        """Testing PackageRepository.lookup_package_bundles with a bundle not
+        found
+        """
+        self._add_bundle_with_channel('OtherPackage')
+
+        repository = PackageRepository()
+
+        self.spy_on(self.data_loader.load_by_path)
+
+        with self.assertRaises(PackageLookupError) as cm:
+            repository.lookup_package_bundles(['OtherPackage', 'Missing'])
+
+        self.assertEqual(list(cm.exception.package_bundles),
+                         ['OtherPackage'])
+
+        # Each bundle should only have been fetched once, as part of the
+        # batch.
+        self.assertEqual(
+            [call.args[0] for call in self.data_loader.load_by_path.calls],
+            [
+                '/packages/OtherPackage/index.json',
+                '/packages/Missing/index.json',
+            ])
+
+        # The bundle that was found should still be cached.
+        self.data_loader.load_by_path.unspy()
+        self.spy_on(self.data_loader.load_by_path)
+
+        self.assertIsNotNone(repository.lookup_package_bundle('OtherPackage'))
+        self.assertRaises(
+            PackageLookupError,
+            lambda: repository.lookup_package_bundle('Missing'))
+        self.assertEqual(len(self.data_loader.load_by_path.calls), 0)
+
+    def test_lookup_package_bundle_with_concurrent_lookups(self):
+        """Testing PackageRepository.lookup_package_bundle coalesces
+        concurrent lookups
+        """
+        num_threads = 5
+        repository = PackageRepository()
+        release = threading.Event()
+        path_to_content = self.data_loader.path_to_content
+
+        def _load_by_path(loader, *parts):
+            release.wait()
+
+            return path_to_content['/'.join(parts)]
+
+        self.spy_on(self.data_loader.load_by_path, call_fake=_load_by_path)
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    repository.lookup_package_bundle('TestPackage')))
+            for i in range(num_threads)
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        while repository.coalesced_loads < num_threads - 1:
+            threading.Event().wait(0.01)
+
+        release.set()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.data_loader.load_by_path.calls), 1)
+        self.assertEqual(len(results), num_threads)
+        self.assertEqual(len(set(id(bundle) for bundle in results)), 1)
+        self.assertEqual(repository.coalesced_loads, num_threads - 1)
+
+    def test_lookup_package_bundle_with_eviction(self):
+        """Testing PackageRepository.lookup_package_bundle evicts bundles
+        over the cache budget and unloads their channels
+        """
+        self._add_bundle_with_channel('OtherPackage')
+
+        repository = PackageRepository(
+            bundle_cache=LRUObjectCache(max_size=10 * 1024 * 1024))
+        bundle = repository.lookup_package_bundle('OtherPackage')
+        channel = bundle.channels[0]
+        channel.load()
+
+        stats = repository.get_cache_stats()
+        self.assertEqual(stats['entries'], 1)
+        self.assertGreater(stats['size'], 0)
+        self.assertTrue(channel._loaded)
+
+        repository._package_bundle_cache.max_size = stats['size']
+        repository.lookup_package_bundle('TestPackage')
+
+        stats = repository.get_cache_stats()
+        self.assertEqual(stats['entries'], 1)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertNotIn('OtherPackage', repository._package_bundle_cache)
+        self.assertFalse(channel._loaded)
+        self.assertEqual(channel._releases, [])
+
+        # The evicted bundle can still load its channels on demand.
+        self.assertEqual(len(channel.releases), 1)
+
+    def test_lookup_package_bundle_tracks_channel_size(self):
+        """Testing PackageRepository.lookup_package_bundle updates the
+        cached size of bundles as channels load
+        """
+        self._add_bundle_with_channel('OtherPackage')
+
+        repository = PackageRepository()
+        bundle = repository.lookup_package_bundle('OtherPackage')
+        size = repository.get_cache_stats()['size']
+
+        self.spy_on(repository._package_bundle_cache.update_size)
+
+        bundle.load_channels()
+
+        self.assertGreater(repository.get_cache_stats()['size'], size)
+        self.assertEqual(
+            len(repository._package_bundle_cache.update_size.calls),
+            1)
+
+        # Later lookups don't need to re-measure the bundle.
+        repository.lookup_package_bundle('OtherPackage')
+        repository.lookup_package_bundles(['OtherPackage'])
+
+        self.assertEqual(
+            len(repository._package_bundle_cache.update_size.calls),
+            1)
+
+    def test_get_index_with_prefetch(self):
+        """Testing PackageRepository.get_index with prefetch=True"""
+        names = ('OtherPackage', 'ThirdPackage', 'HiddenPackage')
+
+        for name in names:
+            self._add_bundle_with_channel(name)
+
+            channel_data = self.data_loader.path_to_content[
+                '/packages/%s/index.json' % name]['channels'][0]
+            channel_data['current'] = (name == 'OtherPackage')
+            channel_data['visible'] = (name != 'HiddenPackage')
+
+        self._set_index_bundles({
+            'HiddenPackage': '2015-10-12T08:17:29.958569',
+            'Missing': '2015-10-12T08:17:29.958569',
+            'OtherPackage': '2015-10-12T08:17:29.958569',
+            'TestPackage': '2015-10-12T08:17:29.958569',
+            'ThirdPackage': '2015-10-12T08:17:29.958569',
+        })
+
+        repository = PackageRepository()
+        index = repository.get_index(prefetch=True)
+        index_bundles = list(index.bundles)
+
+        self.assertTrue(repository.wait_for_prefetch(timeout=5))
+
+        self.spy_on(self.data_loader.load_by_path)
+        self.spy_on(self.data_loader.load_by_paths)
+
+        # Visible channels are prefetched, whether or not they're current.
+        bundle = repository.lookup_package_bundle('OtherPackage')
+        self.assertTrue(bundle.channels[0]._loaded)
+        self.assertEqual(bundle.channels[0].releases[0].version, '1.0')
+
+        bundle = repository.lookup_package_bundle('ThirdPackage')
+        self.assertFalse(bundle.channels[0].current)
+        self.assertTrue(bundle.channels[0]._loaded)
+        self.assertEqual(bundle.channels[0].releases[0].version, '1.0')
+
+        bundle = repository.lookup_package_bundle('HiddenPackage')
+        self.assertFalse(bundle.channels[0]._loaded)
+
+        # The index is left unchanged.
+        self.assertEqual(index.bundles, index_bundles)
+        self.assertFalse(any(
+            package_bundle._loaded
+            for package_bundle in index.bundles
+        ))
+
+        # A second call won't prefetch again.
+        repository.get_index(prefetch=True)
+        self.assertTrue(repository.wait_for_prefetch(timeout=5))
+
+        self.assertFalse(self.data_loader.load_by_path.called)
+        self.assertFalse(self.data_loader.load_by_paths.called)
+
+    def test_wait_for_prefetch_without_prefetch(self):
+        """Testing PackageRepository.wait_for_prefetch without a prefetch in
+        progress
+        """
+        self.assertTrue(PackageRepository().wait_for_prefetch())
+
+    def test_refresh_with_unchanged_index(self):
+        """Testing PackageRepository.refresh with unchanged index"""
+        repository = PackageRepository()
+        index = repository.get_index()
+        bundle = repository.lookup_package_bundle('TestPackage')
+
+        self.spy_on(self.data_loader.load_by_paths)
+
+        self.assertEqual(repository.refresh(), [])
+        self.assertIs(repository.get_index(), index)
+        self.assertIs(repository.lookup_package_bundle('TestPackage'), bundle)
+        self.assertFalse(self.data_loader.load_by_paths.called)
+
+    def test_refresh_with_changed_bundle(self):
+        """Testing PackageRepository.refresh reloads only changed bundles and
+        channels
+        """
+        self._add_bundle_with_channel('OtherPackage')
+        self._set_index_bundles({
+            'TestPackage': '2015-10-12T08:17:29.958569',
+            'OtherPackage': '2015-10-12T08:17:29.958569',
+        })
+
+        repository = PackageRepository()
+        repository.get_index()
+        test_bundle = repository.lookup_package_bundle('TestPackage')
+        other_bundle = repository.lookup_package_bundle('OtherPackage')
+        channel = other_bundle.channels[0]
+        channel.load()
+
+        # Update only OtherPackage's bundle manifest. Its channel is
+        # unchanged.
+        bundle_data = self.data_loader.path_to_content[
+            '/packages/OtherPackage/index.json']
+        bundle_data['last_updated_timestamp'] = '2015-10-20T08:17:29.958569'
+        bundle_data['current_version'] = '1.1'
+        self._set_index_bundles({
+            'TestPackage': '2015-10-12T08:17:29.958569',
+            'OtherPackage': '2015-10-20T08:17:29.958569',
+        }, last_updated='2015-10-20T08:17:29.958569')
+
+        self.spy_on(self.data_loader.load_by_paths)
+
+        self.assertEqual(repository.refresh(), ['OtherPackage'])
+        self.assertEqual(self.data_loader.load_by_paths.calls[0].args[0],
+                         ['/packages/OtherPackage/index.json'])
+
+        self.assertIs(repository.lookup_package_bundle('TestPackage'),
+                      test_bundle)
+        self.assertIs(repository.lookup_package_bundle('OtherPackage'),
+                      other_bundle)
+        self.assertEqual(other_bundle.current_version, '1.1')
+        self.assertIs(other_bundle.channels[0], channel)
+        self.assertTrue(channel._loaded)
+
+    def test_refresh_with_changed_channel(self):
+        """Testing PackageRepository.refresh unloads changed channels"""
+        self._add_bundle_with_channel('OtherPackage')
+        self._set_index_bundles({
+            'OtherPackage': '2015-10-12T08:17:29.958569',
+        })
+
+        repository = PackageRepository()
+        repository.get_index()
+        bundle = repository.lookup_package_bundle('OtherPackage')
+        bundle.channels[0].load()
+
+        bundle_data = self.data_loader.path_to_content[
+            '/packages/OtherPackage/index.json']
+        bundle_data['last_updated_timestamp'] = '2015-10-20T08:17:29.958569'
+        bundle_data['channels'][0]['last_updated_timestamp'] = \
+            '2015-10-20T08:17:29.958569'
+        self._set_index_bundles({
+            'OtherPackage': '2015-10-20T08:17:29.958569',
+        }, last_updated='2015-10-20T08:17:29.958569')
+
+        self.assertEqual(repository.refresh(), ['OtherPackage'])
+        self.assertFalse(bundle.channels[0]._loaded)
+
+    def test_refresh_without_reload_bundles(self):
+        """Testing PackageRepository.refresh with reload_bundles=False
+        invalidates changed and removed bundles
+        """
+        self._add_bundle_with_channel('OtherPackage')
+        self._set_index_bundles({
+            'TestPackage': '2015-10-12T08:17:29.958569',
+            'OtherPackage': '2015-10-12T08:17:29.958569',
+        })
+
+        repository = PackageRepository()
+        repository.get_index()
+        test_bundle = repository.lookup_package_bundle('TestPackage')
+        other_bundle = repository.lookup_package_bundle('OtherPackage')
+
+        self._set_index_bundles({
+            'OtherPackage': '2015-10-20T08:17:29.958569',
+        }, last_updated='2015-10-20T08:17:29.958569')
+
+        self.spy_on(self.data_loader.load_by_paths)
+
+        self.assertEqual(repository.refresh(reload_bundles=False),
+                         ['OtherPackage', 'TestPackage'])
+        self.assertFalse(self.data_loader.load_by_paths.called)
+        self.assertIsNot(repository.lookup_package_bundle('TestPackage'),
+                         test_bundle)
+        self.assertIsNot(repository.lookup_package_bundle('OtherPackage'),
+                         other_bundle)
+
+    def test_invalidate_package_bundle(self):
+        """Testing PackageRepository.invalidate_package_bundle"""
+        repository = PackageRepository()
+        bundle = repository.lookup_package_bundle('TestPackage')
+        index = repository.get_index()
+
+        repository.invalidate_package_bundle('TestPackage')
+
+        self.assertIsNot(repository.lookup_package_bundle('TestPackage'),
+                         bundle)
+        self.assertIs(repository.get_index(), index)
+
+    def test_create_bundle_cache(self):
+        """Testing create_bundle_cache with environment settings"""
+        os.environ['RBPKG_BUNDLE_CACHE_SIZE'] = '1024'
+        os.environ['RBPKG_BUNDLE_CACHE_POLICY'] = 'lfu'
+
+        try:
+            cache = create_bundle_cache()
+        finally:
+            del os.environ['RBPKG_BUNDLE_CACHE_SIZE']
+            del os.environ['RBPKG_BUNDLE_CACHE_POLICY']
+
+        self.assertIsInstance(cache, LFUObjectCache)
+        self.assertEqual(cache.max_size, 1024)
+
+    def test_create_bundle_cache_with_invalid_policy(self):
+        """Testing create_bundle_cache with an invalid policy"""
+        os.environ['RBPKG_BUNDLE_CACHE_POLICY'] = 'random'
+
+        try:
+            self.assertRaises(ConfigurationError, create_bundle_cache)
+        finally:
+            del os.environ['RBPKG_BUNDLE_CACHE_POLICY']
+
+    def test_clear_caches(self):
+        """Testing PackageRepository.clear_caches"""
+        repository = PackageRepository()
+        bundle = repository.lookup_package_bundle('TestPackage')
+        index = repository.get_index()
+
+        repository.clear_caches()
+
+        self.assertIsNot(repository.lookup_package_bundle('TestPackage'),
+                         bundle)
+        self.assertIsNot(repository.get_index(), index)
+
+    def _add_bundle_with_channel(self, name):
+        """Add a bundle with one channel to the test data loader.
+
+        Args:
+            name (unicode):
+                The name of the bundle.
+        """
+        self.data_loader.path_to_content.update({
+            '/packages/%s/index.json' % name: {
+                'format_version': '1.0',
+                'name': name,
+                'created_timestamp': '2015-10-11T08:17:29.958569',
+                'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+                'package_names': [],
+                'channel_aliases': {},
+                'channels': [
+                    {
+                        'name': '1.0.x',
+                        'created_timestamp': '2015-10-11T08:17:29.958569',
+                        'last_updated_timestamp':
+                            '2015-10-12T08:17:29.958569',
+                        'latest_version': '1.0',
+                        'manifest_file': '1.0.x.json',
+                    },
+                ],
+            },
+            '/packages/%s/1.0.x.json' % name: {
+                'format_version': '1.0',
+                'created_timestamp': '2015-10-11T08:17:29.958569',
+                'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+                'releases': [
+                    {
+                        'version': '1.0',
+                        'type': 'stable',
+                        'visible': True,
+                        'release_notes_url': 'https://example.com/' +
+                                             'x' * 4096,
+                    },
+                ],
+                'package_rules': [],
+            },
+        })
+
+    def _set_index_bundles(self, timestamps,
+                           last_updated='2015-10-15T08:17:29.958569'):
+        """Set the bundles listed in the package index.
+
+        Args:
+            timestamps (dict):
+                A mapping of bundle names to their last updated timestamps.
+
+            last_updated (unicode, optional):
+                The last updated timestamp for the index.
+        """
+        self.data_loader.path_to_content['/packages/index.json'] = {
+            'format_version': '1.0',
+            'last_updated_timestamp': last_updated,
+            'bundles': [
+                {
+                    'name': name,
+                    'manifest_file': '%s/index.json' % name,
+                    'created_timestamp': '2015-10-11T08:17:29.958569',
+                    'last_updated_timestamp': timestamp,
+                    'package_names': [],
+                }
+                for name, timestamp in sorted(six.iteritems(timestamps))
+            ],
+        }
@@ -0,0 +1,166 @@
+from __future__ import unicode_literals
+
+from rbpkg.repository.package_bundle import PackageBundle
+from rbpkg.repository.package_repo import PackageRepository
+from rbpkg.repository.search import PackageSearchIndex
+from rbpkg.repository.tests.testcases import PackagesTestCase
+
+
+class PackageSearchIndexTests(PackagesTestCase):
+    """Unit tests for rbpkg.repository.search.PackageSearchIndex."""
+
+    def setUp(self):
+        super(PackageSearchIndexTests, self).setUp()
+
+        self.search_index = PackageSearchIndex([
+            PackageBundle(
+                name='ReviewBoard',
+                package_names=[
+                    {
+                        'systems': ['centos', 'rhel'],
+                        'name': 'ReviewBoard',
+                        'type': 'rpm',
+                    },
+                    {
+                        'systems': ['debian'],
+                        'name': 'python-reviewboard',
+                        'type': 'deb',
+                    },
+                ]),
+            PackageBundle(
+                name='RBTools',
+                package_names=[
+                    {
+                        'systems': ['*'],
+                        'name': 'RBTools',
+                        'package_type': 'python',
+                    },
+                ]),
+            PackageBundle(name='Djblets'),
+            PackageBundle(name='ReviewBot'),
+        ])
+
+    def test_lookup(self):
+        """Testing PackageSearchIndex.lookup"""
+        results = self.search_index.lookup('reviewboard')
+
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0].bundle_name, 'ReviewBoard')
+        self.assertIsNone(results[0].package_type)
+        self.assertEqual(results[0].score, 1.0)
+
+    def test_lookup_with_native_name(self):
+        """Testing PackageSearchIndex.lookup with a native package name"""
+        results = self.search_index.lookup('Python-ReviewBoard')
+
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0].bundle_name, 'ReviewBoard')
+        self.assertEqual(results[0].matched_name, 'python-reviewboard')
+        self.assertEqual(results[0].package_type, 'deb')
+
+    def test_lookup_with_not_found(self):
+        """Testing PackageSearchIndex.lookup with no matching name"""
+        self.assertEqual(self.search_index.lookup('reviewb'), [])
+
+    def test_search_prefix(self):
+        """Testing PackageSearchIndex.search_prefix"""
+        results = self.search_index.search_prefix('review')
+
+        self.assertEqual(
+            [result.bundle_name for result in results],
+            ['ReviewBot', 'ReviewBoard'])
+
+    def test_search_prefix_with_exact_match(self):
+        """Testing PackageSearchIndex.search_prefix ranks an exact match
+        first
+        """
+        results = self.search_index.search_prefix('ReviewBoard')
+
+        self.assertEqual(
+            [result.bundle_name for result in results],
+            ['ReviewBoard'])
+        self.assertEqual(results[0].score, 1.0)
+
+    def test_search_prefix_with_limit(self):
+        """Testing PackageSearchIndex.search_prefix with limit"""
+        results = self.search_index.search_prefix('r', limit=1)
+
+        self.assertEqual(len(results), 1)
+
+    def test_search_fuzzy(self):
+        """Testing PackageSearchIndex.search_fuzzy with a misspelled name"""
+        results = self.search_index.search_fuzzy('reveiwboard')
+
+        self.assertEqual(results[0].bundle_name, 'ReviewBoard')
+
+    def test_search(self):
+        """Testing PackageSearchIndex.search lists prefix matches before
+        fuzzy matches
+        """
+        results = self.search_index.search('reviewbo')
+
+        self.assertEqual(
+            [result.bundle_name for result in results[:2]],
+            ['ReviewBot', 'ReviewBoard'])
+
+        results = self.search_index.search('djblet')
+        self.assertEqual(results[0].bundle_name, 'Djblets')
+
+        results = self.search_index.search('rbtool', limit=1)
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0].bundle_name, 'RBTools')
+
+    def test_search_with_empty_query(self):
+        """Testing PackageSearchIndex.search with an empty query"""
+        self.assertEqual(self.search_index.search('  '), [])
+
+
+class PackageRepositorySearchTests(PackagesTestCase):
+    """Unit tests for PackageRepository.get_search_index."""
+
+    def setUp(self):
+        super(PackageRepositorySearchTests, self).setUp()
+
+        self.data_loader.path_to_content.update({
+            '/packages/index.json': {
+                'format_version': '1.0',
+                'last_updated_timestamp': '2015-10-15T08:17:29.958569',
+                'bundles': [
+                    {
+                        'name': 'ReviewBoard',
+                        'manifest_file': 'ReviewBoard/index.json',
+                        'created_timestamp': '2015-10-10T08:17:29.958569',
+                        'last_updated_timestamp':
+                            '2015-10-15T08:17:29.958569',
+                        'current_version': '2.0.20',
+                        'package_names': [
+                            {
+                                'systems': ['debian'],
+                                'name': 'python-reviewboard',
+                                'type': 'deb',
+                            },
+                        ],
+                    },
+                ],
+            },
+        })
+
+    def test_get_search_index(self):
+        """Testing PackageRepository.get_search_index"""
+        repository = PackageRepository()
+        search_index = repository.get_search_index()
+
+        results = search_index.lookup('python-reviewboard')
+        self.assertEqual(results[0].bundle_name, 'ReviewBoard')
+        self.assertIs(repository.get_search_index(), search_index)
+
+    def test_get_search_index_with_new_index(self):
+        """Testing PackageRepository.get_search_index rebuilds after the
+        package index changes
+        """
+        repository = PackageRepository()
+        search_index = repository.get_search_index()
+
+        repository.invalidate_index()
+
+        self.assertIsNot(repository.get_search_index(), search_index)
@@ -0,0 +1,328 @@
+from __future__ import unicode_literals
+
+import copy
+
+from kgb import SpyAgency
+
+from rbpkg.repository.errors import PackageLookupError, SnapshotChangedError
+from rbpkg.repository.package_repo import PackageRepository
+from rbpkg.repository.snapshots import (PackageBundleView,
+                                        PackageChannelView,
+                                        PackageReleaseView)
+from rbpkg.repository.tests.testcases import PackagesTestCase
+
+
+def _make_bundle(name):
+    return {
+        'format_version': '1.0',
+        'name': name,
+        'created_timestamp': '2015-10-11T08:17:29.958569',
+        'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+        'current_version': '1.0',
+        'package_names': [],
+        'channel_aliases': {},
+        'channels': [
+            {
+                'name': '1.0.x',
+                'created_timestamp': '2015-10-11T08:17:29.958569',
+                'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+                'latest_version': '1.0',
+                'type': 'release',
+                'current': True,
+                'visible': True,
+                'manifest_file': '1.0.x.json',
+            },
+        ],
+    }
+
+
+def _make_channel(name, version):
+    return {
+        'format_version': '1.0',
+        'created_timestamp': '2015-10-11T08:17:29.958569',
+        'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+        'releases': [
+            {
+                'version': version,
+                'type': 'stable',
+                'visible': True,
+            },
+        ],
+        'package_rules': [
+            {
+                'version_range': '*',
+                'package_type': 'python',
+                'package_name': name,
+                'systems': ['*'],
+            },
+        ],
+    }
+
+
+class RepositorySnapshotTests(SpyAgency, PackagesTestCase):
+    """Unit tests for rbpkg.repository.snapshots.RepositorySnapshot."""
+
+    def setUp(self):
+        super(RepositorySnapshotTests, self).setUp()
+
+        self.data_loader.path_to_content.update({
+            '/packages/index.json': {
+                'format_version': '1.0',
+                'last_updated_timestamp': '2015-10-15T08:17:29.958569',
+                'bundles': [],
+            },
+            '/packages/TestPackage/index.json': _make_bundle('TestPackage'),
+            '/packages/TestPackage/1.0.x.json':
+                _make_channel('TestPackage', '1.0'),
+            '/packages/OtherPackage/index.json': _make_bundle('OtherPackage'),
+            '/packages/OtherPackage/1.0.x.json':
+                _make_channel('OtherPackage', '1.0'),
+        })
+
+        self.repository = PackageRepository()
+
+    def test_lookup_package_bundle(self):
+        """Testing RepositorySnapshot.lookup_package_bundle"""
+        snapshot = self.repository.create_snapshot()
+        bundle = snapshot.lookup_package_bundle('TestPackage')
+
+        self.assertIsInstance(bundle, PackageBundleView)
+        self.assertEqual(bundle.name, 'TestPackage')
+        self.assertIs(snapshot.lookup_package_bundle('TestPackage'), bundle)
+
+        channel = bundle.current_channel
+        self.assertIsInstance(channel, PackageChannelView)
+        self.assertIs(channel.bundle, bundle)
+
+        release = channel.releases[0]
+        self.assertIsInstance(release, PackageReleaseView)
+        self.assertEqual(release.version, '1.0')
+        self.assertIs(release.channel, channel)
+
+        rules = channel.get_all_rules_for_version(
+            '1.0', require_current_system=False)
+        self.assertEqual(len(rules), 1)
+        self.assertEqual(rules[0].package_name, 'TestPackage')
+        self.assertIs(rules[0].channel, channel)
+
+    def test_lookup_package_bundle_with_not_found(self):
+        """Testing RepositorySnapshot.lookup_package_bundle with bundle not
+        found
+        """
+        snapshot = self.repository.create_snapshot()
+
+        with self.assertRaises(PackageLookupError):
+            snapshot.lookup_package_bundle('Missing')
+
+    def test_lookup_package_bundles(self):
+        """Testing RepositorySnapshot.lookup_package_bundles"""
+        snapshot = self.repository.create_snapshot()
+        bundle = snapshot.lookup_package_bundle('TestPackage')
+
+        bundles = snapshot.lookup_package_bundles(
+            ['TestPackage', 'OtherPackage'],
+            load_channels=True)
+
+        self.assertEqual(set(bundles), set(['TestPackage', 'OtherPackage']))
+        self.assertIs(bundles['TestPackage'], bundle)
+        self.assertEqual(
+            bundles['OtherPackage'].current_channel.releases[0].version,
+            '1.0')
+
+    def test_lookup_package_bundles_with_not_found(self):
+        """Testing RepositorySnapshot.lookup_package_bundles with a bundle
+        not found pins the bundles that were found
+        """
+        snapshot = self.repository.create_snapshot()
+
+        self.spy_on(self.repository.lookup_package_bundle)
+
+        with self.assertRaises(PackageLookupError):
+            snapshot.lookup_package_bundles(['TestPackage', 'Missing'])
+
+        self.assertIn('TestPackage', snapshot._bundles)
+        self.assertNotIn('Missing', snapshot._bundles)
+        self.assertFalse(self.repository.lookup_package_bundle.called)
+
+    def test_views_are_read_only(self):
+        """Testing RepositorySnapshot views can't be modified"""
+        snapshot = self.repository.create_snapshot()
+        bundle = snapshot.lookup_package_bundle('TestPackage')
+        channel = bundle.current_channel
+        release = channel.releases[0]
+
+        with self.assertRaises(AttributeError):
+            bundle.name = 'Changed'
+
+        with self.assertRaises(AttributeError):
+            channel.current = False
+
+        with self.assertRaises(AttributeError):
+            release.version = '2.0'
+
+        with self.assertRaises(AttributeError):
+            del release.version
+
+        self.assertIsInstance(bundle.channels, tuple)
+        self.assertIsInstance(channel.releases, tuple)
+
+    def test_pinned_across_refresh(self):
+        """Testing RepositorySnapshot keeps pinned data across repository
+        refreshes and cache clears
+        """
+        snapshot = self.repository.create_snapshot(
+            bundle_names=['TestPackage'],
+            load_channels=True)
+        index = snapshot.get_index()
+
+        self.data_loader.path_to_content.update({
+            '/packages/index.json': {
+                'format_version': '1.0',
+                'last_updated_timestamp': '2015-10-16T08:17:29.958569',
+                'bundles': [],
+            },
+            '/packages/TestPackage/1.0.x.json':
+                _make_channel('TestPackage', '1.1'),
+        })
+        self.repository.clear_caches()
+
+        self.assertIsNot(self.repository.get_index(), index)
+        self.assertIs(snapshot.get_index(), index)
+
+        bundle = snapshot.lookup_package_bundle('TestPackage')
+        self.assertEqual(bundle.current_channel.releases[0].version, '1.0')
+
+        new_bundle = self.repository.lookup_package_bundle('TestPackage')
+        self.assertEqual(new_bundle.current_channel.releases[0].version,
+                         '1.1')
+
+    def test_pinned_across_channel_unload(self):
+        """Testing RepositorySnapshot keeps pinned channel data when the
+        channel is unloaded
+        """
+        snapshot = self.repository.create_snapshot()
+        bundle = snapshot.lookup_package_bundle('TestPackage')
+        releases = bundle.current_channel.releases
+
+        path_to_content = self.data_loader.path_to_content
+        path_to_content['/packages/TestPackage/1.0.x.json'] = \
+            _make_channel('TestPackage', '1.1')
+        self.repository.lookup_package_bundle('TestPackage').unload_channels()
+
+        self.assertIs(bundle.current_channel.releases, releases)
+        self.assertEqual(releases[0].version, '1.0')
+
+    def test_lookup_package_bundle_with_changed_cached_bundle(self):
+        """Testing RepositorySnapshot.lookup_package_bundle with a bundle
+        cached when the snapshot was created and changed since
+        """
+        self.repository.lookup_package_bundle('TestPackage')
+        snapshot = self.repository.create_snapshot()
+
+        bundle_data = copy.deepcopy(_make_bundle('TestPackage'))
+        bundle_data['last_updated_timestamp'] = '2015-10-16T08:17:29.958569'
+        self.data_loader.path_to_content[
+            '/packages/TestPackage/index.json'] = bundle_data
+        self.repository.clear_caches()
+
+        with self.assertRaises(SnapshotChangedError):
+            snapshot.lookup_package_bundle('TestPackage')
+
+        self.assertNotIn('TestPackage', snapshot._bundles)
+
+    def test_lookup_package_bundle_with_changed_indexed_bundle(self):
+        """Testing RepositorySnapshot.lookup_package_bundle with a bundle
+        listed in the index and changed since the snapshot was created
+        """
+        self.data_loader.path_to_content['/packages/index.json'] = {
+            'format_version': '1.0',
+            'last_updated_timestamp': '2015-10-15T08:17:29.958569',
+            'bundles': [
+                {
+                    'name': 'TestPackage',
+                    'manifest_file': 'TestPackage/index.json',
+                    'created_timestamp': '2015-10-11T08:17:29.958569',
+                    'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+                    'package_names': [],
+                },
+            ],
+        }
+        snapshot = self.repository.create_snapshot()
+
+        bundle_data = copy.deepcopy(_make_bundle('TestPackage'))
+        bundle_data['last_updated_timestamp'] = '2015-10-16T08:17:29.958569'
+        self.data_loader.path_to_content[
+            '/packages/TestPackage/index.json'] = bundle_data
+
+        with self.assertRaises(SnapshotChangedError):
+            snapshot.lookup_package_bundle('TestPackage')
+
+        # Unchanged bundles not in the index can still be pinned.
+        bundle = snapshot.lookup_package_bundle('OtherPackage')
+        self.assertEqual(bundle.name, 'OtherPackage')
+
+    def test_channel_releases_with_changed_channel(self):
+        """Testing RepositorySnapshot with a channel changed before its
+        releases were pinned
+        """
+        snapshot = self.repository.create_snapshot(
+            bundle_names=['TestPackage'])
+        bundle = snapshot.lookup_package_bundle('TestPackage')
+
+        channel_data = _make_channel('TestPackage', '1.1')
+        channel_data['last_updated_timestamp'] = '2015-10-16T08:17:29.958569'
+        self.data_loader.path_to_content[
+            '/packages/TestPackage/1.0.x.json'] = channel_data
+
+        with self.assertRaises(SnapshotChangedError):
+            bundle.current_channel.releases
+
+    def test_create_snapshot_with_previous_shares_views(self):
+        """Testing PackageRepository.create_snapshot with previous snapshot
+        shares unchanged views
+        """
+        snapshot1 = self.repository.create_snapshot(
+            bundle_names=['TestPackage', 'OtherPackage'],
+            load_channels=True)
+
+        path_to_content = self.data_loader.path_to_content
+        path_to_content['/packages/TestPackage/1.0.x.json'] = \
+            _make_channel('TestPackage', '1.1')
+        self.repository.lookup_package_bundle('TestPackage').unload_channels()
+
+        snapshot2 = self.repository.create_snapshot(previous=snapshot1)
+
+        # The unchanged bundle is shared as-is.
+        other1 = snapshot1.lookup_package_bundle('OtherPackage')
+        self.assertIs(snapshot2.lookup_package_bundle('OtherPackage'), other1)
+
+        # The bundle with the reloaded channel gets a new channel view, but
+        # the old snapshot keeps its data.
+        bundle1 = snapshot1.lookup_package_bundle('TestPackage')
+        bundle2 = snapshot2.lookup_package_bundle('TestPackage')
+
+        self.assertIsNot(bundle2.current_channel, bundle1.current_channel)
+        self.assertEqual(bundle1.current_channel.releases[0].version, '1.0')
+        self.assertEqual(bundle2.current_channel.releases[0].version, '1.1')
+
+    def test_create_snapshot_with_previous_and_changed_bundle(self):
+        """Testing PackageRepository.create_snapshot with previous snapshot
+        and a reloaded bundle
+        """
+        snapshot1 = self.repository.create_snapshot(
+            bundle_names=['TestPackage'])
+
+        bundle_data = copy.deepcopy(_make_bundle('TestPackage'))
+        bundle_data['current_version'] = '1.1'
+        path_to_content = self.data_loader.path_to_content
+        path_to_content['/packages/TestPackage/index.json'] = bundle_data
+        self.repository.invalidate_package_bundle('TestPackage')
+
+        snapshot2 = self.repository.create_snapshot(previous=snapshot1)
+
+        self.assertEqual(
+            snapshot1.lookup_package_bundle('TestPackage').current_version,
+            '1.0')
+        self.assertEqual(
+            snapshot2.lookup_package_bundle('TestPackage').current_version,
+            '1.1')
@@ -0,0 +1,483 @@
+from __future__ import unicode_literals
+
+import copy
+
+from kgb import SpyAgency
+
+from rbpkg.repository.errors import LoadDataError, PathNotFoundError
+from rbpkg.repository.loaders import InMemoryPackageDataLoader, set_data_loader
+from rbpkg.repository.package_bundle import PackageBundle
+from rbpkg.repository.package_repo import PackageRepository
+from rbpkg.repository.sqlite_mirror import (SqlitePackageDataLoader,
+                                            SqliteRepositoryMirror)
+from rbpkg.testing.testcases import TestCase
+
+
+REPOSITORY_DATA = {
+    '/packages/index.json': {
+        'format_version': '1.0',
+        'last_updated_timestamp': '2015-10-15T08:17:29.958569',
+        'bundles': [
+            {
+                'name': 'TestPackage',
+                'manifest_file': 'TestPackage/index.json',
+                'created_timestamp': '2015-10-10T08:17:29.958569',
+                'last_updated_timestamp': '2015-10-15T08:17:29.958569',
+                'current_version': '1.0.5',
+                'package_names': [],
+            },
+            {
+                'name': 'OtherPackage',
+                'manifest_file': 'OtherPackage/index.json',
+                'created_timestamp': '2015-10-10T08:17:29.958569',
+                'last_updated_timestamp': '2015-10-11T08:17:29.958569',
+                'current_version': '2.0',
+                'package_names': [],
+            },
+        ],
+    },
+    '/packages/TestPackage/index.json': {
+        'format_version': '1.0',
+        'name': 'TestPackage',
+        'description': ['Summary.'],
+        'created_timestamp': '2015-10-10T08:17:29.958569',
+        'last_updated_timestamp': '2015-10-15T08:17:29.958569',
+        'current_version': '1.0.5',
+        'package_names': [],
+        'channel_aliases': {
+            'stable': '1.0.x',
+        },
+        'channels': [
+            {
+                'name': '2.0.x',
+                'created_timestamp': '2015-10-13T08:17:29.958569',
+                'last_updated_timestamp': '2015-10-14T08:17:29.958569',
+                'latest_version': '2.0beta1',
+                'type': 'prerelease',
+                'current': False,
+                'visible': True,
+                'manifest_file': '2.0.x.json',
+            },
+            {
+                'name': '1.0.x',
+                'created_timestamp': '2015-10-11T08:17:29.958569',
+                'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+                'latest_version': '1.0.5',
+                'type': 'release',
+                'current': True,
+                'visible': True,
+                'manifest_file': '1.0.x.json',
+            },
+        ],
+    },
+    '/packages/TestPackage/2.0.x.json': {
+        'format_version': '1.0',
+        'created_timestamp': '2015-10-13T08:17:29.958569',
+        'last_updated_timestamp': '2015-10-14T08:17:29.958569',
+        'releases': [
+            {
+                'version': '2.0beta1',
+                'type': 'beta',
+                'visible': True,
+            },
+        ],
+        'package_rules': [],
+    },
+    '/packages/TestPackage/1.0.x.json': {
+        'format_version': '1.0',
+        'created_timestamp': '2015-10-11T08:17:29.958569',
+        'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+        'releases': [
+            {
+                'version': '1.0.5',
+                'type': 'stable',
+                'visible': True,
+                'release_notes_url': 'https://example.com/1.0.5/',
+            },
+            {
+                'version': '1.0',
+                'type': 'stable',
+                'visible': True,
+            },
+        ],
+        'package_rules': [
+            {
+                'version_range': '*',
+                'package_type': 'rpm',
+                'package_name': 'TestPackage',
+                'systems': ['centos', 'rhel'],
+            },
+            {
+                'version_range': '*',
+                'package_type': 'python',
+                'package_name': 'TestPackage',
+                'systems': ['*'],
+            },
+        ],
+    },
+    '/packages/OtherPackage/index.json': {
+        'format_version': '1.0',
+        'name': 'OtherPackage',
+        'created_timestamp': '2015-10-10T08:17:29.958569',
+        'last_updated_timestamp': '2015-10-11T08:17:29.958569',
+        'current_version': '2.0',
+        'package_names': [],
+        'channel_aliases': {},
+        'channels': [],
+    },
+}
+
+
+UNMIRRORED_DATA = {
+    '/packages/Unmirrored/index.json': {
+        'format_version': '1.0',
+        'name': 'Unmirrored',
+        'created_timestamp': '2015-10-10T08:17:29.958569',
+        'last_updated_timestamp': '2015-10-11T08:17:29.958569',
+        'current_version': '3.0',
+        'package_names': [],
+        'channel_aliases': {},
+        'channels': [
+            {
+                'name': '3.0.x',
+                'created_timestamp': '2015-10-11T08:17:29.958569',
+                'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+                'latest_version': '3.0',
+                'type': 'release',
+                'current': True,
+                'visible': True,
+                'manifest_file': '3.0.x.json',
+            },
+        ],
+    },
+    '/packages/Unmirrored/3.0.x.json': {
+        'format_version': '1.0',
+        'created_timestamp': '2015-10-11T08:17:29.958569',
+        'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+        'releases': [
+            {
+                'version': '3.0',
+                'type': 'stable',
+                'visible': True,
+            },
+        ],
+        'package_rules': [],
+    },
+}
+
+
+class SqliteRepositoryMirrorTests(SpyAgency, TestCase):
+    """Unit tests for rbpkg.repository.sqlite_mirror.SqliteRepositoryMirror.
+    """
+
+    def setUp(self):
+        super(SqliteRepositoryMirrorTests, self).setUp()
+
+        self.source_loader = InMemoryPackageDataLoader(
+            copy.deepcopy(REPOSITORY_DATA))
+        self.mirror = SqliteRepositoryMirror(':memory:')
+
+    def tearDown(self):
+        super(SqliteRepositoryMirrorTests, self).tearDown()
+
+        self.mirror.close()
+
+    def test_sync(self):
+        """Testing SqliteRepositoryMirror.sync imports all manifests"""
+        self.assertEqual(self.mirror.sync(self.source_loader),
+                         ['OtherPackage', 'TestPackage'])
+
+        for path, data in REPOSITORY_DATA.items():
+            self.assertEqual(self.mirror.get_manifest_data(path), data)
+
+    def test_sync_with_unchanged_index(self):
+        """Testing SqliteRepositoryMirror.sync with unchanged index"""
+        self.mirror.sync(self.source_loader)
+
+        self.spy_on(self.source_loader.load_by_paths)
+
+        self.assertEqual(self.mirror.sync(self.source_loader), [])
+        self.assertFalse(self.source_loader.load_by_paths.called)
+
+    def test_sync_with_changed_bundle(self):
+        """Testing SqliteRepositoryMirror.sync only updates changed bundles
+        """
+        self.mirror.sync(self.source_loader)
+
+        path_to_content = self.source_loader.path_to_content
+        index_data = path_to_content['/packages/index.json']
+        index_data['last_updated_timestamp'] = '2015-10-16T08:17:29.958569'
+        index_data['bundles'][1]['last_updated_timestamp'] = \
+            '2015-10-16T08:17:29.958569'
+
+        bundle_data = path_to_content['/packages/OtherPackage/index.json']
+        bundle_data['last_updated_timestamp'] = '2015-10-16T08:17:29.958569'
+        bundle_data['current_version'] = '2.1'
+
+        self.spy_on(self.source_loader.load_by_paths)
+
+        self.assertEqual(self.mirror.sync(self.source_loader),
+                         ['OtherPackage'])
+        self.assertEqual(
+            self.source_loader.load_by_paths.calls[0].args[0],
+            ['/packages/OtherPackage/index.json'])
+        self.assertEqual(
+            self.mirror.get_manifest_data(
+                '/packages/OtherPackage/index.json')['current_version'],
+            '2.1')
+        self.assertEqual(
+            self.mirror.get_manifest_data('/packages/TestPackage/1.0.x.json'),
+            REPOSITORY_DATA['/packages/TestPackage/1.0.x.json'])
+
+    def test_sync_with_removed_bundle(self):
+        """Testing SqliteRepositoryMirror.sync with a bundle removed from the
+        index
+        """
+        self.mirror.sync(self.source_loader)
+
+        index_data = self.source_loader.path_to_content['/packages/index.json']
+        index_data['last_updated_timestamp'] = '2015-10-16T08:17:29.958569'
+        del index_data['bundles'][1]
+
+        self.assertEqual(self.mirror.sync(self.source_loader), [])
+        self.assertEqual(
+            [
+                bundle_data['name']
+                for bundle_data in self.mirror.get_manifest_data(
+                    '/packages/index.json')['bundles']
+            ],
+            ['TestPackage'])
+        self.assertIsNone(
+            self.mirror.get_manifest_data('/packages/OtherPackage/index.json'))
+        self.assertEqual(
+            self.mirror.get_manifest_data('/packages/TestPackage/index.json'),
+            REPOSITORY_DATA['/packages/TestPackage/index.json'])
+
+    def test_sync_with_load_error(self):
+        """Testing SqliteRepositoryMirror.sync with a manifest that fails to
+        load leaves the mirror unchanged
+        """
+        del self.source_loader.path_to_content[
+            '/packages/TestPackage/1.0.x.json']
+
+        self.assertRaises(LoadDataError,
+                          lambda: self.mirror.sync(self.source_loader))
+        self.assertIsNone(
+            self.mirror.get_manifest_data('/packages/index.json'))
+
+    def test_sync_with_paged_channel(self):
+        """Testing SqliteRepositoryMirror.sync with a paged channel manifest
+        """
+        path_to_content = self.source_loader.path_to_content
+        channel_data = path_to_content['/packages/TestPackage/1.0.x.json']
+        path_to_content['/packages/TestPackage/1.0.x.page2.json'] = {
+            'format_version': '1.0',
+            'releases': [channel_data['releases'].pop()],
+        }
+        channel_data['next_page'] = '1.0.x.page2.json'
+
+        self.mirror.sync(self.source_loader)
+
+        self.assertEqual(
+            self.mirror.get_manifest_data('/packages/TestPackage/1.0.x.json'),
+            REPOSITORY_DATA['/packages/TestPackage/1.0.x.json'])
+
+    def test_get_latest_release(self):
+        """Testing SqliteRepositoryMirror.get_latest_release"""
+        self.mirror.sync(self.source_loader)
+
+        self.assertEqual(
+            self.mirror.get_latest_release('/packages/TestPackage/index.json',
+                                           'TestPackage>=2.0b1'),
+            ('2.0.x', {
+                'version': '2.0beta1',
+                'type': 'beta',
+                'visible': True,
+            }))
+        self.assertEqual(
+            self.mirror.get_latest_release('/packages/TestPackage/index.json',
+                                           'TestPackage>=1.0'),
+            ('1.0.x', {
+                'version': '1.0.5',
+                'type': 'stable',
+                'visible': True,
+                'release_notes_url': 'https://example.com/1.0.5/',
+            }))
+        self.assertEqual(
+            self.mirror.get_latest_release('/packages/TestPackage/index.json',
+                                           'TestPackage<1.0.5'),
+            ('1.0.x', {
+                'version': '1.0',
+                'type': 'stable',
+                'visible': True,
+            }))
+        self.assertIsNone(
+            self.mirror.get_latest_release('/packages/TestPackage/index.json',
+                                           'TestPackage<1.0'))
+
+    def test_get_latest_release_with_equivalent_version(self):
+        """Testing SqliteRepositoryMirror.get_latest_release with an exact
+        version written differently than the release's version
+        """
+        self.mirror.sync(self.source_loader)
+
+        self.assertEqual(
+            self.mirror.get_latest_release('/packages/TestPackage/index.json',
+                                           'TestPackage==1.0.0'),
+            ('1.0.x', {
+                'version': '1.0',
+                'type': 'stable',
+                'visible': True,
+            }))
+
+    def test_get_latest_release_with_bundle_not_found(self):
+        """Testing SqliteRepositoryMirror.get_latest_release with a bundle
+        that isn't in the mirror
+        """
+        self.mirror.sync(self.source_loader)
+
+        self.assertRaises(
+            PathNotFoundError,
+            lambda: self.mirror.get_latest_release(
+                '/packages/Missing/index.json', 'Missing>=1.0'))
+
+    def test_get_latest_release_with_types(self):
+        """Testing SqliteRepositoryMirror.get_latest_release with channel and
+        release types
+        """
+        self.mirror.sync(self.source_loader)
+
+        self.assertEqual(
+            self.mirror.get_latest_release('/packages/TestPackage/index.json',
+                                           'TestPackage>=1.0',
+                                           channel_types=['release'])[0],
+            '1.0.x')
+        self.assertIsNone(
+            self.mirror.get_latest_release('/packages/TestPackage/index.json',
+                                           'TestPackage>=2.0b1',
+                                           release_types=['stable']))
+
+    def test_get_package_rules(self):
+        """Testing SqliteRepositoryMirror.get_package_rules"""
+        self.mirror.sync(self.source_loader)
+
+        rules = self.mirror.get_package_rules(
+            '/packages/TestPackage/1.0.x.json', system='centos')
+        self.assertEqual([rule['package_type'] for rule in rules],
+                         ['rpm', 'python'])
+
+        rules = self.mirror.get_package_rules(
+            '/packages/TestPackage/1.0.x.json', system='macosx')
+        self.assertEqual([rule['package_type'] for rule in rules],
+                         ['python'])
+
+
+class SqlitePackageDataLoaderTests(SpyAgency, TestCase):
+    """Unit tests for rbpkg.repository.sqlite_mirror.SqlitePackageDataLoader.
+    """
+
+    def setUp(self):
+        super(SqlitePackageDataLoaderTests, self).setUp()
+
+        self.mirror = SqliteRepositoryMirror(':memory:')
+        self.mirror.sync(InMemoryPackageDataLoader(
+            copy.deepcopy(REPOSITORY_DATA)))
+
+        self.fallback_loader = InMemoryPackageDataLoader(
+            copy.deepcopy(UNMIRRORED_DATA))
+        self.loader = SqlitePackageDataLoader(
+            self.mirror,
+            fallback_loader=self.fallback_loader)
+        set_data_loader(self.loader)
+
+    def tearDown(self):
+        super(SqlitePackageDataLoaderTests, self).tearDown()
+
+        set_data_loader(None)
+        self.mirror.close()
+
+    def test_load_by_path(self):
+        """Testing SqlitePackageDataLoader.load_by_path"""
+        self.assertEqual(
+            self.loader.load_by_path('/packages/TestPackage/index.json'),
+            REPOSITORY_DATA['/packages/TestPackage/index.json'])
+
+    def test_load_by_path_with_not_found(self):
+        """Testing SqlitePackageDataLoader.load_by_path with path not found"""
+        self.assertRaises(
+            LoadDataError,
+            lambda: self.loader.load_by_path('/packages/Missing/index.json'))
+
+    def test_load_by_path_with_no_fallback_loader(self):
+        """Testing SqlitePackageDataLoader.load_by_path with path not in the
+        mirror and no fallback loader
+        """
+        loader = SqlitePackageDataLoader(self.mirror)
+
+        self.assertRaises(
+            PathNotFoundError,
+            lambda: loader.load_by_path('/packages/Unmirrored/index.json'))
+
+    def test_load_by_path_with_fallback(self):
+        """Testing SqlitePackageDataLoader.load_by_path with path not in the
+        mirror loads from the fallback loader
+        """
+        self.spy_on(self.fallback_loader.load_by_path)
+
+        self.assertEqual(
+            self.loader.load_by_path('/packages/Unmirrored/index.json'),
+            UNMIRRORED_DATA['/packages/Unmirrored/index.json'])
+        self.assertTrue(self.fallback_loader.load_by_path.called)
+
+    def test_load_by_paths_with_fallback(self):
+        """Testing SqlitePackageDataLoader.load_by_paths with some paths not
+        in the mirror loads only those from the fallback loader
+        """
+        self.spy_on(self.fallback_loader.try_load_by_paths)
+
+        self.assertEqual(
+            self.loader.load_by_paths([
+                '/packages/TestPackage/index.json',
+                '/packages/Unmirrored/index.json',
+            ]),
+            {
+                '/packages/TestPackage/index.json':
+                    REPOSITORY_DATA['/packages/TestPackage/index.json'],
+                '/packages/Unmirrored/index.json':
+                    UNMIRRORED_DATA['/packages/Unmirrored/index.json'],
+            })
+        self.assertEqual(
+            self.fallback_loader.try_load_by_paths.calls[0].args[0],
+            ['/packages/Unmirrored/index.json'])
+
+    def test_get_latest_release_for_version_range(self):
+        """Testing PackageBundle.get_latest_release_for_version_range with
+        SqlitePackageDataLoader queries the mirror
+        """
+        bundle = PackageRepository().lookup_package_bundle('TestPackage')
+
+        self.spy_on(self.mirror.get_manifest_data)
+
+        release = bundle.get_latest_release_for_version_range(
+            '>=1.0', channel_types=['release'])
+
+        self.assertEqual(release.version, '1.0.5')
+        self.assertEqual(release.release_notes_url,
+                         'https://example.com/1.0.5/')
+        self.assertEqual(release.channel.name, '1.0.x')
+        self.assertFalse(release.channel._loaded)
+        self.assertFalse(self.mirror.get_manifest_data.called)
+
+        self.assertIsNone(bundle.get_latest_release_for_version_range('<1.0'))
+
+    def test_get_latest_release_for_version_range_with_unmirrored(self):
+        """Testing PackageBundle.get_latest_release_for_version_range with
+        SqlitePackageDataLoader and a bundle that isn't in the mirror
+        """
+        bundle = PackageBundle(manifest_url='/packages/Unmirrored/index.json',
+                               name='Unmirrored')
+
+        release = bundle.get_latest_release_for_version_range('>=1.0')
+
+        self.assertEqual(release.version, '3.0')
+        self.assertEqual(release.channel.name, '3.0.x')
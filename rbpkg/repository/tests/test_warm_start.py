@@ -0,0 +1,246 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+
+from kgb import SpyAgency
+from six.moves import cPickle as pickle
+
+from rbpkg.repository.loaders import InMemoryPackageDataLoader, set_data_loader
+from rbpkg.repository.package_repo import PackageRepository
+from rbpkg.repository.warm_start import (ManifestDigestPackageDataLoader,
+                                         WarmStartCache,
+                                         get_manifest_digest)
+from rbpkg.testing.testcases import TestCase
+
+
+def _make_bundle(name, current_version='1.0'):
+    return {
+        'format_version': '1.0',
+        'name': name,
+        'created_timestamp': '2015-10-11T08:17:29.958569',
+        'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+        'current_version': current_version,
+        'package_names': [],
+        'channel_aliases': {},
+        'channels': [
+            {
+                'name': '1.0.x',
+                'created_timestamp': '2015-10-11T08:17:29.958569',
+                'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+                'latest_version': '1.0',
+                'type': 'release',
+                'current': True,
+                'visible': True,
+                'manifest_file': '1.0.x.json',
+            },
+        ],
+    }
+
+
+def _make_channel(version):
+    return {
+        'format_version': '1.0',
+        'created_timestamp': '2015-10-11T08:17:29.958569',
+        'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+        'releases': [
+            {
+                'version': version,
+                'type': 'stable',
+                'visible': True,
+            },
+        ],
+        'package_rules': [],
+    }
+
+
+class WarmStartCacheTests(SpyAgency, TestCase):
+    """Unit tests for rbpkg.repository.warm_start.WarmStartCache."""
+
+    def setUp(self):
+        super(WarmStartCacheTests, self).setUp()
+
+        self.tempdir = tempfile.mkdtemp(prefix='rbpkg-tests.')
+        self.filename = os.path.join(self.tempdir, 'warm-start.pickle')
+
+        self.data_loader = InMemoryPackageDataLoader({
+            '/packages/index.json': {
+                'format_version': '1.0',
+                'last_updated_timestamp': '2015-10-15T08:17:29.958569',
+                'bundles': [],
+            },
+            '/packages/TestPackage/index.json': _make_bundle('TestPackage'),
+            '/packages/TestPackage/1.0.x.json': _make_channel('1.0'),
+        })
+        self.loader = ManifestDigestPackageDataLoader(self.data_loader)
+        set_data_loader(self.loader)
+
+        # Populate the cache file from a first run.
+        repository = PackageRepository()
+        repository.get_index()
+        repository.lookup_package_bundle('TestPackage').load_channels()
+
+        self.assertTrue(WarmStartCache(self.filename).save(repository))
+
+    def tearDown(self):
+        super(WarmStartCacheTests, self).tearDown()
+
+        set_data_loader(None)
+        shutil.rmtree(self.tempdir)
+
+    def test_restore(self):
+        """Testing WarmStartCache.restore"""
+        self.spy_on(self.loader.parse_content)
+        self.spy_on(self.data_loader.fetch_by_path)
+
+        repository = PackageRepository()
+        restored = WarmStartCache(self.filename).restore(repository)
+
+        self.assertEqual(
+            set(restored),
+            set([
+                '/packages/index.json',
+                '/packages/TestPackage/index.json',
+                '/packages/TestPackage/1.0.x.json',
+            ]))
+
+        index = repository.get_index()
+        self.assertEqual(index.manifest_url, '/packages/index.json')
+
+        bundle = repository.lookup_package_bundle('TestPackage')
+        channel = bundle.current_channel
+        self.assertTrue(channel._loaded)
+        self.assertEqual(channel.releases[0].version, '1.0')
+        self.assertIs(channel.bundle, bundle)
+        self.assertIs(channel.releases[0].channel, channel)
+
+        # Only the index had to be fetched, and nothing had to be parsed.
+        self.assertEqual(len(self.data_loader.fetch_by_path.calls), 1)
+        self.assertEqual(self.data_loader.fetch_by_path.calls[0].args,
+                         ('/packages/index.json',))
+        self.assertEqual(len(self.loader.parse_content.calls), 0)
+
+        # The restored objects are fully functional.
+        channel.unload()
+        self.assertEqual(channel.releases[0].version, '1.0')
+
+    def test_restore_with_changed_index(self):
+        """Testing WarmStartCache.restore with a changed package index"""
+        path_to_content = self.data_loader.path_to_content
+        path_to_content['/packages/index.json'] = {
+            'format_version': '1.0',
+            'last_updated_timestamp': '2015-10-16T08:17:29.958569',
+            'bundles': [],
+        }
+        path_to_content['/packages/TestPackage/index.json'] = \
+            _make_bundle('TestPackage', current_version='1.1')
+
+        repository = PackageRepository()
+        restored = WarmStartCache(self.filename).restore(repository)
+
+        self.assertEqual(restored, [])
+        self.assertEqual(
+            repository.lookup_package_bundle('TestPackage').current_version,
+            '1.1')
+
+    def test_restore_with_missing_index(self):
+        """Testing WarmStartCache.restore with a package index that can't
+        be fetched
+        """
+        del self.data_loader.path_to_content['/packages/index.json']
+
+        self.assertEqual(
+            WarmStartCache(self.filename).restore(PackageRepository()),
+            [])
+
+    def test_restore_with_corrupt_file(self):
+        """Testing WarmStartCache.restore with a corrupt cache file"""
+        with open(self.filename, 'wb') as fp:
+            fp.write(b'not a pickle')
+
+        self.assertEqual(
+            WarmStartCache(self.filename).restore(PackageRepository()),
+            [])
+
+    def test_restore_with_other_version(self):
+        """Testing WarmStartCache.restore with a cache file from another
+        version
+        """
+        with open(self.filename, 'rb') as fp:
+            state = pickle.load(fp)
+
+        state['rbpkg_version'] = '0.0'
+
+        with open(self.filename, 'wb') as fp:
+            pickle.dump(state, fp)
+
+        self.assertEqual(
+            WarmStartCache(self.filename).restore(PackageRepository()),
+            [])
+
+    def test_restore_without_digest_loader(self):
+        """Testing WarmStartCache.restore without digests being recorded"""
+        set_data_loader(self.data_loader)
+
+        self.assertEqual(
+            WarmStartCache(self.filename).restore(PackageRepository()),
+            [])
+
+    def test_save_unchanged(self):
+        """Testing WarmStartCache.save with data unchanged since restoring"""
+        repository = PackageRepository()
+        warm_start_cache = WarmStartCache(self.filename)
+        warm_start_cache.restore(repository)
+
+        self.assertFalse(warm_start_cache.save(repository))
+
+        # Loading changed data requires a new save.
+        self.data_loader.path_to_content['/packages/index.json'][
+            'last_updated_timestamp'] = '2015-10-16T08:17:29.958569'
+        repository.invalidate_index()
+        repository.get_index()
+
+        self.assertTrue(warm_start_cache.save(repository))
+
+
+    def test_save_without_index(self):
+        """Testing WarmStartCache.save without the package index loaded
+        records its digest
+        """
+        os.unlink(self.filename)
+        loader = ManifestDigestPackageDataLoader(self.data_loader)
+        set_data_loader(loader)
+
+        repository = PackageRepository()
+        repository.lookup_package_bundle('TestPackage')
+
+        self.assertTrue(WarmStartCache(self.filename).save(repository))
+        self.assertIn('/packages/index.json', loader.get_digests())
+
+        restored = WarmStartCache(self.filename).restore(PackageRepository())
+        self.assertEqual(restored, ['/packages/TestPackage/index.json'])
+
+
+class ManifestDigestPackageDataLoaderTests(TestCase):
+    """Unit tests for
+    rbpkg.repository.warm_start.ManifestDigestPackageDataLoader.
+    """
+
+    def test_fetch_by_path(self):
+        """Testing ManifestDigestPackageDataLoader.fetch_by_path records
+        digests
+        """
+        loader = ManifestDigestPackageDataLoader(InMemoryPackageDataLoader({
+            '/packages/index.json': {
+                'format_version': '1.0',
+            },
+        }))
+
+        data = loader.load_by_path('/packages/index.json')
+        self.assertEqual(data, {'format_version': '1.0'})
+
+        result = loader.fetch_by_path('/packages/index.json')
+        self.assertEqual(loader.get_digests(), {
+            '/packages/index.json': get_manifest_digest(result.content),
+        })
@@ -0,0 +1,218 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+
+from rbpkg.repository.loaders import (FilePackageDataLoader,
+                                      InstrumentedPackageDataLoader,
+                                      set_data_loader)
+from rbpkg.repository.manifests import write_manifest
+from rbpkg.repository.package_repo import PackageRepository
+from rbpkg.repository.watchers import RepositoryWatcher
+from rbpkg.testing.testcases import TestCase
+
+
+class RepositoryWatcherTests(TestCase):
+    """Unit tests for rbpkg.repository.watchers.RepositoryWatcher."""
+
+    def setUp(self):
+        super(RepositoryWatcherTests, self).setUp()
+
+        self.root = tempfile.mkdtemp(prefix='rbpkg-tests.')
+
+        self._old_root = os.environ.get('RBPKG_FILE_LOADER_ROOT')
+        os.environ['RBPKG_FILE_LOADER_ROOT'] = self.root
+
+        self._write('/packages/index.json', {
+            'format_version': '1.0',
+            'last_updated_timestamp': '2015-10-15T08:17:29.958569',
+            'bundles': [],
+        })
+
+        for name in ('TestPackage', 'OtherPackage'):
+            self._write('/packages/%s/index.json' % name, {
+                'format_version': '1.0',
+                'name': name,
+                'created_timestamp': '2015-10-11T08:17:29.958569',
+                'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+                'package_names': [],
+                'channel_aliases': {},
+                'channels': [
+                    {
+                        'name': '1.0.x',
+                        'created_timestamp': '2015-10-11T08:17:29.958569',
+                        'last_updated_timestamp':
+                            '2015-10-12T08:17:29.958569',
+                        'latest_version': '1.0',
+                        'type': 'release',
+                        'current': True,
+                        'visible': True,
+                        'manifest_file': '1.0.x.json',
+                    },
+                ],
+            })
+            self._write_channel(name, '1.0')
+
+        self.file_loader = FilePackageDataLoader()
+        set_data_loader(self.file_loader)
+
+        self.repository = PackageRepository()
+
+        # Checks are made manually, rather than from the background thread.
+        self.watcher = RepositoryWatcher(self.repository,
+                                         interval=3600,
+                                         use_watchdog=False)
+
+    def tearDown(self):
+        super(RepositoryWatcherTests, self).tearDown()
+
+        self.watcher.stop()
+        set_data_loader(None)
+
+        if self._old_root is None:
+            del os.environ['RBPKG_FILE_LOADER_ROOT']
+        else:
+            os.environ['RBPKG_FILE_LOADER_ROOT'] = self._old_root
+
+        shutil.rmtree(self.root)
+
+    def test_check_with_no_changes(self):
+        """Testing RepositoryWatcher.check with no changed manifests"""
+        bundle = self._load_bundle('TestPackage')
+
+        self.assertEqual(self.watcher.check(), [])
+        self.assertEqual(self.watcher.check(), [])
+        self.assertIs(self.repository.lookup_package_bundle('TestPackage'),
+                      bundle)
+
+    def test_check_with_changed_channel(self):
+        """Testing RepositoryWatcher.check with a changed channel manifest"""
+        bundle = self._load_bundle('TestPackage')
+        other_bundle = self._load_bundle('OtherPackage')
+        self.watcher.check()
+
+        self._write_channel('TestPackage', '1.1')
+
+        self.assertEqual(self.watcher.check(),
+                         ['/packages/TestPackage/1.0.x.json'])
+
+        # Only the changed channel is unloaded. The bundles stay cached.
+        self.assertIs(self.repository.lookup_package_bundle('TestPackage'),
+                      bundle)
+        self.assertFalse(bundle.current_channel._loaded)
+        self.assertTrue(other_bundle.current_channel._loaded)
+        self.assertEqual(bundle.current_channel.releases[0].version, '1.1')
+
+    def test_check_with_change_before_first_check(self):
+        """Testing RepositoryWatcher.check with a manifest changed after
+        loading and before the first check
+        """
+        self.watcher.start()
+        bundle = self._load_bundle('TestPackage')
+
+        self._write_channel('TestPackage', '1.1')
+
+        self.assertEqual(self.watcher.check(),
+                         ['/packages/TestPackage/1.0.x.json'])
+        self.assertFalse(bundle.current_channel._loaded)
+
+    def test_stop_with_polling(self):
+        """Testing RepositoryWatcher.stop when polling stops examining
+        loaded manifests
+        """
+        self.watcher.start()
+        self.watcher.stop()
+        self.assertEqual(self.file_loader._load_listeners, [])
+
+        bundle = self._load_bundle('TestPackage')
+
+        self._write_channel('TestPackage', '1.1')
+
+        # Without a signature from the load, the first check only records
+        # the current state.
+        self.assertEqual(self.watcher.check(), [])
+        self.assertTrue(bundle.current_channel._loaded)
+
+    def test_start_with_wrapped_file_loader(self):
+        """Testing RepositoryWatcher.start listens to the file loader
+        wrapped by the current data loader
+        """
+        set_data_loader(InstrumentedPackageDataLoader(self.file_loader))
+        watcher = RepositoryWatcher(self.repository, use_watchdog=False)
+
+        self.assertEqual(self.file_loader._load_listeners, [])
+
+        watcher.start()
+
+        try:
+            self.assertEqual(self.file_loader._load_listeners,
+                             [watcher._on_file_load])
+        finally:
+            watcher.stop()
+
+    def test_check_with_changed_bundle(self):
+        """Testing RepositoryWatcher.check with a changed bundle manifest"""
+        bundle = self._load_bundle('TestPackage')
+        other_bundle = self._load_bundle('OtherPackage')
+        self.watcher.check()
+
+        with open(self._get_filename('/packages/TestPackage/index.json'),
+                  'a') as fp:
+            fp.write('\n')
+
+        self.assertEqual(self.watcher.check(),
+                         ['/packages/TestPackage/index.json'])
+        self.assertIsNot(
+            self.repository.lookup_package_bundle('TestPackage'),
+            bundle)
+        self.assertIs(
+            self.repository.lookup_package_bundle('OtherPackage'),
+            other_bundle)
+
+    def test_check_with_changed_index(self):
+        """Testing RepositoryWatcher.check with a changed package index"""
+        index = self.repository.get_index()
+        self.watcher.check()
+
+        self._write('/packages/index.json', {
+            'format_version': '1.0',
+            'last_updated_timestamp': '2015-10-16T08:17:29.958569',
+            'bundles': [],
+        })
+
+        self.assertEqual(self.watcher.check(), ['/packages/index.json'])
+        self.assertIsNot(self.repository.get_index(), index)
+
+    def _load_bundle(self, name):
+        bundle = self.repository.lookup_package_bundle(name)
+        bundle.load_channels()
+
+        return bundle
+
+    def _write_channel(self, name, version):
+        self._write('/packages/%s/1.0.x.json' % name, {
+            'format_version': '1.0',
+            'created_timestamp': '2015-10-11T08:17:29.958569',
+            'last_updated_timestamp': '2015-10-12T08:17:29.958569',
+            'releases': [
+                {
+                    'version': version,
+                    'type': 'stable',
+                    'visible': True,
+                },
+            ],
+            'package_rules': [],
+        })
+
+    def _write(self, path, data):
+        filename = self._get_filename(path)
+        dirname = os.path.dirname(filename)
+
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+
+        write_manifest(filename, data)
+
+    def _get_filename(self, path):
+        return os.path.join(self.root, *path.strip('/').split('/'))
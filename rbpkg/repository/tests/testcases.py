@@ -12,7 +12,7 @@ class PackagesTestCase(TestCase):
     """
 
     def setUp(self):
-        self.data_loader = InMemoryPackageDataLoader()
+        self.data_loader = InMemoryPackageDataLoader({})
         set_data_loader(self.data_loader)
 
     def tearDown(self):
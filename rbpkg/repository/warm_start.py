@@ -0,0 +1,470 @@
+"""Warm-start cache of deserialized repository data.
+
+Loading package data normally means parsing each manifest's JSON and
+building the index, bundles, channels, and releases from it, including
+parsing every timestamp. On a large repository, this dominates the start-up
+time of each ``rbpkg`` invocation.
+
+A :py:class:`WarmStartCache` saves the deserialized objects held by a
+:py:class:`~rbpkg.repository.package_repo.PackageRepository` to a single
+pickle file, along with a digest of the raw content of each manifest they
+were built from. On the next run, the file is read back in one go, and
+only the root package index is fetched and hashed (but not parsed). If it's
+unchanged, the repository is assumed to be unchanged as well, and all the
+saved objects are placed in the repository's caches without fetching
+their manifests. If it changed, nothing is restored, and objects are
+loaded normally on demand. This keeps the cost of restoring independent of
+the size of the repository.
+
+Digests are recorded by :py:class:`ManifestDigestPackageDataLoader`, which
+must be part of the session's data loader. It's added by
+:py:func:`~rbpkg.repository.loaders.create_data_loader` when
+:env:`RBPKG_WARM_START` is set to ``1``.
+"""
+
+from __future__ import unicode_literals
+
+import hashlib
+import logging
+import os
+import posixpath
+import tempfile
+import threading
+
+import six
+from six.moves import cPickle as pickle
+
+from rbpkg import get_package_version
+from rbpkg.repository.errors import LoadDataError
+from rbpkg.repository.loaders import (WrappingPackageDataLoader,
+                                      get_data_loader,
+                                      get_default_cache_dir)
+from rbpkg.utils.disk_cache import replace_file
+
+
+logger = logging.getLogger(__name__)
+
+
+#: The version of the warm-start cache file format.
+FORMAT_VERSION = 1
+
+#: The name of the warm-start cache file within the cache directory.
+WARM_START_FILENAME = 'warm-start.pickle'
+
+
+def get_manifest_digest(content):
+    """Return the digest of a manifest's raw content.
+
+    Args:
+        content (bytes):
+            The raw content of the manifest.
+
+    Returns:
+        unicode:
+        The hex-encoded SHA-256 digest of the content.
+    """
+    return hashlib.sha256(content).hexdigest()
+
+
+def find_digest_loader(loader):
+    """Return the digest-recording loader within a stack of data loaders.
+
+    Args:
+        loader (rbpkg.repository.loaders.PackageDataLoader):
+            The outermost data loader.
+
+    Returns:
+        ManifestDigestPackageDataLoader:
+        The digest-recording loader, or ``None`` if the stack doesn't
+        contain one.
+    """
+    while loader is not None:
+        if isinstance(loader, ManifestDigestPackageDataLoader):
+            return loader
+
+        loader = getattr(loader, 'loader', None)
+
+    return None
+
+
+def create_warm_start_cache():
+    """Create a warm-start cache based on the environment.
+
+    The cache is only used if :env:`RBPKG_WARM_START` is set to ``1``. It's
+    stored in :env:`RBPKG_CACHE_DIR`, or the directory returned by
+    :py:func:`~rbpkg.repository.loaders.get_default_cache_dir`. Setting
+    :env:`RBPKG_CACHE_DIR` to an empty value disables it.
+
+    Returns:
+        WarmStartCache:
+        The warm-start cache, or ``None`` if disabled.
+    """
+    if os.environ.get('RBPKG_WARM_START') != '1':
+        return None
+
+    cache_dir = os.environ.get('RBPKG_CACHE_DIR', get_default_cache_dir())
+
+    if not cache_dir:
+        return None
+
+    return WarmStartCache(os.path.join(cache_dir, WARM_START_FILENAME))
+
+
+class ManifestDigestPackageDataLoader(WrappingPackageDataLoader):
+    """A data loader that records digests of the manifests it fetches.
+
+    The digest of the most recently fetched content of each path is kept,
+    for use by :py:class:`WarmStartCache`.
+    """
+
+    def __init__(self, loader):
+        """Initialize the data loader.
+
+        Args:
+            loader (rbpkg.repository.loaders.PackageDataLoader):
+                The data loader to wrap.
+        """
+        super(ManifestDigestPackageDataLoader, self).__init__(loader)
+
+        self._digests = {}
+        self._lock = threading.Lock()
+
+    def fetch_by_path(self, path, etag=None, last_modified=None):
+        """Fetch the raw content for the given path within the repository.
+
+        Args:
+            path (unicode):
+                The path within the repository.
+
+            etag (unicode, optional):
+                The ETag from a previous fetch of this path.
+
+            last_modified (unicode, optional):
+                The Last-Modified value from a previous fetch of this path.
+
+        Returns:
+            rbpkg.repository.loaders.FetchResult:
+            The result of the fetch.
+
+        Raises:
+            rbpkg.repository.errors.ConfigurationError:
+                Indicates a problem with the configuration of rbpkg or its
+                environment.
+
+            rbpkg.repository.errors.LoadDataError:
+                Error loading the data from the path.
+        """
+        result = self.loader.fetch_by_path(path, etag=etag,
+                                           last_modified=last_modified)
+
+        if result.content is not None:
+            digest = get_manifest_digest(result.content)
+
+            with self._lock:
+                self._digests[path] = digest
+
+        return result
+
+    def get_digests(self):
+        """Return the digests of all fetched manifests.
+
+        Returns:
+            dict:
+            A mapping of paths to the digests of their most recently fetched
+            content.
+        """
+        with self._lock:
+            return self._digests.copy()
+
+
+class WarmStartCache(object):
+    """A cache of deserialized repository data, persisted between runs.
+
+    See the module documentation for details.
+
+    Attributes:
+        filename (unicode):
+            The path to the cache file.
+    """
+
+    def __init__(self, filename):
+        """Initialize the cache.
+
+        Args:
+            filename (unicode):
+                The path to the cache file.
+        """
+        self.filename = filename
+
+        self._stored_digests = None
+
+    def restore(self, repository):
+        """Restore cached data into a repository.
+
+        The root package index is fetched to check that the repository is
+        unchanged. If it is, the saved objects are restored, where the
+        repository doesn't already have its own copy. Otherwise, nothing is
+        restored.
+
+        A missing, unreadable, or outdated cache file is ignored.
+
+        Args:
+            repository (rbpkg.repository.package_repo.PackageRepository):
+                The repository to restore data into.
+
+        Returns:
+            list of unicode:
+            The paths of the manifests whose data was restored.
+        """
+        loader = find_digest_loader(get_data_loader())
+
+        if loader is None:
+            logger.debug('Not restoring the warm-start cache, since manifest '
+                         'digests are not being recorded.')
+            return []
+
+        state = self._read()
+
+        if state is None:
+            return []
+
+        stored_digests = state['digests']
+        index_path = repository._build_package_index_path()
+        index_digest = stored_digests.get(index_path)
+
+        if (index_digest is None or
+            self._fetch_digest(loader, index_path) != index_digest):
+            logger.debug('Not restoring the warm-start cache, since the '
+                         'package index has changed.')
+            return []
+
+        self._stored_digests = stored_digests
+
+        restored = []
+        restored_bundles = set()
+
+        for name, package_bundle in six.iteritems(state['bundles']):
+            if repository._package_bundle_cache.peek(name) is not None:
+                continue
+
+            for channel in package_bundle._channels:
+                if channel._loaded:
+                    restored += self._get_channel_paths(channel,
+                                                        stored_digests)
+
+            repository._add_package_bundle(name, package_bundle)
+            restored_bundles.add(id(package_bundle))
+            restored.append(package_bundle.absolute_manifest_url)
+
+        index = state['index']
+
+        # Entries in the index may have been replaced by loaded bundles,
+        # which must have been restored as well.
+        if (index is not None and
+            repository._index is None and
+            all(not package_bundle._loaded or
+                id(package_bundle) in restored_bundles
+                for package_bundle in index.bundles)):
+            repository._set_index(index)
+            restored.append(index_path)
+
+        logger.debug('Restored data for %d of %d manifests from the '
+                     'warm-start cache.',
+                     len(restored), len(stored_digests))
+
+        return restored
+
+    def save(self, repository):
+        """Save the data cached by a repository.
+
+        The index, cached package bundles, and their loaded channels are
+        saved, along with the digests of their manifests. Objects whose
+        manifest digests aren't known are left out. Nothing is written if
+        the data is unchanged from what was last restored or saved.
+
+        The digest of the root package index is always saved, fetching the
+        index if it wasn't loaded, since it's used to check the cache on
+        the next run.
+
+        Args:
+            repository (rbpkg.repository.package_repo.PackageRepository):
+                The repository to save data from.
+
+        Returns:
+            bool:
+            ``True`` if the cache file was written.
+        """
+        loader = find_digest_loader(get_data_loader())
+
+        if loader is None:
+            return False
+
+        index_path = repository._build_package_index_path()
+
+        # Restored objects weren't fetched during this run, so their
+        # digests are only known from the cache file.
+        known_digests = dict(self._stored_digests or {})
+        known_digests.update(loader.get_digests())
+
+        if (index_path not in known_digests and
+            self._fetch_digest(loader, index_path) is None):
+            return False
+
+        known_digests.update(loader.get_digests())
+        paths = [index_path]
+        index = repository._index
+
+        package_bundles = {}
+
+        for name in repository._package_bundle_cache.keys():
+            package_bundle = repository._package_bundle_cache.peek(name)
+
+            if (package_bundle is None or
+                not package_bundle._loaded or
+                package_bundle.absolute_manifest_url not in known_digests):
+                continue
+
+            package_bundles[name] = package_bundle
+            paths.append(package_bundle.absolute_manifest_url)
+
+            for channel in package_bundle._channels:
+                if channel._loaded:
+                    paths += self._get_channel_paths(channel, known_digests)
+
+        digests = dict(
+            (path, known_digests[path])
+            for path in paths
+            if path in known_digests
+        )
+
+        if digests == self._stored_digests:
+            return False
+
+        state = {
+            'format_version': FORMAT_VERSION,
+            'rbpkg_version': get_package_version(),
+            'digests': digests,
+            'index': index,
+            'bundles': package_bundles,
+        }
+
+        if not self._write(state):
+            return False
+
+        self._stored_digests = digests
+
+        return True
+
+    def _read(self):
+        """Read the state from the cache file.
+
+        Returns:
+            dict:
+            The state, or ``None`` if the file is missing, unreadable, or
+            from a different version.
+        """
+        try:
+            with open(self.filename, 'rb') as fp:
+                state = pickle.load(fp)
+        except (IOError, OSError):
+            return None
+        except Exception as e:
+            logger.debug('Ignoring unreadable warm-start cache "%s": %s',
+                         self.filename, e)
+            return None
+
+        if (not isinstance(state, dict) or
+            state.get('format_version') != FORMAT_VERSION or
+            state.get('rbpkg_version') != get_package_version()):
+            logger.debug('Ignoring outdated warm-start cache "%s".',
+                         self.filename)
+            return None
+
+        return state
+
+    def _write(self, state):
+        """Atomically write the state to the cache file.
+
+        Args:
+            state (dict):
+                The state to write.
+
+        Returns:
+            bool:
+            ``True`` if the file was written.
+        """
+        cache_dir = os.path.dirname(self.filename)
+        temp_filename = None
+
+        try:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+
+            fd, temp_filename = tempfile.mkstemp(prefix='.tmp-',
+                                                 dir=cache_dir)
+
+            with os.fdopen(fd, 'wb') as fp:
+                pickle.dump(state, fp, pickle.HIGHEST_PROTOCOL)
+
+            replace_file(temp_filename, self.filename)
+        except (IOError, OSError, pickle.PicklingError) as e:
+            logger.warning('Unable to write the warm-start cache "%s": %s',
+                           self.filename, e)
+
+            if temp_filename is not None:
+                try:
+                    os.unlink(temp_filename)
+                except OSError:
+                    pass
+
+            return False
+
+        return True
+
+    def _fetch_digest(self, loader, path):
+        """Fetch the current digest of a manifest.
+
+        Args:
+            loader (ManifestDigestPackageDataLoader):
+                The loader to fetch the manifest through. This will record
+                the digest as well.
+
+            path (unicode):
+                The path to the manifest.
+
+        Returns:
+            unicode:
+            The digest, or ``None`` if the manifest couldn't be fetched.
+        """
+        try:
+            return get_manifest_digest(loader.fetch_by_path(path).content)
+        except LoadDataError as e:
+            logger.debug('Unable to fetch "%s" for the warm-start cache: %s',
+                         path, e)
+            return None
+
+    def _get_channel_paths(self, channel, digests):
+        """Return the paths of the manifests making up a loaded channel.
+
+        This is the channel's manifest, along with any continuation pages
+        that have digests.
+
+        Args:
+            channel (rbpkg.repository.package_channel.PackageChannel):
+                The channel.
+
+            digests (dict):
+                The known manifest digests.
+
+        Returns:
+            list of unicode:
+            The paths of the manifests.
+        """
+        path = channel.absolute_manifest_url
+        page_prefix = '%s.page' % posixpath.splitext(path)[0]
+
+        return [path] + sorted(
+            page_path
+            for page_path in digests
+            if page_path.startswith(page_prefix)
+        )
@@ -0,0 +1,351 @@
+"""Invalidation of cached package data when local manifests change.
+
+Long-running processes that load from a local repository tree through
+:py:class:`~rbpkg.repository.loaders.FilePackageDataLoader` can use a
+:py:class:`RepositoryWatcher` to pick up changes to manifest files without
+restarting or clearing all caches. Only the cached data loaded from the
+changed manifests is invalidated.
+
+If the `watchdog <https://pypi.python.org/pypi/watchdog>`_ module is
+installed, file system events (such as inotify on Linux) are used to detect
+changes. Otherwise, the manifests with cached data are polled with
+:py:func:`os.stat`.
+"""
+
+from __future__ import unicode_literals
+
+import logging
+import os
+import threading
+
+from rbpkg.repository.errors import ConfigurationError
+from rbpkg.repository.loaders import (FilePackageDataLoader,
+                                      get_data_loader)
+from rbpkg.utils.compression import (COMPRESSION_EXTENSIONS,
+                                     get_supported_compressions)
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+
+logger = logging.getLogger(__name__)
+
+
+def _find_file_loader(loader):
+    """Return the file loader that a data loader loads through.
+
+    Args:
+        loader (rbpkg.repository.loaders.PackageDataLoader):
+            The data loader, which may wrap other loaders.
+
+    Returns:
+        rbpkg.repository.loaders.FilePackageDataLoader:
+        The file loader, or ``None`` if the loader doesn't use one.
+    """
+    while loader is not None:
+        if isinstance(loader, FilePackageDataLoader):
+            return loader
+
+        loader = (getattr(loader, 'loader', None) or
+                  getattr(loader, 'fallback_loader', None))
+
+    return None
+
+
+class _ManifestEventHandler(FileSystemEventHandler):
+    """Records manifests changed according to file system events."""
+
+    def __init__(self, watcher):
+        """Initialize the handler.
+
+        Args:
+            watcher (RepositoryWatcher):
+                The watcher to notify of changes.
+        """
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        """Handle a file system event.
+
+        Args:
+            event (watchdog.events.FileSystemEvent):
+                The event.
+        """
+        if not event.is_directory:
+            self.watcher._add_changed_file(event.src_path)
+
+            dest_path = getattr(event, 'dest_path', None)
+
+            if dest_path:
+                self.watcher._add_changed_file(dest_path)
+
+
+class RepositoryWatcher(object):
+    """Watches a local repository tree for changes to cached manifests.
+
+    When a manifest with cached data changes, the data loaded from it is
+    invalidated through :py:meth:`PackageRepository.invalidate_manifests()
+    <rbpkg.repository.package_repo.PackageRepository.invalidate_manifests>`,
+    and will be loaded again on next use. The cost of each check is
+    proportional to the number of changed files when using file system
+    events, or to the number of cached manifests when polling.
+
+    Changes are checked for every :py:attr:`interval` seconds once
+    :py:meth:`start` is called, or can be checked for manually by calling
+    :py:meth:`check`.
+
+    When polling, once :py:meth:`start` is called, a manifest's file is
+    examined as it's loaded by the repository's
+    :py:class:`~rbpkg.repository.loaders.FilePackageDataLoader`, and changes
+    from then on are detected. Manifests with data cached before then (or
+    loaded through another loader) are examined the first time they're seen
+    with cached data instead. The watcher stops examining loaded files once
+    :py:meth:`stop` is called.
+
+    Attributes:
+        interval (float):
+            The number of seconds between checks.
+
+        repository (rbpkg.repository.package_repo.PackageRepository):
+            The repository whose caches are invalidated.
+
+        use_watchdog (bool):
+            Whether file system events are used to detect changes.
+    """
+
+    #: The default number of seconds between checks.
+    DEFAULT_INTERVAL = 1.0
+
+    def __init__(self, repository, interval=DEFAULT_INTERVAL,
+                 use_watchdog=None, file_loader=None):
+        """Initialize the watcher.
+
+        Args:
+            repository (rbpkg.repository.package_repo.PackageRepository):
+                The repository whose caches are invalidated.
+
+            interval (float, optional):
+                The number of seconds between checks.
+
+            use_watchdog (bool, optional):
+                Whether to use file system events to detect changes. By
+                default, they're used if :py:mod:`watchdog` is installed.
+
+            file_loader (rbpkg.repository.loaders.FilePackageDataLoader,
+                         optional):
+                The loader that the repository loads manifests through. By
+                default, this is found by unwrapping the current data loader
+                (see :py:func:`~rbpkg.repository.loaders.get_data_loader`).
+
+        Raises:
+            rbpkg.repository.errors.ConfigurationError:
+                :env:`RBPKG_FILE_LOADER_ROOT` was not set to a valid path,
+                or ``use_watchdog`` was set without :py:mod:`watchdog`
+                installed.
+        """
+        if use_watchdog is None:
+            use_watchdog = (Observer is not None)
+        elif use_watchdog and Observer is None:
+            raise ConfigurationError(
+                'The watchdog module must be installed to use file system '
+                'events.')
+
+        self.repository = repository
+        self.interval = interval
+        self.use_watchdog = use_watchdog
+
+        if file_loader is None:
+            file_loader = _find_file_loader(get_data_loader())
+
+            if file_loader is None:
+                # The repository doesn't load from the local tree, but
+                # cached manifests can still be polled.
+                file_loader = FilePackageDataLoader()
+
+        self._file_loader = file_loader
+        self._root = os.path.abspath(self._file_loader.get_file_path(''))
+        self._signatures = {}
+        self._changed_paths = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._observer = None
+        self._listening = False
+
+    def start(self):
+        """Start watching for changes in the background."""
+        self._start_listening()
+
+        if self._thread is not None:
+            return
+
+        if self.use_watchdog:
+            self._observer = Observer()
+            self._observer.schedule(_ManifestEventHandler(self), self._root,
+                                    recursive=True)
+            self._observer.start()
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching for changes."""
+        if self._listening:
+            self._file_loader.remove_load_listener(self._on_file_load)
+            self._listening = False
+
+        if self._thread is None:
+            return
+
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+    def check(self):
+        """Check for changed manifests and invalidate their cached data.
+
+        Returns:
+            list of unicode:
+            The paths of the manifests that had cached data invalidated.
+        """
+        if self.use_watchdog:
+            with self._lock:
+                changed = self._changed_paths
+                self._changed_paths = set()
+        else:
+            changed = self._poll()
+
+        if not changed:
+            return []
+
+        invalidated = self.repository.invalidate_manifests(changed)
+
+        if invalidated:
+            logger.debug('Invalidated cached data for changed manifests: %s',
+                         ', '.join(sorted(invalidated)))
+
+        return invalidated
+
+    def _start_listening(self):
+        """Start recording signatures of files as they're loaded.
+
+        This is only needed when polling.
+        """
+        if not self.use_watchdog and not self._listening:
+            self._file_loader.add_load_listener(self._on_file_load)
+            self._listening = True
+
+    def _on_file_load(self, path):
+        """Record the signature of a file that's about to be loaded.
+
+        The file is examined before it's read, so that any change made
+        while it's being read will be detected on the next poll.
+
+        Args:
+            path (unicode):
+                The path within the repository.
+        """
+        signature = self._get_signature(path)
+
+        with self._lock:
+            self._signatures[path] = signature
+
+    def _run(self):
+        """Check for changes until stopped.
+
+        This is run in a background thread.
+        """
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.exception('Unexpected error checking for changed '
+                                 'manifests: %s',
+                                 e)
+
+    def _poll(self):
+        """Poll the manifests with cached data for changes.
+
+        Returns:
+            set of unicode:
+            The paths of the manifests that changed.
+        """
+        changed = set()
+
+        for path in self.repository.get_cached_manifest_paths():
+            signature = self._get_signature(path)
+
+            with self._lock:
+                old_signature = self._signatures.setdefault(path, signature)
+
+                if signature != old_signature:
+                    # The path is forgotten until its data is loaded again,
+                    # at which point it will be examined again.
+                    changed.add(path)
+                    del self._signatures[path]
+
+        return changed
+
+    def _get_signature(self, path):
+        """Return a value identifying the current state of a manifest's file.
+
+        Compressed variants of the file are included, since the loader may
+        use them in place of the uncompressed file.
+
+        Args:
+            path (unicode):
+                The path within the repository.
+
+        Returns:
+            tuple:
+            The signature of the file.
+        """
+        filename = self._file_loader.get_file_path(path)
+        filenames = [
+            filename + COMPRESSION_EXTENSIONS[compression]
+            for compression in get_supported_compressions()
+        ]
+        filenames.append(filename)
+
+        signature = []
+
+        for filename in filenames:
+            try:
+                st = os.stat(filename)
+            except OSError:
+                signature.append(None)
+            else:
+                signature.append((st.st_ino, st.st_mtime, st.st_size))
+
+        return tuple(signature)
+
+    def _add_changed_file(self, filename):
+        """Record that a file in the repository tree changed.
+
+        Args:
+            filename (unicode):
+                The absolute filename that changed.
+        """
+        path = os.path.relpath(os.path.abspath(filename), self._root)
+
+        if path.startswith(os.pardir):
+            return
+
+        for ext in COMPRESSION_EXTENSIONS.values():
+            if path.endswith(ext):
+                path = path[:-len(ext)]
+                break
+
+        with self._lock:
+            self._changed_paths.add('/' + path.replace(os.sep, '/'))
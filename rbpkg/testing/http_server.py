@@ -0,0 +1,225 @@
+"""A local HTTP server for testing loaders that talk to a repository."""
+
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import threading
+import time
+
+import six
+from six.moves import BaseHTTPServer, socketserver
+
+from rbpkg.utils.compression import COMPRESSION_GZIP, compress
+
+
+class _RequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Handles requests for a :py:class:`TestHTTPServer`."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        """Set up the handler for a new connection."""
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+
+        self.server.test_server._on_connection()
+
+    def do_GET(self):
+        """Handle a GET request."""
+        self.server.test_server._handle_get(self)
+
+    def log_message(self, *args, **kwargs):
+        """Suppress logging of requests."""
+        pass
+
+
+class _ThreadedHTTPServer(socketserver.ThreadingMixIn,
+                          BaseHTTPServer.HTTPServer):
+    """An HTTP server handling each connection on its own thread."""
+
+    daemon_threads = True
+
+
+class TestHTTPServer(object):
+    """A local HTTP server serving pre-defined content for paths.
+
+    This is a stand-in for a package repository, allowing loaders to be
+    tested against a real HTTP server. It supports keep-alive connections,
+    and tracks the number of connections and requests it has seen.
+
+    It can be used as a context manager, which will start and stop the
+    server.
+
+    Attributes:
+        path_to_content (dict):
+            A mapping of request paths to content. Values may be byte
+            strings or JSON-serializable data.
+
+        delay (float):
+            The number of seconds to wait before responding to a request.
+
+        compress_responses (bool):
+            Whether to gzip-compress responses for clients that accept it.
+
+        connections_accepted (int):
+            The number of connections accepted by the server.
+
+        requests_handled (int):
+            The number of requests handled by the server.
+
+        request_log (list of unicode):
+            The paths requested, in order.
+
+        not_modified_count (int):
+            The number of requests answered with :http:`304` based on the
+            ``If-None-Match`` header.
+    """
+
+    # Prevent test runners from collecting this as a test case.
+    __test__ = False
+
+    def __init__(self, path_to_content=None, delay=0):
+        """Initialize the server.
+
+        Args:
+            path_to_content (dict, optional):
+                A mapping of request paths to content.
+
+            delay (float, optional):
+                The number of seconds to wait before responding to a
+                request.
+        """
+        self.path_to_content = path_to_content or {}
+        self.delay = delay
+        self.compress_responses = False
+        self.connections_accepted = 0
+        self.requests_handled = 0
+        self.request_log = []
+        self.not_modified_count = 0
+
+        self._server = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        """The base URL of the running server."""
+        host, port = self._server.server_address[:2]
+
+        return 'http://%s:%s/' % (host, port)
+
+    def start(self):
+        """Start the server on a free port on localhost."""
+        self._server = _ThreadedHTTPServer(('127.0.0.1', 0), _RequestHandler)
+        self._server.test_server = self
+
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        kwargs={'poll_interval': 0.05})
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop the server."""
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def send_response(self, handler, status, content=b'', headers={}):
+        """Send a response to a request.
+
+        Args:
+            handler (BaseHTTPServer.BaseHTTPRequestHandler):
+                The handler for the request.
+
+            status (int):
+                The HTTP status code.
+
+            content (bytes, optional):
+                The response body.
+
+            headers (dict, optional):
+                Additional headers to send.
+        """
+        handler.send_response(status)
+        handler.send_header('Content-Length', six.text_type(len(content)))
+
+        for name, value in six.iteritems(headers):
+            handler.send_header(name, value)
+
+        handler.end_headers()
+        handler.wfile.write(content)
+
+    def handle_path(self, handler, path):
+        """Respond to a GET request for a path.
+
+        Responses include an ETag based on the content, and conditional
+        requests for unchanged content will receive a :http:`304`.
+
+        Subclasses can override this to simulate other server behavior.
+
+        Args:
+            handler (BaseHTTPServer.BaseHTTPRequestHandler):
+                The handler for the request.
+
+            path (unicode):
+                The requested path.
+        """
+        try:
+            content = self.path_to_content[path]
+        except KeyError:
+            self.send_response(handler, 404, b'Not Found')
+            return
+
+        if not isinstance(content, bytes):
+            content = json.dumps(content).encode('utf-8')
+
+        etag = '"%s"' % hashlib.sha1(content).hexdigest()
+
+        if handler.headers.get('If-None-Match') == etag:
+            with self._lock:
+                self.not_modified_count += 1
+
+            self.send_response(handler, 304, headers={
+                'ETag': etag,
+            })
+        else:
+            headers = {
+                'Content-Type': 'application/json',
+                'ETag': etag,
+            }
+
+            if (self.compress_responses and
+                'gzip' in handler.headers.get('Accept-Encoding', '')):
+                content = compress(content, COMPRESSION_GZIP)
+                headers['Content-Encoding'] = 'gzip'
+
+            self.send_response(handler, 200, content, headers)
+
+    def __enter__(self):
+        self.start()
+
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _on_connection(self):
+        """Record a newly-accepted connection."""
+        with self._lock:
+            self.connections_accepted += 1
+
+    def _handle_get(self, handler):
+        """Handle a GET request from a request handler.
+
+        Args:
+            handler (BaseHTTPServer.BaseHTTPRequestHandler):
+                The handler for the request.
+        """
+        with self._lock:
+            self.requests_handled += 1
+            self.request_log.append(handler.path)
+
+        if self.delay:
+            time.sleep(self.delay)
+
+        self.handle_path(handler, handler.path)
@@ -0,0 +1,676 @@
+from __future__ import unicode_literals
+
+import sys
+import threading
+import time
+import types
+from collections import OrderedDict
+
+import six
+
+
+class NegativeCache(object):
+    """A bounded cache of keys known to be missing.
+
+    This is used to remember lookups that failed because something doesn't
+    exist (such as a package bundle that was never published), so that
+    repeated lookups can fail fast without asking the repository again.
+
+    Entries expire after a time-to-live, so that newly-published content is
+    eventually found. When the cache is full, the oldest entries are dropped
+    first.
+
+    Attributes:
+        max_entries (int):
+            The maximum number of entries kept in the cache.
+
+        ttl (float):
+            The default number of seconds an entry is kept.
+    """
+
+    #: The default maximum number of entries.
+    DEFAULT_MAX_ENTRIES = 1024
+
+    #: The default number of seconds an entry is kept.
+    DEFAULT_TTL = 60
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        """Initialize the cache.
+
+        Args:
+            max_entries (int, optional):
+                The maximum number of entries kept in the cache.
+
+            ttl (float, optional):
+                The default number of seconds an entry is kept.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, key, message='', ttl=None):
+        """Record a key as missing.
+
+        Args:
+            key (object):
+                The key that's missing. This must be hashable.
+
+            message (unicode, optional):
+                A message describing why the key is missing. This is
+                returned by :py:meth:`get`.
+
+            ttl (float, optional):
+                The number of seconds to keep the entry. This defaults to
+                :py:attr:`ttl`.
+        """
+        if ttl is None:
+            ttl = self.ttl
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time() + ttl, message)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Return the message recorded for a missing key.
+
+        Args:
+            key (object):
+                The key to look up.
+
+        Returns:
+            unicode:
+            The message passed to :py:meth:`add`, if the key is recorded as
+            missing and hasn't expired. Otherwise, ``None``.
+        """
+        with self._lock:
+            try:
+                expires, message = self._entries[key]
+            except KeyError:
+                return None
+
+            if expires <= time.time():
+                del self._entries[key]
+
+                return None
+
+        return message
+
+    def discard(self, key):
+        """Remove a key from the cache, if present.
+
+        Args:
+            key (object):
+                The key to remove.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove all entries from the cache."""
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class ObjectCache(object):
+    """A memory-budgeted cache of objects.
+
+    Each object is stored along with an estimate of its size in memory.
+    When the total size exceeds :py:attr:`max_size`, entries are evicted
+    until it fits again. Subclasses decide which entry is evicted first.
+
+    An :py:attr:`on_evict` callback can be provided to release resources
+    owned by evicted objects. It's called outside of the cache's lock.
+
+    Attributes:
+        evictions (int):
+            The number of entries evicted to stay within the budget.
+
+        evicted_size (int):
+            The total estimated size, in bytes, of evicted entries.
+
+        hits (int):
+            The number of lookups that found an entry.
+
+        max_size (int):
+            The maximum total estimated size, in bytes, of all entries.
+            ``None`` means the cache is unbounded.
+
+        misses (int):
+            The number of lookups that didn't find an entry.
+
+        on_evict (callable):
+            A function called with the key and object of each evicted
+            entry, or ``None``.
+    """
+
+    #: The name of the eviction policy, used in statistics.
+    policy_name = None
+
+    def __init__(self, max_size=None, get_size=None, on_evict=None):
+        """Initialize the cache.
+
+        Args:
+            max_size (int, optional):
+                The maximum total estimated size, in bytes, of all entries.
+                ``None`` means the cache is unbounded.
+
+            get_size (callable, optional):
+                A function taking an object and returning its estimated size
+                in bytes. This defaults to :py:func:`estimate_size`.
+
+            on_evict (callable, optional):
+                A function called with the key and object of each evicted
+                entry.
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_size = 0
+
+        self.on_evict = on_evict
+
+        self._get_size = get_size or estimate_size
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._total_size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def total_size(self):
+        """The total estimated size, in bytes, of all entries."""
+        return self._total_size
+
+    def get(self, key, default=None):
+        """Return the object for a key, marking it as used.
+
+        Args:
+            key (object):
+                The key to look up.
+
+            default (object, optional):
+                The value to return if the key isn't in the cache.
+
+        Returns:
+            object:
+            The cached object, or ``default``.
+        """
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+
+                return default
+
+            self.hits += 1
+            self._mark_used(key)
+
+        return value
+
+    def peek(self, key, default=None):
+        """Return the object for a key, without marking it as used.
+
+        This doesn't affect eviction order or statistics.
+
+        Args:
+            key (object):
+                The key to look up.
+
+            default (object, optional):
+                The value to return if the key isn't in the cache.
+
+        Returns:
+            object:
+            The cached object, or ``default``.
+        """
+        return self._entries.get(key, default)
+
+    def set(self, key, value):
+        """Store an object, evicting others if over budget.
+
+        The object may itself be evicted immediately if it's larger than the
+        whole budget.
+
+        Args:
+            key (object):
+                The key to store the object under.
+
+            value (object):
+                The object to store.
+        """
+        size = self._get_size(value)
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = value
+            self._sizes[key] = size
+            self._total_size += size
+            self._add_entry(key)
+
+            evicted = self._evict(protected_key=key)
+
+        self._notify_evicted(evicted)
+
+    def update_size(self, key):
+        """Re-estimate the size of a cached object.
+
+        This should be called when a cached object has grown or shrunk (for
+        instance, after loading more data into it). Other entries will be
+        evicted if the cache is now over budget.
+
+        Args:
+            key (object):
+                The key of the object.
+        """
+        value = self.peek(key)
+
+        if value is None:
+            return
+
+        size = self._get_size(value)
+
+        with self._lock:
+            if self._entries.get(key) is not value:
+                return
+
+            self._total_size += size - self._sizes[key]
+            self._sizes[key] = size
+
+            evicted = self._evict(protected_key=key)
+
+        self._notify_evicted(evicted)
+
+    def discard(self, key):
+        """Remove an object from the cache, if present.
+
+        This doesn't call the :py:attr:`on_evict` callback.
+
+        Args:
+            key (object):
+                The key to remove.
+        """
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        """Remove all objects from the cache.
+
+        This doesn't call the :py:attr:`on_evict` callback.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._total_size = 0
+            self._clear_entries()
+
+    def keys(self):
+        """Return the keys of all cached objects.
+
+        Returns:
+            list:
+            The keys.
+        """
+        with self._lock:
+            return list(self._entries.keys())
+
+    def get_stats(self):
+        """Return statistics on the cache.
+
+        Returns:
+            dict:
+            A dictionary with the following keys:
+
+            ``policy`` (:py:class:`unicode`):
+                The name of the eviction policy.
+
+            ``entries`` (:py:class:`int`):
+                The number of cached objects.
+
+            ``size`` (:py:class:`int`):
+                The total estimated size of cached objects, in bytes.
+
+            ``max_size`` (:py:class:`int`):
+                The budget, in bytes, or ``None``.
+
+            ``hits`` (:py:class:`int`):
+                The number of lookups that found an object.
+
+            ``misses`` (:py:class:`int`):
+                The number of lookups that didn't find an object.
+
+            ``evictions`` (:py:class:`int`):
+                The number of evicted objects.
+
+            ``evicted_size`` (:py:class:`int`):
+                The total estimated size of evicted objects, in bytes.
+        """
+        with self._lock:
+            return {
+                'policy': self.policy_name,
+                'entries': len(self._entries),
+                'size': self._total_size,
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'evicted_size': self.evicted_size,
+            }
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _add_entry(self, key):
+        """Track a newly-stored entry for eviction.
+
+        The caller must hold the lock.
+
+        Args:
+            key (object):
+                The key of the entry.
+        """
+        pass
+
+    def _mark_used(self, key):
+        """Track a use of an entry for eviction.
+
+        The caller must hold the lock.
+
+        Args:
+            key (object):
+                The key of the entry.
+        """
+        raise NotImplementedError
+
+    def _remove_entry(self, key):
+        """Stop tracking an entry for eviction.
+
+        The caller must hold the lock.
+
+        Args:
+            key (object):
+                The key of the entry.
+        """
+        pass
+
+    def _clear_entries(self):
+        """Stop tracking all entries for eviction.
+
+        The caller must hold the lock.
+        """
+        pass
+
+    def _choose_victim(self, protected_key):
+        """Return the key of the next entry to evict.
+
+        The caller must hold the lock.
+
+        Args:
+            protected_key (object):
+                The key of an entry that should only be evicted if it's the
+                last one left. This is the entry that was just stored or
+                resized.
+
+        Returns:
+            object:
+            The key of the entry to evict.
+        """
+        raise NotImplementedError
+
+    def _remove(self, key):
+        """Remove an entry, if present.
+
+        The caller must hold the lock.
+
+        Args:
+            key (object):
+                The key of the entry.
+
+        Returns:
+            object:
+            The removed object, or ``None`` if the key wasn't present.
+        """
+        value = self._entries.pop(key, None)
+
+        if key in self._sizes:
+            self._total_size -= self._sizes.pop(key)
+            self._remove_entry(key)
+
+        return value
+
+    def _evict(self, protected_key):
+        """Evict entries until the cache is within budget.
+
+        The caller must hold the lock.
+
+        Args:
+            protected_key (object):
+                The key of an entry that should only be evicted if it's the
+                last one left.
+
+        Returns:
+            list of tuple:
+            The ``(key, object)`` pairs that were evicted.
+        """
+        evicted = []
+
+        if self.max_size is not None:
+            while self._entries and self._total_size > self.max_size:
+                key = self._choose_victim(protected_key)
+                size = self._sizes[key]
+
+                evicted.append((key, self._remove(key)))
+                self.evictions += 1
+                self.evicted_size += size
+
+        return evicted
+
+    def _notify_evicted(self, evicted):
+        """Call the eviction callback for evicted entries.
+
+        Args:
+            evicted (list of tuple):
+                The ``(key, object)`` pairs that were evicted.
+        """
+        if self.on_evict is not None:
+            for key, value in evicted:
+                self.on_evict(key, value)
+
+
+class LRUObjectCache(ObjectCache):
+    """A memory-budgeted cache that evicts least recently used objects."""
+
+    policy_name = 'lru'
+
+    def _mark_used(self, key):
+        """Track a use of an entry for eviction.
+
+        The caller must hold the lock.
+
+        Args:
+            key (object):
+                The key of the entry.
+        """
+        self._entries[key] = self._entries.pop(key)
+
+    def _choose_victim(self, protected_key):
+        """Return the key of the least recently used entry.
+
+        The caller must hold the lock.
+
+        Args:
+            protected_key (object):
+                The key of an entry that should only be evicted if it's the
+                last one left.
+
+        Returns:
+            object:
+            The key of the entry to evict.
+        """
+        for key in self._entries:
+            if key != protected_key:
+                return key
+
+        return protected_key
+
+
+class LFUObjectCache(ObjectCache):
+    """A memory-budgeted cache that evicts least frequently used objects.
+
+    Ties are broken by evicting the least recently stored object first.
+    """
+
+    policy_name = 'lfu'
+
+    def __init__(self, *args, **kwargs):
+        """Initialize the cache.
+
+        Args:
+            *args (tuple):
+                Positional arguments for :py:class:`ObjectCache`.
+
+            **kwargs (dict):
+                Keyword arguments for :py:class:`ObjectCache`.
+        """
+        super(LFUObjectCache, self).__init__(*args, **kwargs)
+
+        self._use_counts = {}
+
+    def _add_entry(self, key):
+        """Track a newly-stored entry for eviction.
+
+        The caller must hold the lock.
+
+        Args:
+            key (object):
+                The key of the entry.
+        """
+        self._use_counts[key] = 0
+
+    def _mark_used(self, key):
+        """Track a use of an entry for eviction.
+
+        The caller must hold the lock.
+
+        Args:
+            key (object):
+                The key of the entry.
+        """
+        self._use_counts[key] += 1
+
+    def _remove_entry(self, key):
+        """Stop tracking an entry for eviction.
+
+        The caller must hold the lock.
+
+        Args:
+            key (object):
+                The key of the entry.
+        """
+        del self._use_counts[key]
+
+    def _clear_entries(self):
+        """Stop tracking all entries for eviction.
+
+        The caller must hold the lock.
+        """
+        self._use_counts.clear()
+
+    def _choose_victim(self, protected_key):
+        """Return the key of the least frequently used entry.
+
+        The caller must hold the lock.
+
+        Args:
+            protected_key (object):
+                The key of an entry that should only be evicted if it's the
+                last one left. Without this, a newly-stored entry would
+                always be the least frequently used.
+
+        Returns:
+            object:
+            The key of the entry to evict.
+        """
+        return min(
+            self._entries,
+            key=lambda key: (key == protected_key, self._use_counts[key]))
+
+
+#: A mapping of eviction policy names to object cache classes.
+OBJECT_CACHE_POLICIES = {
+    cls.policy_name: cls
+    for cls in (LRUObjectCache, LFUObjectCache)
+}
+
+
+def estimate_size(obj):
+    """Estimate the memory used by an object and everything it references.
+
+    This walks through containers and instance attributes, adding up
+    :py:func:`sys.getsizeof` for each object reached. Each object is counted
+    once, so back-references (such as a channel's reference to its bundle)
+    don't inflate the result. Classes, modules, and functions are not
+    counted.
+
+    This is an estimate, meant for budgeting caches. It doesn't account for
+    interpreter overhead such as memory allocator padding.
+
+    Args:
+        obj (object):
+            The object to estimate the size of.
+
+    Returns:
+        int:
+        The estimated size, in bytes.
+    """
+    seen = set()
+    pending = [obj]
+    size = 0
+
+    while pending:
+        obj = pending.pop()
+
+        if id(obj) in seen or isinstance(obj, _UNSIZED_TYPES):
+            continue
+
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+
+        if isinstance(obj, dict):
+            pending.extend(obj.keys())
+            pending.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            pending.extend(obj)
+        elif not isinstance(obj, _ATOMIC_TYPES):
+            if hasattr(obj, '__dict__'):
+                pending.append(obj.__dict__)
+
+            for slot in getattr(type(obj), '__slots__', ()):
+                try:
+                    pending.append(getattr(obj, slot))
+                except AttributeError:
+                    pass
+
+    return size
+
+
+_ATOMIC_TYPES = six.string_types + (bytes, bool, float, type(None)) + \
+    six.integer_types
+
+_UNSIZED_TYPES = (type, types.ModuleType, types.FunctionType,
+                  types.MethodType, types.BuiltinFunctionType)
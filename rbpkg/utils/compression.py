@@ -0,0 +1,206 @@
+"""Utilities for working with compressed data.
+
+Only compression formats supported by the Python standard library are used.
+XZ support requires the :py:mod:`lzma` module (Python 3.3+).
+"""
+
+from __future__ import unicode_literals
+
+import gzip
+import io
+import zlib
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+
+#: Gzip compression.
+COMPRESSION_GZIP = 'gzip'
+
+#: XZ compression.
+COMPRESSION_XZ = 'xz'
+
+#: The file extensions for each compression format.
+COMPRESSION_EXTENSIONS = {
+    COMPRESSION_GZIP: '.gz',
+    COMPRESSION_XZ: '.xz',
+}
+
+#: The size of the chunks used when decompressing data.
+CHUNK_SIZE = 64 * 1024
+
+_DECOMPRESS_ERRORS = (zlib.error, EOFError)
+
+if lzma is not None:
+    _DECOMPRESS_ERRORS += (lzma.LZMAError,)
+
+_MAGIC = [
+    (COMPRESSION_GZIP, b'\x1f\x8b'),
+    (COMPRESSION_XZ, b'\xfd7zXZ\x00'),
+]
+
+
+def get_supported_compressions():
+    """Return the compression formats supported on this system.
+
+    Returns:
+        list of unicode:
+        The supported compression formats, in order of preference for
+        reading.
+    """
+    compressions = [COMPRESSION_GZIP]
+
+    if lzma is not None:
+        compressions.append(COMPRESSION_XZ)
+
+    return compressions
+
+
+def detect_compression(data):
+    """Return the compression format of some data, based on its header.
+
+    Args:
+        data (bytes):
+            The data, or at least the first few bytes of it.
+
+    Returns:
+        unicode:
+        The compression format, or ``None`` if the data isn't compressed in
+        a known format.
+    """
+    for compression, magic in _MAGIC:
+        if data[:len(magic)] == magic:
+            return compression
+
+    return None
+
+
+def decompress(data, compression=None):
+    """Decompress data.
+
+    The data is decompressed incrementally, in chunks, rather than all at
+    once.
+
+    Args:
+        data (bytes):
+            The compressed data.
+
+        compression (unicode, optional):
+            The compression format. If not provided, it will be detected
+            from the data. Uncompressed data will be returned as-is.
+
+    Returns:
+        bytes:
+        The decompressed data.
+
+    Raises:
+        IOError:
+            The data could not be decompressed.
+    """
+    if compression is None:
+        compression = detect_compression(data)
+
+        if compression is None:
+            return data
+
+    decompressor = _get_decompressor(compression)
+    view = memoryview(data)
+    chunks = []
+
+    try:
+        for i in range(0, len(data), CHUNK_SIZE):
+            chunks.append(decompressor.decompress(view[i:i + CHUNK_SIZE]))
+
+        if hasattr(decompressor, 'flush'):
+            chunks.append(decompressor.flush())
+    except _DECOMPRESS_ERRORS as e:
+        raise IOError('Unable to decompress %s data: %s' % (compression, e))
+
+    return b''.join(chunks)
+
+
+def compress(data, compression):
+    """Compress data.
+
+    Args:
+        data (bytes):
+            The data to compress.
+
+        compression (unicode):
+            The compression format.
+
+    Returns:
+        bytes:
+        The compressed data.
+
+    Raises:
+        ValueError:
+            The compression format is not supported.
+    """
+    if compression == COMPRESSION_GZIP:
+        buf = io.BytesIO()
+
+        # The modification time is fixed, so the same input always results
+        # in the same output.
+        with gzip.GzipFile(fileobj=buf, mode='wb', mtime=0) as fp:
+            fp.write(data)
+
+        return buf.getvalue()
+    elif compression == COMPRESSION_XZ and lzma is not None:
+        return lzma.compress(data)
+    else:
+        raise ValueError('Unsupported compression format "%s"'
+                         % compression)
+
+
+def open_decompressed(fp, compression):
+    """Return a file-like object that decompresses another as it's read.
+
+    Args:
+        fp (file):
+            The file containing compressed data.
+
+        compression (unicode):
+            The compression format.
+
+    Returns:
+        file:
+        A file-like object returning decompressed data.
+
+    Raises:
+        ValueError:
+            The compression format is not supported.
+    """
+    if compression == COMPRESSION_GZIP:
+        return gzip.GzipFile(fileobj=fp, mode='rb')
+    elif compression == COMPRESSION_XZ and lzma is not None:
+        return lzma.LZMAFile(fp, mode='rb')
+    else:
+        raise ValueError('Unsupported compression format "%s"'
+                         % compression)
+
+
+def _get_decompressor(compression):
+    """Return an incremental decompressor for a compression format.
+
+    Args:
+        compression (unicode):
+            The compression format.
+
+    Returns:
+        object:
+        The decompressor.
+
+    Raises:
+        ValueError:
+            The compression format is not supported.
+    """
+    if compression == COMPRESSION_GZIP:
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif compression == COMPRESSION_XZ and lzma is not None:
+        return lzma.LZMADecompressor()
+    else:
+        raise ValueError('Unsupported compression format "%s"'
+                         % compression)
@@ -0,0 +1,448 @@
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class DiskCacheEntry(object):
+    """An entry stored in a :py:class:`DiskCache`.
+
+    Attributes:
+        key (unicode):
+            The key the entry was stored under.
+
+        content (bytes):
+            The cached content.
+
+        etag (unicode):
+            The ETag validator for the content, if any.
+
+        last_modified (unicode):
+            The Last-Modified validator for the content, if any.
+
+        stored_timestamp (float):
+            The time (in seconds since the epoch) when the entry was stored.
+
+        validated_timestamp (float):
+            The time (in seconds since the epoch) when the entry was stored
+            or last marked as validated, whichever is later.
+
+        missing (bool):
+            Whether the entry records that the content doesn't exist.
+    """
+
+    def __init__(self, key, content, etag=None, last_modified=None,
+                 stored_timestamp=None, validated_timestamp=None,
+                 missing=False):
+        """Initialize the entry.
+
+        Args:
+            key (unicode):
+                The key the entry was stored under.
+
+            content (bytes):
+                The cached content.
+
+            etag (unicode, optional):
+                The ETag validator for the content.
+
+            last_modified (unicode, optional):
+                The Last-Modified validator for the content.
+
+            stored_timestamp (float, optional):
+                The time when the entry was stored.
+
+            validated_timestamp (float, optional):
+                The time when the entry was last validated. This defaults
+                to ``stored_timestamp``.
+
+            missing (bool, optional):
+                Whether the entry records that the content doesn't exist.
+        """
+        self.key = key
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_timestamp = stored_timestamp
+        self.validated_timestamp = max(validated_timestamp or 0,
+                                       stored_timestamp or 0) or None
+        self.missing = missing
+
+    def __repr__(self):
+        return '<DiskCacheEntry(%s; etag=%s)>' % (self.key, self.etag)
+
+
+class DiskCache(object):
+    """A size-capped cache of content stored on disk.
+
+    Each entry is stored in its own file, along with the validators needed
+    to revalidate it later. Files are written to a temporary file and then
+    atomically renamed into place, so multiple processes can safely share
+    a cache directory. Readers will only ever see complete entries.
+
+    When the total size of the cache exceeds :py:attr:`max_size`, the least
+    recently used entries are evicted. Recency is tracked through the
+    modification time of each file, which is updated on every read.
+
+    An entry can be marked as validated (see :py:meth:`mark_validated`)
+    without rewriting it. The time is recorded through the modification time
+    of a small file alongside the entry.
+
+    Attributes:
+        cache_dir (unicode):
+            The directory where entries are stored.
+
+        max_size (int):
+            The maximum total size, in bytes, of all entries.
+    """
+
+    #: The default maximum size of the cache, in bytes.
+    DEFAULT_MAX_SIZE = 100 * 1024 * 1024
+
+    #: The file extension used for entries.
+    ENTRY_EXT = '.cache'
+
+    #: The file extension used to record when entries were validated.
+    VALIDATED_EXT = '.validated'
+
+    def __init__(self, cache_dir, max_size=DEFAULT_MAX_SIZE):
+        """Initialize the cache.
+
+        Args:
+            cache_dir (unicode):
+                The directory where entries are stored. It will be created
+                if it doesn't exist.
+
+            max_size (int, optional):
+                The maximum total size, in bytes, of all entries.
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+        self._total_size = None
+        self._lock = threading.Lock()
+
+        if not os.path.isdir(cache_dir):
+            try:
+                os.makedirs(cache_dir)
+            except OSError:
+                # Another process may have created it in the meantime.
+                if not os.path.isdir(cache_dir):
+                    raise
+
+    def get(self, key):
+        """Return the entry for a key.
+
+        Args:
+            key (unicode):
+                The key to look up.
+
+        Returns:
+            DiskCacheEntry:
+            The entry, or ``None`` if the key isn't in the cache.
+        """
+        filename = self._get_filename(key)
+
+        try:
+            with open(filename, 'rb') as fp:
+                metadata = json.loads(fp.readline().decode('utf-8'))
+                content = fp.read()
+
+            # Mark this as recently used.
+            os.utime(filename, None)
+        except (IOError, OSError):
+            return None
+        except ValueError:
+            logger.warning('Discarding corrupt cache entry "%s"', filename)
+            self._remove_entry_files(filename)
+
+            return None
+
+        if metadata.get('key') != key:
+            # This is an unlikely hash collision. Treat it as a miss.
+            return None
+
+        try:
+            validated_timestamp = os.path.getmtime(
+                self._get_validated_filename(filename))
+        except OSError:
+            validated_timestamp = None
+
+        return DiskCacheEntry(key=key,
+                              content=content,
+                              etag=metadata.get('etag'),
+                              last_modified=metadata.get('last_modified'),
+                              stored_timestamp=metadata.get('stored'),
+                              validated_timestamp=validated_timestamp,
+                              missing=metadata.get('missing', False))
+
+    def set(self, key, content, etag=None, last_modified=None,
+            missing=False):
+        """Store content for a key.
+
+        Any existing entry for the key will be replaced atomically. If the
+        entry can't be written (for instance, if the disk is full), a
+        warning is logged and the cache is left unchanged.
+
+        An entry can also record that the content for a key doesn't exist,
+        by passing ``missing=True`` along with empty content. Callers can
+        then check :py:attr:`DiskCacheEntry.missing` and its age, rather
+        than asking the origin again.
+
+        Args:
+            key (unicode):
+                The key to store the content under.
+
+            content (bytes):
+                The content to store.
+
+            etag (unicode, optional):
+                The ETag validator for the content.
+
+            last_modified (unicode, optional):
+                The Last-Modified validator for the content.
+
+            missing (bool, optional):
+                Whether the entry records that the content doesn't exist.
+        """
+        metadata = {
+            'key': key,
+            'etag': etag,
+            'last_modified': last_modified,
+            'stored': time.time(),
+        }
+
+        if missing:
+            metadata['missing'] = True
+
+        metadata = json.dumps(metadata).encode('utf-8')
+
+        filename = self._get_filename(key)
+        temp_filename = None
+
+        try:
+            old_size = os.path.getsize(filename)
+        except OSError:
+            old_size = 0
+
+        try:
+            fd, temp_filename = tempfile.mkstemp(prefix='.tmp-',
+                                                 dir=self.cache_dir)
+
+            with os.fdopen(fd, 'wb') as fp:
+                fp.write(metadata)
+                fp.write(b'\n')
+                fp.write(content)
+
+            replace_file(temp_filename, filename)
+        except (IOError, OSError) as e:
+            logger.warning('Unable to write cache entry "%s": %s',
+                           filename, e)
+
+            if temp_filename is not None:
+                self._remove_file(temp_filename)
+
+            return
+
+        with self._lock:
+            if self._total_size is not None:
+                self._total_size += (len(metadata) + 1 + len(content) -
+                                     old_size)
+
+            needs_eviction = self._get_total_size() > self.max_size
+
+        if needs_eviction:
+            self.evict()
+
+    def mark_validated(self, key):
+        """Record that the entry for a key was just validated.
+
+        This updates :py:attr:`DiskCacheEntry.validated_timestamp` for the
+        entry, without rewriting the entry itself.
+
+        Args:
+            key (unicode):
+                The key of the entry.
+        """
+        filename = self._get_validated_filename(self._get_filename(key))
+
+        try:
+            os.utime(filename, None)
+        except OSError:
+            try:
+                open(filename, 'wb').close()
+            except (IOError, OSError) as e:
+                logger.warning('Unable to mark cache entry "%s" as '
+                               'validated: %s',
+                               key, e)
+
+    def delete(self, key):
+        """Delete the entry for a key, if it exists.
+
+        Args:
+            key (unicode):
+                The key to delete.
+        """
+        self._remove_entry_files(self._get_filename(key))
+
+        with self._lock:
+            self._total_size = None
+
+    def clear(self):
+        """Delete all entries from the cache."""
+        for filename in self._iter_entry_filenames():
+            self._remove_entry_files(filename)
+
+        with self._lock:
+            self._total_size = 0
+
+    def get_total_size(self):
+        """Return the total size of all entries in the cache.
+
+        Returns:
+            int:
+            The total size, in bytes.
+        """
+        with self._lock:
+            return self._get_total_size()
+
+    def evict(self):
+        """Evict least recently used entries until the cache fits its cap.
+
+        This rescans the cache directory, so that entries written by other
+        processes are accounted for.
+        """
+        entries = []
+
+        for filename in self._iter_entry_filenames():
+            try:
+                st = os.stat(filename)
+            except OSError:
+                continue
+
+            entries.append((st.st_mtime, st.st_size, filename))
+
+        entries.sort()
+        total_size = sum(entry[1] for entry in entries)
+
+        for mtime, size, filename in entries:
+            if total_size <= self.max_size:
+                break
+
+            self._remove_entry_files(filename)
+            total_size -= size
+
+        with self._lock:
+            self._total_size = total_size
+
+    def _get_total_size(self):
+        """Return the total size of all entries, computing it if needed.
+
+        The caller must hold the lock.
+
+        Returns:
+            int:
+            The total size, in bytes.
+        """
+        if self._total_size is None:
+            total_size = 0
+
+            for filename in self._iter_entry_filenames():
+                try:
+                    total_size += os.path.getsize(filename)
+                except OSError:
+                    pass
+
+            self._total_size = total_size
+
+        return self._total_size
+
+    def _get_filename(self, key):
+        """Return the filename for a key.
+
+        Args:
+            key (unicode):
+                The key.
+
+        Returns:
+            unicode:
+            The filename where the entry for the key is stored.
+        """
+        return os.path.join(
+            self.cache_dir,
+            hashlib.sha1(key.encode('utf-8')).hexdigest() + self.ENTRY_EXT)
+
+    def _get_validated_filename(self, filename):
+        """Return the filename recording when an entry was validated.
+
+        Args:
+            filename (unicode):
+                The filename of the entry.
+
+        Returns:
+            unicode:
+            The filename whose modification time is the validation time.
+        """
+        return filename[:-len(self.ENTRY_EXT)] + self.VALIDATED_EXT
+
+    def _iter_entry_filenames(self):
+        """Iterate through the filenames of all entries in the cache.
+
+        Yields:
+            unicode:
+            The filename of each entry.
+        """
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+
+        for name in names:
+            if name.endswith(self.ENTRY_EXT):
+                yield os.path.join(self.cache_dir, name)
+
+    def _remove_entry_files(self, filename):
+        """Remove the files for an entry.
+
+        Args:
+            filename (unicode):
+                The filename of the entry.
+        """
+        self._remove_file(filename)
+        self._remove_file(self._get_validated_filename(filename))
+
+    def _remove_file(self, filename):
+        """Remove a file, ignoring errors if it's already gone.
+
+        Args:
+            filename (unicode):
+                The file to remove.
+        """
+        try:
+            os.unlink(filename)
+        except OSError:
+            pass
+
+
+def replace_file(src, dest):
+    """Atomically replace a file with another.
+
+    Args:
+        src (unicode):
+            The file to move into place.
+
+        dest (unicode):
+            The file to replace.
+    """
+    if hasattr(os, 'replace'):
+        os.replace(src, dest)
+    else:
+        os.rename(src, dest)
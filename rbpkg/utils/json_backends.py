@@ -0,0 +1,228 @@
+"""Pluggable JSON parsing backends.
+
+rbpkg parses a lot of JSON when working with large repositories. The
+standard library's :py:mod:`json` module is always available, but faster
+parsers (:pypi:`orjson` or :pypi:`ujson`) will be used if installed.
+
+The backend is chosen once per process. It can be forced by setting
+:env:`RBPKG_JSON_BACKEND` to the name of a backend.
+"""
+
+from __future__ import unicode_literals
+
+import json
+import logging
+import os
+
+import six
+
+
+logger = logging.getLogger(__name__)
+
+
+_json_backend = None
+
+
+class JSONBackend(object):
+    """Base class for a JSON parsing backend.
+
+    Attributes:
+        name (unicode):
+            The name of the backend.
+
+        accepts_buffers (bool):
+            Whether the backend can parse directly from a buffer (such as a
+            :py:class:`memoryview` over a memory-mapped file) without first
+            copying it into a byte string. Large files are only
+            memory-mapped for backends that can.
+    """
+
+    name = None
+    accepts_buffers = False
+
+    def loads(self, data):
+        """Parse JSON data.
+
+        Args:
+            data (bytes or memoryview):
+                The UTF-8-encoded JSON data to parse.
+
+        Returns:
+            object:
+            The parsed data.
+
+        Raises:
+            ValueError:
+                The data could not be parsed.
+        """
+        raise NotImplementedError
+
+
+class StdlibJSONBackend(JSONBackend):
+    """A JSON backend using Python's built-in :py:mod:`json` module.
+
+    Buffers are copied into a byte string before parsing.
+    """
+
+    name = 'json'
+
+    def loads(self, data):
+        """Parse JSON data.
+
+        Args:
+            data (bytes or memoryview):
+                The UTF-8-encoded JSON data to parse.
+
+        Returns:
+            object:
+            The parsed data.
+
+        Raises:
+            ValueError:
+                The data could not be parsed.
+        """
+        if not isinstance(data, bytes):
+            data = bytes(data)
+
+        if six.PY2:
+            data = data.decode('utf-8')
+
+        return json.loads(data)
+
+
+class OrjsonBackend(JSONBackend):
+    """A JSON backend using :pypi:`orjson`.
+
+    orjson can parse directly from buffers, so memory-mapped files are
+    parsed without an extra copy.
+    """
+
+    name = 'orjson'
+    accepts_buffers = True
+
+    def __init__(self):
+        """Initialize the backend.
+
+        Raises:
+            ImportError:
+                orjson is not installed.
+        """
+        import orjson
+
+        self._orjson = orjson
+
+    def loads(self, data):
+        """Parse JSON data.
+
+        Args:
+            data (bytes or memoryview):
+                The UTF-8-encoded JSON data to parse.
+
+        Returns:
+            object:
+            The parsed data.
+
+        Raises:
+            ValueError:
+                The data could not be parsed.
+        """
+        return self._orjson.loads(data)
+
+
+class UjsonBackend(JSONBackend):
+    """A JSON backend using :pypi:`ujson`.
+
+    Buffers are copied into a byte string before parsing.
+    """
+
+    name = 'ujson'
+
+    def __init__(self):
+        """Initialize the backend.
+
+        Raises:
+            ImportError:
+                ujson is not installed.
+        """
+        import ujson
+
+        self._ujson = ujson
+
+    def loads(self, data):
+        """Parse JSON data.
+
+        Args:
+            data (bytes or memoryview):
+                The UTF-8-encoded JSON data to parse.
+
+        Returns:
+            object:
+            The parsed data.
+
+        Raises:
+            ValueError:
+                The data could not be parsed.
+        """
+        if not isinstance(data, bytes):
+            data = bytes(data)
+
+        return self._ujson.loads(data)
+
+
+#: The available backends, in order of preference.
+JSON_BACKENDS = [
+    OrjsonBackend,
+    UjsonBackend,
+    StdlibJSONBackend,
+]
+
+
+def get_json_backend():
+    """Return the JSON backend for the process.
+
+    The first time this is called, the fastest installed backend will be
+    chosen, unless one is specified in :env:`RBPKG_JSON_BACKEND`.
+
+    Returns:
+        JSONBackend:
+        The JSON backend.
+    """
+    global _json_backend
+
+    if _json_backend is None:
+        requested_name = os.environ.get('RBPKG_JSON_BACKEND')
+
+        for backend_cls in JSON_BACKENDS:
+            if requested_name and backend_cls.name != requested_name:
+                continue
+
+            try:
+                _json_backend = backend_cls()
+                break
+            except ImportError:
+                continue
+
+        if _json_backend is None:
+            logger.warning('JSON backend "%s" is not available. Falling '
+                           'back to the standard json module.',
+                           requested_name)
+            _json_backend = StdlibJSONBackend()
+
+        logger.debug('Using JSON backend "%s"', _json_backend.name)
+
+    return _json_backend
+
+
+def set_json_backend(backend):
+    """Set the JSON backend for the process.
+
+    This is primarily meant for unit tests and benchmarks.
+
+    Args:
+        backend (JSONBackend):
+            The backend to use, or ``None`` to choose one automatically on
+            next use.
+    """
+    global _json_backend
+
+    _json_backend = backend
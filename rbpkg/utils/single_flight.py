@@ -0,0 +1,98 @@
+from __future__ import unicode_literals
+
+import sys
+import threading
+
+import six
+
+
+class _InFlightCall(object):
+    """State for a call in progress within a :py:class:`SingleFlight`."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.exc_info = None
+
+
+class SingleFlight(object):
+    """Coalesces concurrent calls for the same key into a single call.
+
+    When several threads request the same key at the same time, only the
+    first one will perform the work. The others will wait for it to finish
+    and then receive the same result (or exception).
+
+    Once a call finishes, the key is forgotten, so later calls will perform
+    the work again. Callers are expected to cache results themselves.
+
+    Attributes:
+        call_count (int):
+            The number of calls that performed work.
+
+        coalesced_count (int):
+            The number of calls that waited on another call's result
+            instead of performing the work themselves.
+    """
+
+    def __init__(self):
+        """Initialize the object."""
+        self.call_count = 0
+        self.coalesced_count = 0
+
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        """Call a function, sharing the result with concurrent callers.
+
+        Args:
+            key (object):
+                The key identifying the work. This must be hashable.
+
+            func (callable):
+                The function to call, if no call for the key is in flight.
+
+            *args (tuple):
+                Positional arguments to pass to the function.
+
+            **kwargs (dict):
+                Keyword arguments to pass to the function.
+
+        Returns:
+            object:
+            The result of the function.
+
+        Raises:
+            Exception:
+                Any exception raised by the function will be raised to all
+                callers waiting on it.
+        """
+        with self._lock:
+            call = self._in_flight.get(key)
+
+            if call is None:
+                call = _InFlightCall()
+                self._in_flight[key] = call
+                self.call_count += 1
+                is_owner = True
+            else:
+                self.coalesced_count += 1
+                is_owner = False
+
+        if is_owner:
+            try:
+                call.result = func(*args, **kwargs)
+            except BaseException:
+                call.exc_info = sys.exc_info()
+            finally:
+                with self._lock:
+                    del self._in_flight[key]
+
+                call.event.set()
+        else:
+            call.event.wait()
+
+        if call.exc_info is not None:
+            six.reraise(*call.exc_info)
+
+        return call.result
@@ -0,0 +1,207 @@
+from __future__ import unicode_literals
+
+import time
+
+from rbpkg.testing.testcases import TestCase
+from rbpkg.utils.caches import (LFUObjectCache, LRUObjectCache,
+                                NegativeCache, estimate_size)
+
+
+class NegativeCacheTests(TestCase):
+    """Unit tests for rbpkg.utils.caches.NegativeCache."""
+
+    def test_add_and_get(self):
+        """Testing NegativeCache.add and NegativeCache.get"""
+        cache = NegativeCache()
+        cache.add('key', 'Not found')
+
+        self.assertEqual(cache.get('key'), 'Not found')
+        self.assertIn('key', cache)
+        self.assertIsNone(cache.get('other'))
+        self.assertNotIn('other', cache)
+
+    def test_get_with_expired(self):
+        """Testing NegativeCache.get with an expired entry"""
+        cache = NegativeCache(ttl=0.01)
+        cache.add('key1')
+        cache.add('key2', ttl=60)
+
+        time.sleep(0.02)
+
+        self.assertIsNone(cache.get('key1'))
+        self.assertEqual(cache.get('key2'), '')
+        self.assertEqual(len(cache), 1)
+
+    def test_add_with_max_entries(self):
+        """Testing NegativeCache.add drops the oldest entries when full"""
+        cache = NegativeCache(max_entries=2)
+        cache.add('key1')
+        cache.add('key2')
+        cache.add('key3')
+
+        self.assertEqual(len(cache), 2)
+        self.assertNotIn('key1', cache)
+        self.assertIn('key2', cache)
+        self.assertIn('key3', cache)
+
+    def test_discard(self):
+        """Testing NegativeCache.discard"""
+        cache = NegativeCache()
+        cache.add('key')
+        cache.discard('key')
+        cache.discard('other')
+
+        self.assertNotIn('key', cache)
+
+    def test_clear(self):
+        """Testing NegativeCache.clear"""
+        cache = NegativeCache()
+        cache.add('key1')
+        cache.add('key2')
+        cache.clear()
+
+        self.assertEqual(len(cache), 0)
+
+
+class LRUObjectCacheTests(TestCase):
+    """Unit tests for rbpkg.utils.caches.LRUObjectCache."""
+
+    def test_set_and_get(self):
+        """Testing LRUObjectCache.set and LRUObjectCache.get"""
+        cache = LRUObjectCache(get_size=len)
+        cache.set('key', 'value')
+
+        self.assertEqual(cache.get('key'), 'value')
+        self.assertIsNone(cache.get('other'))
+        self.assertEqual(cache.total_size, 5)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+
+    def test_set_evicts_least_recently_used(self):
+        """Testing LRUObjectCache.set evicts least recently used objects"""
+        evicted = []
+        cache = LRUObjectCache(max_size=30, get_size=len,
+                               on_evict=lambda *args: evicted.append(args))
+        cache.set('key1', 'x' * 10)
+        cache.set('key2', 'x' * 10)
+        cache.set('key3', 'x' * 10)
+        cache.get('key1')
+        cache.set('key4', 'x' * 10)
+
+        self.assertEqual(cache.keys(), ['key3', 'key1', 'key4'])
+        self.assertEqual(evicted, [('key2', 'x' * 10)])
+        self.assertEqual(cache.total_size, 30)
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(cache.evicted_size, 10)
+
+    def test_set_with_object_over_budget(self):
+        """Testing LRUObjectCache.set with an object larger than the budget
+        """
+        cache = LRUObjectCache(max_size=10, get_size=len)
+        cache.set('key', 'x' * 20)
+
+        self.assertNotIn('key', cache)
+        self.assertEqual(cache.total_size, 0)
+
+    def test_update_size(self):
+        """Testing LRUObjectCache.update_size evicts when an object grows"""
+        cache = LRUObjectCache(max_size=30, get_size=len)
+        cache.set('key1', ['x'] * 10)
+        cache.set('key2', ['x'] * 10)
+
+        cache.peek('key2').extend(['x'] * 15)
+        cache.update_size('key2')
+
+        self.assertEqual(cache.keys(), ['key2'])
+        self.assertEqual(cache.total_size, 25)
+
+    def test_discard_and_clear(self):
+        """Testing LRUObjectCache.discard and LRUObjectCache.clear"""
+        evicted = []
+        cache = LRUObjectCache(get_size=len,
+                               on_evict=lambda *args: evicted.append(args))
+        cache.set('key1', 'value')
+        cache.set('key2', 'value')
+        cache.discard('key1')
+
+        self.assertEqual(cache.keys(), ['key2'])
+        self.assertEqual(cache.total_size, 5)
+
+        cache.clear()
+
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.total_size, 0)
+        self.assertEqual(evicted, [])
+
+    def test_get_stats(self):
+        """Testing LRUObjectCache.get_stats"""
+        cache = LRUObjectCache(max_size=10, get_size=len)
+        cache.set('key1', 'x' * 6)
+        cache.set('key2', 'x' * 6)
+        cache.get('key2')
+        cache.get('key1')
+
+        self.assertEqual(cache.get_stats(), {
+            'policy': 'lru',
+            'entries': 1,
+            'size': 6,
+            'max_size': 10,
+            'hits': 1,
+            'misses': 1,
+            'evictions': 1,
+            'evicted_size': 6,
+        })
+
+
+class LFUObjectCacheTests(TestCase):
+    """Unit tests for rbpkg.utils.caches.LFUObjectCache."""
+
+    def test_set_evicts_least_frequently_used(self):
+        """Testing LFUObjectCache.set evicts least frequently used objects"""
+        cache = LFUObjectCache(max_size=30, get_size=len)
+        cache.set('key1', 'x' * 10)
+        cache.set('key2', 'x' * 10)
+        cache.set('key3', 'x' * 10)
+
+        cache.get('key1')
+        cache.get('key1')
+        cache.get('key2')
+        cache.get('key3')
+        cache.get('key3')
+
+        cache.set('key4', 'x' * 10)
+
+        self.assertEqual(sorted(cache.keys()), ['key1', 'key3', 'key4'])
+
+    def test_set_with_ties(self):
+        """Testing LFUObjectCache.set evicts the oldest object on ties"""
+        cache = LFUObjectCache(max_size=20, get_size=len)
+        cache.set('key1', 'x' * 10)
+        cache.set('key2', 'x' * 10)
+        cache.set('key3', 'x' * 10)
+
+        self.assertEqual(sorted(cache.keys()), ['key2', 'key3'])
+
+
+class EstimateSizeTests(TestCase):
+    """Unit tests for rbpkg.utils.caches.estimate_size."""
+
+    def test_with_nested_objects(self):
+        """Testing estimate_size counts referenced objects"""
+        class Node(object):
+            def __init__(self, parent=None):
+                self.parent = parent
+                self.children = []
+                self.data = None
+
+        root = Node()
+        empty_size = estimate_size(root)
+
+        child = Node(root)
+        child.data = 'x' * 1000
+        root.children.append(child)
+
+        self.assertGreater(estimate_size(root), empty_size + 1000)
+
+        # The back-reference to the parent isn't counted twice.
+        self.assertEqual(estimate_size(root), estimate_size(child))
@@ -0,0 +1,65 @@
+from __future__ import unicode_literals
+
+import io
+from unittest import SkipTest
+
+from rbpkg.testing.testcases import TestCase
+from rbpkg.utils.compression import (COMPRESSION_GZIP, COMPRESSION_XZ,
+                                     compress, decompress,
+                                     detect_compression,
+                                     get_supported_compressions,
+                                     open_decompressed)
+
+
+class CompressionTests(TestCase):
+    """Unit tests for rbpkg.utils.compression."""
+
+    data = b'{"releases": []}' * 10000
+
+    def test_compress_and_decompress_gzip(self):
+        """Testing compress and decompress with gzip"""
+        compressed = compress(self.data, COMPRESSION_GZIP)
+
+        self.assertTrue(len(compressed) < len(self.data))
+        self.assertEqual(detect_compression(compressed), COMPRESSION_GZIP)
+        self.assertEqual(decompress(compressed), self.data)
+
+    def test_compress_gzip_is_deterministic(self):
+        """Testing compress with gzip produces stable output"""
+        self.assertEqual(compress(self.data, COMPRESSION_GZIP),
+                         compress(self.data, COMPRESSION_GZIP))
+
+    def test_compress_and_decompress_xz(self):
+        """Testing compress and decompress with xz"""
+        if COMPRESSION_XZ not in get_supported_compressions():
+            raise SkipTest('XZ compression is not supported')
+
+        compressed = compress(self.data, COMPRESSION_XZ)
+
+        self.assertTrue(len(compressed) < len(self.data))
+        self.assertEqual(detect_compression(compressed), COMPRESSION_XZ)
+        self.assertEqual(decompress(compressed), self.data)
+
+    def test_compress_with_unsupported(self):
+        """Testing compress with unsupported compression format"""
+        self.assertRaises(ValueError, lambda: compress(self.data, 'zip'))
+
+    def test_decompress_with_uncompressed(self):
+        """Testing decompress with uncompressed data"""
+        self.assertEqual(decompress(self.data), self.data)
+        self.assertIsNone(detect_compression(self.data))
+
+    def test_decompress_with_corrupt_data(self):
+        """Testing decompress with corrupt data"""
+        compressed = compress(self.data, COMPRESSION_GZIP)
+
+        self.assertRaises(
+            IOError,
+            lambda: decompress(compressed[:10] + b'xxxxxxxxxx'))
+
+    def test_open_decompressed(self):
+        """Testing open_decompressed"""
+        fp = io.BytesIO(compress(self.data, COMPRESSION_GZIP))
+
+        with open_decompressed(fp, COMPRESSION_GZIP) as decompressed_fp:
+            self.assertEqual(decompressed_fp.read(), self.data)
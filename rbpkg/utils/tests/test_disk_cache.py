@@ -0,0 +1,175 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+
+from rbpkg.testing.testcases import TestCase
+from rbpkg.utils.disk_cache import DiskCache
+
+
+class DiskCacheTests(TestCase):
+    """Unit tests for rbpkg.utils.disk_cache.DiskCache."""
+
+    def setUp(self):
+        super(DiskCacheTests, self).setUp()
+
+        self.cache_dir = tempfile.mkdtemp(prefix='rbpkg-tests.')
+
+    def tearDown(self):
+        super(DiskCacheTests, self).tearDown()
+
+        shutil.rmtree(self.cache_dir)
+
+    def test_get_with_miss(self):
+        """Testing DiskCache.get with key not in the cache"""
+        cache = DiskCache(self.cache_dir)
+
+        self.assertIsNone(cache.get('/packages/index.json'))
+
+    def test_set_and_get(self):
+        """Testing DiskCache.set and DiskCache.get"""
+        cache = DiskCache(self.cache_dir)
+        cache.set('/packages/index.json', b'{}\n{}',
+                  etag='"abc"',
+                  last_modified='Sat, 10 Oct 2015 08:17:29 GMT')
+
+        entry = cache.get('/packages/index.json')
+        self.assertEqual(entry.key, '/packages/index.json')
+        self.assertEqual(entry.content, b'{}\n{}')
+        self.assertEqual(entry.etag, '"abc"')
+        self.assertEqual(entry.last_modified,
+                         'Sat, 10 Oct 2015 08:17:29 GMT')
+        self.assertIsNotNone(entry.stored_timestamp)
+
+    def test_set_replaces_entry(self):
+        """Testing DiskCache.set replaces an existing entry"""
+        cache = DiskCache(self.cache_dir)
+        cache.set('key', b'old')
+        cache.set('key', b'new')
+
+        self.assertEqual(cache.get('key').content, b'new')
+        self.assertEqual(
+            [name for name in os.listdir(self.cache_dir)
+             if name.startswith('.tmp-')],
+            [])
+
+    def test_set_replaces_entry_total_size(self):
+        """Testing DiskCache.set accounts for the size of a replaced entry"""
+        cache = DiskCache(self.cache_dir)
+        cache.set('key', b'old content')
+        cache.get_total_size()
+        cache.set('key', b'new content, which is longer')
+
+        self.assertEqual(
+            cache.get_total_size(),
+            sum(
+                os.path.getsize(os.path.join(self.cache_dir, name))
+                for name in os.listdir(self.cache_dir)
+            ))
+
+    def test_set_with_write_error(self):
+        """Testing DiskCache.set with an error creating the entry"""
+        cache = DiskCache(self.cache_dir)
+        shutil.rmtree(self.cache_dir)
+
+        try:
+            cache.set('/packages/index.json', b'{}')
+        finally:
+            os.mkdir(self.cache_dir)
+
+        self.assertIsNone(cache.get('/packages/index.json'))
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_set_with_missing(self):
+        """Testing DiskCache.set with missing=True"""
+        cache = DiskCache(self.cache_dir)
+        cache.set('key', b'Not found', missing=True)
+
+        entry = cache.get('key')
+        self.assertTrue(entry.missing)
+        self.assertEqual(entry.content, b'Not found')
+
+        cache.set('key', b'content')
+        self.assertFalse(cache.get('key').missing)
+
+    def test_mark_validated(self):
+        """Testing DiskCache.mark_validated"""
+        cache = DiskCache(self.cache_dir)
+        cache.set('key', b'content')
+
+        filename = cache._get_filename('key')
+        st = os.stat(filename)
+        stored_timestamp = cache.get('key').stored_timestamp
+
+        cache.mark_validated('key')
+        os.utime(cache._get_validated_filename(filename),
+                 (stored_timestamp + 100, stored_timestamp + 100))
+
+        entry = cache.get('key')
+        self.assertEqual(entry.content, b'content')
+        self.assertEqual(entry.stored_timestamp, stored_timestamp)
+        self.assertEqual(entry.validated_timestamp, stored_timestamp + 100)
+
+        # The entry itself should not have been rewritten.
+        self.assertEqual(os.stat(filename).st_ino, st.st_ino)
+
+    def test_delete(self):
+        """Testing DiskCache.delete"""
+        cache = DiskCache(self.cache_dir)
+        cache.set('key', b'content')
+        cache.delete('key')
+
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(cache.get_total_size(), 0)
+
+    def test_delete_with_validated(self):
+        """Testing DiskCache.delete with an entry marked as validated"""
+        cache = DiskCache(self.cache_dir)
+        cache.set('key', b'content')
+        cache.mark_validated('key')
+        cache.delete('key')
+
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_clear(self):
+        """Testing DiskCache.clear"""
+        cache = DiskCache(self.cache_dir)
+        cache.set('key1', b'content')
+        cache.set('key2', b'content')
+        cache.clear()
+
+        self.assertIsNone(cache.get('key1'))
+        self.assertIsNone(cache.get('key2'))
+        self.assertEqual(cache.get_total_size(), 0)
+
+    def test_eviction(self):
+        """Testing DiskCache evicts least recently used entries"""
+        cache = DiskCache(self.cache_dir)
+
+        for i, key in enumerate(('key1', 'key2', 'key3')):
+            cache.set(key, b'x' * 100)
+            os.utime(cache._get_filename(key), (1000 + i, 1000 + i))
+
+        # Mark key1 as more recent than key2.
+        os.utime(cache._get_filename('key1'), (2000, 2000))
+
+        cache.max_size = cache.get_total_size() + 10
+        cache.set('key4', b'x' * 100)
+
+        self.assertIsNotNone(cache.get('key1'))
+        self.assertIsNone(cache.get('key2'))
+        self.assertIsNotNone(cache.get('key3'))
+        self.assertIsNotNone(cache.get('key4'))
+        self.assertTrue(cache.get_total_size() <= cache.max_size)
+
+    def test_get_with_corrupt_entry(self):
+        """Testing DiskCache.get with a corrupt entry"""
+        cache = DiskCache(self.cache_dir)
+        cache.set('key', b'content')
+
+        with open(cache._get_filename('key'), 'wb') as fp:
+            fp.write(b'corrupt\ncontent')
+
+        self.assertIsNone(cache.get('key'))
+        self.assertFalse(os.path.exists(cache._get_filename('key')))
@@ -0,0 +1,81 @@
+from __future__ import unicode_literals
+
+import os
+
+from rbpkg.testing.testcases import TestCase
+from rbpkg.utils.json_backends import (JSON_BACKENDS, StdlibJSONBackend,
+                                       get_json_backend, set_json_backend)
+
+
+class JSONBackendsTests(TestCase):
+    """Unit tests for rbpkg.utils.json_backends."""
+
+    def setUp(self):
+        super(JSONBackendsTests, self).setUp()
+
+        self._old_backend_name = os.environ.pop('RBPKG_JSON_BACKEND', None)
+        set_json_backend(None)
+
+    def tearDown(self):
+        super(JSONBackendsTests, self).tearDown()
+
+        if self._old_backend_name is None:
+            os.environ.pop('RBPKG_JSON_BACKEND', None)
+        else:
+            os.environ['RBPKG_JSON_BACKEND'] = self._old_backend_name
+
+        set_json_backend(None)
+
+    def test_get_json_backend_is_cached(self):
+        """Testing get_json_backend returns the same backend each call"""
+        self.assertIs(get_json_backend(), get_json_backend())
+
+    def test_get_json_backend_with_env(self):
+        """Testing get_json_backend with RBPKG_JSON_BACKEND"""
+        os.environ['RBPKG_JSON_BACKEND'] = 'json'
+
+        self.assertIsInstance(get_json_backend(), StdlibJSONBackend)
+
+    def test_get_json_backend_with_unavailable_env(self):
+        """Testing get_json_backend with RBPKG_JSON_BACKEND naming an
+        unknown backend
+        """
+        os.environ['RBPKG_JSON_BACKEND'] = 'unknown'
+
+        self.assertIsInstance(get_json_backend(), StdlibJSONBackend)
+
+    def test_loads(self):
+        """Testing JSONBackend.loads with all installed backends"""
+        data = b'{"name": "TestPackage", "releases": [{"version": "1.0"}]}'
+        expected = {
+            'name': 'TestPackage',
+            'releases': [{'version': '1.0'}],
+        }
+
+        for backend in self._get_installed_backends():
+            self.assertEqual(backend.loads(data), expected)
+            self.assertEqual(backend.loads(memoryview(data)), expected)
+
+    def test_loads_with_invalid_json(self):
+        """Testing JSONBackend.loads with invalid JSON and all installed
+        backends
+        """
+        for backend in self._get_installed_backends():
+            self.assertRaises(ValueError, backend.loads, b'{"name": ')
+
+    def _get_installed_backends(self):
+        """Return instances of all installed backends.
+
+        Returns:
+            list of rbpkg.utils.json_backends.JSONBackend:
+            The installed backends.
+        """
+        backends = []
+
+        for backend_cls in JSON_BACKENDS:
+            try:
+                backends.append(backend_cls())
+            except ImportError:
+                pass
+
+        return backends
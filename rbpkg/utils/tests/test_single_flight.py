@@ -0,0 +1,110 @@
+from __future__ import unicode_literals
+
+import threading
+
+from rbpkg.testing.testcases import TestCase
+from rbpkg.utils.single_flight import SingleFlight
+
+
+class SingleFlightTests(TestCase):
+    """Unit tests for rbpkg.utils.single_flight.SingleFlight."""
+
+    def _run_concurrently(self, single_flight, key, func, num_threads=5):
+        """Call SingleFlight.do from several threads at once.
+
+        The function is blocked until all threads have started, ensuring the
+        calls overlap.
+
+        Args:
+            single_flight (rbpkg.utils.single_flight.SingleFlight):
+                The object to call.
+
+            key (object):
+                The key to pass.
+
+            func (callable):
+                The function to pass.
+
+            num_threads (int, optional):
+                The number of threads to start.
+
+        Returns:
+            list:
+            The result (or exception) from each thread.
+        """
+        results = []
+        release = threading.Event()
+
+        def _blocking_func():
+            release.wait()
+
+            return func()
+
+        def _thread_main():
+            try:
+                results.append(single_flight.do(key, _blocking_func))
+            except Exception as e:
+                results.append(e)
+
+        threads = [
+            threading.Thread(target=_thread_main)
+            for i in range(num_threads)
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        # Wait until every thread is either running the function or waiting
+        # on it.
+        while (single_flight.call_count +
+               single_flight.coalesced_count) < num_threads:
+            threading.Event().wait(0.01)
+
+        release.set()
+
+        for thread in threads:
+            thread.join()
+
+        return results
+
+    def test_do(self):
+        """Testing SingleFlight.do"""
+        single_flight = SingleFlight()
+
+        self.assertEqual(single_flight.do('key', lambda: 42), 42)
+        self.assertEqual(single_flight.do('key', lambda: 43), 43)
+        self.assertEqual(single_flight.call_count, 2)
+        self.assertEqual(single_flight.coalesced_count, 0)
+
+    def test_do_with_concurrent_calls(self):
+        """Testing SingleFlight.do with concurrent calls for the same key"""
+        single_flight = SingleFlight()
+        calls = []
+
+        def _func():
+            calls.append(1)
+
+            return 'result'
+
+        results = self._run_concurrently(single_flight, 'key', _func)
+
+        self.assertEqual(results, ['result'] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(single_flight.call_count, 1)
+        self.assertEqual(single_flight.coalesced_count, 4)
+
+    def test_do_with_concurrent_errors(self):
+        """Testing SingleFlight.do with concurrent calls raising an error"""
+        single_flight = SingleFlight()
+
+        def _func():
+            raise ValueError('oh no')
+
+        results = self._run_concurrently(single_flight, 'key', _func)
+
+        self.assertEqual(len(results), 5)
+
+        for result in results:
+            self.assertIsInstance(result, ValueError)
+
+        self.assertEqual(single_flight.call_count, 1)
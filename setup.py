@@ -27,6 +27,9 @@ elif sys.hexversion < 0x02070000:
 
 rbpkg_commands = [
     'install = rbpkg.commands.install:InstallCommand',
+    'mirror = rbpkg.commands.mirror:MirrorCommand',
+    'search = rbpkg.commands.search:SearchCommand',
+    'snapshot = rbpkg.commands.snapshot:SnapshotCommand',
     'upgrade = rbpkg.commands.upgrade:UpgradeCommand',
 ]
 
@@ -44,6 +47,9 @@ setup(
         'rbpkg_commands': rbpkg_commands,
     },
     install_requires=install_requires,
+    extras_require={
+        'watch': ['watchdog'],
+    },
     include_package_data=True,
     maintainer='Christian Hammond',
     maintainer_email='christian@beanbaginc.com',